@@ -1,10 +1,14 @@
 import os
+import json
 import logging
 import uuid
 import threading
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
+import click
+from datetime import datetime, timedelta
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.utils import secure_filename
 
@@ -40,6 +44,16 @@ ALLOWED_EXTENSIONS = {'csv'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+app.config['PREVIEW_MIN_BYTES'] = 5 * 1024 * 1024  # Publish a sampled preview first for larger uploads
+app.config['MAX_SHARDS'] = 64  # Upper bound on topic-hash shards a single upload can be split into
+app.config['LOCAL_SHARD_PROCESSES'] = int(os.environ.get('LOCAL_SHARD_PROCESSES', max(1, (os.cpu_count() or 2) - 1)))
+app.config['MAX_EXTRACTED_BYTES'] = 2 * 1024 * 1024 * 1024  # Uncompressed size limit for archive/gzip/zstd uploads
+app.config['MAX_RESUMABLE_UPLOAD_BYTES'] = 2 * 1024 * 1024 * 1024  # Chunked uploads bypass MAX_CONTENT_LENGTH per file
+app.config['UPLOAD_CHUNK_BYTES'] = 8 * 1024 * 1024  # Chunk size suggested to resumable upload clients
+# Comma-separated text_normalizer rules applied before scoring; unset for all, "none" to score raw text
+app.config['TEXT_NORMALIZATION_RULES'] = os.environ.get('TEXT_NORMALIZATION_RULES')
+app.config['GENERATION_CONCURRENCY'] = int(os.environ.get('GENERATION_CONCURRENCY', 4))  # EIPs generated at once per batch job
+app.config['MAX_GENERATION_EIPS'] = 100  # Upper bound on EIPs in one batch generation job
 
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -57,6 +71,14 @@ class AnalysisJob(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = db.Column(db.DateTime)
+    metadata_snapshot_id = db.Column(db.Integer, db.ForeignKey('eip_metadata_snapshot.id'))
+    # Which results the job's EIPSentiment rows hold: 'preview' (sampled), 'partial' (rows scored so far) or 'final'
+    result_kind = db.Column(db.String(20))
+    processed_fraction = db.Column(db.Float)
+    # SHA-256 of the uploaded file, used to count each upload once in the global rollup
+    content_hash = db.Column(db.String(64), index=True)
+    # 'sentiment' (an uploaded CSV) or 'generation' (batch contract and test generation, see batch_generation.py)
+    job_type = db.Column(db.String(20), default='sentiment', nullable=False)
     
     output_files = db.relationship('OutputFile', backref='job', lazy=True, cascade='all, delete-orphan')
 
@@ -69,37 +91,416 @@ class OutputFile(db.Model):
     file_size = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class EIPMetadataSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    source = db.Column(db.String(255))
+    eip_count = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    entries = db.relationship('EIPMetadata', backref='snapshot', lazy=True)
+
+class EIPMetadata(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # NULL for rows attached to a single sentiment record instead of a shared snapshot
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('eip_metadata_snapshot.id'))
+    eip = db.Column(db.String(10), nullable=False)
+    category = db.Column(db.String(100))
+    status = db.Column(db.String(50))
+    title = db.Column(db.Text)
+    author = db.Column(db.Text)
+    
+    __table_args__ = (db.UniqueConstraint('snapshot_id', 'eip', name='uq_metadata_snapshot_eip'),)
+
+def _metadata_attribute(name):
+    """Expose an EIPMetadata column on EIPSentiment for reads, writes and query filters"""
+    
+    def getter(self):
+        return getattr(self.eip_metadata, name) if self.eip_metadata is not None else None
+    
+    def setter(self, value):
+        # Shared snapshot rows are copied before writing so other jobs are unaffected
+        if self.eip_metadata is None or self.eip_metadata.snapshot_id is not None:
+            current = self.eip_metadata
+            self.eip_metadata = EIPMetadata(
+                eip=self.eip,
+                category=current.category if current else None,
+                status=current.status if current else None,
+                title=current.title if current else None,
+                author=current.author if current else None
+            )
+        setattr(self.eip_metadata, name, value)
+    
+    def expression(cls):
+        return select(getattr(EIPMetadata, name)).where(EIPMetadata.id == cls.metadata_id).scalar_subquery()
+    
+    return hybrid_property(getter, setter, expr=expression)
+
 class EIPSentiment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.String(36), db.ForeignKey('analysis_job.id'), nullable=False)
     eip = db.Column(db.String(10), nullable=False)
+    metadata_id = db.Column(db.Integer, db.ForeignKey('eip_metadata.id'), index=True)
     unified_compound = db.Column(db.Float)
     unified_pos = db.Column(db.Float)
     unified_neg = db.Column(db.Float)
     unified_neu = db.Column(db.Float)
     total_comment_count = db.Column(db.Integer)
-    category = db.Column(db.String(100))
-    status = db.Column(db.String(50))
-    title = db.Column(db.Text)
-    author = db.Column(db.Text)
+    # Distribution of comment compound scores (see quantile_sketch.CompoundSketch)
+    compound_p10 = db.Column(db.Float)
+    compound_p50 = db.Column(db.Float)
+    compound_p90 = db.Column(db.Float)
+    polarization = db.Column(db.Float)
+    compound_sketch = db.Column(db.Text)
+    # 95% bootstrap confidence interval of unified_compound
+    compound_ci_low = db.Column(db.Float)
+    compound_ci_high = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    eip_metadata = db.relationship('EIPMetadata', lazy='joined')
+    
+    category = _metadata_attribute('category')
+    status = _metadata_attribute('status')
+    title = _metadata_attribute('title')
+    author = _metadata_attribute('author')
+    
     __table_args__ = (db.Index('idx_eip_job', 'eip', 'job_id'),)
 
+class GlobalEIPSentiment(db.Model):
+    """Corpus-wide per-EIP sums across every rolled-up upload"""
+    eip = db.Column(db.String(10), primary_key=True)
+    compound_sum = db.Column(db.Float, default=0.0)
+    pos_sum = db.Column(db.Float, default=0.0)
+    neg_sum = db.Column(db.Float, default=0.0)
+    neu_sum = db.Column(db.Float, default=0.0)
+    comment_count = db.Column(db.Integer, default=0, index=True)
+    # Kept equal to compound_sum / comment_count so leaderboards are an index scan
+    unified_compound = db.Column(db.Float, index=True)
+    compound_sketch = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class GlobalRollupSource(db.Model):
+    """An upload (or appended delta) already counted in the global rollup"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    job_id = db.Column(db.String(36), db.ForeignKey('analysis_job.id'))
+    comment_count = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class GlobalSentimentSummary(db.Model):
+    """Single-row running totals behind the global summary endpoint"""
+    id = db.Column(db.Integer, primary_key=True)
+    upload_count = db.Column(db.Integer, default=0)
+    comment_count = db.Column(db.Integer, default=0)
+    compound_sum = db.Column(db.Float, default=0.0)
+    eip_count = db.Column(db.Integer, default=0)
+    eip_compound_sum = db.Column(db.Float, default=0.0)
+    positive_eips = db.Column(db.Integer, default=0)
+    negative_eips = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class JobShard(db.Model):
+    """One topic-hash partition of a split job, claimed and scored by a shard worker"""
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(36), db.ForeignKey('analysis_job.id'), nullable=False)
+    shard_index = db.Column(db.Integer, nullable=False)
+    shard_count = db.Column(db.Integer, nullable=False)
+    input_path = db.Column(db.String(500), nullable=False)
+    row_count = db.Column(db.Integer)
+    # pending -> running -> completed, or back to pending when a worker fails or its lease expires
+    status = db.Column(db.String(20), default='pending', index=True)
+    worker_id = db.Column(db.String(255))
+    lease_expires_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, default=0)
+    eip_aggregates_path = db.Column(db.String(500))
+    erc_aggregates_path = db.Column(db.String(500))
+    sketches_path = db.Column(db.String(500))
+    scores_path = db.Column(db.String(500))
+    error_message = db.Column(db.Text)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (db.UniqueConstraint('job_id', 'shard_index', name='uq_job_shard_index'),)
+
+class UploadSession(db.Model):
+    """A resumable upload being received in chunks; becomes an AnalysisJob when the last chunk lands"""
+    id = db.Column(db.String(36), primary_key=True)
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, default=0)
+    # Optional SHA-256 of the whole file, checked once every chunk has arrived
+    expected_sha256 = db.Column(db.String(64))
+    shards = db.Column(db.Integer, default=1)
+    # uploading -> completed, or invalid/aborted
+    status = db.Column(db.String(20), default='uploading')
+    header_checked = db.Column(db.Boolean, default=False)
+    error_message = db.Column(db.Text)
+    job_id = db.Column(db.String(36), db.ForeignKey('analysis_job.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class LLMTask(db.Model):
+    """An LLM endpoint call running on the background event loop; polled until it finishes"""
+    id = db.Column(db.String(36), primary_key=True)
+    # generate_contract, analyze_security, generate_tests or analyze_code
+    kind = db.Column(db.String(40), nullable=False)
+    # running -> completed, failed or cancelled
+    status = db.Column(db.String(20), default='running')
+    # Text generated so far by a streamed call, while it is running
+    partial_text = db.Column(db.Text)
+    result_json = db.Column(db.Text)
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Reported as failed once passed while still running, e.g. after the worker restarted
+    deadline_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+
+class LLMCall(db.Model):
+    """Telemetry of one LLM completion, written in batches by llm_telemetry"""
+    id = db.Column(db.Integer, primary_key=True)
+    # generate_contract, analyze_security, analyze_security_chunk, generate_tests or recommend_eips
+    endpoint = db.Column(db.String(40), nullable=False, index=True)
+    model = db.Column(db.String(40))
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    latency_ms = db.Column(db.Float)
+    # Streamed completions only
+    first_token_ms = db.Column(db.Float)
+    retries = db.Column(db.Integer, default=0)
+    cache_hit = db.Column(db.Boolean, default=False)
+    # Shared the result of an identical request already in flight
+    coalesced = db.Column(db.Boolean, default=False)
+    streamed = db.Column(db.Boolean, default=False)
+    error_class = db.Column(db.String(80))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
 # Initialize database tables
 with app.app_context():
     db.create_all()
 
+    # create_all never alters existing tables; add new columns and move legacy metadata
+    from schema_upgrade import upgrade_schema
+    upgrade_schema(db.engine, db.metadata)
+
+    from eip_search import ensure_search_index
+    ensure_search_index(db.engine)
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _replace_interim_rows(job, frame, result_kind, processed_fraction):
+    """Replace a job's sentiment rows with interim aggregates while the full run continues"""
+    from eip_metadata import metadata_ids_by_eip
+    
+    # The job's own metadata is only fetched during Stage 1; borrow the latest snapshot meanwhile
+    snapshot = EIPMetadataSnapshot.query.order_by(EIPMetadataSnapshot.created_at.desc()).first()
+    metadata_ids = metadata_ids_by_eip(snapshot)
+    
+    frame = frame.astype(object).where(frame.notna(), None)
+    now = datetime.utcnow()
+    rows = [{
+        'job_id': job.id,
+        'eip': record['eip'],
+        'metadata_id': metadata_ids.get(record['eip']),
+        'unified_compound': record.get('unified_compound'),
+        'unified_pos': record.get('unified_pos'),
+        'unified_neg': record.get('unified_neg'),
+        'unified_neu': record.get('unified_neu'),
+        'total_comment_count': record.get('total_comment_count'),
+        'compound_ci_low': record.get('compound_ci_low'),
+        'compound_ci_high': record.get('compound_ci_high'),
+        'created_at': now
+    } for record in frame.to_dict('records')]
+    
+    EIPSentiment.query.filter_by(job_id=job.id).delete()
+    if rows:
+        db.session.bulk_insert_mappings(EIPSentiment, rows)
+    job.result_kind = result_kind
+    job.processed_fraction = processed_fraction
+    job.updated_at = now
+    db.session.commit()
+
+def publish_preview(job, preview):
+    """Publish approximate aggregates from a stratified sample"""
+    sampled = preview['sampled_comment_count'].sum()
+    total = preview['total_comment_count'].sum()
+    _replace_interim_rows(job, preview, 'preview', float(sampled / total) if total else 0.0)
+
+def publish_partial(job, partial, processed_fraction):
+    """
+    Publish running Stage 1 aggregates for the rows scored so far.
+    
+    A preview stays up until the scored rows cover a larger share of the
+    comments than its sample did.
+    """
+    job.progress = 10 + int(23 * processed_fraction)
+    if job.result_kind == 'preview' and processed_fraction <= (job.processed_fraction or 0):
+        db.session.commit()
+        return False
+    _replace_interim_rows(job, partial.unified(), 'partial', processed_fraction)
+    return True
+
+def finish_analysis(job, analyzer, output_dir):
+    """Run Stages 2-3 for a job whose Stage 1 output is in output_dir, then store results and complete it"""
+    # Stage 2
+    job.stage = 'Stage 2: Fetching EIPs Insight data...'
+    db.session.commit()
+    
+    stage2_output = analyzer.run_stage2(output_dir)
+    job.progress = 66
+    db.session.commit()
+    
+    # Stage 3
+    job.stage = 'Stage 3: Merging and finalizing data...'
+    db.session.commit()
+    
+    final_output = analyzer.run_stage3(output_dir)
+    
+    store_job_results(job, final_output, output_dir)
+
+def store_job_results(job, final_output, output_dir):
+    """Record a job's output files and sentiment rows, add it to the global rollup and mark it completed"""
+    import pandas as pd
+    from score_store import SCORE_STORE_FILENAME
+    from partial_aggregates import PARTIAL_AGGREGATES_FILENAME
+    from text_normalizer import NORMALIZATION_STATS_FILENAME
+    from global_rollup import add_job_to_rollup
+    
+    job_id = job.id
+    
+    # Save output files to database
+    for file_path in final_output:
+        if os.path.exists(file_path):
+            filename = os.path.basename(file_path)
+            file_type = 'unknown'
+            if 'final_merged' in filename:
+                file_type = 'final_analysis'
+            elif 'summary' in filename:
+                file_type = 'summary'
+            elif 'enriched' in filename:
+                file_type = 'enriched'
+            elif filename == SCORE_STORE_FILENAME:
+                file_type = 'comment_scores'
+            elif filename == PARTIAL_AGGREGATES_FILENAME:
+                file_type = 'partial_aggregates'
+            elif filename == NORMALIZATION_STATS_FILENAME:
+                file_type = 'text_normalization'
+            
+            output_file = OutputFile()
+            output_file.job_id = job_id
+            output_file.filename = filename
+            output_file.file_path = file_path
+            output_file.file_type = file_type
+            output_file.file_size = os.path.getsize(file_path)
+            db.session.add(output_file)
+    
+    # Save sentiment data if final merged file exists
+    final_file = next((f for f in final_output if 'final_merged' in f), None)
+    if final_file and os.path.exists(final_file):
+        try:
+            from eip_metadata import load_job_metadata_frame, get_or_create_snapshot, metadata_ids_by_eip
+            
+            df = pd.read_csv(final_file)
+            
+            # Title/author/status/category live in a shared snapshot; rows only reference it
+            snapshot = get_or_create_snapshot(load_job_metadata_frame(output_dir), source=job.original_filename)
+            metadata_ids = metadata_ids_by_eip(snapshot)
+            job.metadata_snapshot_id = snapshot.id if snapshot else None
+            
+            # Handle numeric fields with proper type conversion
+            def safe_float(val):
+                if pd.isna(val) or val == '' or str(val).lower() in ['nan', 'none', 'null']:
+                    return None
+                try:
+                    return float(val)
+                except (ValueError, TypeError):
+                    return None
+            
+            def safe_int(val):
+                if pd.isna(val) or val == '' or str(val).lower() in ['nan', 'none', 'null']:
+                    return None
+                try:
+                    return int(float(val))
+                except (ValueError, TypeError):
+                    return None
+            
+            def safe_eip(val):
+                number = safe_int(val)
+                if number is not None:
+                    return str(number)
+                if pd.isna(val) or str(val).strip() == '' or str(val).lower() == 'nan':
+                    return None
+                return str(val).strip()
+            
+            rows = []
+            for record in df.to_dict('records'):
+                # Skip rows with invalid or missing EIP values
+                eip = safe_eip(record.get('eip'))
+                if eip is None:
+                    continue
+                
+                rows.append({
+                    'job_id': job_id,
+                    'eip': eip,
+                    'metadata_id': metadata_ids.get(eip),
+                    'unified_compound': safe_float(record.get('unified_compound')),
+                    'unified_pos': safe_float(record.get('unified_pos')),
+                    'unified_neg': safe_float(record.get('unified_neg')),
+                    'unified_neu': safe_float(record.get('unified_neu')),
+                    'total_comment_count': safe_int(record.get('total_comment_count')),
+                    'compound_p10': safe_float(record.get('compound_p10')),
+                    'compound_p50': safe_float(record.get('compound_p50')),
+                    'compound_p90': safe_float(record.get('compound_p90')),
+                    'polarization': safe_float(record.get('polarization')),
+                    'compound_ci_low': safe_float(record.get('compound_ci_low')),
+                    'compound_ci_high': safe_float(record.get('compound_ci_high')),
+                    'compound_sketch': record.get('compound_sketch') if isinstance(record.get('compound_sketch'), str) else None,
+                    'created_at': datetime.utcnow()
+                })
+            
+            # Final rows replace any preview rows; the delete commits with the first batch
+            EIPSentiment.query.filter_by(job_id=job_id).delete()
+            
+            # Bulk insert in batches to keep statements bounded
+            batch_size = 1000
+            for i in range(0, len(rows), batch_size):
+                try:
+                    db.session.bulk_insert_mappings(EIPSentiment, rows[i:i + batch_size])
+                    db.session.commit()
+                except Exception as batch_error:
+                    logging.warning(f"Batch commit error: {batch_error}")
+                    db.session.rollback()
+        except Exception as e:
+            logging.warning(f"Could not save sentiment data: {e}")
+    elif job.result_kind == 'preview':
+        EIPSentiment.query.filter_by(job_id=job_id).delete()
+    
+    # Count this upload in the corpus-wide rollup (skipped if the same file was rolled up before)
+    if job.content_hash:
+        try:
+            add_job_to_rollup(job)
+        except Exception as e:
+            logging.warning(f"Could not add job {job_id} to global rollup: {e}")
+            db.session.rollback()
+    
+    # Complete the job
+    job.status = 'completed'
+    job.result_kind = 'final'
+    job.processed_fraction = 1.0
+    job.stage = 'Analysis completed successfully!'
+    job.progress = 100
+    job.completed_at = datetime.utcnow()
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
 def process_csv_background(job_id, filepath, output_dir):
     """Background task to process CSV file through sentiment analysis pipeline"""
     
     try:
         # Import heavy dependencies only when needed
-        import pandas as pd
         from sentiment_analyzer import SentimentAnalyzer
+        from global_rollup import file_sha256
         
         with app.app_context():
             # Update job status to processing
@@ -110,140 +511,105 @@ def process_csv_background(job_id, filepath, output_dir):
             job.status = 'processing'
             job.stage = 'Initializing sentiment analyzer...'
             job.updated_at = datetime.utcnow()
+            # Resumable uploads hash chunks as they arrive
+            if os.path.exists(filepath) and not job.content_hash:
+                job.content_hash = file_sha256(filepath)
             db.session.commit()
             
-            analyzer = SentimentAnalyzer()
+            analyzer = SentimentAnalyzer(normalize_rules=app.config['TEXT_NORMALIZATION_RULES'])
+            
+            # Preview: score a stratified sample so the dashboard has results within seconds
+            if os.path.exists(filepath) and os.path.getsize(filepath) >= app.config['PREVIEW_MIN_BYTES']:
+                job.stage = 'Scoring a preview sample...'
+                job.progress = 5
+                db.session.commit()
+                try:
+                    publish_preview(job, analyzer.run_preview(filepath))
+                except Exception as e:
+                    logging.warning(f"Could not publish preview for job {job_id}: {e}")
+                    db.session.rollback()
             
             # Stage 1
             job.stage = 'Stage 1: Running VADER sentiment analysis...'
             job.progress = 10
             db.session.commit()
             
-            stage1_output = analyzer.run_stage1(filepath, output_dir)
+            def publish_progress(partial, fraction):
+                try:
+                    publish_partial(job, partial, fraction)
+                except Exception:
+                    db.session.rollback()
+                    raise
+            
+            stage1_output = analyzer.run_stage1(filepath, output_dir, progress_callback=publish_progress)
             job.progress = 33
             db.session.commit()
             
-            # Stage 2
-            job.stage = 'Stage 2: Fetching EIPs Insight data...'
-            db.session.commit()
+            finish_analysis(job, analyzer, output_dir)
             
-            stage2_output = analyzer.run_stage2(output_dir)
-            job.progress = 66
-            db.session.commit()
+    except Exception as e:
+        logging.error(f"Error processing job {job_id}: {str(e)}")
+        with app.app_context():
+            job = AnalysisJob.query.get(job_id)
+            if job:
+                job.status = 'error'
+                job.error_message = str(e)
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+
+def ingest_job_background(job_id, upload_paths, output_dir, shard_count=1):
+    """
+    Background task for sharded, compressed and multi-file uploads.
+    
+    Archives and compressed CSVs are unpacked as a stream and every member is
+    validated. A single CSV runs through process_csv_background unless it is
+    split into topic-hash shards; several members are scored as one shard
+    each and merged into one job result.
+    """
+    try:
+        from upload_ingest import ingest_uploads, missing_columns, members_sha256
+        from job_shards import split_job, shard_members, run_local_workers
+        
+        with app.app_context():
+            job = AnalysisJob.query.get(job_id)
+            if not job:
+                return
             
-            # Stage 3
-            job.stage = 'Stage 3: Merging and finalizing data...'
+            job.status = 'processing'
+            job.stage = 'Unpacking upload...'
+            job.updated_at = datetime.utcnow()
             db.session.commit()
             
-            final_output = analyzer.run_stage3(output_dir)
-            
-            # Save output files to database
-            for file_path in final_output:
-                if os.path.exists(file_path):
-                    filename = os.path.basename(file_path)
-                    file_type = 'unknown'
-                    if 'final_merged' in filename:
-                        file_type = 'final_analysis'
-                    elif 'summary' in filename:
-                        file_type = 'summary'
-                    elif 'enriched' in filename:
-                        file_type = 'enriched'
-                    
-                    output_file = OutputFile()
-                    output_file.job_id = job_id
-                    output_file.filename = filename
-                    output_file.file_path = file_path
-                    output_file.file_type = file_type
-                    output_file.file_size = os.path.getsize(file_path)
-                    db.session.add(output_file)
-            
-            # Save sentiment data if final merged file exists
-            final_file = next((f for f in final_output if 'final_merged' in f), None)
-            if final_file and os.path.exists(final_file):
+            members = ingest_uploads(upload_paths, os.path.join(output_dir, 'members'),
+                                     app.config['MAX_EXTRACTED_BYTES'])
+            invalid = []
+            for member in members:
                 try:
-                    df = pd.read_csv(final_file)
-                    
-                    # Handle numeric fields with proper type conversion
-                    def safe_float(val):
-                        if pd.isna(val) or val == '' or str(val).lower() in ['nan', 'none', 'null']:
-                            return None
-                        try:
-                            return float(val)
-                        except (ValueError, TypeError):
-                            return None
-                    
-                    def safe_int(val):
-                        if pd.isna(val) or val == '' or str(val).lower() in ['nan', 'none', 'null']:
-                            return None
-                        try:
-                            return int(float(val))
-                        except (ValueError, TypeError):
-                            return None
-                    
-                    def safe_str(val):
-                        if pd.isna(val) or val == '' or str(val).lower() in ['nan', 'none', 'null']:
-                            return None
-                        return str(val).strip()
-                    
-                    # Process in batches to avoid bulk insert issues
-                    batch_size = 100
-                    batch_count = 0
-                    
-                    for _, row in df.iterrows():
-                        # Skip rows with invalid or missing EIP values
-                        eip_val = row.get('eip', '')
-                        try:
-                            if eip_val is None or str(eip_val).strip() == '' or str(eip_val).lower() == 'nan':
-                                continue
-                        except:
-                            continue
-                            
-                        sentiment = EIPSentiment()
-                        sentiment.job_id = job_id
-                        sentiment.eip = str(eip_val).strip()
-                        sentiment.unified_compound = safe_float(row.get('unified_compound'))
-                        sentiment.unified_pos = safe_float(row.get('unified_pos'))
-                        sentiment.unified_neg = safe_float(row.get('unified_neg'))
-                        sentiment.unified_neu = safe_float(row.get('unified_neu'))
-                        sentiment.total_comment_count = safe_int(row.get('total_comment_count'))
-                        sentiment.category = safe_str(row.get('category_y'))
-                        sentiment.status = safe_str(row.get('status'))
-                        sentiment.title = safe_str(row.get('title'))
-                        sentiment.author = safe_str(row.get('author'))
-                        
-                        db.session.add(sentiment)
-                        batch_count += 1
-                        
-                        # Commit in batches
-                        if batch_count >= batch_size:
-                            try:
-                                db.session.commit()
-                                batch_count = 0
-                            except Exception as batch_error:
-                                logging.warning(f"Batch commit error: {batch_error}")
-                                db.session.rollback()
-                                batch_count = 0
-                    
-                    # Commit any remaining records
-                    if batch_count > 0:
-                        try:
-                            db.session.commit()
-                        except Exception as final_error:
-                            logging.warning(f"Final batch commit error: {final_error}")
-                            db.session.rollback()
+                    missing = missing_columns(member)
                 except Exception as e:
-                    logging.warning(f"Could not save sentiment data: {e}")
-            
-            # Complete the job
-            job.status = 'completed'
-            job.stage = 'Analysis completed successfully!'
-            job.progress = 100
-            job.completed_at = datetime.utcnow()
-            job.updated_at = datetime.utcnow()
-            db.session.commit()
+                    invalid.append(f'{os.path.basename(member)} (unreadable: {e})')
+                    continue
+                if missing:
+                    invalid.append(f'{os.path.basename(member)} (missing {", ".join(missing)})')
+            if invalid:
+                raise ValueError(f'Invalid CSV files: {"; ".join(invalid)}')
             
+            if len(members) > 1 or shard_count > 1:
+                # A plain CSV's hash may already be known from a resumable upload
+                if not (job.content_hash and members == upload_paths):
+                    job.content_hash = members_sha256(members)
+                if len(members) > 1:
+                    shards = shard_members(job, members)
+                else:
+                    shards = split_job(job, members[0], shard_count)
+                
+                # This node scores shards too; other nodes join with `flask shard-worker`
+                run_local_workers(job_id, len(shards))
+                return
+        
+        process_csv_background(job_id, members[0], output_dir)
     except Exception as e:
-        logging.error(f"Error processing job {job_id}: {str(e)}")
+        logging.error(f"Error processing upload of job {job_id}: {str(e)}")
         with app.app_context():
             job = AnalysisJob.query.get(job_id)
             if job:
@@ -252,72 +618,147 @@ def process_csv_background(job_id, filepath, output_dir):
                 job.updated_at = datetime.utcnow()
                 db.session.commit()
 
+def enqueue_upload(filepaths, original_filenames, shard_count=1, content_hash=None):
+    """Create a job for saved upload files and start processing it in the background; returns the job id"""
+    from upload_ingest import is_plain_csv
+    
+    job_id = str(uuid.uuid4())
+    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], job_id)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    job = AnalysisJob()
+    job.id = job_id
+    if len(filepaths) == 1:
+        job.filename = os.path.basename(filepaths[0])
+        job.original_filename = original_filenames[0]
+    else:
+        job.filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(filepaths)}_files"
+        job.original_filename = ', '.join(original_filenames)[:255]
+    job.status = 'queued'
+    job.progress = 0
+    job.stage = 'Queued for processing...'
+    job.content_hash = content_hash
+    db.session.add(job)
+    db.session.commit()
+    
+    # Split, compressed and multi-file uploads go through ingest first
+    shard_count = min(max(shard_count or 1, 1), app.config['MAX_SHARDS'])
+    if len(filepaths) == 1 and is_plain_csv(original_filenames[0]) and shard_count == 1:
+        thread = threading.Thread(target=process_csv_background, args=(job_id, filepaths[0], output_dir))
+    else:
+        thread = threading.Thread(target=ingest_job_background, args=(job_id, filepaths, output_dir, shard_count))
+    thread.daemon = True
+    thread.start()
+    return job_id
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/upload')
 def upload_page():
-    return render_template('upload.html')
+    return render_template('upload.html', max_shards=app.config['MAX_SHARDS'])
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
+    from upload_ingest import allowed_upload, is_plain_csv, missing_columns
     
-    if 'file' not in request.files:
+    files = [f for f in request.files.getlist('file') if f and f.filename]
+    if not files:
         flash('No file selected', 'error')
         return redirect(request.url)
     
-    file = request.files['file']
-    if file.filename == '':
-        flash('No file selected', 'error')
+    if not all(allowed_upload(f.filename) for f in files):
+        flash('Invalid file type. Please upload CSV files, .csv.gz/.csv.zst, or a zip/tar archive of CSVs.', 'error')
         return redirect(request.url)
     
-    if file and file.filename and allowed_file(file.filename):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filepaths = []
+    for index, file in enumerate(files):
         filename = secure_filename(str(file.filename))
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"{timestamp}_{filename}"
+        unique_filename = f"{timestamp}_{filename}" if len(files) == 1 else f"{timestamp}_{index:03d}_{filename}"
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
         file.save(filepath)
-        
-        # Validate CSV structure
+        filepaths.append(filepath)
+    
+    # A single plain CSV is checked right away; archive and compressed members are checked while unpacking
+    if len(files) == 1 and is_plain_csv(files[0].filename):
         try:
-            df = pd.read_csv(filepath)
-            required_columns = ['paragraphs', 'headings', 'unordered_lists', 'topic']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                flash(f'CSV missing required columns: {", ".join(missing_columns)}', 'error')
-                os.remove(filepath)
-                return redirect(request.url)
+            missing = missing_columns(filepaths[0])
         except Exception as e:
             flash(f'Error reading CSV file: {str(e)}', 'error')
-            os.remove(filepath)
+            os.remove(filepaths[0])
+            return redirect(request.url)
+        if missing:
+            flash(f'CSV missing required columns: {", ".join(missing)}', 'error')
+            os.remove(filepaths[0])
             return redirect(request.url)
-        
-        # Create job in database
-        job_id = str(uuid.uuid4())
-        output_dir = os.path.join(app.config['OUTPUT_FOLDER'], job_id)
-        os.makedirs(output_dir, exist_ok=True)
-        
-        job = AnalysisJob()
-        job.id = job_id
-        job.filename = unique_filename
-        job.original_filename = file.filename
-        job.status = 'queued'
-        job.progress = 0
-        job.stage = 'Queued for processing...'
-        db.session.add(job)
-        db.session.commit()
-        
-        # Start background processing
-        thread = threading.Thread(target=process_csv_background, args=(job_id, filepath, output_dir))
-        thread.daemon = True
-        thread.start()
-        
-        flash('File uploaded successfully! Processing started.', 'success')
-        return redirect(url_for('job_status', job_id=job_id))
     
-    flash('Invalid file type. Please upload a CSV file.', 'error')
-    return redirect(request.url)
+    job_id = enqueue_upload(filepaths, [f.filename for f in files], request.form.get('shards', 1, type=int))
+    
+    flash('File uploaded successfully! Processing started.', 'success')
+    return redirect(url_for('job_status', job_id=job_id))
+
+@app.route('/api/uploads', methods=['POST'])
+def create_resumable_upload():
+    """Start a chunked upload; the client then PUTs chunks in order and can resume from the returned offset"""
+    from resumable_upload import create_session, session_status
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        session = create_session(
+            data.get('filename'), int(data.get('size') or 0),
+            expected_sha256=data.get('sha256'), shards=int(data.get('shards') or 1)
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'chunk_size': app.config['UPLOAD_CHUNK_BYTES'], **session_status(session)}), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def resumable_upload_status(upload_id):
+    """Offset to resume from, and the job id once the upload is complete"""
+    from resumable_upload import session_status
+    
+    session = db.session.get(UploadSession, upload_id)
+    if not session:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    return jsonify({'success': True, **session_status(session)})
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Append one chunk; X-Upload-Offset says where it starts and X-Chunk-SHA256 is its checksum"""
+    from resumable_upload import append_chunk, session_status, OffsetMismatch
+    
+    session = db.session.get(UploadSession, upload_id)
+    if not session:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    try:
+        offset = int(request.headers.get('X-Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'X-Upload-Offset header is required'}), 400
+    
+    try:
+        session = append_chunk(session, offset, request.get_data(cache=False), request.headers.get('X-Chunk-SHA256'))
+    except OffsetMismatch as e:
+        return jsonify({'success': False, 'error': str(e), 'offset': e.expected}), 409
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e), **session_status(session)}), 400
+    return jsonify({'success': True, **session_status(session)})
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_resumable_upload(upload_id):
+    """Abandon an unfinished upload and delete its partial file"""
+    from resumable_upload import discard
+    
+    session = db.session.get(UploadSession, upload_id)
+    if not session:
+        return jsonify({'success': False, 'error': 'Upload not found'}), 404
+    if session.status == 'completed':
+        return jsonify({'success': False, 'error': 'Upload already completed'}), 400
+    discard(session)
+    session.status = 'aborted'
+    db.session.commit()
+    return jsonify({'success': True})
 
 @app.route('/job/<job_id>')
 def job_status(job_id):
@@ -340,11 +781,66 @@ def api_job_status(job_id):
         'status': job.status,
         'progress': job.progress,
         'stage': job.stage,
+        'result_kind': job.result_kind,
+        'processed_fraction': job.processed_fraction,
         'error': job.error_message,
         'created_at': job.created_at.isoformat() if job.created_at else None,
         'completed_at': job.completed_at.isoformat() if job.completed_at else None
     })
 
+@app.route('/api/job/<job_id>/eips/<eip>/comments')
+def eip_comment_drilldown(job_id, eip):
+    """Most negative and most positive comments behind an EIP's sentiment score"""
+    from score_store import ScoreStoreReader
+    
+    job = AnalysisJob.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    store_file = OutputFile.query.filter_by(job_id=job_id, file_type='comment_scores').first()
+    if not store_file or not os.path.exists(store_file.file_path):
+        return jsonify({'error': 'No per-comment scores stored for this job'}), 404
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', 5)), 100))
+    except ValueError:
+        limit = 5
+    
+    reader = ScoreStoreReader(store_file.file_path)
+    if eip not in reader:
+        return jsonify({'error': f'No comments found for EIP-{eip}'}), 404
+    
+    return jsonify({
+        'eip': eip,
+        'comment_count': reader.groups[eip]['rows'],
+        **reader.extremes(eip, limit)
+    })
+
+@app.route('/api/eips/<eip>/distribution')
+def eip_distribution(eip):
+    """Compound score percentiles for an EIP, merged across completed jobs without rescanning comments"""
+    from quantile_sketch import merge_sketches
+    
+    query = db.session.query(EIPSentiment.job_id, EIPSentiment.compound_sketch).join(AnalysisJob).filter(
+        EIPSentiment.eip == eip,
+        AnalysisJob.status == 'completed',
+        EIPSentiment.compound_sketch.isnot(None)
+    )
+    job_ids = request.args.getlist('job_id')
+    if job_ids:
+        query = query.filter(EIPSentiment.job_id.in_(job_ids))
+    rows = query.all()
+    if not rows:
+        return jsonify({'error': f'No score distribution stored for EIP-{eip}'}), 404
+    
+    sketch = merge_sketches(encoded for _, encoded in rows)
+    return jsonify({
+        'eip': eip,
+        'jobs': sorted({job_id for job_id, _ in rows}),
+        'comment_count': sketch.count,
+        **sketch.summary()
+    })
+
 @app.route('/download/<job_id>/<filename>')
 def download_file(job_id, filename):
     
@@ -371,7 +867,11 @@ def results():
 def dashboard():
     """Dashboard with sentiment analysis visualizations"""
     # Get all completed jobs for selection
-    jobs = AnalysisJob.query.filter_by(status='completed').order_by(AnalysisJob.created_at.desc()).all()
+    # Running jobs with published preview or partial results are listed too
+    jobs = AnalysisJob.query.filter(AnalysisJob.job_type == 'sentiment').filter(
+        (AnalysisJob.status == 'completed') |
+        ((AnalysisJob.status == 'processing') & AnalysisJob.result_kind.in_(['preview', 'partial']))
+    ).order_by(AnalysisJob.created_at.desc()).all()
     
     # Get selected job ID from query parameter
     selected_job_id = request.args.get('job_id')
@@ -460,9 +960,12 @@ def dashboard():
                 'sentiment_hist': sentiment_hist
             }
     
+    selected_job = next((j for j in jobs if j.id == selected_job_id), None)
+    
     return render_template('dashboard.html', 
                          jobs=jobs, 
                          selected_job_id=selected_job_id,
+                         selected_job=selected_job,
                          sentiment_data=sentiment_data,
                          **dashboard_stats)
 
@@ -486,8 +989,9 @@ def export_dashboard_data(job_id):
     # Write headers
     headers = [
         'EIP', 'Title', 'Author', 'Category', 'Status', 
-        'Unified_Compound', 'Unified_Positive', 'Unified_Negative', 'Unified_Neutral',
-        'Total_Comment_Count', 'Created_At'
+        'Unified_Compound', 'Compound_CI_Low', 'Compound_CI_High', 'Unified_Positive', 'Unified_Negative', 'Unified_Neutral',
+        'Total_Comment_Count', 'Compound_P10', 'Compound_P50', 'Compound_P90', 'Polarization',
+        'Created_At'
     ]
     writer.writerow(headers)
     
@@ -500,10 +1004,16 @@ def export_dashboard_data(job_id):
             eip.category or '',
             eip.status or '',
             eip.unified_compound if eip.unified_compound is not None else '',
+            eip.compound_ci_low if eip.compound_ci_low is not None else '',
+            eip.compound_ci_high if eip.compound_ci_high is not None else '',
             eip.unified_pos if eip.unified_pos is not None else '',
             eip.unified_neg if eip.unified_neg is not None else '',
             eip.unified_neu if eip.unified_neu is not None else '',
             eip.total_comment_count if eip.total_comment_count is not None else '',
+            eip.compound_p10 if eip.compound_p10 is not None else '',
+            eip.compound_p50 if eip.compound_p50 is not None else '',
+            eip.compound_p90 if eip.compound_p90 is not None else '',
+            eip.polarization if eip.polarization is not None else '',
             eip.created_at.strftime('%Y-%m-%d %H:%M:%S') if eip.created_at else ''
         ])
     
@@ -516,11 +1026,181 @@ def export_dashboard_data(job_id):
     
     return response
 
+def reenrich_jobs_background(job_ids=None, metadata_file=None):
+    """Background task to refresh job metadata against a new EIPsInsight snapshot"""
+    try:
+        from eip_metadata import load_current_snapshot, reenrich_completed_jobs
+        
+        with app.app_context():
+            snapshot = load_current_snapshot(metadata_file)
+            results = reenrich_completed_jobs(snapshot, job_ids)
+            logging.info(f"Re-enriched {len(results)} jobs against snapshot {snapshot.id}")
+    except Exception as e:
+        logging.error(f"Error re-enriching jobs: {str(e)}")
+
+@app.route('/api/job/<job_id>/reenrich', methods=['POST'])
+def reenrich_job_metadata(job_id):
+    """Refresh one job's EIP status/category metadata without rescoring comments"""
+    from eip_metadata import load_current_snapshot, reenrich_job
+    
+    job = AnalysisJob.query.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job.status != 'completed':
+        return jsonify({'success': False, 'error': 'Only completed jobs can be re-enriched'}), 400
+    
+    try:
+        snapshot = load_current_snapshot()
+        result = reenrich_job(job_id, snapshot)
+        return jsonify({'success': True, 'snapshot_id': snapshot.id, **result})
+    except Exception as e:
+        logging.error(f"Re-enrichment error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+def append_csv_background(job_id, filepath):
+    """Background task to score a delta CSV and merge it into an existing job"""
+    try:
+        from incremental_append import append_comments
+        
+        with app.app_context():
+            append_comments(job_id, filepath)
+    except Exception as e:
+        logging.error(f"Error appending to job {job_id}: {str(e)}")
+        with app.app_context():
+            job = AnalysisJob.query.get(job_id)
+            if job:
+                job.stage = f'Append failed: {str(e)}'[:255]
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+
+@app.route('/api/job/<job_id>/append', methods=['POST'])
+def append_to_job(job_id):
+    """Score only new comments from a delta CSV and merge them into a completed job"""
+    from upload_ingest import missing_columns
+    
+    job = AnalysisJob.query.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job.status != 'completed':
+        return jsonify({'success': False, 'error': 'Only completed jobs can be appended to'}), 400
+    
+    file = request.files.get('file')
+    if not file or not file.filename or not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'A CSV file is required'}), 400
+    
+    filename = secure_filename(str(file.filename))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_append_{filename}")
+    file.save(filepath)
+    
+    try:
+        missing = missing_columns(filepath)
+    except Exception as e:
+        os.remove(filepath)
+        return jsonify({'success': False, 'error': f'Error reading CSV file: {str(e)}'}), 400
+    if missing:
+        os.remove(filepath)
+        return jsonify({'success': False, 'error': f'CSV missing required columns: {", ".join(missing)}'}), 400
+    
+    thread = threading.Thread(target=append_csv_background, args=(job_id, filepath))
+    thread.daemon = True
+    thread.start()
+    
+    return jsonify({'success': True, 'message': 'Append started'}), 202
+
+@app.route('/api/jobs/reenrich', methods=['POST'])
+def reenrich_all_jobs():
+    """Queue re-enrichment of all completed jobs (or the given job_ids)"""
+    data = request.get_json(silent=True) or {}
+    job_ids = data.get('job_ids')
+    
+    thread = threading.Thread(target=reenrich_jobs_background, args=(job_ids,))
+    thread.daemon = True
+    thread.start()
+    
+    return jsonify({'success': True, 'message': 'Re-enrichment started'}), 202
+
+@app.cli.command('reenrich-jobs')
+@click.option('--metadata-file', default=None, help='Local EIPsInsight export to use instead of fetching')
+@click.option('--job-id', 'job_ids', multiple=True, help='Limit to these jobs (repeatable)')
+def reenrich_jobs_command(metadata_file, job_ids):
+    """Refresh status/category of completed jobs without rescoring comments."""
+    from eip_metadata import load_current_snapshot, reenrich_completed_jobs
+    
+    snapshot = load_current_snapshot(metadata_file)
+    results = reenrich_completed_jobs(snapshot, list(job_ids) or None)
+    for result in results:
+        if 'error' in result:
+            click.echo(f"{result['job_id']}: failed ({result['error']})")
+        else:
+            click.echo(f"{result['job_id']}: {result['updated']} updated, {result['added']} added")
+    click.echo(f"Re-enriched {len(results)} jobs against snapshot {snapshot.id}")
+
+@app.cli.command('shard-worker')
+@click.option('--worker-id', default=None, help='Name recorded on claimed shards (default: host:pid)')
+@click.option('--job-id', default=None, help='Only work on shards of this job')
+@click.option('--once', is_flag=True, help='Exit when no shard is left to claim instead of polling')
+def shard_worker_command(worker_id, job_id, once):
+    """Score shards of split jobs, merging each job when its last shard is done."""
+    from job_shards import run_worker
+    
+    completed = run_worker(worker_id=worker_id, job_id=job_id, once=once)
+    click.echo(f"Scored {completed} shards")
+
+@app.route('/api/global/summary')
+def global_sentiment_summary():
+    """Corpus-wide sentiment totals across every rolled-up upload"""
+    from global_rollup import global_summary
+    return jsonify(global_summary())
+
+@app.route('/api/global/leaderboard')
+def global_sentiment_leaderboard():
+    """Most positive, most negative or most discussed EIPs across all uploads"""
+    from global_rollup import leaderboard
+    
+    try:
+        results = leaderboard(
+            order=request.args.get('order', 'positive'),
+            limit=request.args.get('limit', 10),
+            min_comments=int(request.args.get('min_comments', 1))
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'results': results})
+
+@app.cli.command('rollup-jobs')
+def rollup_jobs_command():
+    """Add completed jobs that are not in the global rollup yet."""
+    from global_rollup import file_sha256, add_job_to_rollup
+    
+    counted = {job_id for (job_id,) in db.session.query(GlobalRollupSource.job_id)}
+    added = 0
+    for job in AnalysisJob.query.filter_by(status='completed', job_type='sentiment').order_by(AnalysisJob.completed_at):
+        if job.id in counted:
+            continue
+        if not job.content_hash:
+            upload_path = os.path.join(app.config['UPLOAD_FOLDER'], job.filename)
+            if not os.path.exists(upload_path):
+                click.echo(f"{job.id}: skipped (upload file no longer available)")
+                continue
+            job.content_hash = file_sha256(upload_path)
+            db.session.commit()
+        if add_job_to_rollup(job):
+            added += 1
+            click.echo(f"{job.id}: added")
+        else:
+            click.echo(f"{job.id}: duplicate upload, skipped")
+    click.echo(f"Added {added} jobs to the global rollup")
+
 @app.route('/smart-contract')
 def smart_contract():
     """Smart Contract Generator page"""
     # Get all completed jobs for selection
-    jobs = AnalysisJob.query.filter_by(status='completed').order_by(AnalysisJob.created_at.desc()).all()
+    # Running jobs with published preview or partial results are listed too
+    jobs = AnalysisJob.query.filter(AnalysisJob.job_type == 'sentiment').filter(
+        (AnalysisJob.status == 'completed') |
+        ((AnalysisJob.status == 'processing') & AnalysisJob.result_kind.in_(['preview', 'partial']))
+    ).order_by(AnalysisJob.created_at.desc()).all()
     
     # Get selected job ID from query parameter
     selected_job_id = request.args.get('job_id')
@@ -529,16 +1209,106 @@ def smart_contract():
     if not selected_job_id and jobs:
         selected_job_id = jobs[0].id
     
-    sentiment_data = []
+    eip_count = 0
     
     if selected_job_id:
-        # Get sentiment data for the selected job
-        sentiment_data = EIPSentiment.query.filter_by(job_id=selected_job_id).all()
+        # EIPs are looked up on demand through the typeahead search endpoint
+        eip_count = EIPSentiment.query.filter_by(job_id=selected_job_id).count()
     
     return render_template('smart_contract.html', 
                          jobs=jobs, 
                          selected_job_id=selected_job_id,
-                         sentiment_data=sentiment_data)
+                         eip_count=eip_count)
+
+@app.route('/api/job/<job_id>/eips/search')
+def search_job_eips(job_id):
+    """Ranked typeahead search over the EIPs of a job"""
+    from eip_search import search_eips
+    
+    query = request.args.get('q', '')
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        limit = 10
+    
+    results = search_eips(db.session, job_id, query, limit)
+    return jsonify({'query': query, 'results': results})
+
+def _prefers_async():
+    """Whether the client sent `Prefer: respond-async` and will poll for the result instead of waiting"""
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def _accept_llm_task(kind, coro, finish=None, streamed=False):
+    """Run an LLM coroutine on the background event loop and answer 202 with the task to poll"""
+    from llm_tasks import start_task
+    
+    task = start_task(kind, coro, finish, streamed)
+    return jsonify({
+        'success': True,
+        'task_id': task.id,
+        'status': task.status,
+        'status_url': url_for('llm_task_status', task_id=task.id)
+    }), 202
+
+def _contract_eip_data(job_id, eip_number):
+    """EIP metadata for contract generation, from the job's rows when available"""
+    # Try to get EIP data from database first
+    eip_data = None
+    if job_id:
+        # EIPSentiment is already defined in this file
+        eip_data_obj = EIPSentiment.query.filter_by(job_id=job_id, eip=eip_number).first()
+        
+        if eip_data_obj:
+            eip_data = {
+                'eip': eip_data_obj.eip,
+                'title': eip_data_obj.title,
+                'status': eip_data_obj.status,
+                'category': eip_data_obj.category,
+                'author': eip_data_obj.author
+            }
+    
+    # If no database data, create basic EIP data structure
+    if not eip_data:
+        eip_data = {
+            'eip': eip_number,
+            'title': f'EIP-{eip_number}',
+            'status': 'Unknown',
+            'category': 'ERC',
+            'author': 'Unknown'
+        }
+    return eip_data
+
+def _sse(event, payload):
+    """One Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _stream_completion(fragments, done_payload, error_label):
+    """
+    Stream completion fragments as `token` events, then a `done` event with
+    `done_payload`, or an `error` event if the completion fails midway.
+    
+    `fragments` is an async generator; it runs on the background event loop,
+    so the OpenAI stream and its retries never block this thread. When the
+    client disconnects the server closes this response, which closes
+    `fragments` and with it the upstream OpenAI stream.
+    """
+    from llm_async import iterate
+    
+    fragments = iterate(fragments)
+    
+    def events():
+        try:
+            for text in fragments:
+                yield _sse('token', {'text': text})
+            yield _sse('done', done_payload)
+        except Exception as e:
+            logging.error(f"{error_label} stream error: {str(e)}")
+            yield _sse('error', {'error': f'{error_label} failed: {str(e)}'})
+        finally:
+            fragments.close()
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/generate-contract', methods=['POST'])
 def generate_contract():
@@ -556,38 +1326,20 @@ def generate_contract():
         if not eip_number or not contract_type:
             return jsonify({'success': False, 'error': 'EIP number and contract type are required'})
         
-        # Try to get EIP data from database first
-        eip_data = None
-        if job_id:
-            # EIPSentiment is already defined in this file
-            eip_data_obj = EIPSentiment.query.filter_by(job_id=job_id, eip=eip_number).first()
-            
-            if eip_data_obj:
-                eip_data = {
-                    'eip': eip_data_obj.eip,
-                    'title': eip_data_obj.title,
-                    'status': eip_data_obj.status,
-                    'category': eip_data_obj.category,
-                    'author': eip_data_obj.author
-                }
-        
-        # If no database data, create basic EIP data structure
-        if not eip_data:
-            eip_data = {
-                'eip': eip_number,
-                'title': f'EIP-{eip_number}',
-                'status': 'Unknown',
-                'category': 'ERC',
-                'author': 'Unknown'
-            }
+        eip_data = _contract_eip_data(job_id, eip_number)
         
         # Initialize code generator
         try:
             from smart_contract_generator import EIPCodeGenerator
+            from llm_async import run
             generator = EIPCodeGenerator()
             
-            # Generate the contract
-            result = generator.generate_eip_implementation(eip_data, contract_type, custom_prompt)
+            if _prefers_async():
+                return _accept_llm_task('generate_contract',
+                                        generator.agenerate_eip_implementation(eip_data, contract_type, custom_prompt))
+            
+            # Generate the contract on the background event loop
+            result = run(generator.agenerate_eip_implementation(eip_data, contract_type, custom_prompt))
             
             # Ensure we return valid JSON
             if not isinstance(result, dict):
@@ -602,6 +1354,46 @@ def generate_contract():
         logging.error(f"Contract generation error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/generate-contract/stream', methods=['POST'])
+def generate_contract_stream():
+    """
+    Stream generated smart contract code as Server-Sent Events, or with
+    `Prefer: respond-async` as a task whose polls include the code so far
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No JSON data provided'}), 400
+        
+        eip_number = data.get('eip_number')
+        contract_type = data.get('contract_type')
+        
+        if not eip_number or not contract_type:
+            return jsonify({'success': False, 'error': 'EIP number and contract type are required'})
+        
+        eip_data = _contract_eip_data(data.get('job_id'), eip_number)
+        
+        from smart_contract_generator import EIPCodeGenerator
+        generator = EIPCodeGenerator()
+        custom_prompt = data.get('custom_prompt')
+        
+        if _prefers_async():
+            return _accept_llm_task('generate_contract', lambda on_text: generator.agenerate_eip_implementation(
+                eip_data, contract_type, custom_prompt, on_text=on_text
+            ), streamed=True)
+        
+        fragments = generator.astream_eip_implementation(eip_data, contract_type, custom_prompt)
+        
+        return _stream_completion(fragments, {
+            'eip_number': eip_data.get('eip', 'N/A'),
+            'contract_type': contract_type,
+            'eip_metadata': eip_data
+        }, 'Code generation')
+        
+    except Exception as e:
+        logging.error(f"Contract generation stream error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/analyze-security', methods=['POST'])
 def analyze_security():
     """Analyze smart contract security using OpenAI"""
@@ -614,10 +1406,14 @@ def analyze_security():
         
         # Initialize code generator
         from smart_contract_generator import EIPCodeGenerator
+        from llm_async import run
         generator = EIPCodeGenerator()
         
-        # Analyze security
-        result = generator.analyze_contract_security(contract_code)
+        if _prefers_async():
+            return _accept_llm_task('analyze_security', generator.aanalyze_contract_security(contract_code))
+        
+        # Analyze security on the background event loop
+        result = run(generator.aanalyze_contract_security(contract_code))
         
         return jsonify(result)
         
@@ -638,10 +1434,14 @@ def generate_tests():
         
         # Initialize code generator
         from smart_contract_generator import EIPCodeGenerator
+        from llm_async import run
         generator = EIPCodeGenerator()
         
-        # Generate tests
-        result = generator.generate_test_suite(contract_code, contract_name)
+        if _prefers_async():
+            return _accept_llm_task('generate_tests', generator.agenerate_test_suite(contract_code, contract_name))
+        
+        # Generate tests on the background event loop
+        result = run(generator.agenerate_test_suite(contract_code, contract_name))
         
         return jsonify(result)
         
@@ -649,6 +1449,162 @@ def generate_tests():
         logging.error(f"Test generation error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/generate-tests/stream', methods=['POST'])
+def generate_tests_stream():
+    """
+    Stream a generated test suite as Server-Sent Events, or with
+    `Prefer: respond-async` as a task whose polls include the tests so far
+    """
+    try:
+        data = request.get_json()
+        contract_code = data.get('contract_code')
+        contract_name = data.get('contract_name', 'Contract')
+        
+        if not contract_code:
+            return jsonify({'success': False, 'error': 'Contract code is required'})
+        
+        from smart_contract_generator import EIPCodeGenerator
+        generator = EIPCodeGenerator()
+        
+        if _prefers_async():
+            return _accept_llm_task('generate_tests', lambda on_text: generator.agenerate_test_suite(
+                contract_code, contract_name, on_text=on_text
+            ), streamed=True)
+        
+        return _stream_completion(generator.astream_test_suite(contract_code, contract_name),
+                                  {'contract_name': contract_name}, 'Test generation')
+        
+    except Exception as e:
+        logging.error(f"Test generation stream error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/generation-jobs', methods=['POST'])
+def create_generation_job_route():
+    """Queue a background job generating the contract and test suite of each listed EIP"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No JSON data provided'}), 400
+        
+        eips = [str(eip).strip() for eip in data.get('eips') or [] if str(eip).strip()]
+        eips = list(dict.fromkeys(eips))
+        contract_type = data.get('contract_type')
+        
+        if not eips or not contract_type:
+            return jsonify({'success': False, 'error': 'A list of EIPs and a contract type are required'}), 400
+        if len(eips) > app.config['MAX_GENERATION_EIPS']:
+            return jsonify({'success': False,
+                            'error': f"At most {app.config['MAX_GENERATION_EIPS']} EIPs per generation job"}), 400
+        
+        from batch_generation import create_generation_job, start_generation_job
+        
+        job = create_generation_job([_contract_eip_data(data.get('job_id'), eip) for eip in eips], contract_type,
+                                    include_tests=data.get('include_tests', True),
+                                    custom_prompt=data.get('custom_prompt'))
+        start_generation_job(job.id)
+        logging.info(f"🏭 Queued generation job {job.id} for {len(eips)} EIPs")
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status_url': url_for('api_job_status', job_id=job.id),
+            'job_url': url_for('job_status', job_id=job.id)
+        }), 202
+    
+    except Exception as e:
+        logging.error(f"Generation job error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/generation-jobs/<job_id>/resume', methods=['POST'])
+def resume_generation_job(job_id):
+    """Restart a failed generation job; artifacts already saved are not generated again"""
+    from batch_generation import start_generation_job
+    
+    job = db.session.get(AnalysisJob, job_id)
+    if not job or job.job_type != 'generation':
+        return jsonify({'success': False, 'error': 'Generation job not found'}), 404
+    if job.status == 'completed':
+        return jsonify({'success': False, 'error': 'Job already completed'}), 409
+    if not start_generation_job(job_id):
+        return jsonify({'success': False, 'error': 'Job is already running'}), 409
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('api_job_status', job_id=job_id)
+    }), 202
+
+def _recommendation_row(eip_data):
+    """
+    The fields of an EIPSentiment row that recommendations show, as a plain dict.
+    Async analyses build their response on the event loop after the request's
+    session has closed, where ORM rows can no longer load their attributes.
+    """
+    return {
+        'eip_number': str(eip_data.eip),
+        'title': eip_data.title or 'Untitled',
+        'status': eip_data.status or 'Unknown',
+        'category': eip_data.category or 'Unknown',
+        'author': eip_data.author or 'Unknown',
+        'sentiment_score': eip_data.unified_compound or 0.0,
+        'comment_count': eip_data.total_comment_count or 0
+    }
+
+def _recommendation_entry(eip_row, rec, source):
+    """EIP recommendation with the sentiment data of its row (see _recommendation_row); source is 'static' or 'llm'"""
+    return {
+        **eip_row,
+        'reason': rec.get('reason', 'Relevant to your code'),
+        'confidence': rec.get('confidence', 0.5),
+        'code_patterns': rec.get('code_patterns', []),
+        'missing': rec.get('missing', []),
+        'source': source
+    }
+
+def _code_analysis_response(recommendations, eip_rows, result):
+    """
+    Static matches plus the LLM recommendations for EIPs they do not cover.
+    `result` is the generator's analysis, or None when the LLM was skipped;
+    if it failed, the static matches are returned with an llm_error.
+    """
+    recommendations = list(recommendations)
+    analysis = None
+    llm_error = None
+    security_error = None
+    if result is not None:
+        if result['success']:
+            analysis = result['analysis']
+            security_error = result.get('security_error')
+            matched = {rec['eip_number'] for rec in recommendations}
+            for rec in result.get('eip_recommendations', []):
+                eip_number = str(rec.get('eip_number', ''))
+                if eip_number in eip_rows and eip_number not in matched:
+                    recommendations.append(_recommendation_entry(eip_rows[eip_number], rec, 'llm'))
+                    matched.add(eip_number)
+        elif not recommendations:
+            return result
+        else:
+            llm_error = result.get('error', 'LLM analysis failed')
+            logging.warning(f"⚠️ LLM analysis failed, returning static matches only: {llm_error}")
+    
+    if analysis is None:
+        detected = ', '.join(f"EIP-{rec['eip_number']}" for rec in recommendations) or 'no standard interfaces'
+        analysis = f"Static signature analysis detected {detected}."
+    
+    # Sort by confidence and sentiment score
+    recommendations.sort(key=lambda x: (x['confidence'], x['sentiment_score']), reverse=True)
+    
+    response = {
+        'success': True,
+        'analysis': analysis,
+        'recommendations': recommendations[:10]  # Limit to top 10
+    }
+    if security_error:
+        response['security_error'] = security_error
+    if llm_error:
+        response['llm_error'] = llm_error
+    return response
+
 @app.route('/api/analyze-code-and-recommend', methods=['POST'])
 def analyze_code_and_recommend():
     """Analyze smart contract code and recommend EIPs with sentiment warnings"""
@@ -682,53 +1638,99 @@ def analyze_code_and_recommend():
         if not eip_data_list:
             return jsonify({'success': False, 'error': 'No EIP data found for the selected job'})
         
-        # Initialize code generator
-        from smart_contract_generator import EIPCodeGenerator
-        generator = EIPCodeGenerator()
+        # Standard interfaces are recognized from their selectors in milliseconds; the LLM only adds to these
+        from interface_detector import recommend_eips
+        eip_rows = {str(eip.eip): _recommendation_row(eip) for eip in eip_data_list}
+        static_recommendations = recommend_eips(contract_code)
+        recommendations = [_recommendation_entry(eip_rows[rec['eip_number']], rec, 'static')
+                           for rec in static_recommendations if rec['eip_number'] in eip_rows]
         
-        # Analyze code and get EIP recommendations
-        result = generator.analyze_code_and_recommend_eips(contract_code, analysis_type, eip_data_list, eip_status_filter)
+        if not data.get('use_llm', True):
+            return jsonify(_code_analysis_response(recommendations, eip_rows, None))
         
-        if not result['success']:
-            return jsonify(result)
+        # Rank candidates locally so only the EIPs matching the code are sent to the model
+        from eip_retrieval import index_for
+        job = db.session.get(AnalysisJob, job_id)
+        # Re-enrichment moves the job to a new metadata snapshot and appends add rows, so both are part of the key
+        index_key = (job_id, eip_status_filter, job.metadata_snapshot_id if job else None, len(eip_data_list))
+        eip_index = index_for(index_key, eip_data_list)
         
-        # Process recommendations and add sentiment data
-        recommendations = []
-        eip_recommendations = result.get('eip_recommendations', [])
+        # Initialize code generator
+        from smart_contract_generator import EIPCodeGenerator
+        from llm_async import run
+        generator = EIPCodeGenerator()
         
-        for rec in eip_recommendations:
-            eip_number = str(rec.get('eip_number', ''))
-            
-            # Find matching EIP in database
-            eip_data = next((eip for eip in eip_data_list if str(eip.eip) == eip_number), None)
-            
-            if eip_data:
-                recommendation = {
-                    'eip_number': eip_number,
-                    'title': eip_data.title or 'Untitled',
-                    'status': eip_data.status or 'Unknown',
-                    'category': eip_data.category or 'Unknown',
-                    'author': eip_data.author or 'Unknown',
-                    'sentiment_score': eip_data.unified_compound or 0.0,
-                    'comment_count': eip_data.total_comment_count or 0,
-                    'reason': rec.get('reason', 'Relevant to your code'),
-                    'confidence': rec.get('confidence', 0.5),
-                    'code_patterns': rec.get('code_patterns', [])
-                }
-                recommendations.append(recommendation)
-        
-        # Sort by confidence and sentiment score
-        recommendations.sort(key=lambda x: (x['confidence'], x['sentiment_score']), reverse=True)
+        if _prefers_async():
+            return _accept_llm_task('analyze_code', generator.aanalyze_code_and_recommend_eips(
+                contract_code, analysis_type, eip_data_list, eip_status_filter, eip_index=eip_index
+            ), lambda result: _code_analysis_response(recommendations, eip_rows, result))
         
-        return jsonify({
-            'success': True,
-            'analysis': result['analysis'],
-            'recommendations': recommendations[:10]  # Limit to top 10
-        })
+        # Analyze code and get EIP recommendations on the background event loop
+        result = run(generator.aanalyze_code_and_recommend_eips(contract_code, analysis_type, eip_data_list,
+                                                                eip_status_filter, eip_index=eip_index))
+        return jsonify(_code_analysis_response(recommendations, eip_rows, result))
         
     except Exception as e:
         logging.error(f"Code analysis and recommendation error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/llm-scheduler')
+def llm_scheduler_stats():
+    """Budgets, queue depth, coalesced requests and rate-limit pauses of the LLM scheduler"""
+    from llm_scheduler import shared_scheduler
+    return jsonify({'success': True, **shared_scheduler().stats()})
+
+@app.route('/api/llm-telemetry')
+def llm_telemetry_summary():
+    """Calls, tokens, cache hits, retries and latency percentiles of recent LLM completions, per endpoint"""
+    from llm_telemetry import flush, summarize
+    
+    try:
+        hours = max(0.0, float(request.args.get('hours', 24)))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'hours must be a number'}), 400
+    
+    # Records still queued for the background writer are included
+    flush()
+    since = datetime.utcnow() - timedelta(hours=hours)
+    endpoints = summarize(since, request.args.get('endpoint'))
+    
+    return jsonify({'success': True, 'hours': hours, 'endpoints': endpoints})
+
+@app.route('/api/llm-tasks/<task_id>')
+def llm_task_status(task_id):
+    """Poll an LLM call started with `Prefer: respond-async`; `result` is set once it has finished"""
+    from llm_tasks import task_status
+    
+    # The background loop updates the row from its own session, so it is always reread
+    task = db.session.get(LLMTask, task_id, populate_existing=True)
+    if not task:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    return jsonify({'success': True, **task_status(task)})
+
+@app.route('/api/llm-tasks/<task_id>', methods=['DELETE'])
+def cancel_llm_task(task_id):
+    """Cancel an LLM task that is still running, e.g. because the page waiting on it was closed"""
+    from llm_tasks import cancel_task, task_status
+    
+    task = db.session.get(LLMTask, task_id, populate_existing=True)
+    if not task:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    cancel_task(task)
+    return jsonify({'success': True, **task_status(task)})
+
+@app.route('/api/llm-cache')
+def llm_cache_stats():
+    """Hit rate, size and limits of the LLM response cache"""
+    try:
+        from llm_cache import shared_cache
+        cache = shared_cache()
+        if cache is None:
+            return jsonify({'success': True, 'enabled': False})
+        return jsonify({'success': True, 'enabled': True, **cache.stats()})
+    except Exception as e:
+        logging.error(f"LLM cache stats error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)})
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,195 @@
+"""
+Headless batch runner for the sentiment pipeline.
+
+Runs Stages 1-3 on a comment export (or every CSV in a directory) without
+going through the web upload:
+
+    python batch_cli.py comments.csv
+    python batch_cli.py exports/ --workers 4 --metadata-file all_eips.csv --format parquet --register
+"""
+
+import os
+import uuid
+import logging
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import click
+import pandas as pd
+
+from sentiment_analyzer import SentimentAnalyzer, SCORING_CHUNK_SIZE, split_input
+from upload_ingest import missing_columns
+from text_normalizer import parse_rules
+
+OUTPUT_FORMATS = ['csv', 'json', 'parquet']
+DEFAULT_OUTPUT_DIR = os.path.join('outputs', 'batch')
+
+# Stage outputs written again in the requested format; the CSVs stay for --register and the web app
+RESULT_FILES = ['final_merged_analysis.csv', 'unified_sentiment_summary.csv', 'enriched_sentiment_with_status.csv']
+
+
+def find_inputs(path):
+    """A single CSV, or the CSVs directly inside a directory in name order"""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith('.csv') and os.path.isfile(os.path.join(path, name))
+        )
+    return [path]
+
+
+def _score_shard(shard_file, chunk_size, normalize_rules):
+    analyzer = SentimentAnalyzer(chunk_size=chunk_size, normalize_rules=normalize_rules)
+    return analyzer.run_shard(shard_file, os.path.splitext(shard_file)[0])
+
+
+def analyze_file(input_file, output_dir, chunk_size=SCORING_CHUNK_SIZE, metadata_file=None, workers=1,
+                 normalize_rules=None):
+    """
+    Run Stages 1-3 on one export and return Stage 3's output files.
+
+    With several workers the file is split by topic hash and the shards are
+    scored in parallel processes, then merged as a sharded web job is.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    analyzer = SentimentAnalyzer(chunk_size=chunk_size, metadata_file=metadata_file, normalize_rules=normalize_rules)
+
+    if workers > 1:
+        shards = split_input(input_file, os.path.join(output_dir, 'shards'), workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shard_outputs = list(pool.map(_score_shard, [path for path, _ in shards], [chunk_size] * len(shards),
+                                          [normalize_rules] * len(shards)))
+        analyzer.run_stage1_from_shards(shard_outputs, output_dir)
+    else:
+        analyzer.run_stage1(input_file, output_dir)
+
+    analyzer.run_stage2(output_dir)
+    return analyzer.run_stage3(output_dir)
+
+
+def export_results(final_output, output_format):
+    """Write the result tables in `output_format` next to the CSVs; returns the files written"""
+    if output_format == 'csv':
+        return []
+    exported = []
+    for path in final_output:
+        if os.path.basename(path) not in RESULT_FILES or not os.path.exists(path):
+            continue
+        df = pd.read_csv(path)
+        target = f"{os.path.splitext(path)[0]}.{output_format}"
+        if output_format == 'json':
+            df.to_json(target, orient='records', lines=True)
+        else:
+            df.to_parquet(target, index=False)
+        exported.append(target)
+    return exported
+
+
+def register_results(input_file, output_dir, final_output):
+    """Store a batch run as a completed AnalysisJob so it shows up in the web app; returns the job id"""
+    from app import app, db, AnalysisJob, store_job_results
+    from global_rollup import file_sha256
+
+    with app.app_context():
+        job = AnalysisJob()
+        job.id = str(uuid.uuid4())
+        job.filename = os.path.basename(input_file)
+        job.original_filename = os.path.basename(input_file)
+        job.status = 'processing'
+        job.progress = 66
+        job.stage = 'Batch run: storing results...'
+        job.content_hash = file_sha256(input_file)
+        db.session.add(job)
+        db.session.commit()
+
+        store_job_results(job, final_output, output_dir)
+        return job.id
+
+
+def _parquet_available():
+    return any(importlib.util.find_spec(engine) for engine in ('pyarrow', 'fastparquet'))
+
+
+@click.command()
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--output-dir', default=DEFAULT_OUTPUT_DIR, show_default=True,
+              help='Results go to a subdirectory per input file')
+@click.option('--workers', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Parallel processes: files of a directory, or topic shards of a single file')
+@click.option('--chunk-size', default=SCORING_CHUNK_SIZE, show_default=True, type=click.IntRange(min=1),
+              help='Comments scored per chunk')
+@click.option('--metadata-file', default=None, type=click.Path(exists=True, dir_okay=False),
+              help='Offline EIPsInsight export (all_eips.csv); skips all network fetches')
+@click.option('--format', 'output_format', default='csv', show_default=True, type=click.Choice(OUTPUT_FORMATS),
+              help='Format of the result tables')
+@click.option('--normalize-rules', default=None,
+              help='Comma-separated text normalization rules applied before scoring (default: all; "none" for raw text)')
+@click.option('--register', is_flag=True, help='Store results as completed jobs in the app database')
+def main(path, output_dir, workers, chunk_size, metadata_file, output_format, normalize_rules, register):
+    """Run the sentiment pipeline on a CSV export or a directory of exports."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        normalize_rules = parse_rules(normalize_rules)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--normalize-rules')
+    if output_format == 'parquet' and not _parquet_available():
+        raise click.UsageError('--format parquet requires pyarrow or fastparquet')
+
+    inputs = find_inputs(path)
+    if not inputs:
+        raise click.UsageError(f'No CSV files found in {path}')
+
+    runnable, failures = [], []
+    for input_file in inputs:
+        try:
+            missing = missing_columns(input_file)
+        except Exception as e:
+            failures.append(input_file)
+            click.echo(f'{input_file}: skipped, could not read CSV ({e})', err=True)
+            continue
+        if missing:
+            failures.append(input_file)
+            click.echo(f'{input_file}: skipped, missing required columns: {", ".join(missing)}', err=True)
+            continue
+        runnable.append(input_file)
+
+    def file_output_dir(input_file):
+        return os.path.join(output_dir, os.path.splitext(os.path.basename(input_file))[0])
+
+    def finish(input_file, final_output):
+        exported = export_results(final_output, output_format)
+        message = f'{input_file}: {len(final_output) + len(exported)} files in {file_output_dir(input_file)}'
+        if register:
+            message += f', registered as job {register_results(input_file, file_output_dir(input_file), final_output)}'
+        click.echo(message)
+
+    # One file uses every worker on its shards; several files are spread over the workers whole
+    if len(runnable) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(runnable))) as pool:
+            futures = {
+                pool.submit(analyze_file, input_file, file_output_dir(input_file), chunk_size, metadata_file,
+                            1, normalize_rules): input_file
+                for input_file in runnable
+            }
+            for future in as_completed(futures):
+                input_file = futures[future]
+                try:
+                    finish(input_file, future.result())
+                except Exception as e:
+                    failures.append(input_file)
+                    click.echo(f'{input_file}: failed ({e})', err=True)
+    else:
+        for input_file in runnable:
+            try:
+                finish(input_file, analyze_file(input_file, file_output_dir(input_file), chunk_size,
+                                                metadata_file, workers if len(runnable) == 1 else 1, normalize_rules))
+            except Exception as e:
+                failures.append(input_file)
+                click.echo(f'{input_file}: failed ({e})', err=True)
+
+    click.echo(f'Analyzed {len(inputs) - len(failures)} of {len(inputs)} files')
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app import app, db, AnalysisJob, OutputFile
+
+# The job's parameters, written when it is created so a resumed run needs nothing else
+PLAN_FILENAME = "generation_plan.json"
+SUMMARY_FILENAME = "generation_summary.json"
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_-]+")
+
+# A job runs in at most one thread per process; a resume while it is running is refused
+_running = set()
+_running_lock = threading.Lock()
+
+
+def artifact_filenames(eip_number, contract_type):
+    """File names of the contract and test suite generated for one EIP"""
+    base = f"eip-{_SAFE_NAME.sub('_', str(eip_number))}_{_SAFE_NAME.sub('_', contract_type)}"
+    return f"{base}.sol", f"{base}.test.js"
+
+
+def create_generation_job(eips, contract_type, include_tests=True, custom_prompt=None):
+    """
+    Record a generation job for `eips` (EIP metadata dicts, as the contract
+    generator takes them) and write its plan; returns the job.
+    """
+    job_id = str(uuid.uuid4())
+    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], job_id)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, PLAN_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump({
+            'eips': eips,
+            'contract_type': contract_type,
+            'include_tests': include_tests,
+            'custom_prompt': custom_prompt,
+        }, f, indent=2)
+
+    job = AnalysisJob()
+    job.id = job_id
+    job.job_type = 'generation'
+    job.filename = f"generation_{len(eips)}_eips_{_SAFE_NAME.sub('_', contract_type)}"
+    job.original_filename = f"{contract_type}: " + ', '.join(f"EIP-{eip['eip']}" for eip in eips)[:200]
+    job.status = 'queued'
+    job.progress = 0
+    job.stage = 'Queued for generation...'
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def start_generation_job(job_id):
+    """Run (or resume) a generation job in a background thread; False if it is already running here"""
+    with _running_lock:
+        if job_id in _running:
+            return False
+        _running.add(job_id)
+    thread = threading.Thread(target=run_generation_job, args=(job_id,))
+    thread.daemon = True
+    thread.start()
+    return True
+
+
+def _existing_artifacts(job):
+    """Names of the job's artifacts already saved, in the database and on disk"""
+    return {
+        output.filename for output in OutputFile.query.filter_by(job_id=job.id).all()
+        if os.path.exists(output.file_path)
+    }
+
+
+def _save_artifact(job_id, output_dir, filename, content, file_type):
+    path = os.path.join(output_dir, filename)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    with app.app_context():
+        output = OutputFile.query.filter_by(job_id=job_id, filename=filename).first() or OutputFile(
+            job_id=job_id, filename=filename, file_path=path, file_type=file_type
+        )
+        output.file_size = os.path.getsize(path)
+        db.session.add(output)
+        db.session.commit()
+
+
+def _generate_eip(job_id, output_dir, plan, eip_data, existing):
+    """
+    Generate whatever is missing for one EIP; returns (artifacts saved, error
+    or None). A contract saved by an earlier run is read back for its tests.
+    """
+    from smart_contract_generator import EIPCodeGenerator
+    from llm_scheduler import BATCH
+
+    contract_file, tests_file = artifact_filenames(eip_data['eip'], plan['contract_type'])
+    generator = EIPCodeGenerator(priority=BATCH)
+    saved = 0
+
+    if contract_file in existing:
+        with open(os.path.join(output_dir, contract_file), encoding='utf-8') as f:
+            contract_code = f.read()
+    else:
+        result = generator.generate_eip_implementation(eip_data, plan['contract_type'], plan.get('custom_prompt'))
+        if not result.get('success'):
+            return saved, result.get('error', 'Code generation failed')
+        contract_code = result['generated_code']
+        _save_artifact(job_id, output_dir, contract_file, contract_code, 'generated_contract')
+        saved += 1
+
+    if plan.get('include_tests', True) and tests_file not in existing:
+        result = generator.generate_test_suite(contract_code, plan['contract_type'])
+        if not result.get('success'):
+            return saved, result.get('error', 'Test generation failed')
+        _save_artifact(job_id, output_dir, tests_file, result['test_code'], 'generated_tests')
+        saved += 1
+    return saved, None
+
+
+def run_generation_job(job_id):
+    """
+    Generate the contract (and test suite) of every EIP in the job's plan,
+    GENERATION_CONCURRENCY EIPs at a time. Artifacts are saved as they finish,
+    so a rerun after a failure only generates what is missing.
+    """
+    try:
+        with app.app_context():
+            job = db.session.get(AnalysisJob, job_id)
+            if not job:
+                return
+            output_dir = os.path.join(app.config['OUTPUT_FOLDER'], job_id)
+            with open(os.path.join(output_dir, PLAN_FILENAME), encoding='utf-8') as f:
+                plan = json.load(f)
+
+            existing = _existing_artifacts(job)
+            per_eip = 2 if plan.get('include_tests', True) else 1
+            expected = {name for eip in plan['eips']
+                        for name in artifact_filenames(eip['eip'], plan['contract_type'])[:per_eip]}
+            total = len(expected)
+            done = len(expected & existing)
+            pending = [eip for eip in plan['eips']
+                       if not set(artifact_filenames(eip['eip'], plan['contract_type'])[:per_eip]) <= existing]
+
+            job.status = 'processing'
+            job.error_message = None
+            job.progress = int(100 * done / total) if total else 100
+            job.stage = f'Generating: {done}/{total} artifacts saved' + (' (resumed)' if done else '')
+            job.updated_at = datetime.utcnow()
+            db.session.commit()
+            logging.info(f"🏭 Generation job {job_id}: {len(pending)} of {len(plan['eips'])} EIPs to generate")
+
+            errors = {}
+            with ThreadPoolExecutor(max_workers=max(1, app.config['GENERATION_CONCURRENCY']),
+                                    thread_name_prefix='generation') as pool:
+                futures = {pool.submit(_generate_eip, job_id, output_dir, plan, eip, existing): eip
+                           for eip in pending}
+                for future in as_completed(futures):
+                    eip_number = futures[future]['eip']
+                    try:
+                        saved, error = future.result()
+                    except Exception as e:
+                        saved, error = 0, str(e)
+                    done += saved
+                    if error:
+                        errors[str(eip_number)] = error
+                        logging.warning(f"⚠️ Generation job {job_id}: EIP-{eip_number} failed: {error}")
+                    job.progress = int(100 * done / total) if total else 100
+                    job.stage = f'Generating: {done}/{total} artifacts saved (EIP-{eip_number} finished)'
+                    job.updated_at = datetime.utcnow()
+                    db.session.commit()
+
+            summary = {
+                'contract_type': plan['contract_type'],
+                'eips': [str(eip['eip']) for eip in plan['eips']],
+                'artifacts_saved': done,
+                'artifacts_expected': total,
+                'errors': errors,
+            }
+            _save_artifact(job_id, output_dir, SUMMARY_FILENAME, json.dumps(summary, indent=2), 'generation_summary')
+
+            if errors:
+                job.status = 'error'
+                job.error_message = (f"{len(errors)} of {len(plan['eips'])} EIPs failed; resume to retry them: "
+                                     + '; '.join(f"EIP-{eip}: {error}" for eip, error in sorted(errors.items())))
+                job.stage = f'Generation incomplete: {done}/{total} artifacts saved'
+            else:
+                job.status = 'completed'
+                job.progress = 100
+                job.stage = f'Generation completed: {total} artifacts saved'
+                job.completed_at = datetime.utcnow()
+            job.updated_at = datetime.utcnow()
+            db.session.commit()
+    except Exception as e:
+        logging.error(f"Error running generation job {job_id}: {str(e)}")
+        with app.app_context():
+            job = db.session.get(AnalysisJob, job_id)
+            if job:
+                job.status = 'error'
+                job.error_message = str(e)
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+    finally:
+        with _running_lock:
+            _running.discard(job_id)
@@ -0,0 +1,123 @@
+"""
+Benchmark of pre-scoring text normalization.
+
+Scores the same comments with raw and normalized text and reports the
+scoring throughput of each, the bytes removed and how far the scores moved:
+
+    python benchmark_normalizer.py comments.csv
+    python benchmark_normalizer.py --synthetic 20000 --rules code_fences,quotes
+"""
+
+import re
+import time
+import random
+import click
+import pandas as pd
+
+from sentiment_analyzer import SentimentAnalyzer
+from text_normalizer import TextNormalizer
+
+# Shapes of forum posts seen in Fellowship of Ethereum Magicians threads
+SYNTHETIC_POSTS = [
+    "I think this proposal is a great improvement and I support moving it to last call.",
+    "This breaks existing wallets and I strongly oppose it in its current form.",
+    "> The gas cost is too high for most use cases\nAgreed, but the alternative is worse.",
+    "[quote=\"alice, post:3, topic:1234\"]This is a terrible idea and a security risk[/quote] Fair point, updated the spec.",
+    "Reference implementation:\n```solidity\nfunction transfer(address to, uint256 amount) external returns (bool) {\n"
+    "    require(balanceOf[msg.sender] >= amount, \"insufficient\");\n    return true;\n}\n```\nLooks good to me.",
+    "Deployed at 0x5FbDB2315678afecb367f032d93F642f64180aa3, tx 0x"
+    "8f1b2c3d4e5f60718293a4b5c6d7e8f90a1b2c3d4e5f60718293a4b5c6d7e8f9 failed though.",
+    "See https://github.com/ethereum/EIPs/pull/1234 and https://eips.ethereum.org/EIPS/eip-1234 for the discussion.",
+    "Nice work! Happy to help with test vectors.",
+]
+
+
+def synthetic_comments(count, seed=0):
+    """A comment export of `count` rows mixing prose, quotes, code, links and hex blobs"""
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        "topic": [f"EIP-{rng.randint(1, 200)} discussion" for _ in range(count)],
+        "paragraphs": [" ".join(rng.sample(SYNTHETIC_POSTS, 2)) for _ in range(count)],
+        "headings": "",
+        "unordered_lists": "",
+    })
+
+
+def _score(analyzer, texts):
+    started = time.perf_counter()
+    scores = texts.apply(analyzer.polarity_scores).apply(pd.Series)
+    return scores, time.perf_counter() - started
+
+
+def _label(compound):
+    return pd.cut(compound, [-1.01, -0.05, 0.05, 1.01], labels=["negative", "neutral", "positive"], right=False)
+
+
+def run_benchmark(df, rules=None):
+    """Score `df` raw and normalized; returns throughput, bytes removed and score deltas"""
+    analyzer = SentimentAnalyzer(normalize_rules="none")
+    text_columns = df[["paragraphs", "headings", "unordered_lists"]].fillna("").astype(str)
+    raw = text_columns["paragraphs"] + " " + text_columns["headings"] + " " + text_columns["unordered_lists"]
+
+    normalizer = TextNormalizer(rules)
+    started = time.perf_counter()
+    normalized = normalizer.normalize_series(raw)
+    normalize_seconds = time.perf_counter() - started
+
+    raw_scores, raw_seconds = _score(analyzer.analyzer, raw)
+    normalized_scores, normalized_seconds = _score(analyzer.analyzer, normalized)
+    delta = (normalized_scores["compound"] - raw_scores["compound"]).abs()
+
+    eips = df["topic"].str.extract(r"eip-?(\d{2,5})", flags=re.IGNORECASE)[0]
+    per_eip = pd.DataFrame({"eip": eips, "raw": raw_scores["compound"], "normalized": normalized_scores["compound"]})
+    per_eip = per_eip.dropna(subset=["eip"]).groupby("eip")[["raw", "normalized"]].mean()
+
+    return {
+        "comments": len(df),
+        "rules": normalizer.rules,
+        **normalizer.stats.to_dict(),
+        "raw_comments_per_second": len(df) / raw_seconds if raw_seconds else float("inf"),
+        "normalized_comments_per_second": len(df) / (normalize_seconds + normalized_seconds),
+        "normalize_seconds": normalize_seconds,
+        "mean_abs_compound_delta": float(delta.mean()) if len(delta) else 0.0,
+        "max_abs_compound_delta": float(delta.max()) if len(delta) else 0.0,
+        "label_changed_fraction": float((_label(raw_scores["compound"]) != _label(normalized_scores["compound"])).mean()),
+        "max_abs_eip_compound_delta": float((per_eip["normalized"] - per_eip["raw"]).abs().max()) if len(per_eip) else 0.0,
+    }
+
+
+@click.command()
+@click.argument('path', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option('--synthetic', default=10000, show_default=True, type=click.IntRange(min=1),
+              help='Comments to generate when no CSV export is given')
+@click.option('--rules', default=None, help='Comma-separated normalization rules (default: all)')
+def main(path, synthetic, rules):
+    """Compare scoring throughput and scores with and without text normalization."""
+    if path:
+        df = pd.read_csv(path)
+        df.columns = df.columns.str.strip().str.lower()
+    else:
+        df = synthetic_comments(synthetic)
+    try:
+        result = run_benchmark(df, rules)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--rules')
+
+    click.echo(f"Comments:            {result['comments']}")
+    click.echo(f"Rules:               {', '.join(result['rules']) or 'none'}")
+    click.echo(f"Bytes removed:       {result['bytes_removed']} of {result['bytes_in']} "
+               f"({result['removed_fraction']:.1%})")
+    for rule, removed in result['removed_by_rule'].items():
+        click.echo(f"  {rule:<18} {removed}")
+    click.echo(f"Raw scoring:         {result['raw_comments_per_second']:.0f} comments/s")
+    click.echo(f"Normalized scoring:  {result['normalized_comments_per_second']:.0f} comments/s "
+               f"({result['normalized_comments_per_second'] / result['raw_comments_per_second']:.2f}x, "
+               f"normalization included)")
+    click.echo(f"Compound delta:      mean {result['mean_abs_compound_delta']:.4f}, "
+               f"max {result['max_abs_compound_delta']:.4f}")
+    click.echo(f"Label changed:       {result['label_changed_fraction']:.1%} of comments")
+    click.echo(f"Per-EIP mean delta:  max {result['max_abs_eip_compound_delta']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
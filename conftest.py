@@ -152,4 +152,20 @@ def eip_sentiment_data(test_app, analysis_job):
         for sentiment in sentiment_data:
             db.session.add(sentiment)
         db.session.commit()
-        return sentiment_data
\ No newline at end of file
+        return sentiment_data
+
+@pytest.fixture(autouse=True)
+def isolated_llm_client(monkeypatch):
+    """Give every test a fresh OpenAI client (so patched OpenAI classes take effect), scheduler, no LLM response cache and no telemetry"""
+    from smart_contract_generator import reset_shared_client
+    from llm_cache import reset_shared_cache
+    from llm_scheduler import reset_shared_scheduler
+    monkeypatch.setenv('LLM_CACHE_PATH', '')
+    monkeypatch.setenv('LLM_TELEMETRY', 'off')
+    reset_shared_client()
+    reset_shared_cache()
+    reset_shared_scheduler()
+    yield
+    reset_shared_client()
+    reset_shared_cache()
+    reset_shared_scheduler()
\ No newline at end of file
@@ -0,0 +1,184 @@
+import os
+import hashlib
+import logging
+from datetime import datetime
+import pandas as pd
+from sqlalchemy.exc import IntegrityError
+
+from app import db, AnalysisJob, EIPSentiment, EIPMetadataSnapshot, EIPMetadata
+
+METADATA_COLUMNS = ["eip", "title", "author", "status", "category"]
+
+
+def _clean(val):
+    if pd.isna(val) or str(val).strip() == '' or str(val).lower() in ['nan', 'none', 'null']:
+        return None
+    return str(val).strip()
+
+
+def normalize_metadata_frame(df):
+    """Reduce an EIPsInsight export to one row per EIP with the shared metadata columns"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=METADATA_COLUMNS)
+
+    frame = df.copy()
+    frame.columns = frame.columns.str.strip().str.lower()
+    if "eip" not in frame.columns:
+        return pd.DataFrame(columns=METADATA_COLUMNS)
+    for col in METADATA_COLUMNS:
+        if col not in frame.columns:
+            frame[col] = None
+    frame = frame[METADATA_COLUMNS]
+
+    # EIP numbers come back as ints, floats or strings depending on the source file
+    frame["eip"] = pd.to_numeric(frame["eip"], errors="coerce")
+    frame = frame.dropna(subset=["eip"])
+    frame["eip"] = frame["eip"].astype(int).astype(str)
+    for col in METADATA_COLUMNS[1:]:
+        frame[col] = frame[col].map(_clean)
+
+    frame = frame.drop_duplicates(subset=["eip"], keep="first").sort_values("eip").reset_index(drop=True)
+    # Missing values must reach the database as NULL, not as float NaN
+    return frame.astype(object).where(frame.notna(), None)
+
+
+def load_job_metadata_frame(output_dir):
+    """Load the metadata a job was enriched with (Stage 2 export, falling back to Stage 1's copy)"""
+    candidates = [
+        os.path.join(output_dir, "eipsinsight_data", "all_eips.csv"),
+        os.path.join(output_dir, "eip_status_data.csv"),
+    ]
+    for path in candidates:
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            try:
+                frame = normalize_metadata_frame(pd.read_csv(path))
+            except Exception as e:
+                logging.warning(f"Could not read metadata file {path}: {e}")
+                continue
+            if not frame.empty:
+                return frame
+    return normalize_metadata_frame(None)
+
+
+def snapshot_hash(frame):
+    """Content hash identifying a metadata snapshot independent of row order"""
+    payload = frame[METADATA_COLUMNS].sort_values("eip").to_csv(index=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_or_create_snapshot(frame, source=None):
+    """
+    Return the shared snapshot for this metadata, inserting it only if unseen.
+
+    Jobs enriched from identical EIPsInsight data share one set of metadata rows.
+    """
+    content_hash = snapshot_hash(frame)
+    snapshot = EIPMetadataSnapshot.query.filter_by(content_hash=content_hash).first()
+    if snapshot:
+        return snapshot
+
+    try:
+        snapshot = EIPMetadataSnapshot()
+        snapshot.content_hash = content_hash
+        snapshot.source = source
+        snapshot.eip_count = len(frame)
+        db.session.add(snapshot)
+        db.session.flush()
+
+        rows = [
+            dict(snapshot_id=snapshot.id, **{col: record[col] for col in METADATA_COLUMNS})
+            for record in frame.to_dict("records")
+        ]
+        if rows:
+            db.session.bulk_insert_mappings(EIPMetadata, rows)
+        db.session.commit()
+        logging.info(f"✅ Stored metadata snapshot {content_hash[:12]} with {len(rows)} EIPs")
+        return snapshot
+    except IntegrityError:
+        # Another worker stored the same snapshot concurrently
+        db.session.rollback()
+        return EIPMetadataSnapshot.query.filter_by(content_hash=content_hash).first()
+
+
+def metadata_ids_by_eip(snapshot):
+    """Map EIP number -> EIPMetadata id for a snapshot"""
+    if snapshot is None:
+        return {}
+    rows = db.session.query(EIPMetadata.eip, EIPMetadata.id).filter_by(snapshot_id=snapshot.id).all()
+    return {eip: metadata_id for eip, metadata_id in rows}
+
+
+def reenrich_job(job_id, snapshot):
+    """
+    Re-point a job's sentiment rows at a newer metadata snapshot without rescoring.
+
+    Mirrors the metadata merges of Stage 1 and Stage 3: stored aggregates are
+    kept, EIPs that appeared in the snapshot are added with empty sentiment,
+    and EIPs missing from it lose their metadata but keep their scores.
+    Returns counts of updated and added rows.
+    """
+    job = AnalysisJob.query.get(job_id)
+    if not job:
+        raise ValueError(f"Job {job_id} not found")
+
+    metadata_ids = metadata_ids_by_eip(snapshot)
+    existing = db.session.query(EIPSentiment.id, EIPSentiment.eip, EIPSentiment.metadata_id).filter_by(job_id=job_id).all()
+
+    updates = [
+        {"id": row_id, "metadata_id": metadata_ids.get(eip)}
+        for row_id, eip, metadata_id in existing
+        if metadata_ids.get(eip) != metadata_id
+    ]
+    known_eips = {eip for _, eip, _ in existing}
+    now = datetime.utcnow()
+    additions = [
+        {"job_id": job_id, "eip": eip, "metadata_id": metadata_id, "created_at": now}
+        for eip, metadata_id in metadata_ids.items()
+        if eip not in known_eips
+    ]
+
+    if updates:
+        db.session.bulk_update_mappings(EIPSentiment, updates)
+    if additions:
+        db.session.bulk_insert_mappings(EIPSentiment, additions)
+    job.metadata_snapshot_id = snapshot.id
+    job.updated_at = now
+    db.session.commit()
+
+    logging.info(f"✅ Re-enriched job {job_id}: {len(updates)} updated, {len(additions)} added")
+    return {"job_id": job_id, "updated": len(updates), "added": len(additions)}
+
+
+def reenrich_completed_jobs(snapshot, job_ids=None):
+    """Re-enrich every completed job (or the given ones) that is not already on this snapshot"""
+    query = AnalysisJob.query.filter_by(status='completed', job_type='sentiment')
+    if job_ids:
+        query = query.filter(AnalysisJob.id.in_(job_ids))
+    jobs = query.filter(
+        (AnalysisJob.metadata_snapshot_id != snapshot.id) | (AnalysisJob.metadata_snapshot_id.is_(None))
+    ).all()
+
+    results = []
+    for job in jobs:
+        try:
+            results.append(reenrich_job(job.id, snapshot))
+        except Exception as e:
+            logging.error(f"❌ Re-enrichment failed for job {job.id}: {e}")
+            db.session.rollback()
+            results.append({"job_id": job.id, "error": str(e)})
+    return results
+
+
+def load_current_snapshot(metadata_file=None):
+    """Build a snapshot from a local metadata export, or from a fresh EIPsInsight fetch"""
+    if metadata_file:
+        frame = normalize_metadata_frame(pd.read_csv(metadata_file))
+        source = os.path.basename(metadata_file)
+    else:
+        from sentiment_analyzer import fetch_eip_metadata
+        frame = normalize_metadata_frame(fetch_eip_metadata())
+        source = "eipsinsight"
+
+    if frame.empty:
+        raise ValueError("Metadata snapshot is empty")
+    return get_or_create_snapshot(frame, source=source)
@@ -0,0 +1,129 @@
+import re
+import math
+import threading
+from collections import Counter, OrderedDict, namedtuple
+
+# EIPs put in a code analysis prompt, and indexes kept in memory (one per job and status filter)
+TOP_K = 30
+MAX_CACHED_INDEXES = 32
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# An explicit "IERC721"/"EIP-2612" mention outweighs any number of shared title words
+NUMBER_MENTION_WEIGHT = 3
+
+# Solidity keywords, types and boilerplate that say nothing about which EIP a contract relates to
+STOPWORDS = {
+    "pragma", "solidity", "spdx", "license", "identifier", "mit", "import", "contract", "interface", "library",
+    "abstract", "is", "function", "modifier", "event", "emit", "error", "revert", "require", "assert", "return",
+    "returns", "public", "private", "internal", "external", "view", "pure", "payable", "virtual", "override",
+    "constant", "immutable", "memory", "storage", "calldata", "mapping", "struct", "enum", "constructor",
+    "if", "else", "for", "while", "do", "break", "continue", "new", "delete", "true", "false", "this", "super",
+    "msg", "sender", "value", "tx", "block", "address", "bool", "string", "bytes", "byte", "int", "uint",
+    "uint8", "uint16", "uint32", "uint64", "uint128", "uint256", "int256", "bytes4", "bytes32", "the", "a", "an",
+    "of", "to", "and", "or", "in", "on", "for", "with", "by", "from", "at", "as", "be", "are", "it", "that",
+    "notice", "dev", "param", "title", "author", "inheritdoc", "unchecked", "using", "type", "length", "push",
+}
+
+# Longest first; a suffix is only stripped when at least four characters remain
+SUFFIXES = ("ations", "ation", "ings", "ing", "ers", "als", "ies", "es", "ed", "er", "al", "s", "e")
+
+EIPDoc = namedtuple("EIPDoc", ["eip", "title", "status", "category"])
+
+_NUMBER_MENTION = re.compile(r"\b(?:i?erc|eip)[-_ ]?(\d{1,5})(?!\d)", re.IGNORECASE)
+_IDENTIFIER = re.compile(r"[A-Za-z][A-Za-z0-9]*")
+_CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def _stem(word):
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """
+    Search terms of a contract or an EIP title: identifiers split on camelCase
+    and underscores ("safeTransferFrom" -> safe, transf, from), lowercased
+    and lightly stemmed, plus an "eipN" term per EIP/ERC number mentioned.
+    """
+    text = text or ""
+    terms = [f"eip{int(number)}" for number in _NUMBER_MENTION.findall(text)]
+    for identifier in _IDENTIFIER.findall(_NUMBER_MENTION.sub(" ", text)):
+        for part in _CAMEL_PART.findall(identifier):
+            part = part.lower()
+            if part not in STOPWORDS and not part.isdigit() and len(part) > 1:
+                terms.append(_stem(part))
+    return terms
+
+
+class EIPIndex:
+    """BM25 index over EIP numbers, titles and categories, ranked against the identifiers in a contract"""
+
+    def __init__(self, eip_rows):
+        # Plain tuples, so a cached index never touches ORM rows from an earlier request
+        self.docs = [EIPDoc(str(row.eip), row.title, row.status, row.category) for row in eip_rows]
+        self.popularity = [getattr(row, "total_comment_count", 0) or 0 for row in eip_rows]
+        self.term_counts = [
+            Counter([f"eip{int(doc.eip)}" if doc.eip.isdigit() else doc.eip.lower()]
+                    + tokenize(doc.title) + tokenize(doc.category))
+            for doc in self.docs
+        ]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def scores(self, contract_code):
+        query = Counter(tokenize(contract_code))
+        for term in query:
+            if term.startswith("eip") and term[3:].isdigit():
+                query[term] = NUMBER_MENTION_WEIGHT
+            else:
+                query[term] = 1
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            for term, weight in query.items():
+                tf = counts.get(term)
+                if tf:
+                    score += weight * self.idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+    def top_k(self, contract_code, k=TOP_K):
+        """
+        The `k` EIPs best matching the contract. EIPs with no matching term are
+        left out; when nothing matches at all, the most discussed EIPs are
+        returned so the prompt still has candidates.
+        """
+        scores = self.scores(contract_code)
+        ranked = sorted(range(len(self.docs)), key=lambda i: (-scores[i], -self.popularity[i]))
+        matched = [i for i in ranked if scores[i] > 0][:k]
+        return [self.docs[i] for i in (matched or ranked[:k])]
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def index_for(key, eip_rows):
+    """
+    The index of `eip_rows`, built once per `key` (job, status filter,
+    metadata snapshot and row count) and kept for later requests.
+    """
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = EIPIndex(eip_rows)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,221 @@
+import re
+import logging
+from sqlalchemy import text
+
+# SQLite: external-content FTS5 table kept in sync with the shared eip_metadata table by triggers
+SQLITE_FTS_TABLE = "eip_metadata_search"
+
+# Index from before metadata was normalized, built over per-job eip_sentiment rows
+SQLITE_LEGACY_DDL = [
+    "DROP TRIGGER IF EXISTS eip_search_ai",
+    "DROP TRIGGER IF EXISTS eip_search_ad",
+    "DROP TRIGGER IF EXISTS eip_search_au",
+    "DROP TABLE IF EXISTS eip_search",
+]
+
+SQLITE_INDEX_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(
+        eip, title, author, status, category,
+        content='eip_metadata', content_rowid='id', prefix='1 2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON eip_metadata BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, eip, title, author, status, category)
+        VALUES (new.id, new.eip, new.title, new.author, new.status, new.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON eip_metadata BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, eip, title, author, status, category)
+        VALUES ('delete', old.id, old.eip, old.title, old.author, old.status, old.category);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE ON eip_metadata BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, eip, title, author, status, category)
+        VALUES ('delete', old.id, old.eip, old.title, old.author, old.status, old.category);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, eip, title, author, status, category)
+        VALUES (new.id, new.eip, new.title, new.author, new.status, new.category);
+    END
+    """,
+]
+
+
+# PostgreSQL: weighted tsvector expression backed by a GIN expression index.
+# The query must use the exact same expression for the planner to pick the index.
+def _postgres_tsvector(alias=""):
+    prefix = f"{alias}." if alias else ""
+    return (
+        f"setweight(to_tsvector('simple', coalesce({prefix}eip, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce({prefix}title, '')), 'B') || "
+        f"setweight(to_tsvector('simple', coalesce({prefix}author, '')), 'C') || "
+        f"setweight(to_tsvector('simple', coalesce({prefix}status, '') || ' ' || coalesce({prefix}category, '')), 'D')"
+    )
+
+
+POSTGRES_TSVECTOR = _postgres_tsvector("m")
+
+POSTGRES_INDEX_DDL = [
+    "DROP INDEX IF EXISTS idx_eip_sentiment_search",
+    f"CREATE INDEX IF NOT EXISTS idx_eip_metadata_search ON eip_metadata USING GIN (({_postgres_tsvector()}))",
+]
+
+RESULT_COLUMNS = "s.eip, m.title, m.author, m.status, m.category, s.unified_compound, s.total_comment_count"
+
+MAX_RESULTS = 1000
+
+# PostgreSQL engines whose index has already been created in this process
+_postgres_ready = set()
+
+
+# Prefixes users type in front of numbers ("EIP-20", "erc721") that are not in the indexed text
+NOISE_TERMS = {"eip", "erc"}
+
+
+def _query_terms(query):
+    """Split free-text input into safe search terms ("EIP-20 token" -> ["20", "token"])"""
+    query = re.sub(r"\b(eip|erc)[-\s]?(\d+)", r"\2", (query or "").lower())
+    terms = re.findall(r"\w+", query)
+    return [t for t in terms if t not in NOISE_TERMS] or terms
+
+
+def _exact_eip(terms):
+    """Return the EIP number the user most likely typed, used to pin exact matches first"""
+    return next((t for t in terms if t.isdigit()), "")
+
+
+def _sqlite_has_fts5(conn):
+    try:
+        options = conn.execute(text("PRAGMA compile_options")).scalars().all()
+        return any("FTS5" in str(opt).upper() for opt in options)
+    except Exception:
+        return False
+
+
+def ensure_search_index(engine):
+    """
+    Create the backend-specific search index if it does not exist yet.
+
+    Safe to call repeatedly; returns True when a native full-text index is
+    available and False when searches will fall back to LIKE scans.
+    """
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                if not _sqlite_has_fts5(conn):
+                    return False
+                trigger = conn.execute(
+                    text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+                    {"name": f"{SQLITE_FTS_TABLE}_ai"}
+                ).first()
+                if trigger:
+                    return True
+                for statement in SQLITE_LEGACY_DDL + SQLITE_INDEX_DDL:
+                    conn.execute(text(statement))
+                # Index rows that were written before the triggers existed
+                conn.execute(text(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')"))
+                logging.info("✅ SQLite FTS5 EIP search index ready")
+                return True
+            if dialect == "postgresql":
+                if engine.url not in _postgres_ready:
+                    for statement in POSTGRES_INDEX_DDL:
+                        conn.execute(text(statement))
+                    _postgres_ready.add(engine.url)
+                return True
+    except Exception as e:
+        logging.warning(f"Could not create EIP search index, falling back to LIKE search: {e}")
+    return False
+
+
+def _row_to_dict(row):
+    return {
+        "eip": row.eip,
+        "title": row.title,
+        "author": row.author,
+        "status": row.status,
+        "category": row.category,
+        "unified_compound": row.unified_compound,
+        "total_comment_count": row.total_comment_count,
+    }
+
+
+def _search_sqlite(session, job_id, terms, limit):
+    match = " ".join(f'"{term}"*' for term in terms)
+    rows = session.execute(text(f"""
+        SELECT {RESULT_COLUMNS}
+        FROM {SQLITE_FTS_TABLE}
+        JOIN eip_metadata m ON m.id = {SQLITE_FTS_TABLE}.rowid
+        JOIN eip_sentiment s ON s.metadata_id = m.id
+        WHERE {SQLITE_FTS_TABLE} MATCH :match AND s.job_id = :job_id
+        ORDER BY CASE WHEN s.eip = :exact THEN 0 ELSE 1 END,
+                 bm25({SQLITE_FTS_TABLE}, 10.0, 4.0, 2.0, 1.0, 1.0)
+        LIMIT :limit
+    """), {"match": match, "job_id": job_id, "exact": _exact_eip(terms), "limit": limit})
+    return [_row_to_dict(row) for row in rows]
+
+
+def _search_postgres(session, job_id, terms, limit):
+    tsquery = " & ".join(f"{term}:*" for term in terms)
+    rows = session.execute(text(f"""
+        SELECT {RESULT_COLUMNS}
+        FROM eip_sentiment s
+        JOIN eip_metadata m ON m.id = s.metadata_id
+        WHERE ({POSTGRES_TSVECTOR}) @@ to_tsquery('simple', :tsquery) AND s.job_id = :job_id
+        ORDER BY CASE WHEN s.eip = :exact THEN 0 ELSE 1 END,
+                 ts_rank(({POSTGRES_TSVECTOR}), to_tsquery('simple', :tsquery)) DESC
+        LIMIT :limit
+    """), {"tsquery": tsquery, "job_id": job_id, "exact": _exact_eip(terms), "limit": limit})
+    return [_row_to_dict(row) for row in rows]
+
+
+def _search_like(session, job_id, terms, limit):
+    """Portable fallback used when no native full-text index is available"""
+    clauses = []
+    params = {"job_id": job_id, "exact": _exact_eip(terms), "limit": limit}
+    for i, term in enumerate(terms):
+        params[f"t{i}"] = f"%{term}%"
+        clauses.append(
+            f"(lower(s.eip) LIKE :t{i} OR lower(coalesce(m.title, '')) LIKE :t{i} "
+            f"OR lower(coalesce(m.author, '')) LIKE :t{i} OR lower(coalesce(m.status, '')) LIKE :t{i} "
+            f"OR lower(coalesce(m.category, '')) LIKE :t{i})"
+        )
+    rows = session.execute(text(f"""
+        SELECT {RESULT_COLUMNS}
+        FROM eip_sentiment s
+        LEFT JOIN eip_metadata m ON m.id = s.metadata_id
+        WHERE s.job_id = :job_id AND {" AND ".join(clauses)}
+        ORDER BY CASE WHEN s.eip = :exact THEN 0 ELSE 1 END, s.total_comment_count DESC
+        LIMIT :limit
+    """), params)
+    return [_row_to_dict(row) for row in rows]
+
+
+def search_eips(session, job_id, query, limit=10):
+    """
+    Ranked search over EIP number, title, author, status and category of one job.
+
+    Uses SQLite FTS5 or a PostgreSQL tsvector index depending on the backend,
+    with a LIKE scan as a last resort.
+    """
+    terms = _query_terms(query)
+    if not terms:
+        return []
+    limit = max(1, min(int(limit), MAX_RESULTS))
+
+    engine = session.get_bind()
+    native = ensure_search_index(engine)
+    dialect = engine.dialect.name
+
+    if native:
+        try:
+            if dialect == "sqlite":
+                return _search_sqlite(session, job_id, terms, limit)
+            if dialect == "postgresql":
+                return _search_postgres(session, job_id, terms, limit)
+        except Exception as e:
+            logging.warning(f"Full-text EIP search failed, using LIKE search: {e}")
+            session.rollback()
+    return _search_like(session, job_id, terms, limit)
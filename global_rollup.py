@@ -0,0 +1,189 @@
+import hashlib
+import logging
+from sqlalchemy.exc import IntegrityError
+
+from app import db, EIPSentiment, EIPMetadata, EIPMetadataSnapshot, GlobalEIPSentiment, GlobalRollupSource, GlobalSentimentSummary
+from quantile_sketch import CompoundSketch
+
+SUMMARY_ID = 1
+
+# Same thresholds the dashboard uses to call an EIP positive or negative
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+LEADERBOARD_ORDERS = {
+    'positive': GlobalEIPSentiment.unified_compound.desc(),
+    'negative': GlobalEIPSentiment.unified_compound.asc(),
+    'comments': GlobalEIPSentiment.comment_count.desc(),
+}
+MAX_LEADERBOARD = 100
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Content hash of an upload, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sentiment_class(compound):
+    if compound is None:
+        return None
+    if compound > POSITIVE_THRESHOLD:
+        return 'positive'
+    if compound < NEGATIVE_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+def _get_summary():
+    summary = db.session.query(GlobalSentimentSummary).filter_by(id=SUMMARY_ID).with_for_update().first()
+    if summary is None:
+        summary = GlobalSentimentSummary(
+            id=SUMMARY_ID, upload_count=0, comment_count=0, compound_sum=0.0,
+            eip_count=0, eip_compound_sum=0.0, positive_eips=0, negative_eips=0
+        )
+        db.session.add(summary)
+    return summary
+
+
+def _adjust_class_counts(summary, compound, step):
+    cls = _sentiment_class(compound)
+    if cls == 'positive':
+        summary.positive_eips += step
+    elif cls == 'negative':
+        summary.negative_eips += step
+
+
+def add_to_rollup(content_hash, aggregates, sketches=None, job_id=None):
+    """
+    Fold one upload's per-EIP sums into the global rollup.
+
+    `aggregates` is a PartialAggregates and `sketches` maps EIP -> serialized
+    CompoundSketch. Uploads are identified by content hash, so the same file
+    analysed twice is only counted once. Returns False for a duplicate.
+    """
+    source = GlobalRollupSource(content_hash=content_hash, job_id=job_id, comment_count=aggregates.comment_count)
+    db.session.add(source)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        logging.info(f"Upload {content_hash[:12]} is already in the global rollup")
+        return False
+
+    sketches = sketches or {}
+    summary = _get_summary()
+    eips = list(aggregates.sums.index)
+    existing = {
+        row.eip: row for row in
+        GlobalEIPSentiment.query.filter(GlobalEIPSentiment.eip.in_(eips)).with_for_update()
+    } if eips else {}
+
+    for eip, sums in aggregates.sums.iterrows():
+        row = existing.get(eip)
+        if row is None:
+            row = GlobalEIPSentiment(eip=eip, compound_sum=0.0, pos_sum=0.0, neg_sum=0.0, neu_sum=0.0, comment_count=0)
+            db.session.add(row)
+            summary.eip_count += 1
+        else:
+            _adjust_class_counts(summary, row.unified_compound, -1)
+            summary.eip_compound_sum -= row.unified_compound or 0.0
+
+        row.compound_sum += float(sums["compound_sum"])
+        row.pos_sum += float(sums["pos_sum"])
+        row.neg_sum += float(sums["neg_sum"])
+        row.neu_sum += float(sums["neu_sum"])
+        row.comment_count += int(sums["count"])
+        row.unified_compound = row.compound_sum / row.comment_count if row.comment_count else None
+        if sketches.get(eip):
+            sketch = CompoundSketch.from_string(sketches[eip])
+            if row.compound_sketch:
+                sketch = sketch + CompoundSketch.from_string(row.compound_sketch)
+            row.compound_sketch = sketch.to_string()
+
+        _adjust_class_counts(summary, row.unified_compound, 1)
+        summary.eip_compound_sum += row.unified_compound or 0.0
+
+    summary.upload_count += 1
+    summary.comment_count += aggregates.comment_count
+    summary.compound_sum += float(aggregates.sums["compound_sum"].sum()) if eips else 0.0
+    db.session.commit()
+    logging.info(f"✅ Added upload {content_hash[:12]} to global rollup ({len(eips)} EIPs)")
+    return True
+
+
+def add_job_to_rollup(job):
+    """Roll up a completed job using its saved per-EIP sums and stored sketches"""
+    from incremental_append import read_job_aggregates
+
+    if not job.content_hash:
+        raise ValueError(f"Job {job.id} has no content hash")
+    aggregates, _ = read_job_aggregates(job)
+    sketches = dict(
+        db.session.query(EIPSentiment.eip, EIPSentiment.compound_sketch)
+        .filter_by(job_id=job.id).filter(EIPSentiment.compound_sketch.isnot(None))
+    )
+    return add_to_rollup(job.content_hash, aggregates, sketches, job_id=job.id)
+
+
+def global_summary():
+    summary = db.session.get(GlobalSentimentSummary, SUMMARY_ID)
+    if summary is None or not summary.eip_count:
+        return {
+            'upload_count': summary.upload_count if summary else 0,
+            'comment_count': 0, 'eip_count': 0,
+            'avg_comment_compound': None, 'avg_eip_compound': None,
+            'positive_eips': 0, 'negative_eips': 0, 'neutral_eips': 0,
+        }
+    return {
+        'upload_count': summary.upload_count,
+        'comment_count': summary.comment_count,
+        'eip_count': summary.eip_count,
+        'avg_comment_compound': summary.compound_sum / summary.comment_count if summary.comment_count else None,
+        'avg_eip_compound': summary.eip_compound_sum / summary.eip_count,
+        'positive_eips': summary.positive_eips,
+        'negative_eips': summary.negative_eips,
+        'neutral_eips': summary.eip_count - summary.positive_eips - summary.negative_eips,
+    }
+
+
+def leaderboard(order='positive', limit=10, min_comments=1):
+    """Top EIPs corpus-wide, read straight off the indexed rollup columns"""
+    if order not in LEADERBOARD_ORDERS:
+        raise ValueError(f"order must be one of {', '.join(LEADERBOARD_ORDERS)}")
+    limit = max(1, min(int(limit), MAX_LEADERBOARD))
+
+    rows = GlobalEIPSentiment.query.filter(
+        GlobalEIPSentiment.comment_count >= min_comments,
+        GlobalEIPSentiment.unified_compound.isnot(None)
+    ).order_by(LEADERBOARD_ORDERS[order], GlobalEIPSentiment.eip).limit(limit).all()
+
+    # Titles come from the newest metadata snapshot
+    titles = {}
+    latest = EIPMetadataSnapshot.query.order_by(EIPMetadataSnapshot.created_at.desc()).first()
+    if latest and rows:
+        titles = {
+            m.eip: m for m in
+            EIPMetadata.query.filter_by(snapshot_id=latest.id).filter(EIPMetadata.eip.in_([r.eip for r in rows]))
+        }
+
+    results = []
+    for row in rows:
+        metadata = titles.get(row.eip)
+        entry = {
+            'eip': row.eip,
+            'title': metadata.title if metadata else None,
+            'status': metadata.status if metadata else None,
+            'unified_compound': row.unified_compound,
+            'unified_pos': row.pos_sum / row.comment_count,
+            'unified_neg': row.neg_sum / row.comment_count,
+            'unified_neu': row.neu_sum / row.comment_count,
+            'comment_count': row.comment_count,
+        }
+        if row.compound_sketch:
+            entry.update(CompoundSketch.from_string(row.compound_sketch).summary())
+        results.append(entry)
+    return results
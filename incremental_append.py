@@ -0,0 +1,172 @@
+import os
+import logging
+import threading
+from datetime import datetime
+import pandas as pd
+
+from app import app, db, AnalysisJob, OutputFile, EIPSentiment, EIPMetadataSnapshot
+from partial_aggregates import PartialAggregates, PARTIAL_AGGREGATES_FILENAME, SCORE_COLUMNS
+from quantile_sketch import CompoundSketch, sketches_by_group
+from global_rollup import add_to_rollup, file_sha256
+from score_store import ScoreStoreReader, append_to_score_store
+from sentiment_stats import bootstrap_mean_ci
+
+# Appends rewrite a job's stored aggregates, so they run one at a time
+_append_lock = threading.Lock()
+
+
+def _aggregates_from_rows(job_id):
+    """Rebuild per-EIP sums from stored unified means for jobs analysed before sums were saved"""
+    rows = db.session.query(
+        EIPSentiment.eip, EIPSentiment.unified_compound, EIPSentiment.unified_pos,
+        EIPSentiment.unified_neg, EIPSentiment.unified_neu, EIPSentiment.total_comment_count
+    ).filter_by(job_id=job_id).filter(EIPSentiment.total_comment_count > 0).all()
+    if not rows:
+        return PartialAggregates()
+
+    frame = pd.DataFrame(rows, columns=["eip"] + SCORE_COLUMNS + ["count"]).drop_duplicates("eip")
+    sums = pd.DataFrame({f"{col}_sum": frame[col].fillna(0) * frame["count"] for col in SCORE_COLUMNS})
+    sums["count"] = frame["count"].astype(float)
+    sums.index = frame["eip"]
+    return PartialAggregates(sums)
+
+
+def read_job_aggregates(job):
+    """Return a job's per-EIP sums and the OutputFile they were read from (None when rebuilt from rows)"""
+    output_file = OutputFile.query.filter_by(job_id=job.id, file_type='partial_aggregates').first()
+    if output_file and os.path.exists(output_file.file_path):
+        return PartialAggregates.from_csv(output_file.file_path), output_file
+    return _aggregates_from_rows(job.id), None
+
+
+def load_job_aggregates(job):
+    """Return a job's stored per-EIP sums and the file they live in, creating the file record if needed"""
+    aggregates, output_file = read_job_aggregates(job)
+    if output_file is not None:
+        return aggregates, output_file
+
+    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], job.id)
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = OutputFile()
+    output_file.job_id = job.id
+    output_file.filename = PARTIAL_AGGREGATES_FILENAME
+    output_file.file_path = os.path.join(output_dir, PARTIAL_AGGREGATES_FILENAME)
+    output_file.file_type = 'partial_aggregates'
+    db.session.add(output_file)
+    return aggregates, output_file
+
+
+def _append_to_job_score_store(job, delta_scores, touched):
+    """
+    Add the delta's comments to the job's score store and return the bootstrap
+    intervals of the touched EIPs over all their comments, or None when the job
+    has no score store (it was analysed before scores were stored).
+    """
+    store_file = OutputFile.query.filter_by(job_id=job.id, file_type='comment_scores').first()
+    if not store_file or not os.path.exists(store_file.file_path):
+        logging.warning(f"Job {job.id} has no per-comment score store; appended comments are not stored")
+        return None
+    append_to_score_store(store_file.file_path, delta_scores)
+    store_file.file_size = os.path.getsize(store_file.file_path)
+
+    reader = ScoreStoreReader(store_file.file_path)
+    comments = pd.concat([reader.read_eip(eip).assign(eip=eip) for eip in touched], ignore_index=True)
+    return bootstrap_mean_ci(comments["eip"].to_numpy(), comments["compound"].to_numpy())
+
+
+def append_comments(job_id, delta_file, analyzer=None):
+    """
+    Score only the comments in `delta_file` and fold them into a completed job.
+
+    The job's stored per-EIP sums and counts are merged with the delta's, so
+    unified_* and total_comment_count come out as if the whole corpus had been
+    scored; compound sketches are merged the same way. The delta's comments
+    are added to the job's score store, and the touched EIPs' bootstrap
+    intervals are recomputed from it (cleared for jobs without a store). As in
+    Stage 1, an EIP gets a new row only if the job's metadata snapshot has it.
+    Returns counts of new comments and updated/added EIP rows.
+    """
+    if analyzer is None:
+        from sentiment_analyzer import SentimentAnalyzer
+        analyzer = SentimentAnalyzer(normalize_rules=app.config['TEXT_NORMALIZATION_RULES'])
+
+    with _append_lock:
+        job = AnalysisJob.query.get(job_id)
+        if not job:
+            raise ValueError(f"Job {job_id} not found")
+
+        df = analyzer._score_comments(analyzer._load_comments(delta_file))
+        delta_scores = analyzer._comment_scores_by_eip(df)
+
+        delta = PartialAggregates().add(delta_scores)
+        aggregates, aggregates_file = load_job_aggregates(job)
+        previously_scored = set(aggregates.sums.index)
+        aggregates.merge(delta)
+        aggregates.to_csv(aggregates_file.file_path)
+        aggregates_file.file_size = os.path.getsize(aggregates_file.file_path)
+
+        touched = set(delta_scores["eip"])
+        unified = aggregates.unified()
+        unified = unified[unified["eip"].isin(touched)].set_index("eip")
+        delta_sketches = sketches_by_group(delta_scores["eip"].to_numpy(), delta_scores["compound"].to_numpy())
+        intervals = _append_to_job_score_store(job, delta_scores, touched)
+
+        existing = {}
+        for row_id, eip, encoded in db.session.query(
+            EIPSentiment.id, EIPSentiment.eip, EIPSentiment.compound_sketch
+        ).filter_by(job_id=job_id).filter(EIPSentiment.eip.in_(touched)):
+            existing.setdefault(eip, []).append((row_id, encoded))
+
+        # Stage 1 keeps only EIPs with metadata (an inner join), so EIPs new to the job need it too
+        metadata_ids = {}
+        if job.metadata_snapshot_id:
+            from eip_metadata import metadata_ids_by_eip
+            metadata_ids = metadata_ids_by_eip(db.session.get(EIPMetadataSnapshot, job.metadata_snapshot_id))
+
+        now = datetime.utcnow()
+        updates, additions = [], []
+        for eip, values in unified.iterrows():
+            has_interval = intervals is not None and eip in intervals.index
+            fields = {
+                **{f"unified_{col}": float(values[f"unified_{col}"]) for col in SCORE_COLUMNS},
+                "total_comment_count": int(values["total_comment_count"]),
+                "compound_ci_low": float(intervals.at[eip, "ci_low"]) if has_interval else None,
+                "compound_ci_high": float(intervals.at[eip, "ci_high"]) if has_interval else None,
+            }
+            if eip in existing:
+                for row_id, encoded in existing[eip]:
+                    if encoded:
+                        sketch = delta_sketches[eip] + CompoundSketch.from_string(encoded)
+                        distribution = {**sketch.summary(), "compound_sketch": sketch.to_string()}
+                    elif eip in previously_scored:
+                        # Older jobs have no sketch of their earlier comments to merge with
+                        distribution = {**dict.fromkeys(CompoundSketch().summary()), "compound_sketch": None}
+                    else:
+                        sketch = delta_sketches[eip]
+                        distribution = {**sketch.summary(), "compound_sketch": sketch.to_string()}
+                    updates.append({"id": row_id, **fields, **distribution})
+            elif eip in metadata_ids:
+                sketch = delta_sketches[eip]
+                additions.append({
+                    "job_id": job_id, "eip": eip, "metadata_id": metadata_ids[eip], "created_at": now,
+                    **fields, **sketch.summary(), "compound_sketch": sketch.to_string(),
+                })
+
+        if updates:
+            db.session.bulk_update_mappings(EIPSentiment, updates)
+        if additions:
+            db.session.bulk_insert_mappings(EIPSentiment, additions)
+        job.stage = f'Appended {len(df)} comments'
+        job.updated_at = now
+        db.session.commit()
+
+        # The delta's comments are new to the corpus too
+        try:
+            add_to_rollup(file_sha256(delta_file), delta,
+                          {eip: sketch.to_string() for eip, sketch in delta_sketches.items()}, job_id=job_id)
+        except Exception as e:
+            logging.warning(f"Could not add appended comments of job {job_id} to global rollup: {e}")
+            db.session.rollback()
+
+    logging.info(f"✅ Appended {len(df)} comments to job {job_id}: {len(updates)} updated, {len(additions)} added")
+    return {"job_id": job_id, "comments": len(df), "updated": len(updates), "added": len(additions)}
@@ -0,0 +1,449 @@
+"""
+Static detection of standard interfaces (ERC-20, ERC-721, ERC-1155, ...) in Solidity source.
+
+Function and event signatures are read from the source, canonicalized and
+hashed to selectors, then matched against a catalog of standard interfaces.
+Inherited OpenZeppelin-style bases and ERC-165 interface IDs found in the code
+count as evidence too. Nothing here needs the network or an LLM.
+"""
+
+import re
+from functools import lru_cache
+
+# Confidence below which a partial signature match is not reported
+MIN_CONFIDENCE = 0.5
+INHERITANCE_CONFIDENCE = 0.95
+INTERFACE_ID_CONFIDENCE = 0.9
+
+
+# --- Keccak-256 (the original Keccak padding Ethereum uses, not SHA3-256) ---
+
+_KECCAK_ROUND_CONSTANTS = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+# Rotation offsets, indexed [x][y]
+_KECCAK_ROTATIONS = [
+    [0, 36, 3, 41, 18],
+    [1, 44, 10, 45, 2],
+    [62, 6, 43, 15, 61],
+    [28, 55, 25, 21, 56],
+    [27, 20, 39, 8, 14],
+]
+_MASK_64 = (1 << 64) - 1
+_KECCAK_RATE = 136
+
+
+def _rotl(value, shift):
+    return ((value << shift) | (value >> (64 - shift))) & _MASK_64 if shift else value
+
+
+def _keccak_f(lanes):
+    for round_constant in _KECCAK_ROUND_CONSTANTS:
+        # theta
+        c = [lanes[x] ^ lanes[x + 5] ^ lanes[x + 10] ^ lanes[x + 15] ^ lanes[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rotl(c[(x + 1) % 5], 1) for x in range(5)]
+        lanes = [lanes[i] ^ d[i % 5] for i in range(25)]
+        # rho and pi
+        b = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                b[y + 5 * ((2 * x + 3 * y) % 5)] = _rotl(lanes[x + 5 * y], _KECCAK_ROTATIONS[x][y])
+        # chi and iota
+        lanes = [b[i] ^ (~b[(i + 1) % 5 + 5 * (i // 5)] & b[(i + 2) % 5 + 5 * (i // 5)]) for i in range(25)]
+        lanes[0] ^= round_constant
+    return lanes
+
+
+def keccak256(data):
+    """Keccak-256 digest of `data` (bytes)"""
+    padded = bytearray(data)
+    padded.append(0x01)
+    padded.extend(b"\x00" * (-len(padded) % _KECCAK_RATE))
+    padded[-1] |= 0x80
+
+    lanes = [0] * 25
+    for offset in range(0, len(padded), _KECCAK_RATE):
+        block = padded[offset:offset + _KECCAK_RATE]
+        for i in range(_KECCAK_RATE // 8):
+            lanes[i] ^= int.from_bytes(block[i * 8:i * 8 + 8], "little")
+        lanes = _keccak_f(lanes)
+    return b"".join(lane.to_bytes(8, "little") for lane in lanes[:4])
+
+
+@lru_cache(maxsize=4096)
+def selector(signature):
+    """4-byte function selector of a canonical signature, e.g. 'transfer(address,uint256)' -> '0xa9059cbb'"""
+    return "0x" + keccak256(signature.encode("ascii"))[:4].hex()
+
+
+@lru_cache(maxsize=4096)
+def event_topic(signature):
+    """Topic 0 of a canonical event signature"""
+    return "0x" + keccak256(signature.encode("ascii")).hex()
+
+
+def interface_id(function_signatures):
+    """ERC-165 interface ID: the XOR of the functions' selectors"""
+    value = 0
+    for signature in function_signatures:
+        value ^= int(selector(signature), 16)
+    return f"0x{value:08x}"
+
+
+# --- Catalog of standard interfaces ---
+
+CATALOG = [
+    {
+        "eip": "20", "name": "ERC-20 Token",
+        "functions": ["totalSupply()", "balanceOf(address)", "transfer(address,uint256)",
+                      "transferFrom(address,address,uint256)", "approve(address,uint256)", "allowance(address,address)"],
+        "events": ["Transfer(address,address,uint256)", "Approval(address,address,uint256)"],
+        "bases": ["ERC20", "IERC20"],
+    },
+    {
+        "eip": "165", "name": "ERC-165 Interface Detection",
+        "functions": ["supportsInterface(bytes4)"],
+        "events": [],
+        "bases": ["ERC165", "IERC165"],
+    },
+    {
+        "eip": "173", "name": "ERC-173 Contract Ownership",
+        "functions": ["owner()", "transferOwnership(address)"],
+        "events": ["OwnershipTransferred(address,address)"],
+        "bases": ["Ownable", "Ownable2Step", "IERC173"],
+    },
+    {
+        "eip": "712", "name": "EIP-712 Typed Structured Data Signing",
+        "functions": [],
+        "events": [],
+        "bases": ["EIP712"],
+    },
+    {
+        "eip": "721", "name": "ERC-721 Non-Fungible Token",
+        "functions": ["balanceOf(address)", "ownerOf(uint256)", "safeTransferFrom(address,address,uint256,bytes)",
+                      "safeTransferFrom(address,address,uint256)", "transferFrom(address,address,uint256)",
+                      "approve(address,uint256)", "setApprovalForAll(address,bool)", "getApproved(uint256)",
+                      "isApprovedForAll(address,address)"],
+        "events": ["Transfer(address,address,uint256)", "Approval(address,address,uint256)",
+                   "ApprovalForAll(address,address,bool)"],
+        "bases": ["ERC721", "IERC721"],
+    },
+    {
+        "eip": "721", "name": "ERC-721 Metadata Extension",
+        "functions": ["name()", "symbol()", "tokenURI(uint256)"],
+        "events": [],
+        "bases": ["IERC721Metadata", "ERC721URIStorage"],
+        # name() and symbol() are ERC-20 functions too, so this only counts alongside ERC-721 itself
+        "extends": "721",
+    },
+    {
+        "eip": "721", "name": "ERC-721 Enumerable Extension",
+        "functions": ["totalSupply()", "tokenOfOwnerByIndex(address,uint256)", "tokenByIndex(uint256)"],
+        "events": [],
+        "bases": ["ERC721Enumerable", "IERC721Enumerable"],
+        "extends": "721",
+    },
+    {
+        "eip": "1155", "name": "ERC-1155 Multi Token",
+        "functions": ["safeTransferFrom(address,address,uint256,uint256,bytes)",
+                      "safeBatchTransferFrom(address,address,uint256[],uint256[],bytes)",
+                      "balanceOf(address,uint256)", "balanceOfBatch(address[],uint256[])",
+                      "setApprovalForAll(address,bool)", "isApprovedForAll(address,address)"],
+        "events": ["TransferSingle(address,address,address,uint256,uint256)",
+                   "TransferBatch(address,address,address,uint256[],uint256[])",
+                   "ApprovalForAll(address,address,bool)", "URI(string,uint256)"],
+        "bases": ["ERC1155", "IERC1155"],
+    },
+    {
+        "eip": "1271", "name": "ERC-1271 Contract Signature Validation",
+        "functions": ["isValidSignature(bytes32,bytes)"],
+        "events": [],
+        "bases": ["IERC1271"],
+    },
+    {
+        "eip": "1967", "name": "ERC-1967 Proxy Storage Slots",
+        "functions": [],
+        "events": ["Upgraded(address)", "AdminChanged(address,address)", "BeaconUpgraded(address)"],
+        "bases": ["ERC1967Proxy", "ERC1967Upgrade", "ERC1967Utils", "TransparentUpgradeableProxy"],
+        # Implementation, admin and beacon slots
+        "constants": ["0x360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc",
+                      "0xb53127684a568b3173ae13b9f8a6016e243e63b6e8ee1178d6a717850b5d6103",
+                      "0xa3f0ad74e5423aebfd80d3ef4346578335a9a72aeaee59ff6cb3582b35133d50"],
+    },
+    {
+        "eip": "2612", "name": "ERC-2612 Permit",
+        "functions": ["permit(address,address,uint256,uint256,uint8,bytes32,bytes32)", "nonces(address)",
+                      "DOMAIN_SEPARATOR()"],
+        "events": [],
+        "bases": ["ERC20Permit", "IERC20Permit"],
+    },
+    {
+        "eip": "2771", "name": "ERC-2771 Meta Transactions",
+        "functions": ["isTrustedForwarder(address)"],
+        "events": [],
+        "bases": ["ERC2771Context"],
+    },
+    {
+        "eip": "2981", "name": "ERC-2981 NFT Royalties",
+        "functions": ["royaltyInfo(uint256,uint256)"],
+        "events": [],
+        "bases": ["ERC2981", "IERC2981", "ERC721Royalty"],
+    },
+    {
+        "eip": "3156", "name": "ERC-3156 Flash Loans",
+        "functions": ["maxFlashLoan(address)", "flashFee(address,uint256)", "flashLoan(address,address,uint256,bytes)"],
+        "events": [],
+        "bases": ["ERC20FlashMint", "IERC3156FlashLender"],
+    },
+    {
+        "eip": "4626", "name": "ERC-4626 Tokenized Vault",
+        "functions": ["asset()", "totalAssets()", "convertToShares(uint256)", "convertToAssets(uint256)",
+                      "maxDeposit(address)", "previewDeposit(uint256)", "deposit(uint256,address)",
+                      "maxMint(address)", "previewMint(uint256)", "mint(uint256,address)",
+                      "maxWithdraw(address)", "previewWithdraw(uint256)", "withdraw(uint256,address,address)",
+                      "maxRedeem(address)", "previewRedeem(uint256)", "redeem(uint256,address,address)"],
+        "events": ["Deposit(address,address,uint256,uint256)", "Withdraw(address,address,address,uint256,uint256)"],
+        "bases": ["ERC4626", "IERC4626"],
+    },
+    {
+        "eip": "4906", "name": "ERC-4906 Metadata Update Events",
+        "functions": [],
+        "events": ["MetadataUpdate(uint256)", "BatchMetadataUpdate(uint256,uint256)"],
+        "bases": ["IERC4906"],
+    },
+    {
+        "eip": "4907", "name": "ERC-4907 Rentable NFT",
+        "functions": ["setUser(uint256,address,uint64)", "userOf(uint256)", "userExpires(uint256)"],
+        "events": ["UpdateUser(uint256,address,uint64)"],
+        "bases": ["ERC4907", "IERC4907"],
+    },
+    {
+        "eip": "5192", "name": "ERC-5192 Minimal Soulbound NFT",
+        "functions": ["locked(uint256)"],
+        "events": ["Locked(uint256)", "Unlocked(uint256)"],
+        "bases": ["IERC5192"],
+    },
+    {
+        "eip": "5267", "name": "ERC-5267 EIP-712 Domain Retrieval",
+        "functions": ["eip712Domain()"],
+        "events": ["EIP712DomainChanged()"],
+        "bases": ["IERC5267"],
+    },
+]
+
+# Every ERC-165 interface ID in the catalog (interfaces with at least one function)
+INTERFACE_IDS = {interface_id(entry["functions"]): entry for entry in CATALOG if entry["functions"]}
+
+
+# --- Solidity source parsing ---
+
+_COMMENTS = re.compile(r"//[^\n]*|/\*[\s\S]*?\*/")
+_STRINGS = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+_FUNCTION = re.compile(r"\bfunction\s+(\w+)\s*\(([^)]*)\)([^{;]*)")
+_EVENT = re.compile(r"\bevent\s+(\w+)\s*\(([^)]*)\)\s*(anonymous\s*)?;")
+_PUBLIC_GETTER = re.compile(
+    r"^\s*((?:mapping\s*\((?:[^()]|\([^()]*\))*\))|[\w.]+(?:\[\d*\])*)\s+(?:(?:constant|immutable|override|payable)\s+)*"
+    r"public\s+(?:(?:constant|immutable|override|payable)\s+)*(\w+)\s*(?:=|;)",
+    re.MULTILINE,
+)
+_INHERITANCE = re.compile(r"\b(?:contract|interface|abstract\s+contract)\s+\w+\s+is\s+([^{]+)\{")
+_HEX_LITERAL = re.compile(r"\b0x[0-9a-fA-F]{8}(?:[0-9a-fA-F]{56})?\b")
+_TYPE_INTERFACE_ID = re.compile(r"type\s*\(\s*(\w+)\s*\)\s*\.\s*interfaceId")
+_STRUCT = re.compile(r"\bstruct\s+(\w+)")
+_ENUM = re.compile(r"\benum\s+(\w+)")
+
+_ELEMENTARY = re.compile(r"^(address|bool|string|bytes\d*|u?int\d*|fixed|ufixed)$")
+_DATA_LOCATIONS = {"memory", "calldata", "storage", "indexed", "payable"}
+
+
+def _strip_source(source):
+    """Source without comments and with string contents blanked, so neither is parsed as code"""
+    return _STRINGS.sub('""', _COMMENTS.sub(" ", source))
+
+
+def _canonical_type(raw, enums):
+    """ABI type of a parameter declaration ('uint amount' -> 'uint256'), or None if it cannot be derived"""
+    parts = [part for part in raw.split() if part not in _DATA_LOCATIONS]
+    if not parts:
+        return None
+    declared = parts[0]
+    match = re.match(r"^([\w.]+)((?:\[\d*\])*)$", declared)
+    if not match:
+        return None
+    base, arrays = match.groups()
+    if base in ("uint", "int"):
+        base += "256"
+    elif base in enums:
+        base = "uint8"
+    elif not _ELEMENTARY.match(base):
+        # Contract and interface types are addresses in the ABI; structs become tuples we cannot expand
+        if base[0].isupper() and "." not in base:
+            base = "address"
+        else:
+            return None
+    return base + arrays
+
+
+def _signature(name, params, structs, enums):
+    types = []
+    for param in filter(None, (p.strip() for p in params.split(","))):
+        declared = param.split()[0]
+        if declared.split("[")[0] in structs:
+            return None
+        canonical = _canonical_type(param, enums)
+        if canonical is None:
+            return None
+        types.append(canonical)
+    return f"{name}({','.join(types)})"
+
+
+def _getter_signature(declaration, name, enums):
+    """Signature of the getter Solidity generates for a public state variable"""
+    key_types = []
+    while declaration.startswith("mapping"):
+        inner = declaration[declaration.index("(") + 1:declaration.rindex(")")]
+        key, _, declaration = inner.partition("=>")
+        key_type = _canonical_type(key.strip().split()[0], enums)
+        if key_type is None:
+            return None
+        key_types.append(key_type)
+        declaration = declaration.strip()
+    # Public arrays take an index per dimension
+    key_types.extend("uint256" for _ in re.findall(r"\[\d*\]", declaration))
+    return f"{name}({','.join(key_types)})"
+
+
+def parse_interface(source):
+    """
+    External surface of Solidity source: canonical function signatures
+    (external/public functions and public state variable getters), event
+    signatures, inherited base names and 4- or 32-byte hex literals.
+    """
+    code = _strip_source(source)
+    structs = set(_STRUCT.findall(code))
+    enums = set(_ENUM.findall(code))
+
+    functions = set()
+    for name, params, modifiers in _FUNCTION.findall(code):
+        if re.search(r"\b(internal|private)\b", modifiers):
+            continue
+        signature = _signature(name, params, structs, enums)
+        if signature:
+            functions.add(signature)
+    for declaration, name in _PUBLIC_GETTER.findall(code):
+        signature = _getter_signature(declaration.strip(), name, enums)
+        if signature:
+            functions.add(signature)
+
+    events = set()
+    for name, params, _ in _EVENT.findall(code):
+        signature = _signature(name, params, structs, enums)
+        if signature:
+            events.add(signature)
+
+    bases = set()
+    for base_list in _INHERITANCE.findall(code):
+        bases.update(re.findall(r"(\w+)\s*(?:\([^)]*\))?\s*(?:,|$)", base_list.strip()))
+
+    literals = {literal.lower() for literal in _HEX_LITERAL.findall(code)}
+    referenced = set(_TYPE_INTERFACE_ID.findall(code))
+    return {"functions": functions, "events": events, "bases": bases, "literals": literals,
+            "interface_refs": referenced}
+
+
+def detect_interfaces(source):
+    """
+    Standard interfaces the contract implements, best match first.
+
+    Each match carries its EIP number, confidence, the evidence found
+    (signatures with selectors, inherited bases, interface IDs) and the
+    catalog members the code does not declare.
+    """
+    parsed = parse_interface(source)
+    matches = []
+    for entry in CATALOG:
+        members = [("function", sig) for sig in entry["functions"]] + [("event", sig) for sig in entry["events"]]
+        found = [(kind, sig) for kind, sig in members if sig in parsed["functions" if kind == "function" else "events"]]
+        evidence = [f"{sig} [{selector(sig) if kind == 'function' else event_topic(sig)[:10]}]" for kind, sig in found]
+        confidence = len(found) / len(members) if members else 0.0
+
+        inherited = sorted(set(entry["bases"]) & (parsed["bases"] | parsed["interface_refs"]))
+        if inherited:
+            confidence = max(confidence, INHERITANCE_CONFIDENCE)
+            evidence.extend(f"inherits or references {base}" for base in inherited)
+
+        if entry["functions"]:
+            entry_id = interface_id(entry["functions"])
+            if entry_id in parsed["literals"]:
+                confidence = max(confidence, INTERFACE_ID_CONFIDENCE)
+                evidence.append(f"supportsInterface id {entry_id}")
+        for constant in entry.get("constants", []):
+            if constant in parsed["literals"]:
+                confidence = max(confidence, INTERFACE_ID_CONFIDENCE)
+                evidence.append(f"storage slot {constant[:10]}...")
+
+        if confidence < MIN_CONFIDENCE:
+            continue
+        matches.append({
+            "eip_number": entry["eip"],
+            "interface": entry["name"],
+            "confidence": round(confidence, 3),
+            "evidence": evidence,
+            "missing": [sig for kind, sig in members if (kind, sig) not in found],
+            "interface_id": interface_id(entry["functions"]) if entry["functions"] else None,
+            "_entry": entry,
+            "_found": set(found),
+            "_explicit": bool(inherited) or len(evidence) > len(found),
+        })
+
+    matches = [match for match in matches if not _explained_elsewhere(match, matches)]
+    detected = {match["eip_number"] for match in matches if "extends" not in match["_entry"]}
+    matches = [match for match in matches if match["_entry"].get("extends", match["eip_number"]) in detected
+               or match["_explicit"]]
+    for match in matches:
+        del match["_entry"], match["_found"], match["_explicit"]
+    matches.sort(key=lambda match: (-match["confidence"], -len(match["evidence"])))
+    return matches
+
+
+def _explained_elsewhere(match, matches):
+    """
+    True when every signature behind a match also belongs to a better
+    matching interface, e.g. the balanceOf/approve/Transfer that ERC-721
+    shares with ERC-20.
+    """
+    if match["_explicit"]:
+        return False
+    for other in matches:
+        if other is match or other["confidence"] <= match["confidence"]:
+            continue
+        entry = other["_entry"]
+        members = {("function", sig) for sig in entry["functions"]} | {("event", sig) for sig in entry["events"]}
+        if match["_found"] <= members:
+            return True
+    return False
+
+
+def recommend_eips(source):
+    """
+    One recommendation per EIP from detect_interfaces, in the shape of the
+    LLM recommendations (eip_number, reason, confidence, code_patterns).
+    """
+    recommendations = {}
+    for match in detect_interfaces(source):
+        if match["eip_number"] in recommendations:
+            recommendations[match["eip_number"]]["code_patterns"].extend(match["evidence"])
+            continue
+        recommendations[match["eip_number"]] = {
+            "eip_number": match["eip_number"],
+            "reason": f"Implements {match['interface']} (static signature analysis)",
+            "confidence": match["confidence"],
+            "code_patterns": list(match["evidence"]),
+            "missing": match["missing"],
+        }
+    return list(recommendations.values())
@@ -0,0 +1,276 @@
+import os
+import time
+import socket
+import threading
+import multiprocessing
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+
+from app import app, db, AnalysisJob, JobShard, finish_analysis
+from sentiment_analyzer import split_input
+
+SHARD_DIRNAME = "shards"
+
+# A running shard whose worker stops renewing its lease is handed to another worker
+LEASE_SECONDS = 600
+MAX_SHARD_ATTEMPTS = 3
+POLL_INTERVAL = 5.0
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def _add_shards(job, shards):
+    """Record (input_path, row_count) shards of a job and hand it to the shard workers"""
+    for index, (path, row_count) in enumerate(shards):
+        db.session.add(JobShard(
+            job_id=job.id, shard_index=index, shard_count=len(shards),
+            input_path=path, row_count=row_count, status='pending', attempts=0
+        ))
+    job.status = 'processing'
+    job.stage = f'Stage 1: Waiting for shard workers (0/{len(shards)} shards scored)'
+    job.progress = 10
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+
+def split_job(job, input_file, shard_count):
+    """Split a queued job's upload into shards and record them for workers to claim"""
+    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], job.id)
+    shards = split_input(input_file, os.path.join(output_dir, SHARD_DIRNAME), shard_count)
+    _add_shards(job, shards)
+    logging.info(f"🧩 Split job {job.id} into {shard_count} shards")
+    return shards
+
+
+def shard_members(job, member_files):
+    """Score each file of a multi-file upload as its own shard; the merge combines them into one result"""
+    shards = [(path, None) for path in member_files]
+    _add_shards(job, shards)
+    logging.info(f"🧩 Job {job.id} has {len(shards)} member files")
+    return shards
+
+
+def _fail_job(job_id, message):
+    job = db.session.get(AnalysisJob, job_id)
+    if job and job.status in ('processing', 'merging'):
+        job.status = 'error'
+        job.error_message = message
+        job.updated_at = datetime.utcnow()
+
+
+def _expire_exhausted_shards(now):
+    """Fail shards whose lease ran out on their last allowed attempt, and their jobs"""
+    exhausted = JobShard.query.filter(
+        JobShard.status == 'running', JobShard.lease_expires_at < now,
+        JobShard.attempts >= MAX_SHARD_ATTEMPTS
+    ).all()
+    for shard in exhausted:
+        shard.status = 'failed'
+        shard.error_message = shard.error_message or f'Worker {shard.worker_id} stopped responding'
+        _fail_job(shard.job_id, f'Shard {shard.shard_index} failed after {shard.attempts} attempts')
+    if exhausted:
+        db.session.commit()
+
+
+def claim_shard(worker_id, job_id=None):
+    """
+    Atomically take the next pending (or abandoned) shard of a processing job.
+
+    The claim is a conditional UPDATE on the status and attempt count the
+    worker saw, so when two workers race for a shard only one row update
+    succeeds. Returns the claimed JobShard or None.
+    """
+    now = datetime.utcnow()
+    _expire_exhausted_shards(now)
+
+    candidates = JobShard.query.join(AnalysisJob, AnalysisJob.id == JobShard.job_id).filter(
+        AnalysisJob.status == 'processing',
+        JobShard.attempts < MAX_SHARD_ATTEMPTS,
+        or_(JobShard.status == 'pending',
+            and_(JobShard.status == 'running', JobShard.lease_expires_at < now))
+    )
+    if job_id:
+        candidates = candidates.filter(JobShard.job_id == job_id)
+
+    for shard_id, status, attempts in candidates.with_entities(
+        JobShard.id, JobShard.status, JobShard.attempts
+    ).order_by(AnalysisJob.created_at, JobShard.shard_index).limit(10).all():
+        claimed = JobShard.query.filter_by(id=shard_id, status=status, attempts=attempts).update({
+            'status': 'running',
+            'worker_id': worker_id,
+            'attempts': attempts + 1,
+            'lease_expires_at': now + timedelta(seconds=LEASE_SECONDS),
+            'started_at': now,
+            'error_message': None,
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return db.session.get(JobShard, shard_id)
+    return None
+
+
+def renew_lease(shard, worker_id):
+    """Extend a running shard's lease; False when another worker has taken it over"""
+    renewed = JobShard.query.filter_by(id=shard.id, status='running', worker_id=worker_id).update(
+        {'lease_expires_at': datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}, synchronize_session=False
+    )
+    db.session.commit()
+    return bool(renewed)
+
+
+def process_shard(shard, worker_id, analyzer):
+    """Score a claimed shard and record its outputs, or put it back for a retry on failure"""
+    output_prefix = os.path.splitext(shard.input_path)[0]
+    job_id, index = shard.job_id, shard.shard_index
+
+    # Scoring progress doubles as the lease heartbeat
+    def heartbeat(partial, fraction):
+        if not renew_lease(shard, worker_id):
+            logging.warning(f"⚠️ Lost lease on shard {index} of job {job_id}")
+
+    try:
+        outputs = analyzer.run_shard(shard.input_path, output_prefix, progress_callback=heartbeat)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"❌ Shard {index} of job {job_id} failed on {worker_id}: {e}")
+        retry = shard.attempts < MAX_SHARD_ATTEMPTS
+        JobShard.query.filter_by(id=shard.id, worker_id=worker_id, status='running').update({
+            'status': 'pending' if retry else 'failed',
+            'error_message': str(e),
+            'lease_expires_at': None,
+        }, synchronize_session=False)
+        if not retry:
+            _fail_job(job_id, f'Shard {index} failed after {shard.attempts} attempts: {e}')
+        db.session.commit()
+        return False
+
+    # Only the current lease holder records results; a superseded worker's identical files are harmless
+    completed = JobShard.query.filter_by(id=shard.id, worker_id=worker_id, status='running').update({
+        'status': 'completed',
+        'eip_aggregates_path': outputs['eip_aggregates'],
+        'erc_aggregates_path': outputs['erc_aggregates'],
+        'sketches_path': outputs['sketches'],
+        'scores_path': outputs['scores'],
+        'completed_at': datetime.utcnow(),
+    }, synchronize_session=False)
+    db.session.commit()
+    if not completed:
+        return False
+
+    done = JobShard.query.filter_by(job_id=job_id, status='completed').count()
+    job = db.session.get(AnalysisJob, job_id)
+    if job and job.status == 'processing':
+        job.stage = f'Stage 1: {done}/{shard.shard_count} shards scored'
+        job.progress = 10 + int(23 * done / shard.shard_count)
+        db.session.commit()
+    return True
+
+
+def maybe_finalize(job_id, analyzer):
+    """
+    Merge a job's shards and run the rest of the pipeline once every shard is scored.
+
+    The job is moved from processing to merging with a conditional UPDATE, so
+    exactly one worker finalizes it. A merge whose worker died is taken over
+    after LEASE_SECONDS without progress.
+    """
+    shards = JobShard.query.filter_by(job_id=job_id).order_by(JobShard.shard_index).all()
+    if not shards or any(shard.status != 'completed' for shard in shards):
+        return False
+
+    now = datetime.utcnow()
+    claimed = AnalysisJob.query.filter(
+        AnalysisJob.id == job_id,
+        or_(AnalysisJob.status == 'processing',
+            and_(AnalysisJob.status == 'merging', AnalysisJob.updated_at < now - timedelta(seconds=LEASE_SECONDS)))
+    ).update({'status': 'merging', 'stage': 'Stage 1: Merging shard results...', 'updated_at': now},
+             synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return False
+
+    job = db.session.get(AnalysisJob, job_id)
+    db.session.refresh(job)
+    output_dir = os.path.join(app.config['OUTPUT_FOLDER'], job_id)
+    try:
+        analyzer.run_stage1_from_shards([{
+            'eip_aggregates': shard.eip_aggregates_path,
+            'erc_aggregates': shard.erc_aggregates_path,
+            'sketches': shard.sketches_path,
+            'scores': shard.scores_path,
+        } for shard in shards], output_dir)
+        job.progress = 33
+        db.session.commit()
+        finish_analysis(job, analyzer, output_dir)
+    except Exception as e:
+        logging.error(f"Error merging shards of job {job_id}: {str(e)}")
+        db.session.rollback()
+        _fail_job(job_id, str(e))
+        db.session.commit()
+        return False
+    return True
+
+
+def _local_worker_process(job_id):
+    from app import app as worker_app
+
+    with worker_app.app_context():
+        run_worker(job_id=job_id)
+
+
+def run_local_workers(job_id, shard_count):
+    """
+    Work on a job's shards from this node: up to LOCAL_SHARD_PROCESSES extra
+    processes plus the calling thread, which returns once the job is done.
+    """
+    processes = []
+    context = multiprocessing.get_context('spawn')
+    for _ in range(min(app.config['LOCAL_SHARD_PROCESSES'], shard_count - 1)):
+        process = context.Process(target=_local_worker_process, args=(job_id,), daemon=True)
+        process.start()
+        processes.append(process)
+    try:
+        return run_worker(job_id=job_id)
+    finally:
+        for process in processes:
+            process.join()
+
+
+def run_worker(worker_id=None, job_id=None, once=False, analyzer=None, poll_interval=POLL_INTERVAL):
+    """
+    Claim and score shards until there is nothing left to do.
+
+    With `job_id` the worker serves that job until it leaves the processing
+    state (so shards abandoned by other nodes are picked up once their lease
+    expires); with `once` it exits as soon as nothing is claimable; otherwise
+    it polls forever. Returns the number of shards this worker completed.
+    """
+    if analyzer is None:
+        from sentiment_analyzer import SentimentAnalyzer
+        analyzer = SentimentAnalyzer(normalize_rules=app.config['TEXT_NORMALIZATION_RULES'])
+    worker_id = worker_id or default_worker_id()
+
+    completed = 0
+    while True:
+        shard = claim_shard(worker_id, job_id)
+        if shard is None:
+            if job_id:
+                maybe_finalize(job_id, analyzer)
+                job = db.session.get(AnalysisJob, job_id)
+                if job is not None:
+                    db.session.refresh(job)
+                if job is None or job.status != 'processing':
+                    break
+            if once:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        logging.info(f"🧩 {worker_id} claimed shard {shard.shard_index} of job {shard.job_id}")
+        if process_shard(shard, worker_id, analyzer):
+            completed += 1
+            maybe_finalize(shard.job_id, analyzer)
+    return completed
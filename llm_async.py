@@ -0,0 +1,67 @@
+"""
+Background asyncio event loop for LLM completions.
+
+Web requests hand a coroutine to this loop and return straight away, so a
+worker is never held while OpenAI generates tokens or a retry backs off. One
+daemon thread per process runs the loop; any number of completions can wait
+on the network concurrently inside it.
+"""
+
+import asyncio
+import logging
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def event_loop():
+    """The process-wide background loop, started on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-async", daemon=True).start()
+            _loop = loop
+            logging.info("🔁 Started background LLM event loop")
+        return _loop
+
+
+def submit(coro):
+    """Schedule `coro` on the background loop; returns a concurrent.futures.Future of its result"""
+    return asyncio.run_coroutine_threadsafe(coro, event_loop())
+
+
+def run(coro):
+    """Run `coro` on the background loop and wait for its result; the calling thread makes no network calls"""
+    return submit(coro).result()
+
+
+async def _next(fragments):
+    return await fragments.__anext__()
+
+
+def iterate(fragments):
+    """
+    Relay an async generator to a regular thread, one item at a time. Each
+    item is produced on the background loop only when the caller asks for it,
+    and closing the returned generator closes the async one there.
+    """
+    loop = event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(_next(fragments), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(fragments.aclose(), loop).result()
+
+
+def stop_event_loop():
+    """Stop the background loop (tests, shutdown); the next submit starts a new one"""
+    global _loop
+    with _loop_lock:
+        loop, _loop = _loop, None
+    if loop is not None and not loop.is_closed():
+        loop.call_soon_threadsafe(loop.stop)
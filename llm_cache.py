@@ -0,0 +1,158 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# LLM_CACHE_PATH="" (or "off") disables the cache
+DEFAULT_CACHE_PATH = os.path.join("instance", "llm_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# String literals are matched first so "//" inside them is not taken for a comment
+_SOLIDITY_TOKENS = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*[\s\S]*?\*/')
+_SOLIDITY_FENCE = re.compile(r"```solidity\n([\s\S]*?)```")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_solidity(code):
+    """Solidity with comments (NatSpec included) removed and whitespace collapsed, for cache keys only"""
+    code = _SOLIDITY_TOKENS.sub(lambda m: m.group(0) if m.group(0)[0] in "\"'" else " ", code)
+    return _WHITESPACE.sub(" ", code).strip()
+
+
+def normalize_prompt(text):
+    """Prompt text with its fenced Solidity normalized, so reformatted or re-commented code hits the cache"""
+    text = _SOLIDITY_FENCE.sub(lambda m: f"```solidity\n{normalize_solidity(m.group(1))}```", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def request_key(model, messages, **params):
+    """Cache key of a chat completion request: model, sampling parameters and normalized messages"""
+    payload = {
+        "model": model,
+        "params": params,
+        "messages": [{"role": m["role"], "content": normalize_prompt(m.get("content") or "")} for m in messages],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM responses shared by every process using the same file.
+
+    Entries older than `ttl_seconds` are misses and are purged on write; when
+    the stored responses exceed `max_bytes` the least recently used go first.
+    Hit and miss counts are kept in the file too, so the hit rate covers all
+    workers and survives restarts.
+    """
+
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """The cached response for `key`, or None on a miss"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", ("hits" if row else "misses",))
+        return row[0] if row else None
+
+    def set(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now))
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                evicted = 0
+                for old_key, old_size in conn.execute("SELECT key, size FROM responses ORDER BY last_used_at").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= old_size
+                    evicted += 1
+                logging.info(f"🧹 LLM cache evicted {evicted} responses to stay under {self.max_bytes} bytes")
+
+    def stats(self):
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "hits": counters["hits"],
+            "misses": counters["misses"],
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("UPDATE counters SET value = 0")
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def shared_cache():
+    """The process-wide cache configured by LLM_CACHE_PATH/TTL_SECONDS/MAX_BYTES, or None when disabled"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            path = os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+            if path.strip().lower() in ("", "off"):
+                return None
+            _shared_cache = LLMCache(
+                path,
+                ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            )
+        return _shared_cache
+
+
+def reset_shared_cache():
+    """Forget the process-wide cache so the next use rereads the environment (tests, config changes)"""
+    global _shared_cache
+    with _shared_cache_lock:
+        _shared_cache = None
@@ -0,0 +1,300 @@
+"""
+Process-wide admission control for OpenAI calls.
+
+Every attempt takes one request and its estimated tokens from two token
+buckets (requests and tokens per minute). Waiting callers are admitted in
+priority order, interactive before batch, first come first served within a
+priority. A 429 pauses admission for everyone until its Retry-After has
+passed, instead of each caller retrying on its own schedule. Concurrent calls
+with the same request key are coalesced: one goes upstream and every caller
+gets its result. If that call is cancelled (a timeout or a closed client on
+the leader's side), the callers waiting on it make the call again themselves. A waiter with a
+deadline of its own stops waiting when it passes, leaving the call running
+for the others.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+INTERACTIVE = 0
+BATCH = 1
+
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 150000
+
+# Rough prompt size estimate; max_tokens is counted in full, as OpenAI reserves it against the limit
+CHARS_PER_TOKEN = 4
+
+# Refills are not signalled, so waiters re-check the buckets at least this often (seconds)
+MAX_WAIT_SLICE = 0.25
+
+# Pause after a 429 that carries no Retry-After header (seconds)
+DEFAULT_RATE_LIMIT_PAUSE = 5.0
+
+
+class LeaderCancelled(RuntimeError):
+    """Handed to coalesced callers when the call they joined was cancelled; they retry it"""
+
+
+def estimate_tokens(request):
+    """Tokens a chat completion request counts against the budget: prompt estimate plus max_tokens"""
+    prompt_chars = sum(len(message.get("content") or "") for message in request.get("messages") or [])
+    return prompt_chars // CHARS_PER_TOKEN + (request.get("max_tokens") or 0)
+
+
+def rate_limit_delay(error):
+    """Seconds to pause for a 429 error (its Retry-After header or the default), or None for other errors"""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return DEFAULT_RATE_LIMIT_PAUSE
+
+
+class TokenBucket:
+    """`per_minute` units of capacity refilled continuously; callers hold the scheduler lock"""
+
+    def __init__(self, per_minute, clock):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` is available (a request larger than the bucket waits for a full one)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """Request and token budgets, priority admission and coalescing of identical in-flight requests"""
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 clock=time.monotonic):
+        self.clock = clock
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_bucket = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        self._condition = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._inflight = {}
+        self._stats = {"admitted": 0, "coalesced": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    # --- admission ---
+
+    def _enqueue(self, priority):
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _discard(self, ticket):
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._condition.notify_all()
+
+    def _try_admit(self, ticket, cost):
+        """0 if `ticket` was admitted, else the seconds to wait before trying again"""
+        if self._queue[0] != ticket:
+            return MAX_WAIT_SLICE
+        wait = self._paused_until - self.clock()
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1))
+        if self.token_bucket is not None:
+            wait = max(wait, self.token_bucket.wait_time(cost))
+        if wait > 0:
+            return wait
+        if self.request_bucket is not None:
+            self.request_bucket.take(1)
+        if self.token_bucket is not None:
+            self.token_bucket.take(cost)
+        heapq.heappop(self._queue)
+        self._stats["admitted"] += 1
+        self._condition.notify_all()
+        return 0
+
+    def acquire(self, cost, priority=INTERACTIVE):
+        """Block until one request of `cost` tokens fits the budgets and no higher-priority caller is waiting"""
+        started = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    wait = self._try_admit(ticket, cost)
+                    if not wait:
+                        break
+                    self._condition.wait(min(wait, MAX_WAIT_SLICE))
+            except BaseException:
+                self._discard(ticket)
+                raise
+            self._stats["wait_seconds"] += time.monotonic() - started
+
+    async def acquire_async(self, cost, priority=INTERACTIVE):
+        """acquire for the event loop: waits with asyncio.sleep instead of blocking the loop thread"""
+        started = time.monotonic()
+        with self._condition:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_admit(ticket, cost)
+                if not wait:
+                    break
+                await asyncio.sleep(min(wait, MAX_WAIT_SLICE))
+        except BaseException:
+            with self._condition:
+                self._discard(ticket)
+            raise
+        with self._condition:
+            self._stats["wait_seconds"] += time.monotonic() - started
+
+    def pause(self, seconds):
+        """Admit nothing for `seconds`, e.g. after a 429 with Retry-After"""
+        with self._condition:
+            self._paused_until = max(self._paused_until, self.clock() + seconds)
+            self._stats["rate_limited"] += 1
+        logging.warning(f"⏸️ OpenAI rate limit hit, pausing LLM requests for {seconds:.1f}s")
+
+    # --- coalescing ---
+
+    def _join(self, key):
+        """The in-flight future for `key` and whether this caller leads (makes the upstream call)"""
+        with self._condition:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future, False
+            future = Future()
+            # Running futures cannot be cancelled, so a cancelled async waiter cannot settle it for the rest
+            future.set_running_or_notify_cancel()
+            self._inflight[key] = future
+            return future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._condition:
+            self._inflight.pop(key, None)
+        if error is not None and not isinstance(error, Exception):
+            # CancelledError and the like belong to the leader alone; waiters retry instead
+            future.set_exception(LeaderCancelled(f"coalesced call cancelled ({type(error).__name__})"))
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    @staticmethod
+    def _wait_time(deadline):
+        """Seconds a waiter may still wait for its `deadline` (time.monotonic()), or None"""
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM request deadline passed while waiting on a shared call")
+        return remaining
+
+    def coalesce(self, key, fn, deadline=None):
+        """
+        fn(), shared with every concurrent caller passing the same `key` (None
+        never coalesces). A caller that joins another's call waits at most
+        until its own `deadline` (time.monotonic()) and then raises
+        TimeoutError; the call itself goes on for the rest.
+        """
+        if key is None:
+            return fn()
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result(timeout=self._wait_time(deadline))
+            except FutureTimeoutError:
+                raise TimeoutError("LLM request deadline passed while waiting on a shared call")
+            except LeaderCancelled:
+                continue
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def coalesce_async(self, key, fn, deadline=None):
+        """coalesce for coroutine functions; sync and async callers of one key share the same call"""
+        if key is None:
+            return await fn()
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                waiter = asyncio.shield(asyncio.wrap_future(future))
+                return await asyncio.wait_for(waiter, self._wait_time(deadline))
+            except asyncio.TimeoutError:
+                raise TimeoutError("LLM request deadline passed while waiting on a shared call")
+            except LeaderCancelled:
+                continue
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def stats(self):
+        with self._condition:
+            return {
+                **self._stats,
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "waiting": len(self._queue),
+                "in_flight": len(self._inflight),
+                "paused_for": max(0.0, self._paused_until - self.clock()),
+            }
+
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def shared_scheduler():
+    """
+    The process-wide scheduler. Budgets come from LLM_REQUESTS_PER_MINUTE and
+    LLM_TOKENS_PER_MINUTE; 0 lifts that limit.
+    """
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            _shared_scheduler = LLMScheduler(
+                int(os.environ.get("LLM_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)),
+                int(os.environ.get("LLM_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE)),
+            )
+        return _shared_scheduler
+
+
+def reset_shared_scheduler():
+    """Drop the process-wide scheduler so the next call reads the budgets again (tests, config changes)"""
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        _shared_scheduler = None
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from app import app, db, LLMTask
+from llm_async import submit
+
+# Seconds a task may run; past this it is cancelled, or reported as failed if
+# no process is left to finish it (LLM_TASK_TIMEOUT overrides)
+DEFAULT_TASK_TIMEOUT = 300.0
+
+
+def task_timeout():
+    return float(os.environ.get("LLM_TASK_TIMEOUT", DEFAULT_TASK_TIMEOUT))
+
+
+# How long past its deadline a task may still be recorded as running before it is reported lost
+LOST_TASK_GRACE = timedelta(seconds=10)
+
+# Seconds between saves of a streamed task's text so far
+PARTIAL_SAVE_INTERVAL = 0.5
+
+# Futures of the tasks this process is running, so they can be cancelled
+_futures = {}
+
+
+def start_task(kind, coro, finish=None, streamed=False):
+    """
+    Record an LLMTask and run `coro` on the background event loop. `finish`
+    turns the generator's result into the endpoint's response body; it runs
+    on the loop, so it must not touch the database.
+    
+    With `streamed`, `coro` is a function taking an `on_text` callback and
+    returning the coroutine; the text generated so far is saved on the task
+    as it arrives, for polls to show.
+    """
+    timeout = task_timeout()
+    task = LLMTask(id=str(uuid.uuid4()), kind=kind, deadline_at=datetime.utcnow() + timedelta(seconds=timeout))
+    db.session.add(task)
+    db.session.commit()
+    if streamed:
+        coro = coro(_partial_saver(task.id))
+    future = submit(_run(task.id, coro, finish, timeout))
+    _futures[task.id] = future
+    future.add_done_callback(lambda _: _futures.pop(task.id, None))
+    return task
+
+
+def _partial_saver(task_id):
+    """on_text callback saving the text so far every PARTIAL_SAVE_INTERVAL seconds"""
+    parts = []
+    saved = time.monotonic()
+
+    async def on_text(text):
+        nonlocal saved
+        parts.append(text)
+        if time.monotonic() - saved < PARTIAL_SAVE_INTERVAL:
+            return
+        saved = time.monotonic()
+        if not await asyncio.to_thread(_record_partial, task_id, "".join(parts)):
+            # Cancelled, possibly by another process: stop generating
+            raise asyncio.CancelledError()
+
+    return on_text
+
+
+def _record_partial(task_id, text):
+    """Save the text so far of a running task; False once the task is no longer running"""
+    with app.app_context():
+        updated = LLMTask.query.filter_by(id=task_id, status='running').update({'partial_text': text})
+        db.session.commit()
+        return updated > 0
+
+
+async def _run(task_id, coro, finish, timeout=None):
+    limit = asyncio.timeout(timeout)
+    try:
+        async with limit:
+            result = await coro
+        if finish is not None:
+            result = finish(result)
+        error = None if result.get('success') else result.get('error')
+    except TimeoutError as e:
+        # Either the task's own limit or a timeout raised by the call itself
+        error = f"Task did not finish within {timeout:g} seconds" if limit.expired() else str(e)
+        logging.error(f"LLM task {task_id} failed: {error}")
+        result = None
+    except Exception as e:
+        logging.error(f"LLM task {task_id} failed: {str(e)}")
+        result, error = None, str(e)
+    # The database write is blocking, so it happens off the loop thread
+    await asyncio.to_thread(_record_outcome, task_id, result, error)
+
+
+def _record_outcome(task_id, result, error):
+    with app.app_context():
+        task = db.session.get(LLMTask, task_id)
+        # Already cancelled, or reported as failed once its deadline passed
+        if task is None or task.status != 'running':
+            return
+        task.status = 'failed' if error else 'completed'
+        task.result_json = json.dumps(result) if result is not None else None
+        task.error_message = error
+        task.completed_at = datetime.utcnow()
+        db.session.commit()
+        logging.info(f"🤖 LLM task {task_id} ({task.kind}) {task.status}")
+
+
+def _expire_if_overdue(task):
+    """Mark a task still running past its deadline as failed: the process running it is gone"""
+    deadline = task.deadline_at
+    if deadline is None and task.created_at is not None:
+        deadline = task.created_at + timedelta(seconds=task_timeout())
+    # A live task records its own timeout at the deadline; only one still running well past it was lost
+    if task.status != 'running' or deadline is None or datetime.utcnow() <= deadline + LOST_TASK_GRACE:
+        return
+    task.status = 'failed'
+    task.error_message = 'Task was lost before it finished (the server restarted or its worker stopped)'
+    task.completed_at = datetime.utcnow()
+    db.session.commit()
+    logging.warning(f"🤖 LLM task {task.id} ({task.kind}) passed its deadline while running, marked failed")
+
+
+def cancel_task(task):
+    """Cancel a running task; the completion is stopped if this process is running it"""
+    if task.status != 'running':
+        return
+    task.status = 'cancelled'
+    task.completed_at = datetime.utcnow()
+    db.session.commit()
+    future = _futures.get(task.id)
+    if future is not None:
+        future.cancel()
+    logging.info(f"🤖 LLM task {task.id} ({task.kind}) cancelled")
+
+
+def task_status(task):
+    """
+    Status of a task, and once it has finished the response body the
+    synchronous endpoint would return. While it runs, a streamed task
+    includes the text generated so far. A task still running past its
+    deadline is reported (and stored) as failed.
+    """
+    _expire_if_overdue(task)
+    status = {
+        'task_id': task.id,
+        'kind': task.kind,
+        'status': task.status,
+        'created_at': task.created_at.isoformat() if task.created_at else None,
+        'completed_at': task.completed_at.isoformat() if task.completed_at else None,
+    }
+    if task.status == 'running':
+        status['partial'] = task.partial_text
+    else:
+        status['result'] = json.loads(task.result_json) if task.result_json else None
+        status['error'] = task.error_message
+    return status
@@ -0,0 +1,209 @@
+"""
+Telemetry of LLM completions.
+
+Every completion EIPCodeGenerator asks for is recorded with its endpoint,
+model, prompt and completion tokens, latency, time to first token (streamed
+completions), retries, whether it was answered from the response cache or
+shared with an identical in-flight call, and the class of any error.
+
+Records are queued in memory and written to the llm_call table in batches by
+a background thread, so a completion never waits on the database. Set
+LLM_TELEMETRY=off to record nothing.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+# Seconds between batched writes of queued records
+FLUSH_INTERVAL = 2.0
+
+# Records held while the database is unavailable; the oldest are dropped beyond this
+MAX_PENDING = 10000
+
+PERCENTILES = (50, 90, 99)
+
+_pending = deque(maxlen=MAX_PENDING)
+_wake = threading.Event()
+_flush_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def enabled():
+    return os.environ.get("LLM_TELEMETRY", "on").strip().lower() not in ("off", "0", "false", "")
+
+
+def _count(value):
+    """A token count from an OpenAI usage object; anything else (absent, mocked) is None"""
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+class CallRecord:
+    """Measurements of one completion, filled in while it runs and queued by finish()"""
+
+    def __init__(self, endpoint, model=None, streamed=False):
+        self.endpoint = endpoint or "unknown"
+        self.model = model
+        self.streamed = streamed
+        self.started = time.monotonic()
+        self.first_token_ms = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.retries = 0
+        self.cache_hit = False
+        self.coalesced = False
+
+    def _elapsed_ms(self):
+        return (time.monotonic() - self.started) * 1000.0
+
+    def first_token(self):
+        if self.first_token_ms is None:
+            self.first_token_ms = self._elapsed_ms()
+
+    def add_usage(self, usage):
+        """Token counts of a response (or the final chunk of a stream) when OpenAI reported them"""
+        if usage is None:
+            return
+        self.prompt_tokens = _count(getattr(usage, "prompt_tokens", None)) or self.prompt_tokens
+        self.completion_tokens = _count(getattr(usage, "completion_tokens", None)) or self.completion_tokens
+
+    def finish(self, error=None):
+        """Queue the record; `error` is the exception the completion failed with, or a short reason"""
+        if error is not None and not isinstance(error, str):
+            error = type(error).__name__
+        record({
+            "endpoint": self.endpoint,
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_ms": self._elapsed_ms(),
+            "first_token_ms": self.first_token_ms,
+            "retries": self.retries,
+            "cache_hit": self.cache_hit,
+            "coalesced": self.coalesced,
+            "streamed": self.streamed,
+            "error_class": error,
+            "created_at": datetime.utcnow(),
+        })
+
+
+def record(row):
+    """Queue one llm_call row for the background writer"""
+    if not enabled():
+        return
+    _pending.append(row)
+    _ensure_writer()
+
+
+def _ensure_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_write_loop, name="llm-telemetry", daemon=True)
+            _writer.start()
+
+
+def _write_loop():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        flush()
+
+
+def flush():
+    """Write every queued record now; returns how many were written"""
+    with _flush_lock:
+        rows = []
+        while _pending:
+            rows.append(_pending.popleft())
+        if not rows:
+            return 0
+        from app import app, db, LLMCall
+        try:
+            with app.app_context():
+                db.session.add_all([LLMCall(**row) for row in rows])
+                db.session.commit()
+        except Exception as e:
+            logging.warning(f"LLM telemetry write failed, {len(rows)} records dropped: {str(e)}")
+            return 0
+        return len(rows)
+
+
+def percentiles(values):
+    """Nearest-rank PERCENTILES and the maximum of `values`, or None when there are none"""
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    summary = {f"p{p}": round(values[max(0, -(-p * len(values) // 100) - 1)], 1) for p in PERCENTILES}
+    summary["max"] = round(values[-1], 1)
+    return summary
+
+
+def summarize(since, endpoint=None):
+    """
+    Per-endpoint summary of llm_call rows created since `since`, slowest total
+    latency first. Counts and sums are aggregated in SQL; only the latency
+    columns are fetched, for the percentiles. Latency and time-to-first-token
+    percentiles cover completions that were not answered from the cache, so
+    fast cache hits do not hide slow calls.
+    """
+    from app import db, LLMCall
+    from sqlalchemy import case, func
+
+    filters = [LLMCall.created_at >= since]
+    if endpoint:
+        filters.append(LLMCall.endpoint == endpoint)
+    upstream = LLMCall.cache_hit.isnot(True)
+
+    def flagged(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    totals = db.session.query(
+        LLMCall.endpoint,
+        func.count(LLMCall.id),
+        flagged(LLMCall.error_class.isnot(None)),
+        flagged(LLMCall.cache_hit.is_(True)),
+        flagged(LLMCall.coalesced.is_(True)),
+        func.coalesce(func.sum(LLMCall.retries), 0),
+        func.coalesce(func.sum(LLMCall.prompt_tokens), 0),
+        func.coalesce(func.sum(LLMCall.completion_tokens), 0),
+        func.coalesce(func.sum(case((upstream, LLMCall.latency_ms), else_=0.0)), 0.0),
+    ).filter(*filters).group_by(LLMCall.endpoint).all()
+
+    error_classes = {}
+    for name, error_class, count in db.session.query(LLMCall.endpoint, LLMCall.error_class, func.count(LLMCall.id)) \
+            .filter(*filters, LLMCall.error_class.isnot(None)).group_by(LLMCall.endpoint, LLMCall.error_class):
+        error_classes.setdefault(name, {})[error_class] = count
+
+    def values_by_endpoint(column, *conditions):
+        values = {}
+        for name, value in db.session.query(LLMCall.endpoint, column).filter(*filters, upstream, *conditions):
+            values.setdefault(name, []).append(value)
+        return values
+
+    latencies = values_by_endpoint(LLMCall.latency_ms)
+    first_tokens = values_by_endpoint(LLMCall.first_token_ms, LLMCall.streamed.is_(True))
+
+    summary = []
+    for name, calls, errors, cache_hits, coalesced, retries, prompt_tokens, completion_tokens, latency in totals:
+        summary.append({
+            "endpoint": name,
+            "calls": calls,
+            "errors": errors,
+            "error_rate": round(errors / calls, 4),
+            "error_classes": error_classes.get(name, {}),
+            "cache_hits": cache_hits,
+            "cache_hit_rate": round(cache_hits / calls, 4),
+            "coalesced": coalesced,
+            "retries": retries,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_latency_ms": round(latency, 1),
+            "latency_ms": percentiles(latencies.get(name, [])),
+            "first_token_ms": percentiles(first_tokens.get(name, [])),
+        })
+    return sorted(summary, key=lambda entry: entry["total_latency_ms"], reverse=True)
@@ -3,7 +3,8 @@ from datetime import datetime
 from app import db
 from flask_dance.consumer.storage.sqla import OAuthConsumerMixin
 from flask_login import UserMixin
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, select
+from sqlalchemy.ext.hybrid import hybrid_property
 
 
 # (IMPORTANT) This table is mandatory for Replit Auth, don't drop it.
@@ -45,6 +46,14 @@ class AnalysisJob(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now)
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
     completed_at = db.Column(db.DateTime)
+    metadata_snapshot_id = db.Column(db.Integer, db.ForeignKey('eip_metadata_snapshot.id'))
+    # Which results the job's EIPSentiment rows hold: 'preview' (sampled), 'partial' (rows scored so far) or 'final'
+    result_kind = db.Column(db.String(20))
+    processed_fraction = db.Column(db.Float)
+    # SHA-256 of the uploaded file, used to count each upload once in the global rollup
+    content_hash = db.Column(db.String(64), index=True)
+    # 'sentiment' (an uploaded CSV) or 'generation' (batch contract and test generation, see batch_generation.py)
+    job_type = db.Column(db.String(20), default='sentiment', nullable=False)
     
     output_files = db.relationship('OutputFile', backref='job', lazy=True, cascade='all, delete-orphan')
 
@@ -57,19 +66,186 @@ class OutputFile(db.Model):
     file_size = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.now)
 
+class EIPMetadataSnapshot(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    source = db.Column(db.String(255))
+    eip_count = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    
+    entries = db.relationship('EIPMetadata', backref='snapshot', lazy=True)
+
+class EIPMetadata(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # NULL for rows attached to a single sentiment record instead of a shared snapshot
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('eip_metadata_snapshot.id'))
+    eip = db.Column(db.String(10), nullable=False)
+    category = db.Column(db.String(100))
+    status = db.Column(db.String(50))
+    title = db.Column(db.Text)
+    author = db.Column(db.Text)
+    
+    __table_args__ = (UniqueConstraint('snapshot_id', 'eip', name='uq_metadata_snapshot_eip'),)
+
+def _metadata_attribute(name):
+    """Expose an EIPMetadata column on EIPSentiment for reads, writes and query filters"""
+    
+    def getter(self):
+        return getattr(self.eip_metadata, name) if self.eip_metadata is not None else None
+    
+    def setter(self, value):
+        # Shared snapshot rows are copied before writing so other jobs are unaffected
+        if self.eip_metadata is None or self.eip_metadata.snapshot_id is not None:
+            current = self.eip_metadata
+            self.eip_metadata = EIPMetadata(
+                eip=self.eip,
+                category=current.category if current else None,
+                status=current.status if current else None,
+                title=current.title if current else None,
+                author=current.author if current else None
+            )
+        setattr(self.eip_metadata, name, value)
+    
+    def expression(cls):
+        return select(getattr(EIPMetadata, name)).where(EIPMetadata.id == cls.metadata_id).scalar_subquery()
+    
+    return hybrid_property(getter, setter, expr=expression)
+
 class EIPSentiment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.String(36), db.ForeignKey('analysis_job.id'), nullable=False)
     eip = db.Column(db.String(10), nullable=False)
+    metadata_id = db.Column(db.Integer, db.ForeignKey('eip_metadata.id'), index=True)
     unified_compound = db.Column(db.Float)
     unified_pos = db.Column(db.Float)
     unified_neg = db.Column(db.Float)
     unified_neu = db.Column(db.Float)
     total_comment_count = db.Column(db.Integer)
-    category = db.Column(db.String(100))
-    status = db.Column(db.String(50))
-    title = db.Column(db.Text)
-    author = db.Column(db.Text)
+    # Distribution of comment compound scores (see quantile_sketch.CompoundSketch)
+    compound_p10 = db.Column(db.Float)
+    compound_p50 = db.Column(db.Float)
+    compound_p90 = db.Column(db.Float)
+    polarization = db.Column(db.Float)
+    compound_sketch = db.Column(db.Text)
+    # 95% bootstrap confidence interval of unified_compound
+    compound_ci_low = db.Column(db.Float)
+    compound_ci_high = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.now)
     
-    __table_args__ = (db.Index('idx_eip_job', 'eip', 'job_id'),)
\ No newline at end of file
+    eip_metadata = db.relationship('EIPMetadata', lazy='joined')
+    
+    category = _metadata_attribute('category')
+    status = _metadata_attribute('status')
+    title = _metadata_attribute('title')
+    author = _metadata_attribute('author')
+    
+    __table_args__ = (db.Index('idx_eip_job', 'eip', 'job_id'),)
+
+class GlobalEIPSentiment(db.Model):
+    """Corpus-wide per-EIP sums across every rolled-up upload"""
+    eip = db.Column(db.String(10), primary_key=True)
+    compound_sum = db.Column(db.Float, default=0.0)
+    pos_sum = db.Column(db.Float, default=0.0)
+    neg_sum = db.Column(db.Float, default=0.0)
+    neu_sum = db.Column(db.Float, default=0.0)
+    comment_count = db.Column(db.Integer, default=0, index=True)
+    # Kept equal to compound_sum / comment_count so leaderboards are an index scan
+    unified_compound = db.Column(db.Float, index=True)
+    compound_sketch = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+class GlobalRollupSource(db.Model):
+    """An upload (or appended delta) already counted in the global rollup"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    job_id = db.Column(db.String(36), db.ForeignKey('analysis_job.id'))
+    comment_count = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+class GlobalSentimentSummary(db.Model):
+    """Single-row running totals behind the global summary endpoint"""
+    id = db.Column(db.Integer, primary_key=True)
+    upload_count = db.Column(db.Integer, default=0)
+    comment_count = db.Column(db.Integer, default=0)
+    compound_sum = db.Column(db.Float, default=0.0)
+    eip_count = db.Column(db.Integer, default=0)
+    eip_compound_sum = db.Column(db.Float, default=0.0)
+    positive_eips = db.Column(db.Integer, default=0)
+    negative_eips = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+class JobShard(db.Model):
+    """One topic-hash partition of a split job, claimed and scored by a shard worker"""
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(36), db.ForeignKey('analysis_job.id'), nullable=False)
+    shard_index = db.Column(db.Integer, nullable=False)
+    shard_count = db.Column(db.Integer, nullable=False)
+    input_path = db.Column(db.String(500), nullable=False)
+    row_count = db.Column(db.Integer)
+    # pending -> running -> completed, or back to pending when a worker fails or its lease expires
+    status = db.Column(db.String(20), default='pending', index=True)
+    worker_id = db.Column(db.String(255))
+    lease_expires_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, default=0)
+    eip_aggregates_path = db.Column(db.String(500))
+    erc_aggregates_path = db.Column(db.String(500))
+    sketches_path = db.Column(db.String(500))
+    scores_path = db.Column(db.String(500))
+    error_message = db.Column(db.Text)
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (UniqueConstraint('job_id', 'shard_index', name='uq_job_shard_index'),)
+
+class UploadSession(db.Model):
+    """A resumable upload being received in chunks; becomes an AnalysisJob when the last chunk lands"""
+    id = db.Column(db.String(36), primary_key=True)
+    original_filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_bytes = db.Column(db.BigInteger, default=0)
+    # Optional SHA-256 of the whole file, checked once every chunk has arrived
+    expected_sha256 = db.Column(db.String(64))
+    shards = db.Column(db.Integer, default=1)
+    # uploading -> completed, or invalid/aborted
+    status = db.Column(db.String(20), default='uploading')
+    header_checked = db.Column(db.Boolean, default=False)
+    error_message = db.Column(db.Text)
+    job_id = db.Column(db.String(36), db.ForeignKey('analysis_job.id'))
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+class LLMTask(db.Model):
+    """An LLM endpoint call running on the background event loop; polled until it finishes"""
+    id = db.Column(db.String(36), primary_key=True)
+    # generate_contract, analyze_security, generate_tests or analyze_code
+    kind = db.Column(db.String(40), nullable=False)
+    # running -> completed, failed or cancelled
+    status = db.Column(db.String(20), default='running')
+    # Text generated so far by a streamed call, while it is running
+    partial_text = db.Column(db.Text)
+    result_json = db.Column(db.Text)
+    error_message = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    # Reported as failed once passed while still running, e.g. after the worker restarted
+    deadline_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+
+class LLMCall(db.Model):
+    """Telemetry of one LLM completion, written in batches by llm_telemetry"""
+    id = db.Column(db.Integer, primary_key=True)
+    # generate_contract, analyze_security, analyze_security_chunk, generate_tests or recommend_eips
+    endpoint = db.Column(db.String(40), nullable=False, index=True)
+    model = db.Column(db.String(40))
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    latency_ms = db.Column(db.Float)
+    # Streamed completions only
+    first_token_ms = db.Column(db.Float)
+    retries = db.Column(db.Integer, default=0)
+    cache_hit = db.Column(db.Boolean, default=False)
+    # Shared the result of an identical request already in flight
+    coalesced = db.Column(db.Boolean, default=False)
+    streamed = db.Column(db.Boolean, default=False)
+    error_class = db.Column(db.String(80))
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
\ No newline at end of file
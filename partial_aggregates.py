@@ -0,0 +1,75 @@
+import pandas as pd
+
+PARTIAL_AGGREGATES_FILENAME = "partial_aggregates.csv"
+
+SCORE_COLUMNS = ["compound", "pos", "neg", "neu"]
+SUM_COLUMNS = [f"{col}_sum" for col in SCORE_COLUMNS]
+
+
+class PartialAggregates:
+    """
+    Running per-EIP sums and comment counts that can be merged exactly.
+
+    Sums are kept over the union of EIP- and ERC-keyed comments, the same set
+    Stage 1 averages into the unified_* scores, so unified means can be
+    published at any point without rescanning scored rows.
+    """
+
+    def __init__(self, sums=None):
+        if sums is None:
+            sums = pd.DataFrame(columns=SUM_COLUMNS + ["count"], dtype=float)
+            sums.index.name = "eip"
+        self.sums = sums
+
+    def add(self, comment_scores):
+        """Fold in one row per (comment, EIP) with compound/pos/neg/neu columns"""
+        if comment_scores.empty:
+            return self
+        chunk = comment_scores.groupby("eip")[SCORE_COLUMNS].agg(["sum", "count"])
+        chunk = pd.DataFrame({
+            **{f"{col}_sum": chunk[(col, "sum")] for col in SCORE_COLUMNS},
+            "count": chunk[("compound", "count")],
+        })
+        return self.merge(PartialAggregates(chunk))
+
+    def merge(self, other):
+        """Combine with another set of aggregates (chunks, workers or an earlier run)"""
+        if other.sums.empty:
+            return self
+        if self.sums.empty:
+            self.sums = other.sums.astype(float)
+        else:
+            self.sums = self.sums.add(other.sums, fill_value=0)
+        self.sums.index.name = "eip"
+        return self
+
+    @property
+    def comment_count(self):
+        return int(self.sums["count"].sum()) if not self.sums.empty else 0
+
+    def unified(self):
+        """unified_* means and total_comment_count per EIP"""
+        counts = self.sums["count"]
+        frame = pd.DataFrame({
+            f"unified_{col}": self.sums[f"{col}_sum"] / counts for col in SCORE_COLUMNS
+        })
+        frame["total_comment_count"] = counts.astype(int)
+        return frame.rename_axis("eip").reset_index()
+
+    def averages(self):
+        """Per-EIP avg_* columns and comment_count, shaped like Stage 1's grouped_eip"""
+        counts = self.sums["count"]
+        frame = pd.DataFrame({
+            f"avg_{col}": self.sums[f"{col}_sum"] / counts for col in SCORE_COLUMNS
+        })
+        frame["comment_count"] = counts.astype(int)
+        return frame.rename_axis("eip").reset_index()
+
+    def to_csv(self, path):
+        self.sums.to_csv(path)
+        return path
+
+    @classmethod
+    def from_csv(cls, path):
+        sums = pd.read_csv(path, dtype={"eip": str}).set_index("eip")
+        return cls(sums)
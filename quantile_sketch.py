@@ -0,0 +1,132 @@
+import base64
+import struct
+import numpy as np
+
+# VADER compound scores are bounded to [-1, 1], so a fixed-resolution histogram
+# is an exactly mergeable quantile sketch: merging is adding counts, and every
+# quantile is within half a bin width (0.005) of the true value.
+LOW = -1.0
+HIGH = 1.0
+BINS = 200
+BIN_WIDTH = (HIGH - LOW) / BINS
+
+# VADER's conventional neutral band
+POLARITY_THRESHOLD = 0.05
+
+SKETCH_VERSION = 1
+_PREFIX = struct.Struct("<BH")
+
+
+def _bin_index(values):
+    values = np.clip(np.asarray(values, dtype=float), LOW, HIGH)
+    return np.minimum(((values - LOW) / BIN_WIDTH).astype(np.int64), BINS - 1)
+
+
+class CompoundSketch:
+    """Mergeable sketch of a compound score distribution"""
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros(BINS, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    @classmethod
+    def from_scores(cls, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        return cls(np.bincount(_bin_index(values), minlength=BINS))
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def merge(self, other):
+        """Return a new sketch holding both distributions"""
+        return CompoundSketch(self.counts + other.counts)
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def quantiles(self, qs):
+        """Quantiles interpolated linearly inside the containing bin; NaN for an empty sketch"""
+        qs = np.atleast_1d(np.asarray(qs, dtype=float))
+        total = self.count
+        if total == 0:
+            return np.full(len(qs), np.nan)
+        cumulative = np.cumsum(self.counts)
+        # A rank of exactly 0 would land in the (possibly empty) first bin
+        ranks = np.maximum(qs * total, 1e-9)
+        idx = np.minimum(np.searchsorted(cumulative, ranks, side="left"), BINS - 1)
+        below = np.where(idx > 0, cumulative[idx - 1], 0)
+        within = np.divide(ranks - below, self.counts[idx], out=np.zeros(len(qs)), where=self.counts[idx] > 0)
+        return LOW + (idx + np.clip(within, 0.0, 1.0)) * BIN_WIDTH
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def polarization(self):
+        """
+        2 * min(share positive, share negative): 0 when comments lean one way
+        (or are neutral), 1 when they split evenly between positive and negative.
+        """
+        total = self.count
+        if total == 0:
+            return None
+        edge = int(round((POLARITY_THRESHOLD - LOW) / BIN_WIDTH))
+        negative = self.counts[:BINS - edge].sum() / total
+        positive = self.counts[edge:].sum() / total
+        return float(2 * min(positive, negative))
+
+    def summary(self):
+        p10, p50, p90 = self.quantiles([0.1, 0.5, 0.9]) if self.count else (None, None, None)
+        return {
+            "compound_p10": None if p10 is None else float(p10),
+            "compound_p50": None if p50 is None else float(p50),
+            "compound_p90": None if p90 is None else float(p90),
+            "polarization": self.polarization(),
+        }
+
+    def to_string(self):
+        """Sparse, base64 encoded form: only non-empty bins are stored"""
+        nonzero = np.flatnonzero(self.counts)
+        payload = (
+            _PREFIX.pack(SKETCH_VERSION, len(nonzero))
+            + nonzero.astype("<u1").tobytes()
+            + self.counts[nonzero].astype("<u4").tobytes()
+        )
+        return base64.b64encode(payload).decode("ascii")
+
+    @classmethod
+    def from_string(cls, encoded):
+        payload = base64.b64decode(encoded)
+        version, n = _PREFIX.unpack_from(payload)
+        if version != SKETCH_VERSION:
+            raise ValueError(f"Unsupported sketch version {version}")
+        offset = _PREFIX.size
+        nonzero = np.frombuffer(payload, dtype="<u1", count=n, offset=offset)
+        counts = np.frombuffer(payload, dtype="<u4", count=n, offset=offset + n)
+        sketch = cls()
+        sketch.counts[nonzero] = counts
+        return sketch
+
+
+def merge_sketches(encoded_sketches):
+    """Merge serialized sketches (e.g. one per job), skipping empty values"""
+    merged = CompoundSketch()
+    for encoded in encoded_sketches:
+        if encoded:
+            merged = merged + CompoundSketch.from_string(encoded)
+    return merged
+
+
+def sketches_by_group(keys, values):
+    """
+    Build one sketch per distinct key in a single vectorized pass.
+
+    Returns a dict of key -> CompoundSketch.
+    """
+    keys = np.asarray(keys)
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    groups, codes = np.unique(keys[valid], return_inverse=True)
+    flat = np.bincount(codes * BINS + _bin_index(values[valid]), minlength=len(groups) * BINS)
+    counts = flat.reshape(len(groups), BINS)
+    return {group: CompoundSketch(counts[i]) for i, group in enumerate(groups)}
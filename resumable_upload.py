@@ -0,0 +1,185 @@
+import io
+import os
+import uuid
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from werkzeug.utils import secure_filename
+
+from app import app, db, UploadSession, enqueue_upload
+from upload_ingest import allowed_upload, is_plain_csv, missing_columns
+
+# Bytes searched for the end of a plain CSV's header line before giving up on it
+HEADER_SCAN_BYTES = 64 * 1024
+
+# Running SHA-256 of each session's bytes so far, keyed by session id as (offset, hasher).
+# Rebuilt from disk when missing or behind, e.g. after a restart or a chunk handled by another process.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+# Appends are serialized so a retried chunk cannot interleave with the original attempt
+_append_lock = threading.Lock()
+
+
+class OffsetMismatch(ValueError):
+    """A chunk did not start where the previous one ended"""
+
+    def __init__(self, expected):
+        super().__init__(f"Expected a chunk at offset {expected}")
+        self.expected = expected
+
+
+def create_session(filename, total_size, expected_sha256=None, shards=1):
+    """Start a resumable upload of `total_size` bytes"""
+    if not filename or not allowed_upload(filename):
+        raise ValueError('Invalid file type. Upload a CSV, .csv.gz/.csv.zst, or a zip/tar archive of CSVs.')
+    if total_size <= 0:
+        raise ValueError('size must be positive')
+    if total_size > app.config['MAX_RESUMABLE_UPLOAD_BYTES']:
+        raise ValueError(f"File is larger than {app.config['MAX_RESUMABLE_UPLOAD_BYTES']} bytes")
+
+    session = UploadSession()
+    session.id = str(uuid.uuid4())
+    session.original_filename = filename
+    session.file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{session.id}.part")
+    session.total_size = total_size
+    session.received_bytes = 0
+    session.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+    session.shards = shards or 1
+    session.status = 'uploading'
+    # Only plain CSVs can be checked before they are unpacked
+    session.header_checked = not is_plain_csv(filename)
+    open(session.file_path, 'wb').close()
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def _hasher(session):
+    with _hashers_lock:
+        offset, hasher = _hashers.get(session.id, (None, None))
+        if offset != session.received_bytes:
+            hasher = hashlib.sha256()
+            with open(session.file_path, 'rb') as f:
+                remaining = session.received_bytes
+                while remaining:
+                    block = f.read(min(remaining, 1024 * 1024))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    remaining -= len(block)
+            _hashers[session.id] = (session.received_bytes, hasher)
+        return hasher
+
+
+def _check_header(session):
+    """Validate a plain CSV's header as soon as its first line has arrived"""
+    with open(session.file_path, 'rb') as f:
+        prefix = f.read(min(session.received_bytes, HEADER_SCAN_BYTES))
+    end = prefix.find(b'\n')
+    if end < 0 and session.received_bytes < min(session.total_size, HEADER_SCAN_BYTES):
+        return
+    header = prefix[:end + 1] if end >= 0 else prefix
+    missing = missing_columns(io.BytesIO(header))
+    if missing:
+        raise ValueError(f'CSV missing required columns: {", ".join(missing)}')
+    session.header_checked = True
+
+
+def _fail(session, message):
+    session.status = 'invalid'
+    session.error_message = message
+    db.session.commit()
+    discard(session)
+
+
+def append_chunk(session, offset, data, chunk_sha256):
+    """
+    Write one chunk at `offset` and fold it into the running hash.
+
+    Chunks must arrive in order; a retried chunk at the current offset simply
+    overwrites whatever a failed attempt left on disk. When the last chunk
+    lands the upload becomes a job. Raises OffsetMismatch or ValueError.
+    """
+    with _append_lock:
+        db.session.refresh(session)
+        return _append_chunk(session, offset, data, chunk_sha256)
+
+
+def _append_chunk(session, offset, data, chunk_sha256):
+    if session.status != 'uploading':
+        raise ValueError(f'Upload is {session.status}')
+    if offset != session.received_bytes:
+        raise OffsetMismatch(session.received_bytes)
+    if not data:
+        raise ValueError('Empty chunk')
+    if offset + len(data) > session.total_size:
+        raise ValueError('Chunk extends past the declared file size')
+    if not chunk_sha256 or hashlib.sha256(data).hexdigest() != chunk_sha256.lower():
+        raise ValueError('Chunk checksum mismatch')
+
+    hasher = _hasher(session)
+    with open(session.file_path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+        f.truncate()
+    hasher.update(data)
+    session.received_bytes = offset + len(data)
+    with _hashers_lock:
+        _hashers[session.id] = (session.received_bytes, hasher)
+
+    if not session.header_checked:
+        try:
+            _check_header(session)
+        except ValueError as e:
+            _fail(session, str(e))
+            raise
+
+    if session.received_bytes == session.total_size:
+        _complete(session, hasher.hexdigest())
+    else:
+        db.session.commit()
+    return session
+
+
+def _complete(session, sha256):
+    if session.expected_sha256 and session.expected_sha256 != sha256:
+        _fail(session, 'File checksum mismatch')
+        raise ValueError('File checksum mismatch')
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{timestamp}_{session.id[:8]}_{secure_filename(session.original_filename)}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    os.replace(session.file_path, filepath)
+    session.file_path = filepath
+    session.status = 'completed'
+    db.session.commit()
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+
+    # Only a plain CSV's upload hash is the content hash; archives are hashed by member after unpacking
+    content_hash = sha256 if is_plain_csv(session.original_filename) else None
+    session.job_id = enqueue_upload([filepath], [session.original_filename], session.shards, content_hash)
+    db.session.commit()
+    logging.info(f"✅ Resumable upload {session.id} complete, queued job {session.job_id}")
+
+
+def discard(session):
+    """Drop a session's partial file and hash state"""
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+    if session.status != 'completed' and os.path.exists(session.file_path):
+        os.remove(session.file_path)
+
+
+def session_status(session):
+    return {
+        'upload_id': session.id,
+        'filename': session.original_filename,
+        'status': session.status,
+        'offset': session.received_bytes,
+        'size': session.total_size,
+        'job_id': session.job_id,
+        'error': session.error_message,
+    }
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, literal, select, text
+
+# EIPSentiment columns that moved to EIPMetadata; databases created before the move still have them
+LEGACY_METADATA_COLUMNS = ["category", "status", "title", "author"]
+
+LEGACY_SNAPSHOT_SOURCE = "legacy eip_sentiment columns"
+
+
+def _column_ddl(column, dialect):
+    """ADD COLUMN clause for a model column; always nullable, with the model's scalar default if any"""
+    preparer = dialect.identifier_preparer
+    ddl = f"{preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    default = column.default
+    if default is not None and default.is_scalar:
+        value = literal(default.arg).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}"
+    return ddl
+
+
+def add_missing_columns(conn, metadata):
+    """
+    Add model columns missing from existing tables, and their indexes.
+    db.create_all() creates new tables but never alters existing ones.
+    Returns the names of the added columns as "table.column".
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    preparer = conn.dialect.identifier_preparer
+    added = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in present]
+        for column in missing:
+            conn.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {_column_ddl(column, conn.dialect)}"
+            ))
+            added.append(f"{table.name}.{column.name}")
+        if missing:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    return added
+
+
+def _legacy_snapshots(rows):
+    """
+    Metadata of each job as one snapshot: {job_id: content_hash} and
+    {content_hash: {eip: values}}, so jobs stored with identical metadata
+    share one snapshot, as jobs enriched from the same EIPsInsight data do.
+    """
+    contents = {}
+    for job_id, eip, *values in rows:
+        # A job holds one row per EIP; should it hold more, the first one's metadata is kept
+        contents.setdefault(job_id, {}).setdefault(eip, tuple(values))
+
+    job_hashes, snapshots = {}, {}
+    for job_id, entries in contents.items():
+        payload = "\n".join(repr((eip, *values)) for eip, values in sorted(entries.items()))
+        content_hash = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        job_hashes[job_id] = content_hash
+        snapshots.setdefault(content_hash, entries)
+    return job_hashes, snapshots
+
+
+def backfill_eip_metadata(conn, metadata):
+    """
+    Move title/author/status/category still stored on eip_sentiment rows into
+    shared snapshots: one per distinct set of job metadata, linked to its jobs
+    and, with one set-based UPDATE, to their rows. The legacy values are
+    cleared once copied, so this runs only once per row. Returns the number
+    of rows linked.
+    """
+    columns = {column["name"] for column in inspect(conn).get_columns("eip_sentiment")}
+    if not set(LEGACY_METADATA_COLUMNS) <= columns:
+        return 0
+
+    legacy = ", ".join(LEGACY_METADATA_COLUMNS)
+    present = " OR ".join(f"{name} IS NOT NULL" for name in LEGACY_METADATA_COLUMNS)
+    rows = conn.execute(text(
+        f"SELECT DISTINCT job_id, eip, {legacy} FROM eip_sentiment "
+        f"WHERE metadata_id IS NULL AND ({present}) ORDER BY job_id, eip"
+    )).all()
+    if not rows:
+        return 0
+    job_hashes, snapshots = _legacy_snapshots(rows)
+
+    snapshot_table = metadata.tables["eip_metadata_snapshot"]
+    metadata_table = metadata.tables["eip_metadata"]
+    snapshot_ids = {}
+    for content_hash, entries in snapshots.items():
+        snapshot_id = conn.execute(
+            select(snapshot_table.c.id).where(snapshot_table.c.content_hash == content_hash)
+        ).scalar()
+        if snapshot_id is None:
+            snapshot_id = conn.execute(snapshot_table.insert().values(
+                content_hash=content_hash, source=LEGACY_SNAPSHOT_SOURCE, eip_count=len(entries),
+                created_at=datetime.utcnow()
+            )).inserted_primary_key[0]
+            conn.execute(metadata_table.insert(), [
+                dict(snapshot_id=snapshot_id, eip=eip, **dict(zip(LEGACY_METADATA_COLUMNS, values)))
+                for eip, values in entries.items()
+            ])
+        snapshot_ids[content_hash] = snapshot_id
+
+    # Rows are linked all at once, through their job's snapshot
+    conn.execute(text(
+        "CREATE TEMPORARY TABLE legacy_job_snapshot (job_id VARCHAR(36) PRIMARY KEY, snapshot_id INTEGER NOT NULL)"
+    ))
+    conn.execute(text("INSERT INTO legacy_job_snapshot (job_id, snapshot_id) VALUES (:job_id, :snapshot_id)"), [
+        {"job_id": job_id, "snapshot_id": snapshot_ids[content_hash]}
+        for job_id, content_hash in job_hashes.items()
+    ])
+    cleared = ", ".join(f"{name} = NULL" for name in LEGACY_METADATA_COLUMNS)
+    linked = conn.execute(text(
+        f"UPDATE eip_sentiment SET {cleared}, metadata_id = ("
+        f"SELECT m.id FROM eip_metadata m JOIN legacy_job_snapshot l ON m.snapshot_id = l.snapshot_id "
+        f"WHERE l.job_id = eip_sentiment.job_id AND m.eip = eip_sentiment.eip) "
+        f"WHERE metadata_id IS NULL AND ({present})"
+    )).rowcount
+    conn.execute(text(
+        "UPDATE analysis_job SET metadata_snapshot_id = ("
+        "SELECT snapshot_id FROM legacy_job_snapshot l WHERE l.job_id = analysis_job.id) "
+        "WHERE metadata_snapshot_id IS NULL AND id IN (SELECT job_id FROM legacy_job_snapshot)"
+    ))
+    conn.execute(text("DROP TABLE legacy_job_snapshot"))
+    return linked
+
+
+def upgrade_schema(engine, metadata):
+    """
+    Bring a database created by an older version up to the current models.
+    Safe to call on every start: each step only touches what is still missing.
+    """
+    with engine.begin() as conn:
+        added = add_missing_columns(conn, metadata)
+        if added:
+            logging.info(f"🛠️ Added columns to existing tables: {', '.join(added)}")
+        linked = backfill_eip_metadata(conn, metadata)
+        if linked:
+            logging.info(f"🛠️ Linked {linked} EIP sentiment rows to their metadata snapshots")
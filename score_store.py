@@ -0,0 +1,168 @@
+import os
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+# File layout:
+#   MAGIC | uint64 header length | JSON header | one chunk per EIP
+# Each chunk stores its rows sorted by compound score, column by column:
+#   row (int64) | compound, pos, neg, neu (float32) | text offsets (uint32, rows + 1) | UTF-8 text
+# The header maps every EIP to its chunk offset so a lookup reads only that chunk.
+MAGIC = b"EIPSCR01"
+SCORE_STORE_FILENAME = "comment_scores.bin"
+SCORE_COLUMNS = ["compound", "pos", "neg", "neu"]
+TEXT_PREVIEW_CHARS = 500
+
+_HEADER_LEN = struct.Struct("<Q")
+
+
+def _eip_sort_key(eip):
+    return (0, int(eip)) if str(eip).isdigit() else (1, str(eip))
+
+
+def _encode_chunk(group):
+    group = group.sort_values("compound", kind="stable")
+    texts = [str(t)[:TEXT_PREVIEW_CHARS].encode("utf-8") for t in group["text"].fillna("")]
+    offsets = np.zeros(len(texts) + 1, dtype="<u4")
+    np.cumsum([len(t) for t in texts], out=offsets[1:])
+
+    parts = [group["row"].to_numpy(dtype="<i8").tobytes()]
+    parts += [group[col].to_numpy(dtype="<f4").tobytes() for col in SCORE_COLUMNS]
+    parts += [offsets.tobytes(), b"".join(texts)]
+    return b"".join(parts)
+
+
+def _write_store(path, groups, chunks):
+    header = json.dumps({
+        "version": 1,
+        "columns": ["row"] + SCORE_COLUMNS + ["text"],
+        "row_count": int(sum(g["rows"] for g in groups)),
+        "groups": groups,
+    }).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LEN.pack(len(header)))
+        f.write(header)
+        for payload in chunks:
+            f.write(payload)
+    return path
+
+
+def _add_chunk(groups, chunks, eip, payload, rows):
+    offset = groups[-1]["offset"] + groups[-1]["length"] if groups else 0
+    groups.append({"eip": str(eip), "offset": offset, "length": len(payload), "rows": int(rows)})
+    chunks.append(payload)
+
+
+def write_score_store(path, comments):
+    """
+    Write per-comment scores to a compact columnar file chunked by EIP.
+
+    `comments` needs eip, row, text and the VADER score columns; a comment
+    attributed to several EIPs appears once in each of their chunks.
+    """
+    groups, chunks = [], []
+    for eip, group in sorted(comments.groupby("eip", sort=False), key=lambda item: _eip_sort_key(item[0])):
+        _add_chunk(groups, chunks, eip, _encode_chunk(group), len(group))
+    return _write_store(path, groups, chunks)
+
+
+def append_to_score_store(path, comments):
+    """
+    Add `comments` (as write_score_store takes them) to an existing store.
+
+    Only the chunks of EIPs with new comments are decoded and re-encoded; the
+    others are copied byte for byte. New rows are numbered after the store's
+    last row so they stay unique. The file is swapped in whole.
+    """
+    reader = ScoreStoreReader(path)
+    comments = comments.assign(eip=comments["eip"].astype(str), row=comments["row"] + reader.max_row() + 1)
+    additions = dict(tuple(comments.groupby("eip", sort=False)))
+
+    groups, chunks = [], []
+    with open(path, "rb") as f:
+        for eip in sorted(set(reader.groups) | set(additions), key=_eip_sort_key):
+            if eip in additions:
+                group = additions[eip]
+                if eip in reader:
+                    group = pd.concat([reader.read_eip(eip), group], ignore_index=True)
+                _add_chunk(groups, chunks, eip, _encode_chunk(group), len(group))
+            else:
+                stored = reader.groups[eip]
+                f.seek(reader.data_start + stored["offset"])
+                _add_chunk(groups, chunks, eip, f.read(stored["length"]), stored["rows"])
+
+    tmp_path = f"{path}.tmp"
+    _write_store(tmp_path, groups, chunks)
+    os.replace(tmp_path, path)
+    return path
+
+
+class ScoreStoreReader:
+    """Random access to one EIP's comment scores without reading the whole file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a comment score store")
+            (header_len,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+            self.header = json.loads(f.read(header_len).decode("utf-8"))
+        self.data_start = len(MAGIC) + _HEADER_LEN.size + header_len
+        self.groups = {g["eip"]: g for g in self.header["groups"]}
+
+    def __contains__(self, eip):
+        return str(eip) in self.groups
+
+    def read_eip(self, eip):
+        """Return an EIP's comments sorted from most negative to most positive"""
+        group = self.groups.get(str(eip))
+        if group is None:
+            return pd.DataFrame(columns=["row"] + SCORE_COLUMNS + ["text"])
+
+        with open(self.path, "rb") as f:
+            f.seek(self.data_start + group["offset"])
+            payload = f.read(group["length"])
+
+        n = group["rows"]
+        pos = 0
+        columns = {}
+        columns["row"] = np.frombuffer(payload, dtype="<i8", count=n, offset=pos)
+        pos += 8 * n
+        for col in SCORE_COLUMNS:
+            columns[col] = np.frombuffer(payload, dtype="<f4", count=n, offset=pos).astype(float)
+            pos += 4 * n
+        offsets = np.frombuffer(payload, dtype="<u4", count=n + 1, offset=pos)
+        pos += 4 * (n + 1)
+        blob = payload[pos:]
+        columns["text"] = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(n)]
+        return pd.DataFrame(columns)
+
+    def max_row(self):
+        """Highest comment row in the store, or -1 when it is empty; only the row columns are read"""
+        highest = -1
+        with open(self.path, "rb") as f:
+            for group in self.groups.values():
+                if not group["rows"]:
+                    continue
+                f.seek(self.data_start + group["offset"])
+                rows = np.frombuffer(f.read(8 * group["rows"]), dtype="<i8")
+                highest = max(highest, int(rows.max()))
+        return highest
+
+    def read_all(self):
+        """Every EIP's comments with an `eip` column, as write_score_store takes them"""
+        frames = [self.read_eip(eip).assign(eip=eip) for eip in self.groups]
+        if not frames:
+            return pd.DataFrame(columns=["eip", "row"] + SCORE_COLUMNS + ["text"])
+        return pd.concat(frames, ignore_index=True)[["eip", "row"] + SCORE_COLUMNS + ["text"]]
+
+    def extremes(self, eip, limit=5):
+        """Return an EIP's most negative and most positive comments"""
+        comments = self.read_eip(eip)
+        return {
+            "most_negative": comments.head(limit).to_dict("records"),
+            "most_positive": comments.iloc[::-1].head(limit).to_dict("records"),
+        }
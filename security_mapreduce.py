@@ -0,0 +1,215 @@
+"""
+Map-reduce support for security analysis of large Solidity files.
+
+The source is minified (comments dropped, whitespace collapsed), then split
+at contract and function boundaries into chunks small enough for one
+completion each. Every chunk repeats the pragma and its contract's header,
+state variables, events and modifiers, so the model sees the context a
+function depends on. The per-chunk findings are merged into one report.
+"""
+
+import re
+import json
+from collections import namedtuple
+
+# Characters of minified Solidity per chunk (about 3,000 tokens)
+MAX_CHUNK_CHARS = 12000
+
+SEVERITIES = ("critical", "high", "medium", "low", "gas", "info")
+
+ContractChunk = namedtuple("ContractChunk", ["name", "code"])
+
+_MINIFY = re.compile(
+    r"(?P<string>\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*')"
+    r"|(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)"
+    r"|(?P<space>[ \t\r\f\v]+)"
+)
+_UNIT = re.compile(r"^(?:abstract\s+contract|contract|interface|library)\s+(\w+)")
+_PRAGMA = re.compile(r"^pragma\b[^;]*;", re.MULTILINE)
+_CALLABLE = re.compile(r"^(?:function\b|constructor\b|receive\b|fallback\b)")
+_TITLE_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def minify_solidity(source):
+    """Source without comments, indentation or blank lines; string literals are kept as written"""
+    def replace(match):
+        if match.group("string"):
+            return match.group("string")
+        return " "
+    lines = (line.strip() for line in _MINIFY.sub(replace, source or "").split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def _items(code):
+    """
+    Top-level items of `code`: each ends at a `;` or at the `}` closing a
+    block opened at depth 0. Unbalanced trailing text is returned as one item.
+    """
+    items = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(code):
+        char = code[i]
+        if char in "\"'":
+            end = code.find(char, i + 1)
+            while end != -1 and code[end - 1] == "\\":
+                end = code.find(char, end + 1)
+            i = len(code) if end == -1 else end + 1
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                items.append(code[start:i + 1].strip())
+                start = i + 1
+            depth = max(depth, 0)
+        elif char == ";" and depth == 0:
+            items.append(code[start:i + 1].strip())
+            start = i + 1
+        i += 1
+    rest = code[start:].strip()
+    if rest:
+        items.append(rest)
+    return [item for item in items if item]
+
+
+def _split_unit(name, unit, pragma, max_chars):
+    """A contract as one chunk, or as chunks of its functions each carrying the contract's declarations"""
+    if len(pragma) + len(unit) <= max_chars or "{" not in unit:
+        return [ContractChunk(name, pragma + unit)]
+
+    header, body = unit.split("{", 1)
+    members = _items(body.rsplit("}", 1)[0])
+    callables = [member for member in members if _CALLABLE.match(member)]
+    context = "\n".join(member for member in members if not _CALLABLE.match(member))
+    prefix = f"{pragma}{header.strip()} {{\n{context}\n" if context else f"{pragma}{header.strip()} {{\n"
+
+    groups = []
+    current = []
+    size = len(prefix)
+    for member in callables:
+        if current and size + len(member) + 1 > max_chars:
+            groups.append(current)
+            current, size = [], len(prefix)
+        current.append(member)
+        size += len(member) + 1
+    if current:
+        groups.append(current)
+
+    return [
+        ContractChunk(f"{name} (functions {index}/{len(groups)})" if len(groups) > 1 else name,
+                      prefix + "\n".join(group) + "\n}")
+        for index, group in enumerate(groups, 1)
+    ] or [ContractChunk(name, pragma + unit)]
+
+
+def split_contract(source, max_chars=None):
+    """
+    Minified chunks of a Solidity file. Contracts that fit are packed together
+    whole; larger ones are split between functions. A single function larger
+    than `max_chars` (default MAX_CHUNK_CHARS) is its own chunk.
+    """
+    max_chars = max_chars or MAX_CHUNK_CHARS
+    code = minify_solidity(source)
+    pragma = "".join(match.group(0) + "\n" for match in _PRAGMA.finditer(code))
+
+    units = []
+    file_level = []
+    for item in _items(code):
+        match = _UNIT.match(item)
+        if match:
+            units.append((match.group(1), item))
+        elif not item.startswith("pragma"):
+            file_level.append(item)
+    if file_level:
+        units.insert(0, ("file-level declarations", "\n".join(file_level)))
+    if not units:
+        return [ContractChunk("contract", code)] if code else []
+
+    chunks = []
+    packed_names, packed_code = [], pragma
+    for name, unit in units:
+        if len(pragma) + len(unit) > max_chars:
+            chunks.extend(_split_unit(name, unit, pragma, max_chars))
+            continue
+        if packed_names and len(packed_code) + len(unit) + 1 > max_chars:
+            chunks.append(ContractChunk(", ".join(packed_names), packed_code.rstrip()))
+            packed_names, packed_code = [], pragma
+        packed_names.append(name)
+        packed_code += unit + "\n"
+    if packed_names:
+        chunks.append(ContractChunk(", ".join(packed_names), packed_code.rstrip()))
+    return chunks
+
+
+def parse_findings(content):
+    """Findings of one chunk's JSON response, or ([], text) when the model answered in prose"""
+    try:
+        data = json.loads(content or "")
+    except json.JSONDecodeError:
+        return [], (content or "").strip()
+    findings = data.get("findings") if isinstance(data, dict) else data
+    if not isinstance(findings, list):
+        return [], None
+    return [finding for finding in findings if isinstance(finding, dict) and finding.get("title")], None
+
+
+def _severity(finding):
+    severity = str(finding.get("severity", "info")).lower()
+    return severity if severity in SEVERITIES else "info"
+
+
+def merge_findings(findings):
+    """
+    One entry per issue: findings with the same title (case and punctuation
+    aside) are merged, keeping the highest severity and every location.
+    Sorted by severity, then by how many places the issue appears.
+    """
+    merged = {}
+    for finding in findings:
+        key = " ".join(_TITLE_WORDS.findall(str(finding["title"]).lower()))
+        severity = _severity(finding)
+        location = str(finding.get("location") or "").strip()
+        entry = merged.get(key)
+        if entry is None:
+            merged[key] = entry = {
+                "title": str(finding["title"]).strip(),
+                "severity": severity,
+                "locations": [],
+                "description": str(finding.get("description") or "").strip(),
+                "recommendation": str(finding.get("recommendation") or "").strip(),
+            }
+        elif SEVERITIES.index(severity) < SEVERITIES.index(entry["severity"]):
+            entry["severity"] = severity
+            entry["description"] = str(finding.get("description") or entry["description"]).strip()
+            entry["recommendation"] = str(finding.get("recommendation") or entry["recommendation"]).strip()
+        if location and location not in entry["locations"]:
+            entry["locations"].append(location)
+    return sorted(merged.values(), key=lambda entry: (SEVERITIES.index(entry["severity"]), -len(entry["locations"])))
+
+
+def format_report(findings, chunks, notes=(), failed_parts=()):
+    """Plain-text report of merged findings, grouped by severity"""
+    lines = [f"Security analysis of {len(chunks)} parts: {', '.join(chunk.name for chunk in chunks)}", ""]
+    if not findings and not notes:
+        lines.append("No issues reported.")
+    for severity in SEVERITIES:
+        group = [finding for finding in findings if finding["severity"] == severity]
+        if not group:
+            continue
+        lines.append(f"## {severity.capitalize()} ({len(group)})")
+        for finding in group:
+            where = f" [{', '.join(finding['locations'])}]" if finding["locations"] else ""
+            lines.append(f"- {finding['title']}{where}")
+            if finding["description"]:
+                lines.append(f"  {finding['description']}")
+            if finding["recommendation"]:
+                lines.append(f"  Recommendation: {finding['recommendation']}")
+        lines.append("")
+    for name, text in notes:
+        lines.extend([f"## Notes on {name}", text, ""])
+    for name, error in failed_parts:
+        lines.append(f"Not analyzed: {name} ({error})")
+    return "\n".join(lines).strip()
@@ -1,4 +1,6 @@
 import os
+import time
+import zlib
 import pandas as pd
 import re
 import nltk
@@ -7,10 +9,112 @@ import ast
 import json
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import logging
+from score_store import write_score_store, ScoreStoreReader, SCORE_STORE_FILENAME
+from quantile_sketch import CompoundSketch, sketches_by_group
+from sentiment_stats import bootstrap_mean_ci
+from partial_aggregates import PartialAggregates, SCORE_COLUMNS, PARTIAL_AGGREGATES_FILENAME
+from text_normalizer import TextNormalizer, NORMALIZATION_STATS_FILENAME
+
+EIPSINSIGHT_ALL_URL = "https://eipsinsight.com/api/new/all"
+
+METADATA_COLUMNS = ["eip", "status", "title", "author", "category", "type", "created"]
+
+# Stage 1 scores in chunks and reports running aggregates at most this often (seconds)
+SCORING_CHUNK_SIZE = 2000
+PARTIAL_PUBLISH_INTERVAL = 5.0
+
+# Rows read at a time when splitting an upload into shards
+SPLIT_CHUNK_ROWS = 50_000
+
+# Preview mode: comments scored per EIP/ERC stratum and overall
+PREVIEW_PER_STRATUM = 50
+PREVIEW_MIN_PER_STRATUM = 5
+PREVIEW_MAX_ROWS = 5000
+
+PREVIEW_COLUMNS = [
+    "eip", "unified_compound", "unified_pos", "unified_neg", "unified_neu",
+    "total_comment_count", "sampled_comment_count", "compound_ci_low", "compound_ci_high"
+]
+
+
+def fetch_eip_metadata(url=EIPSINSIGHT_ALL_URL, timeout=30):
+    """Fetch the current status, title, author and category of every EIP from EIPsInsight"""
+    resp = requests.get(url, timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json()
+    
+    # Flatten and convert to DataFrame
+    all_entries = []
+    for key in data:
+        all_entries.extend(data[key])
+    logging.info(f"✅ Total proposals found: {len(all_entries)}")
+    
+    status_df = pd.json_normalize(all_entries)
+    status_df.columns = status_df.columns.str.strip().str.lower()
+    
+    # Select essential metadata
+    columns = [col for col in METADATA_COLUMNS if col in status_df.columns]
+    status_df = status_df[columns]
+    status_df["eip"] = status_df["eip"].astype(str).str.strip()
+    return status_df
+
+
+def load_metadata_file(path):
+    """Read an offline EIPsInsight export (e.g. a saved all_eips.csv) in fetch_eip_metadata's shape"""
+    status_df = pd.read_csv(path, dtype=str)
+    status_df.columns = status_df.columns.str.strip().str.lower()
+    columns = [col for col in METADATA_COLUMNS if col in status_df.columns]
+    status_df = status_df[columns]
+    status_df["eip"] = status_df["eip"].astype(str).str.strip()
+    return status_df
+
+
+def shard_index(topics, shard_count):
+    """Stable shard of each topic, so every comment of a discussion lands in the same shard"""
+    return topics.fillna("").astype(str).map(lambda topic: zlib.crc32(topic.encode("utf-8")) % shard_count)
+
+
+def split_input(input_file, shard_dir, shard_count, chunk_rows=SPLIT_CHUNK_ROWS):
+    """
+    Partition a comment export into `shard_count` CSVs by topic hash.
+
+    The input is streamed in chunks, so it is never held in memory whole.
+    Returns (path, row_count) per shard.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    paths = [os.path.join(shard_dir, f"shard_{index:04d}.csv") for index in range(shard_count)]
+    counts = [0] * shard_count
+
+    columns = pd.read_csv(input_file, nrows=0).columns
+    topic_column = next((col for col in columns if col.strip().lower() == "topic"), None)
+    if topic_column is None:
+        raise ValueError("CSV has no topic column to shard by")
+    for path in paths:
+        pd.DataFrame(columns=columns).to_csv(path, index=False)
+
+    for chunk in pd.read_csv(input_file, chunksize=chunk_rows, dtype=str, keep_default_na=False):
+        indexes = shard_index(chunk[topic_column], shard_count)
+        for index, path in enumerate(paths):
+            part = chunk[indexes == index]
+            if len(part):
+                part.to_csv(path, mode="a", header=False, index=False)
+                counts[index] += len(part)
+    return list(zip(paths, counts))
+
 
 class SentimentAnalyzer:
-    def __init__(self):
-        """Initialize the sentiment analyzer with NLTK setup"""
+    def __init__(self, chunk_size=SCORING_CHUNK_SIZE, metadata_file=None, normalize_rules=None):
+        """
+        Initialize the sentiment analyzer with NLTK setup
+        
+        `metadata_file` is an offline EIPsInsight export used instead of
+        fetching metadata, for runs without network access.
+        `normalize_rules` selects the text_normalizer rules applied before
+        scoring (None for all of them, "none" to score raw text).
+        """
+        self.chunk_size = chunk_size
+        self.metadata_file = metadata_file
+        self.normalizer = TextNormalizer(normalize_rules)
         try:
             nltk.download("vader_lexicon", quiet=True)
             self.analyzer = SentimentIntensityAnalyzer()
@@ -19,29 +123,30 @@ class SentimentAnalyzer:
             logging.error(f"❌ Failed to initialize VADER: {e}")
             raise
 
-    def run_stage1(self, input_file, output_dir):
-        """Stage 1: VADER sentiment analysis and EIP/ERC extraction"""
-        logging.info("🚀 Starting Stage 1: VADER sentiment analysis...")
+    def run_stage1(self, input_file, output_dir, progress_callback=None):
+        """
+        Stage 1: VADER sentiment analysis and EIP/ERC extraction
         
-        # Load CSV data
-        df = pd.read_csv(input_file)
-        df.columns = df.columns.str.strip().str.lower()
+        `progress_callback(partial_aggregates, processed_fraction)` is called
+        with running per-EIP aggregates while comments are being scored.
+        """
+        logging.info("🚀 Starting Stage 1: VADER sentiment analysis...")
         
-        # Combine text columns
-        df["text"] = df[["paragraphs", "headings", "unordered_lists"]].fillna("").agg(" ".join, axis=1)
+        df = self._load_comments(input_file)
         
         # Apply VADER sentiment analysis
         logging.info("🧠 Running VADER sentiment analysis...")
-        scores = df["text"].apply(lambda x: self.analyzer.polarity_scores(x)).apply(pd.Series)
-        df = pd.concat([df, scores], axis=1)
+        df = self._score_comments(df, progress_callback)
+        self._write_normalization_stats(output_dir)
         
-        # Extract EIP and ERC numbers
-        logging.info("🔍 Extracting EIP and ERC identifiers...")
-        df["eip_num"] = df["topic"].str.extract(r"eip-?(\d{2,5})", flags=re.IGNORECASE)
-        df["erc_num"] = df["topic"].str.extract(r"erc-?(\d{2,5})", flags=re.IGNORECASE)
+        # Persist per-comment scores so individual EIPs can be drilled into later
+        logging.info("💾 Writing per-comment score store...")
+        comment_scores = self._comment_scores_by_eip(df)
+        score_store_file = os.path.join(output_dir, SCORE_STORE_FILENAME)
+        write_score_store(score_store_file, comment_scores)
         
-        df["eip"] = df["eip_num"].dropna().astype(int).astype(str)
-        df["erc"] = df["erc_num"].dropna().astype(int).astype(str)
+        # Per-EIP sums and counts let later appends update the unified scores exactly
+        PartialAggregates().add(comment_scores).to_csv(os.path.join(output_dir, PARTIAL_AGGREGATES_FILENAME))
         
         # Group and average sentiment for EIPs
         logging.info("📊 Aggregating sentiment for EIPs...")
@@ -65,6 +170,23 @@ class SentimentAnalyzer:
         }).reset_index()
         grouped_erc.columns = ["erc", "avg_compound", "avg_pos", "avg_neg", "avg_neu", "comment_count"]
         
+        # Distribution sketches over the same EIP and ERC comments as the unified mean
+        logging.info("📐 Building compound score sketches...")
+        sketch_summaries = self._sketch_summaries(comment_scores)
+        
+        # Bootstrap confidence intervals so sparsely discussed EIPs are not read as precise
+        logging.info("🎲 Bootstrapping confidence intervals for unified compound...")
+        confidence_intervals = self._compound_confidence_intervals(comment_scores)
+        
+        return self.finish_stage1(grouped_eip, grouped_erc, [sketch_summaries, confidence_intervals], output_dir)
+
+    def finish_stage1(self, grouped_eip, grouped_erc, distributions, output_dir):
+        """
+        Unify per-EIP and per-ERC averages, enrich them with metadata and write the Stage 1 files.
+        
+        `distributions` are extra per-EIP frames (sketch summaries, confidence
+        intervals) joined onto the unified scores.
+        """
         # Merge EIP and ERC sentiment
         logging.info("🔗 Merging EIP and ERC sentiment...")
         erc_df = grouped_erc.rename(columns={
@@ -104,28 +226,17 @@ class SentimentAnalyzer:
         
         merged["total_comment_count"] = merged["comment_count"] + merged["erc_comment_count"]
         
+        for distribution in distributions:
+            merged = merged.merge(distribution, on="eip", how="left")
+        
         # Fetch EIP metadata from API
         logging.info("🌐 Fetching EIP metadata from EIPsInsight API...")
         try:
-            url = "https://eipsinsight.com/api/new/all"
-            resp = requests.get(url, timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            # Flatten and convert to DataFrame
-            all_entries = []
-            for key in data:
-                all_entries.extend(data[key])
-            logging.info(f"✅ Total proposals found: {len(all_entries)}")
-            
-            status_df = pd.json_normalize(all_entries)
-            status_df.columns = status_df.columns.str.strip().str.lower()
-            
-            # Select essential metadata
-            columns = ["eip", "status", "title", "author", "category", "type", "created"]
-            columns = [col for col in columns if col in status_df.columns]
-            status_df = status_df[columns]
-            status_df["eip"] = status_df["eip"].astype(str).str.strip()
+            if self.metadata_file:
+                logging.info(f"📁 Using offline metadata from {self.metadata_file}")
+                status_df = load_metadata_file(self.metadata_file)
+            else:
+                status_df = fetch_eip_metadata()
             
             # Save status data
             status_file = os.path.join(output_dir, "eip_status_data.csv")
@@ -134,7 +245,7 @@ class SentimentAnalyzer:
         except Exception as e:
             logging.error(f"❌ API request failed: {e}")
             # Create empty status dataframe if API fails
-            status_df = pd.DataFrame(columns=["eip", "status", "title", "author", "category", "type", "created"])
+            status_df = pd.DataFrame(columns=METADATA_COLUMNS)
         
         # Merge with metadata
         logging.info("🔗 Merging sentiment with EIP metadata...")
@@ -145,7 +256,9 @@ class SentimentAnalyzer:
         # Final output filter
         columns_to_keep = [
             "eip", "unified_compound", "unified_pos", "unified_neg", 
-            "unified_neu", "total_comment_count", "category"
+            "unified_neu", "total_comment_count", "category",
+            "compound_p10", "compound_p50", "compound_p90", "polarization", "compound_sketch",
+            "compound_ci_low", "compound_ci_high"
         ]
         final_df = final_merged[[col for col in columns_to_keep if col in final_merged.columns]]
         
@@ -159,6 +272,232 @@ class SentimentAnalyzer:
         logging.info("💾 Stage 1 completed successfully")
         return [enriched_file, summary_file]
 
+    def run_shard(self, input_file, output_prefix, progress_callback=None):
+        """
+        Stage 1 scoring for one shard of a split job.
+        
+        Per-key sums and compound sketches rebuild grouped_eip/grouped_erc;
+        the shard's own score store carries the per-comment scores for the
+        job's score store and confidence intervals.
+        Returns the paths of the EIP sums, ERC sums, sketch and score files.
+        """
+        logging.info(f"🧩 Scoring shard {os.path.basename(output_prefix)}...")
+        df = self._score_comments(self._load_comments(input_file), progress_callback)
+        
+        eip_scores = df.dropna(subset=["eip"])[["eip"] + SCORE_COLUMNS]
+        erc_scores = df.dropna(subset=["erc"])[["erc"] + SCORE_COLUMNS].rename(columns={"erc": "eip"})
+        comment_scores = self._comment_scores_by_eip(df)
+        sketches = self._sketch_summaries(comment_scores)[["eip", "compound_sketch"]]
+        
+        outputs = {
+            "eip_aggregates": f"{output_prefix}.eip.csv",
+            "erc_aggregates": f"{output_prefix}.erc.csv",
+            "sketches": f"{output_prefix}.sketches.csv",
+            "scores": f"{output_prefix}.scores.bin",
+        }
+        # A shard can be retried while a presumed-dead worker is still writing, so files are swapped in whole
+        for key, write in [
+            ("eip_aggregates", PartialAggregates().add(eip_scores).to_csv),
+            ("erc_aggregates", PartialAggregates().add(erc_scores).to_csv),
+            ("sketches", lambda path: sketches.to_csv(path, index=False)),
+            ("scores", lambda path: write_score_store(path, comment_scores)),
+        ]:
+            tmp_path = f"{outputs[key]}.{os.getpid()}.tmp"
+            write(tmp_path)
+            os.replace(tmp_path, outputs[key])
+        
+        logging.info(f"✅ Shard scored: {len(df)} comments")
+        return outputs
+
+    def run_stage1_from_shards(self, shard_outputs, output_dir):
+        """
+        Stage 1 for a split job: merge the shards' sums and sketches and finish as run_stage1 does.
+        
+        Means are rebuilt from summed scores and counts, so they match a
+        single-node run. The shards' per-comment scores are combined into the
+        job's score store and bootstrapped for the confidence intervals; comment
+        rows are numbered within their shard, so each shard's rows are offset
+        past the previous shard's to keep them unique.
+        """
+        logging.info(f"🔗 Merging {len(shard_outputs)} shards...")
+        eip_aggregates, erc_aggregates = PartialAggregates(), PartialAggregates()
+        sketches = {}
+        comment_frames = []
+        row_offset = 0
+        for outputs in shard_outputs:
+            if outputs.get("scores"):
+                frame = ScoreStoreReader(outputs["scores"]).read_all()
+                frame["row"] = frame["row"] + row_offset
+                row_offset = int(frame["row"].max()) + 1 if len(frame) else row_offset
+                comment_frames.append(frame)
+            eip_aggregates.merge(PartialAggregates.from_csv(outputs["eip_aggregates"]))
+            erc_aggregates.merge(PartialAggregates.from_csv(outputs["erc_aggregates"]))
+            shard_sketches = pd.read_csv(outputs["sketches"], dtype=str)
+            for eip, encoded in zip(shard_sketches["eip"], shard_sketches["compound_sketch"]):
+                sketch = CompoundSketch.from_string(encoded)
+                sketches[eip] = sketches[eip] + sketch if eip in sketches else sketch
+        
+        # Sums over the union of EIP- and ERC-keyed comments, as run_stage1 saves them
+        PartialAggregates().merge(eip_aggregates).merge(erc_aggregates).to_csv(
+            os.path.join(output_dir, PARTIAL_AGGREGATES_FILENAME)
+        )
+        
+        grouped_eip = eip_aggregates.averages()
+        grouped_erc = erc_aggregates.averages().rename(columns={"eip": "erc"})
+        sketch_summaries = pd.DataFrame(
+            [{"eip": eip, **sketch.summary(), "compound_sketch": sketch.to_string()} for eip, sketch in sketches.items()],
+            columns=["eip", "compound_p10", "compound_p50", "compound_p90", "polarization", "compound_sketch"]
+        )
+        distributions = [sketch_summaries]
+        if len(comment_frames) == len(shard_outputs):
+            logging.info("💾 Writing per-comment score store...")
+            comment_scores = pd.concat(comment_frames, ignore_index=True)
+            write_score_store(os.path.join(output_dir, SCORE_STORE_FILENAME), comment_scores)
+            logging.info("🎲 Bootstrapping confidence intervals for unified compound...")
+            distributions.append(self._compound_confidence_intervals(comment_scores))
+        else:
+            # Shards scored before they kept per-comment scores
+            logging.warning("⚠️ Some shards have no per-comment scores; no score store or confidence intervals")
+        return self.finish_stage1(grouped_eip, grouped_erc, distributions, output_dir)
+
+    @staticmethod
+    def _load_comments(input_file):
+        """Load the comment export with combined text and extracted EIP/ERC numbers"""
+        df = pd.read_csv(input_file)
+        df.columns = df.columns.str.strip().str.lower()
+        
+        # Combine text columns
+        text_columns = df[["paragraphs", "headings", "unordered_lists"]].fillna("").astype(str)
+        df["text"] = text_columns["paragraphs"] + " " + text_columns["headings"] + " " + text_columns["unordered_lists"]
+        
+        # Extract EIP and ERC numbers
+        logging.info("🔍 Extracting EIP and ERC identifiers...")
+        df["eip_num"] = df["topic"].str.extract(r"eip-?(\d{2,5})", flags=re.IGNORECASE)
+        df["erc_num"] = df["topic"].str.extract(r"erc-?(\d{2,5})", flags=re.IGNORECASE)
+        
+        df["eip"] = df["eip_num"].dropna().astype(int).astype(str)
+        df["erc"] = df["erc_num"].dropna().astype(int).astype(str)
+        return df
+
+    def _score_comments(self, df, progress_callback=None, chunk_size=None,
+                        publish_interval=PARTIAL_PUBLISH_INTERVAL):
+        """Score comments chunk by chunk, reporting running aggregates at throttled intervals"""
+        chunk_size = chunk_size or self.chunk_size
+        self.normalizer.reset_stats()
+        if df.empty:
+            return pd.concat([df, pd.DataFrame(columns=["neg", "neu", "pos", "compound"])], axis=1)
+        
+        partial = PartialAggregates()
+        scored = []
+        last_publish = time.monotonic()
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            # Only the scored copy is normalized; the stored text stays as posted for drill-down
+            texts = self.normalizer.normalize_series(chunk["text"])
+            scores = texts.apply(lambda x: self.analyzer.polarity_scores(x)).apply(pd.Series)
+            chunk = pd.concat([chunk, scores], axis=1)
+            scored.append(chunk)
+            
+            if progress_callback is None:
+                continue
+            partial.add(self._comments_by_eip(chunk, SCORE_COLUMNS))
+            processed = start + len(chunk)
+            # The final aggregates follow right after the last chunk, so it is never published
+            if processed < len(df) and time.monotonic() - last_publish >= publish_interval:
+                try:
+                    progress_callback(partial, processed / len(df))
+                except Exception as e:
+                    logging.warning(f"⚠️ Could not publish partial results: {e}")
+                last_publish = time.monotonic()
+        
+        if self.normalizer.enabled:
+            stats = self.normalizer.stats
+            logging.info(f"✂️ Text normalization removed {stats.bytes_removed} of {stats.bytes_in} bytes before scoring")
+        return pd.concat(scored)
+
+    def _write_normalization_stats(self, output_dir):
+        """Save the bytes each normalization rule removed, so the saving is visible per job"""
+        if not self.normalizer.enabled:
+            return
+        with open(os.path.join(output_dir, NORMALIZATION_STATS_FILENAME), "w") as f:
+            json.dump({"rules": self.normalizer.rules, **self.normalizer.stats.to_dict()}, f, indent=2)
+
+    @staticmethod
+    def _comments_by_eip(df, columns):
+        """One row per (comment, EIP/ERC number), keeping the original row index in `row`"""
+        frames = []
+        for key in ["eip", "erc"]:
+            part = df.dropna(subset=[key])[[key] + columns]
+            part = part.rename(columns={key: "eip"})
+            part["row"] = part.index
+            frames.append(part)
+        return pd.concat(frames, ignore_index=True)
+
+    @classmethod
+    def _comment_scores_by_eip(cls, df):
+        """One row per (comment, EIP/ERC number) with the comment's VADER scores"""
+        return cls._comments_by_eip(df, ["compound", "pos", "neg", "neu", "text"])
+
+    def run_preview(self, input_file, per_stratum=PREVIEW_PER_STRATUM, max_rows=PREVIEW_MAX_ROWS, seed=0):
+        """
+        Score a stratified sample of comments for fast approximate results.
+        
+        Every EIP/ERC topic is a stratum, so rarely discussed EIPs are sampled
+        as well as busy ones. Comment counts are exact; means come from the
+        sample with a bootstrap confidence interval as the error bound (collapsed
+        to the mean when a stratum was scored completely).
+        """
+        logging.info("⚡ Scoring stratified preview sample...")
+        df = self._load_comments(input_file)
+        keys = self._comments_by_eip(df, [])
+        totals = keys.groupby("eip").size()
+        if totals.empty:
+            return pd.DataFrame(columns=PREVIEW_COLUMNS)
+        
+        # Spread the row budget over strata, but never below a handful per EIP
+        per_stratum = max(PREVIEW_MIN_PER_STRATUM, min(per_stratum, max_rows // len(totals)))
+        shuffled = keys.sample(frac=1, random_state=seed)
+        sample = shuffled.groupby("eip", sort=False).head(per_stratum)
+        
+        rows = sample["row"].unique()
+        texts = self.normalizer.normalize_series(df.loc[rows, "text"])
+        scores = texts.apply(lambda x: self.analyzer.polarity_scores(x)).apply(pd.Series)
+        sample = sample.join(scores, on="row")
+        
+        preview = sample.groupby("eip").agg(
+            unified_compound=("compound", "mean"),
+            unified_pos=("pos", "mean"),
+            unified_neg=("neg", "mean"),
+            unified_neu=("neu", "mean"),
+            sampled_comment_count=("compound", "size"),
+        )
+        preview["total_comment_count"] = totals
+        ci = bootstrap_mean_ci(sample["eip"].to_numpy(), sample["compound"].to_numpy())
+        preview["compound_ci_low"] = ci["ci_low"]
+        preview["compound_ci_high"] = ci["ci_high"]
+        exact = preview["sampled_comment_count"] == preview["total_comment_count"]
+        preview.loc[exact, "compound_ci_low"] = preview.loc[exact, "unified_compound"]
+        preview.loc[exact, "compound_ci_high"] = preview.loc[exact, "unified_compound"]
+        
+        logging.info(f"✅ Preview scored {len(rows)} of {len(df)} comments across {len(preview)} EIPs")
+        return preview.reset_index()[PREVIEW_COLUMNS]
+
+    @staticmethod
+    def _sketch_summaries(comment_scores):
+        """Per-EIP serialized compound sketch with its p10/p50/p90 and polarization"""
+        sketches = sketches_by_group(comment_scores["eip"].to_numpy(), comment_scores["compound"].to_numpy())
+        return pd.DataFrame(
+            [{"eip": eip, **sketch.summary(), "compound_sketch": sketch.to_string()} for eip, sketch in sketches.items()],
+            columns=["eip", "compound_p10", "compound_p50", "compound_p90", "polarization", "compound_sketch"]
+        )
+
+    @staticmethod
+    def _compound_confidence_intervals(comment_scores):
+        """Per-EIP 95% bootstrap interval of the mean compound score"""
+        ci = bootstrap_mean_ci(comment_scores["eip"].to_numpy(), comment_scores["compound"].to_numpy())
+        ci = ci.rename(columns={"ci_low": "compound_ci_low", "ci_high": "compound_ci_high"})
+        return ci.rename_axis("eip").reset_index()
+
     def run_stage2(self, output_dir):
         """Stage 2: Fetch and process EIPs Insight data"""
         logging.info("📡 Starting Stage 2: Fetching EIPs Insight data...")
@@ -166,6 +505,13 @@ class SentimentAnalyzer:
         eipsinsight_dir = os.path.join(output_dir, "eipsinsight_data")
         os.makedirs(eipsinsight_dir, exist_ok=True)
         
+        # Offline runs only have the metadata export; Stage 3 merges whatever Stage 2 left
+        if self.metadata_file:
+            logging.info(f"📁 Offline run: using {self.metadata_file} instead of EIPs Insight")
+            pd.read_csv(self.metadata_file).to_csv(os.path.join(eipsinsight_dir, "all_eips.csv"), index=False)
+            logging.info("💾 Stage 2 completed successfully")
+            return eipsinsight_dir
+        
         endpoints = {
             "all_eips": "https://eipsinsight.com/api/new/all",
             "graphsv4": "https://eipsinsight.com/api/new/graphsv4",
@@ -382,7 +728,8 @@ class SentimentAnalyzer:
             
             # Add other generated files
             for filename in ['enriched_sentiment_with_status.csv', 'unified_sentiment_summary.csv', 
-                           'graphsv4_transitions.csv', 'proposed_status_changes_from_prs.csv']:
+                           'graphsv4_transitions.csv', 'proposed_status_changes_from_prs.csv',
+                           SCORE_STORE_FILENAME, PARTIAL_AGGREGATES_FILENAME, NORMALIZATION_STATS_FILENAME]:
                 filepath = os.path.join(output_dir, filename)
                 if os.path.exists(filepath):
                     output_files.append(filepath)
@@ -394,7 +741,8 @@ class SentimentAnalyzer:
             logging.error(f"❌ Stage 3 failed: {e}")
             # Return at least the basic files that should exist
             basic_files = []
-            for filename in ['unified_sentiment_summary.csv', 'enriched_sentiment_with_status.csv']:
+            for filename in ['unified_sentiment_summary.csv', 'enriched_sentiment_with_status.csv',
+                             SCORE_STORE_FILENAME, PARTIAL_AGGREGATES_FILENAME, NORMALIZATION_STATS_FILENAME]:
                 filepath = os.path.join(output_dir, filename)
                 if os.path.exists(filepath):
                     basic_files.append(filepath)
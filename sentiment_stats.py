@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+BOOTSTRAP_RESAMPLES = 1000
+CONFIDENCE = 0.95
+
+# Upper bound on resampled values held in memory at once (replicates x comments)
+BATCH_CELLS = 4_000_000
+
+
+def bootstrap_mean_ci(keys, values, n_resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE, seed=0):
+    """
+    Percentile bootstrap confidence interval of the mean for every group at once.
+
+    All groups are resampled together: values are sorted by group so each one
+    is a contiguous slice, every replicate draws one index per comment inside
+    its own slice, and np.add.reduceat sums the slices. Replicates are drawn in
+    batches so memory stays bounded regardless of the number of comments.
+
+    Returns a DataFrame indexed by group with ci_low and ci_high.
+    """
+    keys = np.asarray(keys)
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    keys, values = keys[valid], values[valid]
+    if len(values) == 0:
+        return pd.DataFrame(columns=["ci_low", "ci_high"], dtype=float)
+
+    groups, codes = np.unique(keys, return_inverse=True)
+    order = np.argsort(codes, kind="stable")
+    values = values[order]
+    sizes = np.bincount(codes, minlength=len(groups))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    # Per-comment slice bounds of the group it belongs to
+    comment_starts = np.repeat(starts, sizes).astype(np.int32)
+    comment_sizes = np.repeat(sizes, sizes).astype(np.float32)
+    comment_last = np.repeat(sizes - 1, sizes).astype(np.int32)
+    values = values.astype(np.float32)
+
+    rng = np.random.default_rng(seed)
+    batch = max(1, min(n_resamples, BATCH_CELLS // len(values)))
+    means = np.empty((n_resamples, len(groups)), dtype=np.float32)
+    for first in range(0, n_resamples, batch):
+        count = min(batch, n_resamples - first)
+        offsets = (rng.random((count, len(values)), dtype=np.float32) * comment_sizes).astype(np.int32)
+        # float32 rounding can land exactly on the slice end
+        draws = comment_starts + np.minimum(offsets, comment_last)
+        means[first:first + count] = np.add.reduceat(values[draws], starts, axis=1) / sizes
+
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha], axis=0)
+    return pd.DataFrame({"ci_low": low.astype(float), "ci_high": high.astype(float)}, index=groups)
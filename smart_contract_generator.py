@@ -1,42 +1,375 @@
 import os
 import json
+import asyncio
 import logging
+import contextlib
 import time
-from openai import OpenAI
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from openai import OpenAI, AsyncOpenAI
+from llm_cache import shared_cache, request_key
+from llm_scheduler import shared_scheduler, estimate_tokens, rate_limit_delay, INTERACTIVE
+from llm_telemetry import CallRecord
+from security_mapreduce import split_contract, minify_solidity, parse_findings, merge_findings, format_report
+
+# Per-call limits (seconds) for the two completions behind code analysis
+RECOMMENDATION_TIMEOUT = 60.0
+SECURITY_ANALYSIS_TIMEOUT = 45.0
+
+_shared_client = None
+_shared_async_client = None
+_shared_client_lock = threading.Lock()
+
+# Runs the independent completions of one endpoint call side by side
+_llm_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm")
+
+# Security analysis chunks of a large contract; separate from _llm_executor, whose tasks wait on these
+_chunk_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-chunk")
+
+# Completion limit for one chunk of a split security analysis
+SECURITY_CHUNK_MAX_TOKENS = 1500
+
+
+def _remaining(deadline):
+    """Seconds left before `deadline` (a time.monotonic() value), or None when there is no deadline"""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def shared_client():
+    """One OpenAI client per process, so every request reuses its HTTP connection pool"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = OpenAI(
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                timeout=60.0  # 60 second timeout
+            )
+        return _shared_client
+
+
+def shared_async_client():
+    """One AsyncOpenAI client per process, used on the llm_async background loop"""
+    global _shared_async_client
+    with _shared_client_lock:
+        if _shared_async_client is None:
+            _shared_async_client = AsyncOpenAI(
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                timeout=60.0
+            )
+        return _shared_async_client
+
+
+def reset_shared_client():
+    """Drop the process-wide clients so the next generator builds new ones (tests, key rotation)"""
+    global _shared_client, _shared_async_client
+    with _shared_client_lock:
+        _shared_client = None
+        _shared_async_client = None
+
 
 class EIPCodeGenerator:
-    def __init__(self):
-        """Initialize the EIP code generator with OpenAI client"""
-        self.client = OpenAI(
-            api_key=os.environ.get("OPENAI_API_KEY"),
-            timeout=60.0  # 60 second timeout
-        )
+    # Scheduler priority of this generator's calls; batch jobs pass llm_scheduler.BATCH
+    priority = INTERACTIVE
+
+    def __init__(self, priority=INTERACTIVE):
+        """Initialize the EIP code generator with the shared OpenAI client and response cache"""
+        self.client = shared_client()
+        self.cache = shared_cache()
+        self.priority = priority
     
-    def _make_openai_request(self, **kwargs):
-        """Make OpenAI request with retry logic"""
+    def _make_openai_request(self, call=None, deadline=None, **kwargs):
+        """
+        Make OpenAI request with retry logic. Every attempt is admitted by the
+        shared scheduler; a 429 pauses all callers for its Retry-After rather
+        than backing off this one alone. Retries are counted on `call`.
+        
+        With a `deadline` (time.monotonic()) each attempt only gets the time
+        left, and no attempt starts once it has passed.
+        """
+        scheduler = shared_scheduler()
+        cost = estimate_tokens(kwargs)
         max_retries = 3
         for attempt in range(max_retries):
+            scheduler.acquire(cost, self.priority)
+            remaining = _remaining(deadline)
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"LLM request deadline passed after {attempt} attempts")
+            request_options = {"timeout": remaining} if remaining is not None else {}
             try:
-                response = self.client.chat.completions.create(**kwargs)
+                response = self.client.chat.completions.create(**kwargs, **request_options)
                 return response
             except Exception as e:
                 if attempt == max_retries - 1:
                     raise e
                 logging.warning(f"OpenAI request failed (attempt {attempt + 1}): {str(e)}")
-                time.sleep(2 ** attempt)  # Exponential backoff
+                pause = rate_limit_delay(e)
+                backoff = 2 ** attempt if pause is None else pause
+                remaining = _remaining(deadline)
+                if remaining is not None and remaining <= backoff:
+                    raise  # No time left for another attempt
+                if call is not None:
+                    call.retries += 1
+                if pause is not None:
+                    scheduler.pause(pause)
+                else:
+                    time.sleep(backoff)  # Exponential backoff
+
+    def _chat(self, timeout=None, endpoint=None, deadline=None, **kwargs):
+        """
+        Text of a chat completion, served from the response cache when an
+        equivalent request (same model, parameters and normalized prompt) was
+        answered before. Cache failures never fail the request. Identical
+        requests already in flight share that call instead of sending another.
         
-    def generate_eip_implementation(self, eip_data, contract_type, custom_prompt=None):
+        `timeout` (seconds) or `deadline` (time.monotonic()) bounds the whole
+        call, retries included; neither is part of the cache key.
+        `endpoint` names the completion in telemetry.
         """
-        Generate Solidity smart contract code for EIP implementation
+        call = CallRecord(endpoint, kwargs.get("model"))
+        try:
+            key = request_key(**kwargs)
+        except Exception as e:
+            logging.warning(f"LLM request key failed: {str(e)}")
+            key = None
+        if self.cache is not None and key:
+            try:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    logging.info("💾 LLM response served from cache")
+                    call.cache_hit = True
+                    call.finish()
+                    return cached
+            except Exception as e:
+                logging.warning(f"LLM cache lookup failed: {str(e)}")
+
+        if timeout:
+            deadline = min(deadline or float("inf"), time.monotonic() + timeout)
+
+        def fetch():
+            call.coalesced = False
+            response = self._make_openai_request(call, deadline, **kwargs)
+            call.add_usage(getattr(response, "usage", None))
+            content = response.choices[0].message.content
+            if self.cache is not None and key and content:
+                try:
+                    self.cache.set(key, content)
+                except Exception as e:
+                    logging.warning(f"LLM cache write failed: {str(e)}")
+            return content
+
+        # Only the caller that leads the upstream call runs fetch
+        call.coalesced = True
+        try:
+            content = shared_scheduler().coalesce(key, fetch, deadline)
+        except Exception as e:
+            call.finish(e)
+            raise
+        call.finish()
+        return content
         
-        Args:
-            eip_data: Dictionary containing EIP metadata
-            contract_type: Type of contract to generate (e.g., "ERC20", "ERC721", "Governance")
-            custom_prompt: Optional custom prompt for specific requirements
+    @property
+    def async_client(self):
+        """The shared AsyncOpenAI client, only built once an async method is used"""
+        return shared_async_client()
+
+    async def _make_openai_request_async(self, call=None, deadline=None, **kwargs):
+        """_make_openai_request for the event loop: admission and backoff never hold a thread"""
+        scheduler = shared_scheduler()
+        cost = estimate_tokens(kwargs)
+        max_retries = 3
+        for attempt in range(max_retries):
+            await scheduler.acquire_async(cost, self.priority)
+            remaining = _remaining(deadline)
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError(f"LLM request deadline passed after {attempt} attempts")
+            request_options = {"timeout": remaining} if remaining is not None else {}
+            try:
+                return await self.async_client.chat.completions.create(**kwargs, **request_options)
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    raise e
+                logging.warning(f"OpenAI request failed (attempt {attempt + 1}): {str(e)}")
+                pause = rate_limit_delay(e)
+                backoff = 2 ** attempt if pause is None else pause
+                remaining = _remaining(deadline)
+                if remaining is not None and remaining <= backoff:
+                    raise  # No time left for another attempt
+                if call is not None:
+                    call.retries += 1
+                if pause is not None:
+                    scheduler.pause(pause)
+                else:
+                    await asyncio.sleep(backoff)  # Exponential backoff
+
+    async def _achat(self, timeout=None, endpoint=None, deadline=None, **kwargs):
+        """_chat for the event loop; the SQLite cache is read and written off the loop thread"""
+        call = CallRecord(endpoint, kwargs.get("model"))
+        try:
+            key = request_key(**kwargs)
+        except Exception as e:
+            logging.warning(f"LLM request key failed: {str(e)}")
+            key = None
+        if self.cache is not None and key:
+            try:
+                cached = await asyncio.to_thread(self.cache.get, key)
+                if cached is not None:
+                    logging.info("💾 LLM response served from cache")
+                    call.cache_hit = True
+                    call.finish()
+                    return cached
+            except Exception as e:
+                logging.warning(f"LLM cache lookup failed: {str(e)}")
+
+        if timeout:
+            deadline = min(deadline or float("inf"), time.monotonic() + timeout)
+
+        async def fetch():
+            call.coalesced = False
+            response = await self._make_openai_request_async(call, deadline, **kwargs)
+            call.add_usage(getattr(response, "usage", None))
+            content = response.choices[0].message.content
+            if self.cache is not None and key and content:
+                try:
+                    await asyncio.to_thread(self.cache.set, key, content)
+                except Exception as e:
+                    logging.warning(f"LLM cache write failed: {str(e)}")
+            return content
+
+        call.coalesced = True
+        try:
+            content = await shared_scheduler().coalesce_async(key, fetch, deadline)
+        except BaseException as e:  # CancelledError too: a timed-out completion is recorded as such
+            call.finish(e)
+            raise
+        call.finish()
+        return content
+
+    def _chat_stream(self, endpoint=None, **kwargs):
+        """
+        Text of a chat completion as it is generated, one fragment at a time.
+        A cached response is yielded whole; a completed stream is cached.
+        
+        Closing the generator (the client went away) closes the HTTP stream, so
+        OpenAI stops generating tokens nobody will read. Streams go through the
+        scheduler's budgets but are not coalesced. OpenAI reports the token
+        usage of a stream in its last chunk, which has no choices.
         """
+        call = CallRecord(endpoint, kwargs.get("model"), streamed=True)
+        key = None
+        if self.cache is not None:
+            try:
+                key = request_key(**kwargs)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    logging.info("💾 LLM response served from cache")
+                    call.cache_hit = True
+                    call.first_token()
+                    call.finish()
+                    yield cached
+                    return
+            except Exception as e:
+                logging.warning(f"LLM cache lookup failed: {str(e)}")
+
+        try:
+            stream = self._make_openai_request(call, stream=True, stream_options={"include_usage": True}, **kwargs)
+        except Exception as e:
+            call.finish(e)
+            raise
+        parts = []
+        finished = False
+        error = None
+        try:
+            for chunk in stream:
+                call.add_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    call.first_token()
+                    parts.append(text)
+                    yield text
+            finished = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if not finished:
+                logging.info(f"🛑 LLM stream closed early after {len(parts)} fragments")
+            stream.close()
+            call.finish(error if finished or error else "StreamClosed")
+
+        if key and parts:
+            try:
+                self.cache.set(key, "".join(parts))
+            except Exception as e:
+                logging.warning(f"LLM cache write failed: {str(e)}")
+
+    async def _achat_stream(self, endpoint=None, **kwargs):
+        """_chat_stream for the event loop, as an async generator; closing it closes the HTTP stream"""
+        call = CallRecord(endpoint, kwargs.get("model"), streamed=True)
+        key = None
+        if self.cache is not None:
+            try:
+                key = request_key(**kwargs)
+                cached = await asyncio.to_thread(self.cache.get, key)
+                if cached is not None:
+                    logging.info("💾 LLM response served from cache")
+                    call.cache_hit = True
+                    call.first_token()
+                    call.finish()
+                    yield cached
+                    return
+            except Exception as e:
+                logging.warning(f"LLM cache lookup failed: {str(e)}")
+
         try:
-            # Construct intelligent prompt
-            system_prompt = f"""
+            stream = await self._make_openai_request_async(call, stream=True, stream_options={"include_usage": True},
+                                                           **kwargs)
+        except Exception as e:
+            call.finish(e)
+            raise
+        parts = []
+        finished = False
+        error = None
+        try:
+            async for chunk in stream:
+                call.add_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    call.first_token()
+                    parts.append(text)
+                    yield text
+            finished = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if not finished:
+                logging.info(f"🛑 LLM stream closed early after {len(parts)} fragments")
+            await stream.close()
+            call.finish(error if finished or error else "StreamClosed")
+
+        if key and parts:
+            try:
+                await asyncio.to_thread(self.cache.set, key, "".join(parts))
+            except Exception as e:
+                logging.warning(f"LLM cache write failed: {str(e)}")
+
+    async def _achat_streamed(self, on_text, endpoint=None, **kwargs):
+        """The whole text of _achat_stream, awaiting `on_text` with each fragment as it arrives"""
+        parts = []
+        async with contextlib.aclosing(self._achat_stream(endpoint, **kwargs)) as fragments:
+            async for text in fragments:
+                parts.append(text)
+                await on_text(text)
+        return "".join(parts)
+
+    def _implementation_request(self, eip_data, contract_type, custom_prompt=None):
+        """Chat completion parameters for generating an EIP implementation"""
+        # Construct intelligent prompt
+        system_prompt = f"""
 You are an expert Solidity developer specializing in Ethereum Improvement Proposals.
 Generate production-ready, secure, and gas-optimized smart contract code.
 
@@ -50,7 +383,7 @@ EIP Details:
 Contract Type: {contract_type}
 """
 
-            user_prompt = custom_prompt or f"""
+        user_prompt = custom_prompt or f"""
 Generate a complete Solidity implementation for EIP-{eip_data.get('eip', 'N/A')}: {eip_data.get('title', 'N/A')}.
 
 Requirements:
@@ -67,43 +400,82 @@ Focus on {contract_type} implementation patterns.
 Make sure the contract is complete and deployable.
 """
 
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = self._make_openai_request(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=4000,
-                temperature=0.1
-            )
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        # do not change this unless explicitly requested by the user
+        return dict(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=4000,
+            temperature=0.1
+        )
+
+    def generate_eip_implementation(self, eip_data, contract_type, custom_prompt=None):
+        """
+        Generate Solidity smart contract code for EIP implementation
+        
+        Args:
+            eip_data: Dictionary containing EIP metadata
+            contract_type: Type of contract to generate (e.g., "ERC20", "ERC721", "Governance")
+            custom_prompt: Optional custom prompt for specific requirements
+        """
+        try:
+            generated_code = self._chat(endpoint="generate_contract",
+                                        **self._implementation_request(eip_data, contract_type, custom_prompt))
+            return self._implementation_result(eip_data, contract_type, generated_code)
 
-            generated_code = response.choices[0].message.content
+        except Exception as e:
+            return self._implementation_result(eip_data, contract_type, error=e)
 
-            return {
-                "success": True,
-                "eip_number": eip_data.get('eip', 'N/A'),
-                "contract_type": contract_type,
-                "generated_code": generated_code,
-                "eip_metadata": eip_data
-            }
+    async def agenerate_eip_implementation(self, eip_data, contract_type, custom_prompt=None, on_text=None):
+        """
+        generate_eip_implementation on the background event loop. With
+        `on_text` the code is streamed, and each fragment is awaited with it.
+        """
+        request = self._implementation_request(eip_data, contract_type, custom_prompt)
+        try:
+            if on_text is None:
+                generated_code = await self._achat(endpoint="generate_contract", **request)
+            else:
+                generated_code = await self._achat_streamed(on_text, endpoint="generate_contract", **request)
+            return self._implementation_result(eip_data, contract_type, generated_code)
 
         except Exception as e:
-            logging.error(f"Code generation failed: {str(e)}")
+            return self._implementation_result(eip_data, contract_type, error=e)
+
+    def _implementation_result(self, eip_data, contract_type, generated_code=None, error=None):
+        """Response of generate_eip_implementation, or its failure when `error` is set"""
+        if error is not None:
+            logging.error(f"Code generation failed: {str(error)}")
             return {
                 "success": False,
-                "error": f"Code generation failed: {str(e)}",
+                "error": f"Code generation failed: {str(error)}",
                 "eip_number": eip_data.get('eip', 'N/A'),
                 "contract_type": contract_type
             }
+        return {
+            "success": True,
+            "eip_number": eip_data.get('eip', 'N/A'),
+            "contract_type": contract_type,
+            "generated_code": generated_code,
+            "eip_metadata": eip_data
+        }
     
-    def analyze_contract_security(self, contract_code):
-        """
-        AI-powered security analysis of smart contract code
-        """
-        try:
-            analysis_prompt = f"""
+    def stream_eip_implementation(self, eip_data, contract_type, custom_prompt=None):
+        """Fragments of the generate_eip_implementation code as the model writes them"""
+        return self._chat_stream(endpoint="generate_contract",
+                                 **self._implementation_request(eip_data, contract_type, custom_prompt))
+
+    def astream_eip_implementation(self, eip_data, contract_type, custom_prompt=None):
+        """stream_eip_implementation for the background event loop (an async generator)"""
+        return self._achat_stream(endpoint="generate_contract",
+                                  **self._implementation_request(eip_data, contract_type, custom_prompt))
+
+    def _security_request(self, contract_code):
+        """Chat completion parameters for a security analysis"""
+        analysis_prompt = f"""
 Analyze this Solidity smart contract for security vulnerabilities, gas optimization opportunities, and best practices:
 
 ```solidity
@@ -120,19 +492,110 @@ Provide a comprehensive analysis including:
 Format the response as structured text with clear sections and severity levels.
 """
 
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = self._make_openai_request(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": analysis_prompt}],
-                max_tokens=2000,
-                temperature=0.2
-            )
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        # do not change this unless explicitly requested by the user
+        return dict(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": analysis_prompt}],
+            max_tokens=2000,
+            temperature=0.2
+        )
 
-            return {
-                "success": True,
-                "analysis": response.choices[0].message.content
-            }
+    def _security_chunk_request(self, chunk, index, total):
+        """Chat completion parameters for the security analysis of one chunk of a split contract"""
+        chunk_prompt = f"""
+Analyze part {index} of {total} ({chunk.name}) of a Solidity codebase for security vulnerabilities, gas optimization opportunities, and best practices.
+The contract's state variables, events and modifiers are repeated for context; report only issues in the code shown.
+
+```solidity
+{chunk.code}
+```
+
+Respond with a JSON object with this structure:
+{{
+  "findings": [
+    {{
+      "title": "Reentrancy in withdraw",
+      "severity": "critical | high | medium | low | gas | info",
+      "location": "Contract.function",
+      "description": "What is wrong and how it can be exploited",
+      "recommendation": "How to fix it"
+    }}
+  ]
+}}
+"""
+
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        # do not change this unless explicitly requested by the user
+        return dict(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": chunk_prompt}],
+            max_tokens=SECURITY_CHUNK_MAX_TOKENS,
+            temperature=0.2,
+            response_format={"type": "json_object"}
+        )
+
+    def _security_report(self, chunks, outcomes):
+        """Merge the per-chunk (content, error) outcomes of a split analysis into one response"""
+        findings, notes, failed_parts = [], [], []
+        for chunk, (content, error) in zip(chunks, outcomes):
+            if error is not None:
+                failed_parts.append((chunk.name, str(error)))
+                continue
+            chunk_findings, prose = parse_findings(content)
+            findings.extend(chunk_findings)
+            if prose:
+                notes.append((chunk.name, prose))
+        if len(failed_parts) == len(chunks):
+            return {"success": False, "error": f"Security analysis failed: {failed_parts[0][1]}"}
+
+        merged = merge_findings(findings)
+        result = {
+            "success": True,
+            "analysis": format_report(merged, chunks, notes, failed_parts),
+            "findings": merged,
+            "parts": len(chunks)
+        }
+        if failed_parts:
+            result["failed_parts"] = [name for name, _ in failed_parts]
+        return result
+
+    def analyze_contract_security(self, contract_code, timeout=None, cancel=None):
+        """
+        AI-powered security analysis of smart contract code
+        
+        The code is minified first. A file too large for one prompt is split
+        at contract and function boundaries, the chunks are analyzed in
+        parallel and their findings merged, so latency follows the largest chunk.
+        
+        `timeout` bounds the whole analysis. Chunks not yet started when it
+        passes, or once `cancel` (a threading.Event) is set, are not sent.
+        """
+        try:
+            deadline = time.monotonic() + timeout if timeout else None
+            chunks = split_contract(contract_code)
+            if len(chunks) <= 1:
+                code = chunks[0].code if chunks else minify_solidity(contract_code)
+                content = self._chat(deadline=deadline, endpoint="analyze_security", **self._security_request(code))
+                return {"success": True, "analysis": content}
+
+            def analyze_chunk(request):
+                if cancel is not None and cancel.is_set():
+                    raise RuntimeError("Security analysis cancelled")
+                return self._chat(deadline=deadline, endpoint="analyze_security_chunk", **request)
+
+            logging.info(f"🧩 Security analysis split into {len(chunks)} parts")
+            futures = [
+                _chunk_executor.submit(analyze_chunk, self._security_chunk_request(chunk, index, len(chunks)))
+                for index, chunk in enumerate(chunks, 1)
+            ]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append((future.result(), None))
+                except Exception as e:
+                    outcomes.append((None, e))
+            return self._security_report(chunks, outcomes)
 
         except Exception as e:
             logging.error(f"Security analysis failed: {str(e)}")
@@ -141,12 +604,33 @@ Format the response as structured text with clear sections and severity levels.
                 "error": f"Security analysis failed: {str(e)}"
             }
 
-    def generate_test_suite(self, contract_code, contract_name):
-        """
-        Generate comprehensive test suite for the smart contract
-        """
+    async def aanalyze_contract_security(self, contract_code, timeout=None):
+        """analyze_contract_security on the background event loop"""
         try:
-            test_prompt = f"""
+            deadline = time.monotonic() + timeout if timeout else None
+            chunks = split_contract(contract_code)
+            if len(chunks) <= 1:
+                code = chunks[0].code if chunks else minify_solidity(contract_code)
+                content = await self._achat(deadline=deadline, endpoint="analyze_security",
+                                            **self._security_request(code))
+                return {"success": True, "analysis": content}
+
+            logging.info(f"🧩 Security analysis split into {len(chunks)} parts")
+            results = await asyncio.gather(*(
+                self._achat(deadline=deadline, endpoint="analyze_security_chunk",
+                            **self._security_chunk_request(chunk, index, len(chunks)))
+                for index, chunk in enumerate(chunks, 1)
+            ), return_exceptions=True)
+            outcomes = [(None, result) if isinstance(result, BaseException) else (result, None) for result in results]
+            return self._security_report(chunks, outcomes)
+
+        except Exception as e:
+            logging.error(f"Security analysis failed: {str(e)}")
+            return {"success": False, "error": f"Security analysis failed: {str(e)}"}
+
+    def _test_suite_request(self, contract_code, contract_name):
+        """Chat completion parameters for generating a Hardhat test suite"""
+        test_prompt = f"""
 Generate a comprehensive test suite for this Solidity smart contract using Hardhat and Chai:
 
 Contract Name: {contract_name}
@@ -167,18 +651,25 @@ Requirements:
 Format as complete JavaScript test files ready to run with Hardhat.
 """
 
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = self._make_openai_request(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": test_prompt}],
-                max_tokens=3000,
-                temperature=0.1
-            )
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        # do not change this unless explicitly requested by the user
+        return dict(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": test_prompt}],
+            max_tokens=3000,
+            temperature=0.1
+        )
+
+    def generate_test_suite(self, contract_code, contract_name):
+        """
+        Generate comprehensive test suite for the smart contract
+        """
+        try:
+            content = self._chat(endpoint="generate_tests", **self._test_suite_request(contract_code, contract_name))
 
             return {
                 "success": True,
-                "test_code": response.choices[0].message.content
+                "test_code": content
             }
 
         except Exception as e:
@@ -188,12 +679,31 @@ Format as complete JavaScript test files ready to run with Hardhat.
                 "error": f"Test generation failed: {str(e)}"
             }
 
-    def analyze_code_and_recommend_eips(self, contract_code, analysis_type, eip_data_list, eip_status_filter='final_only'):
-        """
-        Analyze smart contract code and recommend relevant EIPs with sentiment warnings
-        """
+    async def agenerate_test_suite(self, contract_code, contract_name, on_text=None):
+        """generate_test_suite on the background event loop, streamed to `on_text` when given"""
+        request = self._test_suite_request(contract_code, contract_name)
         try:
-            analysis_prompt = f"""
+            if on_text is None:
+                content = await self._achat(endpoint="generate_tests", **request)
+            else:
+                content = await self._achat_streamed(on_text, endpoint="generate_tests", **request)
+            return {"success": True, "test_code": content}
+
+        except Exception as e:
+            logging.error(f"Test generation failed: {str(e)}")
+            return {"success": False, "error": f"Test generation failed: {str(e)}"}
+
+    def stream_test_suite(self, contract_code, contract_name):
+        """Fragments of the generate_test_suite code as the model writes them"""
+        return self._chat_stream(endpoint="generate_tests", **self._test_suite_request(contract_code, contract_name))
+
+    def astream_test_suite(self, contract_code, contract_name):
+        """stream_test_suite for the background event loop (an async generator)"""
+        return self._achat_stream(endpoint="generate_tests", **self._test_suite_request(contract_code, contract_name))
+
+    def _recommendation_request(self, contract_code, analysis_type, candidates, eip_status_filter):
+        """Chat completion parameters for recommending EIPs from `candidates`"""
+        analysis_prompt = f"""
 Analyze this Solidity smart contract code and identify which Ethereum Improvement Proposals (EIPs) are most relevant:
 
 ```solidity
@@ -206,7 +716,7 @@ Status Filter: {eip_status_filter}
 Based on the code patterns, functionality, and standards used, identify the top 10 most relevant EIPs from this list and explain why each is relevant:
 
 Available EIPs:
-{self._format_eip_list(eip_data_list)}
+{self._format_eip_list(candidates)}
 
 For each relevant EIP, provide:
 1. EIP number
@@ -229,50 +739,145 @@ Format your response as a JSON object with this structure:
 Focus on EIPs that are actually implemented or could be implemented by this code.
 """
 
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            # do not change this unless explicitly requested by the user
-            response = self._make_openai_request(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": analysis_prompt}],
-                max_tokens=2000,
-                temperature=0.2,
-                response_format={"type": "json_object"}
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        # do not change this unless explicitly requested by the user
+        return dict(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": analysis_prompt}],
+            max_tokens=2000,
+            temperature=0.2,
+            response_format={"type": "json_object"}
+        )
+
+    def _recommendation_result(self, content, general_analysis, security_error):
+        """Response of analyze_code_and_recommend_eips from the two completions' outcomes"""
+        content = content or ""
+        if not content.strip():
+            return {"success": False, "error": "Empty response from AI"}
+        
+        try:
+            recommendations = json.loads(content)
+        except json.JSONDecodeError as e:
+            logging.error(f"JSON parsing error: {e}, Content: {content}")
+            return {"success": False, "error": f"Invalid JSON response: {str(e)}"}
+        
+        # Extract analysis text properly
+        if isinstance(general_analysis, dict) and general_analysis.get("success"):
+            analysis_text = general_analysis.get("analysis", "Analysis completed")
+        else:
+            if isinstance(general_analysis, dict):
+                security_error = general_analysis.get("error")
+            logging.warning(f"Returning recommendations without security analysis: {security_error}")
+            analysis_text = "Security analysis unavailable"
+        
+        # Extract recommendations properly
+        if isinstance(recommendations, dict) and "recommendations" in recommendations:
+            eip_recs = recommendations["recommendations"]
+        elif isinstance(recommendations, list):
+            eip_recs = recommendations
+        else:
+            eip_recs = []
+        
+        result = {
+            "success": True,
+            "analysis": analysis_text,
+            "eip_recommendations": eip_recs
+        }
+        if security_error:
+            result["security_error"] = security_error
+        return result
+
+    def analyze_code_and_recommend_eips(self, contract_code, analysis_type, eip_data_list, eip_status_filter='final_only',
+                                        eip_index=None):
+        """
+        Analyze smart contract code and recommend relevant EIPs with sentiment warnings
+        
+        With an `eip_index` (eip_retrieval.EIPIndex over eip_data_list) only the
+        EIPs best matching the contract's identifiers are put in the prompt.
+        """
+        try:
+            candidates = eip_index.top_k(contract_code) if eip_index is not None else eip_data_list
+
+            # The security analysis is independent of the recommendations, so it runs alongside them.
+            # Abandoning it sets `cancel_security`, so its remaining chunks are never sent.
+            cancel_security = threading.Event()
+            security_future = _llm_executor.submit(
+                self.analyze_contract_security, contract_code, SECURITY_ANALYSIS_TIMEOUT, cancel_security
             )
+            security_deadline = time.monotonic() + SECURITY_ANALYSIS_TIMEOUT
 
-            import json
-            content = response.choices[0].message.content or ""
-            if not content.strip():
-                return {"success": False, "error": "Empty response from AI"}
-            
             try:
-                recommendations = json.loads(content)
-            except json.JSONDecodeError as e:
-                logging.error(f"JSON parsing error: {e}, Content: {content}")
-                return {"success": False, "error": f"Invalid JSON response: {str(e)}"}
-            
-            # Also get general analysis
-            general_analysis = self.analyze_contract_security(contract_code)
+                content = self._chat(
+                    timeout=RECOMMENDATION_TIMEOUT,
+                    endpoint="recommend_eips",
+                    **self._recommendation_request(contract_code, analysis_type, candidates, eip_status_filter)
+                )
+            except Exception:
+                cancel_security.set()
+                security_future.cancel()
+                raise
+
+            if not (content or "").strip():
+                cancel_security.set()
+                security_future.cancel()
+                return self._recommendation_result(content, None, None)
             
-            # Extract analysis text properly
-            if isinstance(general_analysis, dict) and general_analysis.get("success"):
-                analysis_text = general_analysis.get("analysis", "Analysis completed")
-            else:
-                analysis_text = "Security analysis completed"
-            
-            # Extract recommendations properly
-            if isinstance(recommendations, dict) and "recommendations" in recommendations:
-                eip_recs = recommendations["recommendations"]
-            elif isinstance(recommendations, list):
-                eip_recs = recommendations
-            else:
-                eip_recs = []
+            # Recommendations are returned even when the security analysis fails or runs over
+            security_error = None
+            try:
+                general_analysis = security_future.result(timeout=max(0.0, security_deadline - time.monotonic()))
+            except FutureTimeoutError:
+                cancel_security.set()
+                general_analysis = None
+                security_error = f"Security analysis timed out after {SECURITY_ANALYSIS_TIMEOUT:.0f}s"
+            except Exception as e:
+                general_analysis = None
+                security_error = f"Security analysis failed: {str(e)}"
             
+            return self._recommendation_result(content, general_analysis, security_error)
+
+        except Exception as e:
+            logging.error(f"Code analysis and EIP recommendation failed: {str(e)}")
             return {
-                "success": True,
-                "analysis": analysis_text,
-                "eip_recommendations": eip_recs
+                "success": False,
+                "error": f"Code analysis failed: {str(e)}"
             }
 
+    async def aanalyze_code_and_recommend_eips(self, contract_code, analysis_type, eip_data_list,
+                                               eip_status_filter='final_only', eip_index=None):
+        """analyze_code_and_recommend_eips on the background event loop, both completions as concurrent tasks"""
+        try:
+            candidates = eip_index.top_k(contract_code) if eip_index is not None else eip_data_list
+            security_task = asyncio.ensure_future(asyncio.wait_for(
+                self.aanalyze_contract_security(contract_code, SECURITY_ANALYSIS_TIMEOUT), SECURITY_ANALYSIS_TIMEOUT
+            ))
+
+            try:
+                content = await self._achat(
+                    timeout=RECOMMENDATION_TIMEOUT,
+                    endpoint="recommend_eips",
+                    **self._recommendation_request(contract_code, analysis_type, candidates, eip_status_filter)
+                )
+            except Exception:
+                security_task.cancel()
+                raise
+
+            if not (content or "").strip():
+                security_task.cancel()
+                return self._recommendation_result(content, None, None)
+
+            security_error = None
+            try:
+                general_analysis = await security_task
+            except asyncio.TimeoutError:
+                general_analysis = None
+                security_error = f"Security analysis timed out after {SECURITY_ANALYSIS_TIMEOUT:.0f}s"
+            except Exception as e:
+                general_analysis = None
+                security_error = f"Security analysis failed: {str(e)}"
+
+            return self._recommendation_result(content, general_analysis, security_error)
+
         except Exception as e:
             logging.error(f"Code analysis and EIP recommendation failed: {str(e)}")
             return {
@@ -0,0 +1,106 @@
+"""
+Tests for the headless batch CLI
+"""
+
+import os
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from click.testing import CliRunner
+from app import AnalysisJob, EIPSentiment
+from batch_cli import main
+
+
+def _fake_scores(text):
+    compound = 0.5 if 'good' in text else -0.5
+    return {'compound': compound, 'pos': max(compound, 0), 'neg': max(-compound, 0), 'neu': 0.5}
+
+
+def _write_comments(path, topics=('EIP-20 thread', 'EIP-20 thread', 'ERC-721 thread')):
+    pd.DataFrame({
+        'topic': list(topics),
+        'paragraphs': ['good', 'bad', 'good'][:len(topics)],
+        'headings': [''] * len(topics),
+        'unordered_lists': [''] * len(topics),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def metadata_file(tmp_path):
+    path = tmp_path / 'all_eips.csv'
+    pd.DataFrame({
+        'eip': [20, 721], 'title': ['Token', 'NFT'], 'author': ['a', 'b'],
+        'status': ['Final', 'Final'], 'category': ['ERC', 'ERC'],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def offline_vader():
+    """Score with a stub instead of the VADER lexicon and fail any network access"""
+    with patch('sentiment_analyzer.SentimentIntensityAnalyzer') as mock_vader, \
+            patch('sentiment_analyzer.requests.get', side_effect=AssertionError('network used')):
+        mock_vader.return_value.polarity_scores.side_effect = _fake_scores
+        yield
+
+
+class TestBatchCli:
+    """Test running Stages 1-3 from the command line"""
+
+    def test_offline_run_writes_requested_format(self, tmp_path, metadata_file):
+        """Test an offline run writes final results as JSON next to the CSVs"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        output_dir = tmp_path / 'out'
+
+        result = CliRunner().invoke(main, [
+            input_file, '--output-dir', str(output_dir), '--metadata-file', metadata_file,
+            '--format', 'json', '--chunk-size', '2'
+        ])
+
+        assert result.exit_code == 0, result.output
+        final = pd.read_json(output_dir / 'comments' / 'final_merged_analysis.json', lines=True)
+        assert set(final.dropna(subset=['unified_compound'])['eip']) == {20, 721}
+        assert (output_dir / 'comments' / 'final_merged_analysis.csv').exists()
+
+    def test_directory_reports_invalid_files(self, tmp_path, metadata_file):
+        """Test valid files in a directory are analyzed and invalid ones fail the run"""
+        inputs = tmp_path / 'exports'
+        inputs.mkdir()
+        _write_comments(inputs / 'good.csv')
+        pd.DataFrame({'topic': ['EIP-20']}).to_csv(inputs / 'bad.csv', index=False)
+
+        result = CliRunner().invoke(main, [
+            str(inputs), '--output-dir', str(tmp_path / 'out'), '--metadata-file', metadata_file
+        ])
+
+        assert result.exit_code == 1
+        assert 'missing required columns' in result.output
+        assert 'Analyzed 1 of 2 files' in result.output
+        assert (tmp_path / 'out' / 'good' / 'unified_sentiment_summary.csv').exists()
+
+    def test_register_creates_completed_job(self, test_app, tmp_path, metadata_file):
+        """Test --register stores the run as a completed job with sentiment rows"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+
+        result = CliRunner().invoke(main, [
+            input_file, '--output-dir', str(tmp_path / 'out'), '--metadata-file', metadata_file, '--register'
+        ])
+
+        assert result.exit_code == 0, result.output
+        with test_app.app_context():
+            job = AnalysisJob.query.one()
+            rows = {row.eip: row for row in EIPSentiment.query.filter_by(job_id=job.id)}
+            assert job.status == 'completed'
+            assert job.content_hash
+            assert rows['20'].total_comment_count == 2
+
+    def test_parquet_requires_engine(self, tmp_path):
+        """Test asking for parquet without an engine installed is a usage error"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+
+        with patch('batch_cli._parquet_available', return_value=False):
+            result = CliRunner().invoke(main, [input_file, '--format', 'parquet'])
+
+        assert result.exit_code == 2
+        assert 'pyarrow' in result.output
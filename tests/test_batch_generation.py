@@ -0,0 +1,133 @@
+"""
+Tests for background batch generation of contracts and test suites
+"""
+
+import os
+import json
+import time
+import threading
+from unittest.mock import patch
+from app import app, db, AnalysisJob, OutputFile
+from batch_generation import create_generation_job, run_generation_job, SUMMARY_FILENAME
+
+
+def _eips(*numbers):
+    return [{'eip': number, 'title': f'EIP-{number}', 'status': 'Final', 'category': 'ERC', 'author': 'Unknown'}
+            for number in numbers]
+
+
+def _implementation(eip_data, contract_type, custom_prompt=None):
+    return {'success': True, 'generated_code': f"contract EIP{eip_data['eip']} {{}}"}
+
+
+def _tests(contract_code, contract_name='Contract'):
+    return {'success': True, 'test_code': f'// tests for {contract_code}'}
+
+
+class TestGenerationJob:
+    """Test a generation job saves every artifact and can be resumed"""
+
+    def _run(self, job, implementation=_implementation, tests=_tests):
+        with patch('smart_contract_generator.EIPCodeGenerator.__init__', return_value=None), \
+                patch('smart_contract_generator.EIPCodeGenerator.generate_eip_implementation',
+                      side_effect=implementation), \
+                patch('smart_contract_generator.EIPCodeGenerator.generate_test_suite', side_effect=tests):
+            run_generation_job(job.id)
+        db.session.expire_all()
+        return db.session.get(AnalysisJob, job.id)
+
+    def test_artifacts_saved_as_output_files(self, test_app, tmp_path):
+        """Test each EIP gets a contract and a test suite file, recorded as output files"""
+        with patch.dict(app.config, {'OUTPUT_FOLDER': str(tmp_path)}):
+            job = create_generation_job(_eips('20', '721'), 'ERC20')
+            job = self._run(job)
+
+        files = {output.filename: output for output in OutputFile.query.filter_by(job_id=job.id)}
+        assert job.status == 'completed'
+        assert job.progress == 100
+        assert job.job_type == 'generation'
+        assert set(files) == {'eip-20_ERC20.sol', 'eip-20_ERC20.test.js', 'eip-721_ERC20.sol',
+                              'eip-721_ERC20.test.js', SUMMARY_FILENAME}
+        with open(files['eip-721_ERC20.test.js'].file_path) as f:
+            assert f.read() == '// tests for contract EIP721 {}'
+        assert files['eip-20_ERC20.sol'].file_type == 'generated_contract'
+
+    def test_concurrency_bounded(self, test_app, tmp_path):
+        """Test no more than GENERATION_CONCURRENCY EIPs are generated at once"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def implementation(eip_data, contract_type, custom_prompt=None):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.1)
+            with lock:
+                active.pop()
+            return _implementation(eip_data, contract_type)
+
+        with patch.dict(app.config, {'OUTPUT_FOLDER': str(tmp_path), 'GENERATION_CONCURRENCY': 2}):
+            job = create_generation_job(_eips('1', '2', '3', '4', '5'), 'ERC20', include_tests=False)
+            job = self._run(job, implementation=implementation)
+
+        assert job.status == 'completed'
+        assert max(peak) == 2
+        assert OutputFile.query.filter_by(job_id=job.id, file_type='generated_contract').count() == 5
+
+    def test_resume_generates_only_missing(self, test_app, tmp_path):
+        """Test a failed EIP leaves the job in error, and a resume regenerates only what is missing"""
+        def failing_tests(contract_code, contract_name='Contract'):
+            if 'EIP721' in contract_code:
+                return {'success': False, 'error': 'quota exceeded'}
+            return _tests(contract_code)
+
+        with patch.dict(app.config, {'OUTPUT_FOLDER': str(tmp_path)}):
+            job = create_generation_job(_eips('20', '721'), 'ERC721')
+            job = self._run(job, tests=failing_tests)
+
+            assert job.status == 'error'
+            assert 'EIP-721: quota exceeded' in job.error_message
+            assert job.progress == 75
+
+            implementations = []
+
+            def implementation(eip_data, contract_type, custom_prompt=None):
+                implementations.append(eip_data['eip'])
+                return _implementation(eip_data, contract_type)
+
+            job = self._run(job, implementation=implementation)
+
+        assert job.status == 'completed'
+        assert implementations == []
+        assert OutputFile.query.filter_by(job_id=job.id).count() == 5
+        with open(os.path.join(str(tmp_path), job.id, SUMMARY_FILENAME)) as f:
+            assert json.load(f)['errors'] == {}
+
+
+class TestGenerationRoutes:
+    """Test generation jobs are queued and resumed through the API"""
+
+    def test_create_returns_202(self, client, tmp_path):
+        """Test a job is recorded and started in the background, with a status URL to poll"""
+        with patch.dict(app.config, {'OUTPUT_FOLDER': str(tmp_path)}), \
+                patch('batch_generation.start_generation_job', return_value=True) as start:
+            response = client.post('/api/generation-jobs', json={'eips': ['20', '20', '721'], 'contract_type': 'ERC20'})
+
+        data = json.loads(response.data)
+        assert response.status_code == 202
+        start.assert_called_once_with(data['job_id'])
+        assert data['status_url'] == f"/api/job/{data['job_id']}/status"
+        assert 'EIP-20, EIP-721' in db.session.get(AnalysisJob, data['job_id']).original_filename
+
+    def test_create_requires_eips(self, client):
+        """Test a request without EIPs is rejected"""
+        response = client.post('/api/generation-jobs', json={'eips': [], 'contract_type': 'ERC20'})
+
+        assert response.status_code == 400
+
+    def test_resume_unknown_job(self, client):
+        """Test resuming a job that is not a generation job returns 404"""
+        response = client.post('/api/generation-jobs/missing/resume')
+
+        assert response.status_code == 404
@@ -0,0 +1,234 @@
+"""
+Tests for shared, snapshot-versioned EIP metadata
+"""
+
+import os
+import tempfile
+import pytest
+import pandas as pd
+from unittest.mock import patch, MagicMock
+from app import db, process_csv_background, AnalysisJob, EIPSentiment, EIPMetadata, EIPMetadataSnapshot
+from eip_metadata import (
+    normalize_metadata_frame, snapshot_hash, get_or_create_snapshot, metadata_ids_by_eip,
+    reenrich_job, reenrich_completed_jobs
+)
+
+
+METADATA = pd.DataFrame({
+    'eip': [20, 721, 1559],
+    'title': ['Token Standard', 'Non-Fungible Token Standard', 'Fee market change'],
+    'author': ['Fabian Vogelsteller', 'William Entriken', 'Vitalik Buterin'],
+    'status': ['Final', 'Final', 'Final'],
+    'category': ['ERC', 'ERC', 'Core'],
+    'type': ['Standards Track'] * 3,
+})
+
+
+def _write_pipeline_outputs(output_dir):
+    """Write the files a completed Stage 1-3 run leaves behind"""
+    eipsinsight_dir = os.path.join(output_dir, 'eipsinsight_data')
+    os.makedirs(eipsinsight_dir, exist_ok=True)
+    METADATA.to_csv(os.path.join(eipsinsight_dir, 'all_eips.csv'), index=False)
+
+    final_file = os.path.join(output_dir, 'final_merged_analysis.csv')
+    pd.DataFrame({
+        'eip': [20, 721],
+        'unified_compound': [0.4, -0.2],
+        'unified_pos': [0.5, 0.1],
+        'unified_neg': [0.1, 0.3],
+        'unified_neu': [0.4, 0.6],
+        'total_comment_count': [12, 3],
+        'title': ['Token Standard', 'Non-Fungible Token Standard'],
+        'status': ['Final', 'Final'],
+        'category_y': ['ERC', 'ERC'],
+    }).to_csv(final_file, index=False)
+    return [final_file]
+
+
+def _create_job(job_id):
+    job = AnalysisJob()
+    job.id = job_id
+    job.filename = 'upload.csv'
+    job.original_filename = 'upload.csv'
+    db.session.add(job)
+    db.session.commit()
+
+
+class TestMetadataSnapshots:
+    """Test snapshot normalization and de-duplication"""
+
+    def test_normalize_metadata_frame(self):
+        """Test EIP numbers are normalized and extra columns dropped"""
+        frame = normalize_metadata_frame(pd.DataFrame({
+            'EIP': ['20', 721.0, None],
+            'Title': ['Token Standard', 'NFT', 'Orphan'],
+            'status': ['Final', 'nan', 'Draft'],
+        }))
+
+        assert list(frame.columns) == ['eip', 'title', 'author', 'status', 'category']
+        assert list(frame['eip']) == ['20', '721']
+        assert frame.loc[frame['eip'] == '721', 'status'].iloc[0] is None
+
+    def test_snapshot_hash_ignores_row_order(self):
+        """Test identical metadata in a different order hashes the same"""
+        frame = normalize_metadata_frame(METADATA)
+        shuffled = frame.iloc[::-1].reset_index(drop=True)
+
+        assert snapshot_hash(frame) == snapshot_hash(shuffled)
+
+    def test_identical_metadata_is_stored_once(self, test_app):
+        """Test two jobs enriched from the same data share one snapshot"""
+        with test_app.app_context():
+            frame = normalize_metadata_frame(METADATA)
+            first = get_or_create_snapshot(frame, source='job-a')
+            second = get_or_create_snapshot(frame, source='job-b')
+
+            assert first.id == second.id
+            assert EIPMetadataSnapshot.query.count() == 1
+            assert EIPMetadata.query.count() == 3
+            assert set(metadata_ids_by_eip(first)) == {'20', '721', '1559'}
+
+    def test_changed_metadata_creates_new_snapshot(self, test_app):
+        """Test a status change produces a new snapshot version"""
+        with test_app.app_context():
+            frame = normalize_metadata_frame(METADATA)
+            first = get_or_create_snapshot(frame)
+            changed = frame.copy()
+            changed.loc[changed['eip'] == '1559', 'status'] = 'Living'
+            second = get_or_create_snapshot(changed)
+
+            assert first.id != second.id
+
+
+class TestSentimentMetadataJoin:
+    """Test EIPSentiment exposes metadata transparently"""
+
+    def test_attributes_and_filters_read_through_metadata(self, test_app):
+        """Test metadata attributes can be read and filtered on"""
+        with test_app.app_context():
+            _create_job('meta-job-1')
+            snapshot = get_or_create_snapshot(normalize_metadata_frame(METADATA))
+            ids = metadata_ids_by_eip(snapshot)
+            for eip in ['20', '1559']:
+                db.session.add(EIPSentiment(job_id='meta-job-1', eip=eip, metadata_id=ids[eip]))
+            db.session.commit()
+
+            rows = EIPSentiment.query.filter(EIPSentiment.category == 'Core').all()
+
+            assert [r.eip for r in rows] == ['1559']
+            assert rows[0].title == 'Fee market change'
+
+    def test_writes_do_not_leak_into_shared_snapshot(self, test_app):
+        """Test assigning metadata on one row copies the shared entry first"""
+        with test_app.app_context():
+            _create_job('meta-job-2')
+            snapshot = get_or_create_snapshot(normalize_metadata_frame(METADATA))
+            ids = metadata_ids_by_eip(snapshot)
+            first = EIPSentiment(job_id='meta-job-2', eip='20', metadata_id=ids['20'])
+            second = EIPSentiment(job_id='meta-job-2', eip='20', metadata_id=ids['20'])
+            db.session.add_all([first, second])
+            db.session.commit()
+
+            first.status = 'Stagnant'
+            db.session.commit()
+
+            assert first.status == 'Stagnant'
+            assert first.title == 'Token Standard'
+            assert second.status == 'Final'
+
+
+class TestPipelineInsert:
+    """Test completed jobs reference shared metadata"""
+
+    @patch('sentiment_analyzer.SentimentAnalyzer')
+    def test_jobs_share_metadata_rows(self, mock_analyzer_cls, test_app):
+        """Test two jobs with the same enrichment data reuse one snapshot"""
+        with test_app.app_context():
+            for job_id in ['meta-job-3', 'meta-job-4']:
+                _create_job(job_id)
+                with tempfile.TemporaryDirectory() as output_dir:
+                    analyzer = MagicMock()
+                    analyzer.run_stage3.return_value = _write_pipeline_outputs(output_dir)
+                    mock_analyzer_cls.return_value = analyzer
+
+                    process_csv_background(job_id, 'unused.csv', output_dir)
+
+            rows = EIPSentiment.query.filter_by(job_id='meta-job-4').order_by(EIPSentiment.eip).all()
+
+            assert AnalysisJob.query.get('meta-job-4').status == 'completed'
+            assert EIPMetadata.query.count() == 3
+            assert [r.eip for r in rows] == ['20', '721']
+            assert rows[0].title == 'Token Standard'
+            assert rows[1].unified_compound == pytest.approx(-0.2)
+
+
+class TestReenrichment:
+    """Test refreshing metadata of historical jobs without rescoring"""
+
+    def _job_on_snapshot(self, job_id, snapshot):
+        _create_job(job_id)
+        job = AnalysisJob.query.get(job_id)
+        job.status = 'completed'
+        job.metadata_snapshot_id = snapshot.id
+        ids = metadata_ids_by_eip(snapshot)
+        db.session.add(EIPSentiment(job_id=job_id, eip='1559', metadata_id=ids['1559'],
+                                    unified_compound=-0.3, total_comment_count=40))
+        db.session.add(EIPSentiment(job_id=job_id, eip='9999', unified_compound=0.2, total_comment_count=2))
+        db.session.commit()
+
+    def _newer_snapshot(self):
+        frame = normalize_metadata_frame(METADATA)
+        frame.loc[frame['eip'] == '1559', 'status'] = 'Living'
+        frame.loc[len(frame)] = ['4626', 'Tokenized Vaults', 'Joey Santoro', 'Final', 'ERC']
+        return get_or_create_snapshot(frame)
+
+    def test_reenrich_updates_metadata_in_place(self, test_app):
+        """Test statuses change while stored aggregates are kept"""
+        with test_app.app_context():
+            old = get_or_create_snapshot(normalize_metadata_frame(METADATA))
+            self._job_on_snapshot('reenrich-job-1', old)
+            original_ids = {r.eip: r.id for r in EIPSentiment.query.filter_by(job_id='reenrich-job-1')}
+            new = self._newer_snapshot()
+
+            result = reenrich_job('reenrich-job-1', new)
+
+            rows = {r.eip: r for r in EIPSentiment.query.filter_by(job_id='reenrich-job-1')}
+            assert rows['1559'].status == 'Living'
+            assert rows['1559'].id == original_ids['1559']
+            assert rows['1559'].unified_compound == pytest.approx(-0.3)
+            assert rows['1559'].total_comment_count == 40
+            assert rows['4626'].title == 'Tokenized Vaults'
+            assert rows['4626'].unified_compound is None
+            assert rows['9999'].unified_compound == pytest.approx(0.2)
+            assert AnalysisJob.query.get('reenrich-job-1').metadata_snapshot_id == new.id
+            assert result['added'] == 3
+
+    def test_bulk_reenrich_skips_jobs_on_snapshot(self, test_app):
+        """Test the bulk operation only touches stale jobs"""
+        with test_app.app_context():
+            old = get_or_create_snapshot(normalize_metadata_frame(METADATA))
+            self._job_on_snapshot('reenrich-job-2', old)
+            new = self._newer_snapshot()
+
+            first = reenrich_completed_jobs(new)
+            second = reenrich_completed_jobs(new)
+
+            assert [r['job_id'] for r in first] == ['reenrich-job-2']
+            assert second == []
+
+    def test_reenrich_cli_command(self, test_app, runner, tmp_path):
+        """Test the reenrich-jobs CLI command with an offline snapshot"""
+        with test_app.app_context():
+            old = get_or_create_snapshot(normalize_metadata_frame(METADATA))
+            self._job_on_snapshot('reenrich-job-3', old)
+            metadata_file = tmp_path / 'all_eips.csv'
+            changed = METADATA.copy()
+            changed.loc[changed['eip'] == 1559, 'status'] = 'Stagnant'
+            changed.to_csv(metadata_file, index=False)
+
+            result = runner.invoke(args=['reenrich-jobs', '--metadata-file', str(metadata_file)])
+
+            assert result.exit_code == 0
+            assert 'reenrich-job-3' in result.output
+            row = EIPSentiment.query.filter_by(job_id='reenrich-job-3', eip='1559').first()
+            assert row.status == 'Stagnant'
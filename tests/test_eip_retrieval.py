@@ -0,0 +1,106 @@
+"""
+Tests for local EIP candidate retrieval
+"""
+
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+from app import db, AnalysisJob, EIPSentiment
+import eip_retrieval
+from eip_retrieval import EIPIndex, index_for, tokenize
+
+EIPS = [
+    ('20', 'Token Standard', 'ERC', 300),
+    ('721', 'Non-Fungible Token Standard', 'ERC', 400),
+    ('1155', 'Multi Token Standard', 'ERC', 100),
+    ('2612', 'Permit Extension for EIP-20 Signed Approvals', 'ERC', 50),
+    ('2981', 'NFT Royalty Standard', 'ERC', 80),
+    ('1559', 'Fee market change for ETH 1.0 chain', 'Core', 900),
+    ('4337', 'Account Abstraction Using Alt Mempool', 'ERC', 200),
+]
+
+NFT_CONTRACT = """
+contract Collectible is ERC721Enumerable, IERC2981 {
+    function royaltyInfo(uint256 tokenId, uint256 salePrice) external view returns (address, uint256) {}
+}
+"""
+
+
+def _rows():
+    return [SimpleNamespace(eip=eip, title=title, status='Final', category=category, total_comment_count=count)
+            for eip, title, category, count in EIPS]
+
+
+class TestEIPIndex:
+    """Test contracts are matched to the EIPs they use"""
+
+    def test_tokenize_splits_identifiers(self):
+        """Test camelCase identifiers are split and ERC/EIP mentions become number terms"""
+        terms = tokenize("function safeTransferFrom() is IERC721Receiver // see EIP-2612")
+
+        assert {'eip721', 'eip2612', 'safe', 'transf', 'receiv'} <= set(terms)
+        assert 'function' not in terms
+
+    def test_mentioned_and_described_eips_rank_first(self):
+        """Test interfaces named in the code and matching titles outrank unrelated EIPs"""
+        top = [doc.eip for doc in EIPIndex(_rows()).top_k(NFT_CONTRACT, 3)]
+
+        assert top[:2] == ['2981', '721']
+        assert '1559' not in top
+
+    def test_only_matching_eips_are_returned(self):
+        """Test unrelated EIPs are left out of the candidates"""
+        top = EIPIndex(_rows()).top_k("contract Wallet { function validateUserOp() {} } // account abstraction", 5)
+
+        assert [doc.eip for doc in top] == ['4337']
+
+    def test_no_match_falls_back_to_most_discussed(self):
+        """Test code with no matching term still yields candidates, busiest EIPs first"""
+        top = EIPIndex(_rows()).top_k("contract Empty {}", 2)
+
+        assert [doc.eip for doc in top] == ['1559', '721']
+
+    def test_index_is_built_once_per_key(self):
+        """Test repeated requests for the same job reuse the index"""
+        with patch.dict(eip_retrieval._indexes, clear=True), \
+                patch('eip_retrieval.EIPIndex', wraps=EIPIndex) as build:
+            first = index_for(('job', 'final_only', 1, 7), _rows())
+            second = index_for(('job', 'final_only', 1, 7), _rows())
+
+        assert first is second
+        assert build.call_count == 1
+
+
+class TestRecommendationPrompt:
+    """Test the analysis endpoint sends only the retrieved candidates"""
+
+    def test_prompt_lists_top_candidates(self, client, test_app):
+        """Test the EIP list in the prompt holds the matching EIPs and not the rest"""
+        with test_app.app_context():
+            db.session.add(AnalysisJob(id='retrieval-job', filename='a.csv', original_filename='a.csv'))
+            for eip, title, category, count in EIPS:
+                row = EIPSentiment(job_id='retrieval-job', eip=eip, total_comment_count=count, unified_compound=0.1)
+                row.title, row.category, row.status = title, category, 'Final'
+                db.session.add(row)
+            db.session.commit()
+
+        prompts = []
+
+        async def chat(self, **kwargs):
+            prompts.append(kwargs['messages'][0]['content'])
+            return json.dumps({'recommendations': [{'eip_number': '2981', 'reason': 'royalties', 'confidence': 0.9}]})
+
+        with patch.dict(eip_retrieval._indexes, clear=True), \
+                patch('smart_contract_generator.EIPCodeGenerator.__init__', return_value=None), \
+                patch('smart_contract_generator.EIPCodeGenerator._achat', chat), \
+                patch('smart_contract_generator.EIPCodeGenerator.aanalyze_contract_security',
+                      new_callable=AsyncMock, return_value={'success': True, 'analysis': 'ok'}):
+            response = client.post('/api/analyze-code-and-recommend', json={
+                'job_id': 'retrieval-job', 'contract_code': NFT_CONTRACT, 'eip_status_filter': 'final_only'
+            })
+
+        result = json.loads(response.data)
+        assert result['success'] is True, result
+        assert result['recommendations'][0]['eip_number'] == '2981'
+        assert 'EIP-2981: NFT Royalty Standard' in prompts[0]
+        assert 'EIP-1559' not in prompts[0]
@@ -0,0 +1,135 @@
+"""
+Tests for the EIP full-text search index and typeahead endpoint
+"""
+
+import pytest
+import json
+from app import db, AnalysisJob, EIPSentiment
+from eip_search import search_eips, ensure_search_index, _query_terms
+
+
+def _add_job_with_eips(job_id, rows):
+    job = AnalysisJob()
+    job.id = job_id
+    job.filename = 'search.csv'
+    job.original_filename = 'search.csv'
+    job.status = 'completed'
+    db.session.add(job)
+    for eip, title, author, status, category in rows:
+        sentiment = EIPSentiment()
+        sentiment.job_id = job_id
+        sentiment.eip = eip
+        sentiment.title = title
+        sentiment.author = author
+        sentiment.status = status
+        sentiment.category = category
+        sentiment.unified_compound = 0.1
+        sentiment.total_comment_count = 10
+        db.session.add(sentiment)
+    db.session.commit()
+
+
+SAMPLE_EIPS = [
+    ('20', 'Token Standard', 'Fabian Vogelsteller, Vitalik Buterin', 'Final', 'ERC'),
+    ('721', 'Non-Fungible Token Standard', 'William Entriken', 'Final', 'ERC'),
+    ('1559', 'Fee market change for ETH 1.0 chain', 'Vitalik Buterin', 'Final', 'Core'),
+    ('4626', 'Tokenized Vaults', 'Joey Santoro', 'Final', 'ERC'),
+]
+
+
+class TestSearchIndex:
+    """Test ranked search over EIP metadata"""
+
+    def test_query_terms(self):
+        """Test free text is split into safe search terms"""
+        assert _query_terms('EIP-20 "token"') == ['20', 'token']
+        assert _query_terms('erc721') == ['721']
+        assert _query_terms('') == []
+        assert _query_terms(None) == []
+
+    def test_search_by_title_prefix(self, test_app):
+        """Test prefix search on title words"""
+        with test_app.app_context():
+            _add_job_with_eips('search-job-1', SAMPLE_EIPS)
+
+            results = search_eips(db.session, 'search-job-1', 'tok')
+            eips = [r['eip'] for r in results]
+
+            assert set(eips) == {'20', '721', '4626'}
+
+    def test_search_by_author(self, test_app):
+        """Test author names are searchable"""
+        with test_app.app_context():
+            _add_job_with_eips('search-job-2', SAMPLE_EIPS)
+
+            results = search_eips(db.session, 'search-job-2', 'vitalik')
+
+            assert {r['eip'] for r in results} == {'20', '1559'}
+
+    def test_exact_eip_number_ranks_first(self, test_app):
+        """Test an exact EIP number match is pinned to the top"""
+        with test_app.app_context():
+            _add_job_with_eips('search-job-3', SAMPLE_EIPS + [
+                ('2020', 'Another proposal', 'Someone', 'Draft', 'Core'),
+            ])
+
+            results = search_eips(db.session, 'search-job-3', 'EIP-20')
+
+            assert results[0]['eip'] == '20'
+
+    def test_search_is_scoped_to_job(self, test_app):
+        """Test results never leak rows from other jobs"""
+        with test_app.app_context():
+            _add_job_with_eips('search-job-4', SAMPLE_EIPS)
+            _add_job_with_eips('search-job-5', [('1155', 'Multi Token Standard', 'Witek Radomski', 'Final', 'ERC')])
+
+            results = search_eips(db.session, 'search-job-5', 'token')
+
+            assert [r['eip'] for r in results] == ['1155']
+
+    def test_index_tracks_updates_and_deletes(self, test_app):
+        """Test the index follows row updates and deletes"""
+        with test_app.app_context():
+            _add_job_with_eips('search-job-6', SAMPLE_EIPS)
+            ensure_search_index(db.engine)
+
+            row = EIPSentiment.query.filter_by(job_id='search-job-6', eip='4626').first()
+            row.title = 'Yield Bearing Vaults'
+            db.session.commit()
+            EIPSentiment.query.filter_by(job_id='search-job-6', eip='721').delete()
+            db.session.commit()
+
+            assert [r['eip'] for r in search_eips(db.session, 'search-job-6', 'yield')] == ['4626']
+            assert search_eips(db.session, 'search-job-6', 'fungible') == []
+
+    def test_empty_query_returns_nothing(self, test_app):
+        """Test blank input does not scan the table"""
+        with test_app.app_context():
+            assert search_eips(db.session, 'search-job-7', '   ') == []
+
+
+class TestSearchEndpoint:
+    """Test the typeahead API endpoint"""
+
+    def test_typeahead_endpoint(self, client, test_app):
+        """Test the endpoint returns ranked JSON results"""
+        with test_app.app_context():
+            _add_job_with_eips('search-job-8', SAMPLE_EIPS)
+
+        response = client.get('/api/job/search-job-8/eips/search?q=vault&limit=5')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['results'][0]['eip'] == '4626'
+        assert data['results'][0]['title'] == 'Tokenized Vaults'
+
+    def test_smart_contract_page_does_not_render_all_eips(self, client, test_app):
+        """Test the generator page no longer ships every EIP as an option"""
+        with test_app.app_context():
+            _add_job_with_eips('search-job-9', SAMPLE_EIPS)
+
+        response = client.get('/smart-contract?job_id=search-job-9')
+
+        assert response.status_code == 200
+        assert b'eipSearch' in response.data
+        assert b'Tokenized Vaults' not in response.data
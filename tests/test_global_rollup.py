@@ -0,0 +1,128 @@
+"""
+Tests for the corpus-wide EIP sentiment rollup
+"""
+
+import json
+from unittest.mock import patch
+import pandas as pd
+import pytest
+from app import app, db, AnalysisJob, EIPSentiment, GlobalEIPSentiment
+from global_rollup import add_to_rollup, add_job_to_rollup, global_summary, leaderboard, file_sha256
+from partial_aggregates import PartialAggregates
+from quantile_sketch import CompoundSketch
+
+
+def _aggregates(eips, compounds):
+    compounds = pd.Series(compounds, dtype=float)
+    return PartialAggregates().add(pd.DataFrame({
+        'eip': eips, 'compound': compounds, 'pos': compounds.clip(lower=0),
+        'neg': (-compounds).clip(lower=0), 'neu': 1 - compounds.abs(),
+    }))
+
+
+class TestRollupUpdates:
+    """Test incremental, de-duplicated rollup updates"""
+
+    def test_uploads_merge_exactly(self, test_app):
+        """Test global means equal the mean over all rolled-up comments"""
+        with test_app.app_context():
+            add_to_rollup('hash-a', _aggregates(['20', '20', '721'], [0.6, 0.2, -0.5]))
+            add_to_rollup('hash-b', _aggregates(['20', '1559'], [-0.2, 0.0]))
+
+            row = db.session.get(GlobalEIPSentiment, '20')
+            summary = global_summary()
+
+            assert row.comment_count == 3
+            assert row.unified_compound == pytest.approx(0.2)
+            assert summary['upload_count'] == 2
+            assert summary['comment_count'] == 5
+            assert summary['eip_count'] == 3
+            assert (summary['positive_eips'], summary['negative_eips'], summary['neutral_eips']) == (1, 1, 1)
+            assert summary['avg_eip_compound'] == pytest.approx((0.2 - 0.5 + 0.0) / 3)
+
+    def test_same_upload_counted_once(self, test_app):
+        """Test re-adding content with a known hash changes nothing"""
+        with test_app.app_context():
+            assert add_to_rollup('hash-c', _aggregates(['20'], [0.5])) is True
+            assert add_to_rollup('hash-c', _aggregates(['20'], [0.5])) is False
+
+            assert db.session.get(GlobalEIPSentiment, '20').comment_count == 1
+            assert global_summary()['upload_count'] == 1
+
+    def test_class_counts_follow_changing_means(self, test_app):
+        """Test an EIP moving from positive to negative updates the summary counts"""
+        with test_app.app_context():
+            add_to_rollup('hash-d', _aggregates(['20'], [0.5]))
+            add_to_rollup('hash-e', _aggregates(['20', '20'], [-0.9, -0.9]))
+
+            summary = global_summary()
+            assert (summary['positive_eips'], summary['negative_eips']) == (0, 1)
+
+    def test_job_rollup_uses_stored_sums_and_sketches(self, test_app, tmp_path):
+        """Test a completed job is rolled up from its rows when no sums file exists"""
+        upload = tmp_path / 'upload.csv'
+        upload.write_text('topic\nEIP-20\n')
+        with test_app.app_context():
+            job = AnalysisJob(id='rollup-job-1', filename='upload.csv', original_filename='upload.csv',
+                              status='completed', content_hash=file_sha256(str(upload)))
+            db.session.add(job)
+            db.session.add(EIPSentiment(job_id='rollup-job-1', eip='20', unified_compound=0.4, unified_pos=0.4,
+                                        unified_neg=0.0, unified_neu=0.6, total_comment_count=2,
+                                        compound_sketch=CompoundSketch.from_scores([0.3, 0.5]).to_string()))
+            db.session.commit()
+
+            assert add_job_to_rollup(job) is True
+            row = db.session.get(GlobalEIPSentiment, '20')
+            assert row.unified_compound == pytest.approx(0.4)
+            assert CompoundSketch.from_string(row.compound_sketch).count == 2
+
+
+class TestRollupEndpoints:
+    """Test the global leaderboard and summary APIs"""
+
+    def test_leaderboard_orders(self, client, test_app):
+        """Test positive, negative and comment-count orderings"""
+        with test_app.app_context():
+            add_to_rollup('hash-f', _aggregates(['20', '721', '721', '1559'], [0.8, -0.4, -0.6, 0.1]))
+
+        positive = json.loads(client.get('/api/global/leaderboard?order=positive&limit=2').data)['results']
+        negative = json.loads(client.get('/api/global/leaderboard?order=negative&limit=1').data)['results']
+        busy = json.loads(client.get('/api/global/leaderboard?order=comments&min_comments=2').data)['results']
+
+        assert [r['eip'] for r in positive] == ['20', '1559']
+        assert negative[0]['eip'] == '721'
+        assert negative[0]['unified_compound'] == pytest.approx(-0.5)
+        assert [r['eip'] for r in busy] == ['721']
+
+    def test_leaderboard_rejects_unknown_order(self, client):
+        """Test invalid orderings return 400"""
+        assert client.get('/api/global/leaderboard?order=random').status_code == 400
+
+    def test_summary_endpoint(self, client, test_app):
+        """Test the summary endpoint reads the running totals"""
+        assert json.loads(client.get('/api/global/summary').data)['eip_count'] == 0
+        with test_app.app_context():
+            add_to_rollup('hash-g', _aggregates(['20'], [0.5]))
+
+        data = json.loads(client.get('/api/global/summary').data)
+
+        assert data['eip_count'] == 1
+        assert data['avg_comment_compound'] == pytest.approx(0.5)
+
+    def test_rollup_cli_backfills_jobs(self, test_app, runner, tmp_path):
+        """Test the rollup-jobs command hashes old uploads and adds each once"""
+        (tmp_path / 'old.csv').write_text('topic\nEIP-721\n')
+        with test_app.app_context():
+            db.session.add(AnalysisJob(id='rollup-job-2', filename='old.csv', original_filename='old.csv',
+                                       status='completed'))
+            db.session.add(EIPSentiment(job_id='rollup-job-2', eip='721', unified_compound=-0.3, unified_pos=0.0,
+                                        unified_neg=0.3, unified_neu=0.7, total_comment_count=3))
+            db.session.commit()
+
+            with patch.dict(app.config, {'UPLOAD_FOLDER': str(tmp_path)}):
+                first = runner.invoke(args=['rollup-jobs'])
+                second = runner.invoke(args=['rollup-jobs'])
+
+            assert 'Added 1 jobs' in first.output
+            assert 'Added 0 jobs' in second.output
+            assert db.session.get(GlobalEIPSentiment, '721').comment_count == 3
@@ -0,0 +1,206 @@
+"""
+Tests for appending new comments to an existing job
+"""
+
+import io
+import os
+import json
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from app import app, db, AnalysisJob, OutputFile, EIPSentiment, GlobalEIPSentiment
+from incremental_append import append_comments
+from partial_aggregates import PartialAggregates, PARTIAL_AGGREGATES_FILENAME
+from quantile_sketch import CompoundSketch
+from score_store import write_score_store, ScoreStoreReader, SCORE_STORE_FILENAME
+from eip_metadata import get_or_create_snapshot, metadata_ids_by_eip, normalize_metadata_frame
+from sentiment_analyzer import SentimentAnalyzer
+
+
+def _fake_scores(text):
+    compound = 0.5 if 'good' in text else -0.5
+    return {'compound': compound, 'pos': max(compound, 0), 'neg': max(-compound, 0), 'neu': 0.5}
+
+
+def _comments(topics, paragraphs):
+    return pd.DataFrame({
+        'topic': topics,
+        'paragraphs': paragraphs,
+        'headings': [''] * len(topics),
+        'unordered_lists': [''] * len(topics),
+    })
+
+
+BASE = _comments(['EIP-20 thread', 'EIP-20 thread', 'ERC-721 thread'], ['good', 'good', 'bad'])
+DELTA = _comments(['EIP-20 thread', 'EIP-1559 thread'], ['bad', 'good'])
+
+# EIP-4844 has no metadata, so a full run drops it
+METADATA = pd.DataFrame({
+    'eip': ['20', '721', '1559'], 'status': ['Final'] * 3, 'title': ['Token', 'NFT', 'Fee market'],
+    'author': [''] * 3, 'category': ['ERC', 'ERC', 'Core'],
+})
+
+
+@pytest.fixture
+def analyzer():
+    with patch('sentiment_analyzer.SentimentIntensityAnalyzer') as mock_vader:
+        mock_vader.return_value.polarity_scores.side_effect = _fake_scores
+        yield SentimentAnalyzer()
+
+
+def _completed_job(job_id, analyzer, tmp_path, save_aggregates=True):
+    """Store a job the way a full run over BASE leaves it"""
+    base_file = tmp_path / 'base.csv'
+    BASE.to_csv(base_file, index=False)
+    scores = analyzer._comment_scores_by_eip(analyzer._score_comments(analyzer._load_comments(str(base_file))))
+    aggregates = PartialAggregates().add(scores)
+    snapshot = get_or_create_snapshot(normalize_metadata_frame(METADATA))
+    metadata_ids = metadata_ids_by_eip(snapshot)
+
+    job = AnalysisJob()
+    job.id = job_id
+    job.filename = 'base.csv'
+    job.original_filename = 'base.csv'
+    job.status = 'completed'
+    job.metadata_snapshot_id = snapshot.id
+    db.session.add(job)
+    for record in aggregates.unified().to_dict('records'):
+        if record['eip'] not in metadata_ids:
+            continue
+        sketch = CompoundSketch.from_scores(scores.loc[scores['eip'] == record['eip'], 'compound'])
+        db.session.add(EIPSentiment(job_id=job_id, compound_sketch=sketch.to_string(), compound_ci_low=-1.0,
+                                    compound_ci_high=1.0, metadata_id=metadata_ids[record['eip']], **record))
+    store_path = write_score_store(str(tmp_path / SCORE_STORE_FILENAME), scores)
+    db.session.add(OutputFile(job_id=job_id, filename=SCORE_STORE_FILENAME, file_path=store_path,
+                              file_type='comment_scores', file_size=os.path.getsize(store_path)))
+    if save_aggregates:
+        path = aggregates.to_csv(str(tmp_path / PARTIAL_AGGREGATES_FILENAME))
+        db.session.add(OutputFile(job_id=job_id, filename=PARTIAL_AGGREGATES_FILENAME, file_path=path,
+                                  file_type='partial_aggregates', file_size=os.path.getsize(path)))
+    db.session.commit()
+
+
+class TestAppendComments:
+    """Test merging delta aggregates into stored ones"""
+
+    def test_append_matches_full_rescore(self, test_app, analyzer, tmp_path):
+        """Test unified scores equal those of scoring base and delta together"""
+        delta_file = tmp_path / 'delta.csv'
+        DELTA.to_csv(delta_file, index=False)
+        with test_app.app_context():
+            _completed_job('append-job-1', analyzer, tmp_path)
+
+            result = append_comments('append-job-1', str(delta_file), analyzer)
+
+            rows = {r.eip: r for r in EIPSentiment.query.filter_by(job_id='append-job-1')}
+            assert result == {'job_id': 'append-job-1', 'comments': 2, 'updated': 1, 'added': 1}
+            assert rows['20'].unified_compound == pytest.approx(0.5 / 3)
+            assert rows['20'].total_comment_count == 3
+            assert -0.5 <= rows['20'].compound_ci_low <= rows['20'].unified_compound <= rows['20'].compound_ci_high
+            assert CompoundSketch.from_string(rows['20'].compound_sketch).count == 3
+            assert rows['721'].unified_compound == pytest.approx(-0.5)
+            assert rows['721'].compound_ci_low == -1.0
+            assert rows['1559'].total_comment_count == 1
+            assert db.session.get(GlobalEIPSentiment, '1559').comment_count == 1
+
+    def test_append_matches_full_rerun_rows_and_comments(self, test_app, analyzer, tmp_path):
+        """Test an append leaves the rows and stored comments of a full Stage 1 run over base and delta"""
+        delta = pd.concat([DELTA, _comments(['EIP-4844 thread'], ['good'])], ignore_index=True)
+        delta_file = tmp_path / 'delta.csv'
+        delta.to_csv(delta_file, index=False)
+        full_file, full_dir = tmp_path / 'full.csv', tmp_path / 'full'
+        pd.concat([BASE, delta], ignore_index=True).to_csv(full_file, index=False)
+        full_dir.mkdir()
+        with patch('sentiment_analyzer.fetch_eip_metadata', return_value=METADATA):
+            analyzer.run_stage1(str(full_file), str(full_dir))
+        full = pd.read_csv(full_dir / 'unified_sentiment_summary.csv', dtype={'eip': str}).set_index('eip')
+        with test_app.app_context():
+            _completed_job('append-job-7', analyzer, tmp_path)
+
+            append_comments('append-job-7', str(delta_file), analyzer)
+
+            rows = {r.eip: r for r in EIPSentiment.query.filter_by(job_id='append-job-7')}
+            assert set(rows) == set(full.index) == {'20', '721', '1559'}
+            for eip, expected in full.iterrows():
+                assert rows[eip].unified_compound == pytest.approx(expected['unified_compound'], abs=1e-4)
+                assert rows[eip].total_comment_count == expected['total_comment_count']
+
+            appended = ScoreStoreReader(str(tmp_path / SCORE_STORE_FILENAME))
+            rerun = ScoreStoreReader(str(full_dir / SCORE_STORE_FILENAME))
+            assert set(appended.groups) == set(rerun.groups)
+            for eip in rerun.groups:
+                columns = ['compound', 'text']
+                assert appended.read_eip(eip)[columns].equals(rerun.read_eip(eip)[columns])
+            assert appended.read_all()['row'].is_unique
+
+    def test_repeated_appends_accumulate(self, test_app, analyzer, tmp_path):
+        """Test each append builds on the sums saved by the previous one"""
+        delta_file = tmp_path / 'delta.csv'
+        DELTA.to_csv(delta_file, index=False)
+        with test_app.app_context():
+            _completed_job('append-job-2', analyzer, tmp_path)
+
+            append_comments('append-job-2', str(delta_file), analyzer)
+            append_comments('append-job-2', str(delta_file), analyzer)
+
+            row = EIPSentiment.query.filter_by(job_id='append-job-2', eip='20').one()
+            assert row.total_comment_count == 4
+            assert row.unified_compound == pytest.approx(0.0)
+
+    def test_append_without_saved_aggregates(self, test_app, analyzer, tmp_path):
+        """Test jobs from before sums were saved are rebuilt from their stored means"""
+        delta_file = tmp_path / 'delta.csv'
+        DELTA.to_csv(delta_file, index=False)
+        with test_app.app_context():
+            _completed_job('append-job-3', analyzer, tmp_path, save_aggregates=False)
+            with patch.dict(app.config, {'OUTPUT_FOLDER': str(tmp_path / 'outputs')}):
+                append_comments('append-job-3', str(delta_file), analyzer)
+
+            row = EIPSentiment.query.filter_by(job_id='append-job-3', eip='20').one()
+            assert row.unified_compound == pytest.approx(0.5 / 3)
+            assert OutputFile.query.filter_by(job_id='append-job-3', file_type='partial_aggregates').count() == 1
+
+
+class TestAppendEndpoint:
+    """Test the delta upload API"""
+
+    def _job(self, job_id, status):
+        job = AnalysisJob()
+        job.id = job_id
+        job.filename = 'base.csv'
+        job.original_filename = 'base.csv'
+        job.status = status
+        db.session.add(job)
+        db.session.commit()
+
+    @patch('app.append_csv_background')
+    def test_append_queues_delta(self, mock_background, client, test_app):
+        """Test a valid delta is saved and processed in the background"""
+        with test_app.app_context():
+            self._job('append-job-4', 'completed')
+
+        response = client.post('/api/job/append-job-4/append', data={
+            'file': (io.BytesIO(DELTA.to_csv(index=False).encode()), 'delta.csv')
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 202
+        job_id, filepath = mock_background.call_args[0]
+        assert job_id == 'append-job-4'
+        os.remove(filepath)
+
+    def test_append_rejects_bad_requests(self, client, test_app):
+        """Test running jobs and malformed deltas are refused"""
+        with test_app.app_context():
+            self._job('append-job-5', 'processing')
+            self._job('append-job-6', 'completed')
+
+        running = client.post('/api/job/append-job-5/append', data={
+            'file': (io.BytesIO(DELTA.to_csv(index=False).encode()), 'delta.csv')
+        }, content_type='multipart/form-data')
+        malformed = client.post('/api/job/append-job-6/append', data={
+            'file': (io.BytesIO(b'topic\nEIP-20\n'), 'delta.csv')
+        }, content_type='multipart/form-data')
+
+        assert running.status_code == 400
+        assert malformed.status_code == 400
+        assert 'missing required columns' in json.loads(malformed.data)['error']
@@ -0,0 +1,149 @@
+"""
+Tests for static Solidity interface detection
+"""
+
+import json
+from unittest.mock import patch, AsyncMock
+from app import db, AnalysisJob, EIPSentiment
+from interface_detector import keccak256, selector, interface_id, detect_interfaces, recommend_eips
+
+ERC20_CONTRACT = """
+contract Token {
+    mapping(address => uint256) public balanceOf;
+    mapping(address => mapping(address => uint256)) public allowance;
+    uint256 public totalSupply;
+    event Transfer(address indexed from, address indexed to, uint256 value);
+    event Approval(address indexed owner, address indexed spender, uint256 value);
+    function transfer(address to, uint amount) external returns (bool) {}
+    function approve(address spender, uint256 amount) external returns (bool) {}
+    function transferFrom(address from, address to, uint256 amount) public returns (bool) {}
+    // function ownerOf(uint256 tokenId) external view returns (address) {}
+}
+"""
+
+ERC721_CONTRACT = """
+contract Collectible {
+    event Transfer(address indexed from, address indexed to, uint256 indexed tokenId);
+    event Approval(address indexed owner, address indexed approved, uint256 indexed tokenId);
+    event ApprovalForAll(address indexed owner, address indexed operator, bool approved);
+    function balanceOf(address owner) external view returns (uint256) {}
+    function ownerOf(uint256 tokenId) external view returns (address) {}
+    function safeTransferFrom(address from, address to, uint256 tokenId, bytes calldata data) external payable {}
+    function safeTransferFrom(address from, address to, uint256 tokenId) external payable {}
+    function transferFrom(address from, address to, uint256 tokenId) external payable {}
+    function approve(address approved, uint256 tokenId) external payable {}
+    function setApprovalForAll(address operator, bool approved) external {}
+    function getApproved(uint256 tokenId) external view returns (address) {}
+    function isApprovedForAll(address owner, address operator) external view returns (bool) {}
+    function _mint(address to, uint256 tokenId) internal {}
+}
+"""
+
+
+class TestSelectors:
+    """Test hashing matches the values Ethereum tooling produces"""
+
+    def test_keccak_empty_input(self):
+        """Test the Keccak-256 digest of empty input"""
+        assert keccak256(b"").hex() == "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"
+
+    def test_function_selector(self):
+        """Test the ERC-20 transfer selector"""
+        assert selector("transfer(address,uint256)") == "0xa9059cbb"
+
+    def test_erc721_interface_id(self):
+        """Test the ERC-721 interface ID is the XOR of its function selectors"""
+        assert interface_id([
+            "balanceOf(address)", "ownerOf(uint256)", "safeTransferFrom(address,address,uint256,bytes)",
+            "safeTransferFrom(address,address,uint256)", "transferFrom(address,address,uint256)",
+            "approve(address,uint256)", "setApprovalForAll(address,bool)", "getApproved(uint256)",
+            "isApprovedForAll(address,address)",
+        ]) == "0x80ac58cd"
+
+
+class TestDetectInterfaces:
+    """Test contracts are matched to the standards they implement"""
+
+    def test_erc20_with_public_getters(self):
+        """Test public state variables count as functions and commented-out code is ignored"""
+        matches = {match['eip_number']: match for match in detect_interfaces(ERC20_CONTRACT)}
+
+        assert set(matches) == {'20'}
+        assert matches['20']['confidence'] == 1.0
+        assert matches['20']['missing'] == []
+
+    def test_erc721_is_not_erc20(self):
+        """Test ERC-721 functions shared in name with ERC-20 do not produce an ERC-20 match"""
+        eips = [rec['eip_number'] for rec in recommend_eips(ERC721_CONTRACT)]
+
+        assert eips == ['721']
+
+    def test_inherited_bases_and_interface_ids(self):
+        """Test OpenZeppelin-style bases and interface ID literals are evidence on their own"""
+        source = """
+        contract Collectible is ERC721, ERC2981, Ownable {
+            function supportsInterface(bytes4 id) public view override returns (bool) {
+                return id == 0x80ac58cd || super.supportsInterface(id);
+            }
+        }
+        """
+        matches = {match['eip_number']: match for match in detect_interfaces(source)}
+
+        assert {'165', '173', '721', '2981'} <= set(matches)
+        assert matches['721']['confidence'] >= 0.95
+        assert '1155' not in matches
+
+
+class TestStaticRecommendations:
+    """Test the analysis endpoint answers from static detection first"""
+
+    def _add_job(self, test_app):
+        with test_app.app_context():
+            db.session.add(AnalysisJob(id='static-job', filename='a.csv', original_filename='a.csv'))
+            for eip, title, compound in (('20', 'Token Standard', 0.4), ('721', 'Non-Fungible Token Standard', 0.2),
+                                         ('2612', 'Permit Extension for EIP-20 Signed Approvals', 0.1)):
+                row = EIPSentiment(job_id='static-job', eip=eip, total_comment_count=10, unified_compound=compound)
+                row.title, row.status = title, 'Final'
+                db.session.add(row)
+            db.session.commit()
+
+    def test_static_only_skips_llm(self, client, test_app):
+        """Test use_llm false returns signature matches with sentiment and never builds an LLM client"""
+        self._add_job(test_app)
+
+        with patch('smart_contract_generator.EIPCodeGenerator') as generator:
+            response = client.post('/api/analyze-code-and-recommend', json={
+                'job_id': 'static-job', 'contract_code': ERC20_CONTRACT, 'use_llm': False
+            })
+
+        result = json.loads(response.data)
+        assert result['success'] is True, result
+        assert [rec['eip_number'] for rec in result['recommendations']] == ['20']
+        assert result['recommendations'][0]['source'] == 'static'
+        assert result['recommendations'][0]['sentiment_score'] == 0.4
+        assert 'EIP-20' in result['analysis']
+        generator.assert_not_called()
+
+    def test_llm_adds_to_static_matches(self, client, test_app):
+        """Test the LLM only contributes EIPs not already matched, and its failure keeps the static matches"""
+        self._add_job(test_app)
+        llm_result = {'success': True, 'analysis': 'ok', 'eip_recommendations': [
+            {'eip_number': '20', 'reason': 'token', 'confidence': 0.6},
+            {'eip_number': '2612', 'reason': 'gasless approvals', 'confidence': 0.7},
+        ]}
+
+        with patch('smart_contract_generator.EIPCodeGenerator') as generator:
+            generator.return_value.aanalyze_code_and_recommend_eips = AsyncMock(return_value=llm_result)
+            merged = json.loads(client.post('/api/analyze-code-and-recommend', json={
+                'job_id': 'static-job', 'contract_code': ERC20_CONTRACT
+            }).data)
+            generator.return_value.aanalyze_code_and_recommend_eips.return_value = {'success': False, 'error': 'down'}
+            fallback = json.loads(client.post('/api/analyze-code-and-recommend', json={
+                'job_id': 'static-job', 'contract_code': ERC20_CONTRACT
+            }).data)
+
+        assert [(rec['eip_number'], rec['source']) for rec in merged['recommendations']] == [
+            ('20', 'static'), ('2612', 'llm')]
+        assert fallback['success'] is True
+        assert fallback['llm_error'] == 'down'
+        assert [rec['eip_number'] for rec in fallback['recommendations']] == ['20']
@@ -0,0 +1,216 @@
+"""
+Tests for sharded execution of a single analysis job
+"""
+
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from app import app, db, AnalysisJob, JobShard, EIPSentiment
+from job_shards import (
+    split_input, split_job, claim_shard, process_shard, run_worker, MAX_SHARD_ATTEMPTS
+)
+from sentiment_analyzer import SentimentAnalyzer
+from score_store import ScoreStoreReader, SCORE_STORE_FILENAME
+
+
+def _fake_scores(text):
+    compound = 0.6 if 'good' in text else -0.4
+    return {'compound': compound, 'pos': max(compound, 0), 'neg': max(-compound, 0), 'neu': 0.4}
+
+
+def _write_comments(path):
+    topics = ['EIP-20 thread'] * 4 + ['ERC-20 standard'] * 3 + ['EIP-1559 fees'] * 5 + ['ERC-721 thread'] * 2
+    pd.DataFrame({
+        'topic': topics,
+        'paragraphs': ['good', 'bad', 'good', 'good', 'bad', 'bad', 'good',
+                       'good', 'good', 'bad', 'good', 'bad', 'good, really', 'bad'],
+        'headings': [''] * len(topics),
+        'unordered_lists': [''] * len(topics),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+METADATA = pd.DataFrame({
+    'eip': ['20', '1559', '721'], 'status': ['Final'] * 3, 'title': ['Token', 'Fee market', 'NFT'],
+    'author': [''] * 3, 'category': ['ERC', 'Core', 'ERC'], 'type': ['Standards Track'] * 3,
+    'created': [''] * 3,
+})
+
+
+@pytest.fixture
+def analyzer():
+    with patch('sentiment_analyzer.SentimentIntensityAnalyzer') as mock_vader, \
+            patch('sentiment_analyzer.fetch_eip_metadata', return_value=METADATA):
+        mock_vader.return_value.polarity_scores.side_effect = _fake_scores
+        yield SentimentAnalyzer()
+
+
+def _split_job(job_id, input_file, shard_count, tmp_path):
+    job = AnalysisJob(id=job_id, filename='comments.csv', original_filename='comments.csv', status='queued')
+    db.session.add(job)
+    db.session.commit()
+    with patch.dict(app.config, {'OUTPUT_FOLDER': str(tmp_path / 'outputs')}):
+        split_job(job, input_file, shard_count)
+    return job
+
+
+class TestSplitInput:
+    """Test uploads are partitioned by topic hash"""
+
+    def test_topics_stay_in_one_shard(self, tmp_path):
+        """Test every row lands in exactly one shard and a topic never spans shards"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+
+        shards = split_input(input_file, str(tmp_path / 'shards'), 3, chunk_rows=4)
+        frames = [pd.read_csv(path) for path, _ in shards]
+
+        assert sum(count for _, count in shards) == 14
+        assert [len(frame) for frame in frames] == [count for _, count in shards]
+        owners = {}
+        for index, frame in enumerate(frames):
+            for topic in frame['topic']:
+                assert owners.setdefault(topic, index) == index
+
+
+class TestShardedStage1:
+    """Test merged shard outputs reproduce a single-node Stage 1"""
+
+    def test_matches_single_node_run(self, analyzer, tmp_path):
+        """Test unified scores, counts and sketches equal those of run_stage1"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        single_dir, sharded_dir = tmp_path / 'single', tmp_path / 'sharded'
+        single_dir.mkdir()
+        sharded_dir.mkdir()
+
+        analyzer.run_stage1(input_file, str(single_dir))
+        outputs = [
+            analyzer.run_shard(path, os.path.splitext(path)[0])
+            for path, _ in split_input(input_file, str(sharded_dir / 'shards'), 3)
+        ]
+        analyzer.run_stage1_from_shards(outputs, str(sharded_dir))
+
+        single = pd.read_csv(single_dir / 'unified_sentiment_summary.csv').set_index('eip').sort_index()
+        sharded = pd.read_csv(sharded_dir / 'unified_sentiment_summary.csv').set_index('eip').sort_index()
+        columns = ['unified_compound', 'unified_pos', 'unified_neg', 'unified_neu', 'total_comment_count',
+                   'compound_p50', 'polarization', 'compound_sketch']
+        pd.testing.assert_frame_equal(sharded[columns], single[columns], check_exact=False)
+        assert sharded['compound_ci_low'].notna().all()
+        assert (sharded['compound_ci_low'] <= sharded['unified_compound']).all()
+        assert (sharded['unified_compound'] <= sharded['compound_ci_high']).all()
+
+    def test_score_store_built_from_shards(self, analyzer, tmp_path):
+        """Test the merged job keeps every comment for drill-down, with rows unique across shards"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        single_dir, sharded_dir = tmp_path / 'single', tmp_path / 'sharded'
+        single_dir.mkdir()
+        sharded_dir.mkdir()
+
+        analyzer.run_stage1(input_file, str(single_dir))
+        outputs = [
+            analyzer.run_shard(path, os.path.splitext(path)[0])
+            for path, _ in split_input(input_file, str(sharded_dir / 'shards'), 3)
+        ]
+        analyzer.run_stage1_from_shards(outputs, str(sharded_dir))
+
+        single = ScoreStoreReader(str(single_dir / SCORE_STORE_FILENAME))
+        sharded = ScoreStoreReader(str(sharded_dir / SCORE_STORE_FILENAME))
+        comments = sharded.read_all()
+        assert {eip: group['rows'] for eip, group in sharded.groups.items()} == \
+            {eip: group['rows'] for eip, group in single.groups.items()}
+        assert sorted(comments['text']) == sorted(single.read_all()['text'])
+        # A comment about both EIP-20 and ERC-20 appears under one key per mention, with the same row
+        assert comments.groupby('row')['text'].nunique().max() == 1
+
+
+class TestShardClaims:
+    """Test workers claim, retry and finish shards through the database"""
+
+    def test_claims_are_exclusive(self, test_app, tmp_path):
+        """Test two workers never get the same shard and completed shards are not handed out"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        with test_app.app_context():
+            _split_job('shard-job-1', input_file, 2, tmp_path)
+
+            first = claim_shard('worker-a')
+            second = claim_shard('worker-b')
+
+            assert {first.shard_index, second.shard_index} == {0, 1}
+            assert claim_shard('worker-c') is None
+
+    def test_expired_lease_is_reclaimed(self, test_app, tmp_path):
+        """Test a shard whose worker stopped renewing its lease goes to another worker"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        with test_app.app_context():
+            _split_job('shard-job-2', input_file, 1, tmp_path)
+            shard = claim_shard('worker-a')
+            shard.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+
+            reclaimed = claim_shard('worker-b')
+
+            assert reclaimed.id == shard.id
+            assert reclaimed.worker_id == 'worker-b'
+            assert reclaimed.attempts == 2
+
+    def test_failed_shard_retried_without_redoing_completed(self, analyzer, test_app, tmp_path):
+        """Test only the shard that failed is scored again"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        with test_app.app_context():
+            _split_job('shard-job-3', input_file, 2, tmp_path)
+            done = claim_shard('worker-a')
+            assert process_shard(done, 'worker-a', analyzer)
+
+            failing = claim_shard('worker-b')
+            with patch.object(analyzer, 'run_shard', side_effect=RuntimeError('node lost')):
+                assert not process_shard(failing, 'worker-b', analyzer)
+            failing = db.session.get(JobShard, failing.id)
+            assert failing.status == 'pending'
+            assert failing.error_message == 'node lost'
+
+            retried = claim_shard('worker-c')
+            assert retried.id == failing.id
+            assert db.session.get(JobShard, done.id).attempts == 1
+
+    def test_exhausted_attempts_fail_job(self, analyzer, test_app, tmp_path):
+        """Test a shard that keeps failing marks the whole job as errored"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        with test_app.app_context():
+            _split_job('shard-job-4', input_file, 1, tmp_path)
+            with patch.object(analyzer, 'run_shard', side_effect=RuntimeError('bad shard')):
+                for attempt in range(MAX_SHARD_ATTEMPTS):
+                    process_shard(claim_shard(f'worker-{attempt}'), f'worker-{attempt}', analyzer)
+
+            job = db.session.get(AnalysisJob, 'shard-job-4')
+            assert job.status == 'error'
+            assert claim_shard('worker-z') is None
+            assert JobShard.query.filter_by(job_id='shard-job-4').one().status == 'failed'
+
+
+def _stage3_from_summary(output_dir):
+    final_file = os.path.join(output_dir, 'final_merged_analysis.csv')
+    pd.read_csv(os.path.join(output_dir, 'unified_sentiment_summary.csv')).to_csv(final_file, index=False)
+    return [final_file]
+
+
+class TestShardWorker:
+    """Test a worker scores every shard and then finalizes the job"""
+
+    def test_worker_completes_job(self, analyzer, test_app, tmp_path):
+        """Test the last shard triggers the merge and the job ends with final rows"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        with test_app.app_context():
+            _split_job('shard-job-5', input_file, 3, tmp_path)
+            with patch.dict(app.config, {'OUTPUT_FOLDER': str(tmp_path / 'outputs')}), \
+                    patch.object(analyzer, 'run_stage2'), \
+                    patch.object(analyzer, 'run_stage3', side_effect=_stage3_from_summary):
+                completed = run_worker('worker-a', once=True, analyzer=analyzer)
+
+            job = db.session.get(AnalysisJob, 'shard-job-5')
+            rows = {row.eip: row for row in EIPSentiment.query.filter_by(job_id='shard-job-5')}
+
+            assert completed == 3
+            assert job.status == 'completed'
+            assert job.result_kind == 'final'
+            assert rows['20'].total_comment_count == 7
@@ -0,0 +1,91 @@
+"""
+Tests for the shared OpenAI client and the LLM response cache
+"""
+
+import json
+import time
+from unittest.mock import patch, MagicMock
+from llm_cache import LLMCache, request_key, normalize_solidity
+from smart_contract_generator import EIPCodeGenerator
+
+CONTRACT = """
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+/// @notice A token
+contract Token {
+    string public url = "https://example.org";
+    function transfer(address to, uint256 amount) external returns (bool) { return true; }
+}
+"""
+
+REFORMATTED = """pragma solidity ^0.8.0;
+contract Token {
+  /* moved things around */
+  string public url = "https://example.org";
+  function transfer(address to, uint256 amount) external returns (bool) {
+      return true; // always
+  }
+}"""
+
+
+def _mock_openai(content):
+    client = MagicMock()
+    client.chat.completions.create.return_value.choices[0].message.content = content
+    return client
+
+
+class TestLLMCache:
+    """Test cache keys, expiry, eviction and hit accounting"""
+
+    def test_code_formatting_does_not_change_key(self):
+        """Test comments and whitespace in the contract map to the same key, but string contents do not"""
+        def key(code):
+            return request_key(model='gpt-4o', messages=[{'role': 'user', 'content': f"Audit\n```solidity\n{code}\n```"}],
+                               temperature=0.2)
+
+        assert key(CONTRACT) == key(REFORMATTED)
+        assert key(CONTRACT) != key(CONTRACT.replace('example.org', 'example.com'))
+        assert 'https://example.org' in normalize_solidity(CONTRACT)
+
+    def test_parameters_are_part_of_key(self):
+        """Test a different model or temperature is a different request"""
+        messages = [{'role': 'user', 'content': 'hello'}]
+
+        assert request_key('gpt-4o', messages, temperature=0.1) != request_key('gpt-4o', messages, temperature=0.2)
+        assert request_key('gpt-4o', messages) != request_key('gpt-4o-mini', messages)
+
+    def test_entries_expire(self, tmp_path):
+        """Test an entry older than the TTL is a miss"""
+        cache = LLMCache(str(tmp_path / 'cache.sqlite3'), ttl_seconds=60)
+        cache.set('k', 'v')
+
+        assert cache.get('k') == 'v'
+        with patch('llm_cache.time.time', return_value=time.time() + 120):
+            assert cache.get('k') is None
+
+    def test_size_limit_evicts_least_recently_used(self, tmp_path):
+        """Test writes past max_bytes drop the entries used longest ago"""
+        cache = LLMCache(str(tmp_path / 'cache.sqlite3'), max_bytes=25)
+        cache.set('a', 'x' * 10)
+        cache.set('b', 'y' * 10)
+        cache.get('a')
+
+        cache.set('c', 'z' * 10)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 'x' * 10
+        assert cache.stats()['size_bytes'] == 20
+
+    def test_hit_rate_is_reported(self, tmp_path, client, monkeypatch):
+        """Test hits and misses are counted and exposed by the stats endpoint"""
+        monkeypatch.setenv('LLM_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+        with patch('smart_contract_generator.OpenAI', return_value=_mock_openai('Looks safe')) as mock_openai:
+            EIPCodeGenerator().analyze_contract_security(CONTRACT)
+            second = EIPCodeGenerator().analyze_contract_security(REFORMATTED)
+
+        stats = json.loads(client.get('/api/llm-cache').data)
+        assert second == {'success': True, 'analysis': 'Looks safe'}
+        assert mock_openai.call_count == 1
+        assert mock_openai.return_value.chat.completions.create.call_count == 1
+        assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
@@ -0,0 +1,280 @@
+"""
+Tests for the LLM request scheduler
+"""
+
+import time
+import asyncio
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+from llm_scheduler import LLMScheduler, INTERACTIVE, BATCH, estimate_tokens, rate_limit_delay
+from smart_contract_generator import EIPCodeGenerator
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.01)
+
+
+class TestBudgets:
+    """Test request and token budgets are enforced"""
+
+    def test_token_estimate_counts_max_tokens(self):
+        """Test the estimate is the prompt at four characters a token plus the reserved max_tokens"""
+        assert estimate_tokens({'messages': [{'role': 'user', 'content': 'x' * 400}], 'max_tokens': 2000}) == 2100
+
+    def test_waits_for_token_refill(self):
+        """Test a request larger than the tokens left waits until the bucket has refilled enough"""
+        clock = FakeClock()
+        scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=6000, clock=clock)
+        scheduler.acquire(5000)
+        admitted = threading.Event()
+        thread = threading.Thread(target=lambda: (scheduler.acquire(3000), admitted.set()))
+        thread.start()
+
+        _wait_until(lambda: scheduler.stats()['waiting'] == 1)
+        clock.now += 10  # 1,000 tokens back: 2,000 available, still short
+        assert not admitted.wait(0.4)
+        clock.now += 10
+        assert admitted.wait(1.0)
+        thread.join()
+
+    def test_interactive_admitted_before_batch(self):
+        """Test an interactive caller overtakes a batch caller that was already waiting"""
+        clock = FakeClock()
+        scheduler = LLMScheduler(requests_per_minute=1, tokens_per_minute=0, clock=clock)
+        scheduler.acquire(0)
+        order = []
+
+        def call(priority, name):
+            scheduler.acquire(0, priority)
+            order.append(name)
+
+        batch = threading.Thread(target=call, args=(BATCH, 'batch'))
+        batch.start()
+        _wait_until(lambda: scheduler.stats()['waiting'] == 1)
+        interactive = threading.Thread(target=call, args=(INTERACTIVE, 'interactive'))
+        interactive.start()
+        _wait_until(lambda: scheduler.stats()['waiting'] == 2)
+
+        clock.now += 60
+        _wait_until(lambda: order)
+        clock.now += 60
+        batch.join(2)
+        interactive.join(2)
+        assert order == ['interactive', 'batch']
+
+    def test_rate_limit_pauses_everyone(self):
+        """Test a 429 with Retry-After holds back every caller until it has passed"""
+        clock = FakeClock()
+        scheduler = LLMScheduler(clock=clock)
+        error = MagicMock(status_code=429)
+        error.response.headers = {'retry-after': '20'}
+
+        scheduler.pause(rate_limit_delay(error))
+        thread = threading.Thread(target=scheduler.acquire, args=(100,))
+        thread.start()
+        thread.join(0.4)
+        assert thread.is_alive()
+        clock.now += 20
+        thread.join(1.0)
+
+        assert not thread.is_alive()
+        assert scheduler.stats()['rate_limited'] == 1
+        assert rate_limit_delay(RuntimeError('boom')) is None
+
+
+class TestCoalescing:
+    """Test identical concurrent requests share one upstream call"""
+
+    def test_concurrent_callers_share_result(self):
+        """Test callers arriving while a request is in flight get its result without calling again"""
+        scheduler = LLMScheduler()
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(2)
+            return 'contract Token {}'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(scheduler.coalesce('same', fetch)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        _wait_until(lambda: scheduler.stats()['coalesced'] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ['contract Token {}'] * 3
+        assert scheduler.stats()['in_flight'] == 0
+
+    def test_failure_fans_out(self):
+        """Test waiters see the leader's error, and a later call goes upstream again"""
+        scheduler = LLMScheduler()
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing():
+            started.set()
+            release.wait(2)
+            raise RuntimeError('upstream down')
+
+        errors = []
+
+        def call():
+            try:
+                scheduler.coalesce('key', failing)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(1)
+        follower = threading.Thread(target=call)
+        follower.start()
+        _wait_until(lambda: scheduler.stats()['coalesced'] == 1)
+        release.set()
+        leader.join()
+        follower.join()
+
+        assert errors == ['upstream down', 'upstream down']
+        assert scheduler.coalesce('key', lambda: 'ok') == 'ok'
+
+    def test_async_caller_joins_sync_call(self):
+        """Test a coroutine on the event loop waits on the same in-flight call as a thread"""
+        scheduler = LLMScheduler()
+        release = threading.Event()
+        thread = threading.Thread(target=scheduler.coalesce, args=('key', lambda: release.wait(2) and 'shared'))
+        thread.start()
+        _wait_until(lambda: scheduler.stats()['in_flight'] == 1)
+
+        async def never_called():
+            raise AssertionError('sent a duplicate request')
+
+        async def wait():
+            threading.Timer(0.1, release.set).start()
+            return await scheduler.coalesce_async('key', never_called)
+
+        assert asyncio.run(wait()) == 'shared'
+        thread.join()
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        """Test callers waiting on a leader that is cancelled make the call themselves instead of being cancelled"""
+        scheduler = LLMScheduler()
+        thread_results = []
+
+        async def scenario():
+            started = asyncio.Event()
+
+            async def hang():
+                started.set()
+                await asyncio.sleep(10)
+
+            async def answer():
+                return 'retried'
+
+            leader = asyncio.ensure_future(scheduler.coalesce_async('key', hang))
+            await started.wait()
+            follower = asyncio.ensure_future(scheduler.coalesce_async('key', answer))
+            thread = threading.Thread(target=lambda: thread_results.append(scheduler.coalesce('key', lambda: 'retried')))
+            thread.start()
+            while scheduler.stats()['coalesced'] < 2:
+                await asyncio.sleep(0.01)
+
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            result = await follower
+            await asyncio.to_thread(thread.join, 2)
+            return result
+
+        assert asyncio.run(scenario()) == 'retried'
+        assert thread_results == ['retried']
+        assert scheduler.stats()['in_flight'] == 0
+
+    def test_cancelled_follower_leaves_call_running(self):
+        """Test a waiting coroutine that is cancelled does not cancel the shared call for the others"""
+        scheduler = LLMScheduler()
+        release = threading.Event()
+        leader = threading.Thread(target=scheduler.coalesce, args=('key', lambda: release.wait(2) and 'shared'))
+        leader.start()
+        _wait_until(lambda: scheduler.stats()['in_flight'] == 1)
+
+        async def never_called():
+            raise AssertionError('sent a duplicate request')
+
+        async def scenario():
+            cancelled = asyncio.ensure_future(scheduler.coalesce_async('key', never_called))
+            waiting = asyncio.ensure_future(scheduler.coalesce_async('key', never_called))
+            await asyncio.sleep(0.05)
+            cancelled.cancel()
+            await asyncio.sleep(0.05)
+            release.set()
+            return await waiting
+
+        assert asyncio.run(scenario()) == 'shared'
+        leader.join()
+
+    def test_follower_stops_waiting_at_its_deadline(self):
+        """Test a caller joining a slower call times out at its own deadline and leaves the call to the others"""
+        scheduler = LLMScheduler()
+        release = threading.Event()
+        results = []
+        leader = threading.Thread(target=lambda: results.append(
+            scheduler.coalesce('key', lambda: release.wait(2) and 'shared')))
+        leader.start()
+        _wait_until(lambda: scheduler.stats()['in_flight'] == 1)
+
+        async def never_called():
+            raise AssertionError('sent a duplicate request')
+
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            scheduler.coalesce('key', lambda: 'duplicate', deadline=time.monotonic() + 0.1)
+        with pytest.raises(TimeoutError):
+            asyncio.run(scheduler.coalesce_async('key', never_called, deadline=time.monotonic() + 0.1))
+        waited = time.monotonic() - started
+        release.set()
+        leader.join()
+
+        assert waited < 1
+        assert results == ['shared']
+        assert scheduler.stats()['in_flight'] == 0
+
+    def test_identical_generations_send_one_request(self):
+        """Test two users generating the same EIP and contract type at once cause one OpenAI call"""
+        client = MagicMock()
+
+        def create(**kwargs):
+            time.sleep(0.2)
+            response = MagicMock()
+            response.choices[0].message.content = 'contract Token {}'
+            return response
+
+        client.chat.completions.create.side_effect = create
+        with patch('smart_contract_generator.shared_client', return_value=client):
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(
+                EIPCodeGenerator().generate_eip_implementation({'eip': '20', 'title': 'Token'}, 'ERC20')))
+                for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        assert client.chat.completions.create.call_count == 1
+        assert [result['generated_code'] for result in results] == ['contract Token {}'] * 2
@@ -0,0 +1,255 @@
+"""
+Tests for the async LLM request path
+"""
+
+import json
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock, AsyncMock
+from app import db, LLMTask, AnalysisJob, EIPSentiment
+from smart_contract_generator import EIPCodeGenerator
+
+
+def _completion(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+
+class GatedStream:
+    """AsyncOpenAI stream stand-in that sends its first fragment, then the rest once released"""
+
+    def __init__(self, first, rest):
+        self.first = first
+        self.rest = rest
+        self.release = threading.Event()
+        self.closed = False
+
+    def _chunk(self, text):
+        return MagicMock(choices=[MagicMock(delta=MagicMock(content=text))])
+
+    async def __aiter__(self):
+        yield self._chunk(self.first)
+        while not self.release.is_set():
+            await asyncio.sleep(0.01)
+        yield self._chunk(self.rest)
+
+    async def close(self):
+        self.closed = True
+
+
+class TestAsyncGenerator:
+    """Test the async generator methods never block a thread"""
+
+    def test_retry_backs_off_without_sleeping_the_thread(self):
+        """Test a failed request is retried after an asyncio.sleep, not time.sleep"""
+        generator = EIPCodeGenerator.__new__(EIPCodeGenerator)
+        generator.cache = None
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(side_effect=[RuntimeError('rate limited'), _completion('ok')])
+
+        with patch('smart_contract_generator.shared_async_client', return_value=client), \
+                patch('smart_contract_generator.asyncio.sleep', new_callable=AsyncMock) as backoff, \
+                patch('smart_contract_generator.time.sleep', side_effect=AssertionError('blocking sleep')):
+            result = asyncio.run(generator.aanalyze_contract_security('contract A {}'))
+
+        assert result == {'success': True, 'analysis': 'ok'}
+        backoff.assert_awaited_once_with(1)
+
+    def test_async_recommendations_keep_security_failure_separate(self):
+        """Test the async analysis returns recommendations when the security completion fails"""
+        generator = EIPCodeGenerator.__new__(EIPCodeGenerator)
+
+        async def achat(timeout=None, **kwargs):
+            return '{"recommendations": [{"eip_number": "20", "confidence": 0.9}]}'
+
+        async def security(code, timeout=None):
+            raise RuntimeError('quota exceeded')
+
+        generator._achat = achat
+        generator.aanalyze_contract_security = security
+        result = asyncio.run(generator.aanalyze_code_and_recommend_eips('contract A {}', 'comprehensive', []))
+
+        assert result['success'] is True
+        assert result['eip_recommendations'][0]['eip_number'] == '20'
+        assert 'quota exceeded' in result['security_error']
+
+
+class TestLLMTaskRoutes:
+    """Test `Prefer: respond-async` answers 202 straight away and the task can be polled"""
+
+    def _poll(self, client, url, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = json.loads(client.get(url).data)
+            if status['status'] != 'running':
+                return status
+            time.sleep(0.05)
+        raise AssertionError('task did not finish')
+
+    def test_accepted_then_completed(self, client):
+        """Test the request returns before the completion does and the poll returns the endpoint's body"""
+        async def create(**kwargs):
+            await asyncio.sleep(0.3)
+            return _completion('// tests')
+
+        async_client = MagicMock()
+        async_client.chat.completions.create = create
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_async_client', return_value=async_client):
+            started = time.monotonic()
+            response = client.post('/api/generate-tests', json={'contract_code': 'contract A {}'},
+                                   headers={'Prefer': 'respond-async'})
+            elapsed = time.monotonic() - started
+            accepted = json.loads(response.data)
+            status = self._poll(client, accepted['status_url'])
+
+        assert response.status_code == 202
+        assert elapsed < 0.3
+        assert accepted['status'] == 'running'
+        assert status['status'] == 'completed'
+        assert status['kind'] == 'generate_tests'
+        assert status['result'] == {'success': True, 'test_code': '// tests'}
+
+    def test_failed_completion_is_reported(self, client):
+        """Test a task whose completion fails ends as failed with the endpoint's error"""
+        async_client = MagicMock()
+        async_client.chat.completions.create = AsyncMock(side_effect=RuntimeError('invalid api key'))
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_async_client', return_value=async_client), \
+                patch('smart_contract_generator.asyncio.sleep', new_callable=AsyncMock):
+            response = client.post('/api/analyze-security', json={'contract_code': 'contract A {}'},
+                                   headers={'Prefer': 'respond-async'})
+            status = self._poll(client, json.loads(response.data)['status_url'])
+
+        assert status['status'] == 'failed'
+        assert 'invalid api key' in status['error']
+        assert status['result']['success'] is False
+
+    def test_code_analysis_finishes_after_request_closed(self, client):
+        """Test the response is built from plain data, so the task completes once the request's session is gone"""
+        db.session.add(AnalysisJob(id='job-721', filename='a.csv', original_filename='a.csv', status='completed'))
+        row = EIPSentiment(job_id='job-721', eip='721', unified_compound=-0.1, total_comment_count=180)
+        row.status = 'Final'
+        row.title = 'EIP-721: Non-Fungible Token Standard'
+        db.session.add(row)
+        db.session.commit()
+        recommendation = json.dumps({'recommendations': [{'eip_number': '721', 'confidence': 0.8}]})
+        async_client = MagicMock()
+        async_client.chat.completions.create = AsyncMock(return_value=_completion(recommendation))
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_async_client', return_value=async_client), \
+                patch('llm_tasks.submit') as submit:
+            response = client.post('/api/analyze-code-and-recommend', headers={'Prefer': 'respond-async'},
+                                   json={'job_id': 'job-721', 'contract_code': 'contract A {}'})
+            # As after the request: the session is closed and its rows detached and expired
+            db.session.remove()
+            asyncio.run(submit.call_args.args[0])
+
+        task = db.session.get(LLMTask, json.loads(response.data)['task_id'])
+        result = json.loads(task.result_json)
+        assert task.status == 'completed'
+        assert result['recommendations'][0]['title'] == 'EIP-721: Non-Fungible Token Standard'
+        assert result['recommendations'][0]['comment_count'] == 180
+
+    def test_task_lost_by_its_worker_reported_failed(self, client):
+        """Test a task still running past its deadline, as after a restart, is reported and stored as failed"""
+        db.session.add_all([
+            LLMTask(id='lost', kind='generate_contract', deadline_at=datetime.utcnow() - timedelta(minutes=1)),
+            LLMTask(id='busy', kind='generate_contract', deadline_at=datetime.utcnow() + timedelta(minutes=5)),
+        ])
+        db.session.commit()
+
+        lost = json.loads(client.get('/api/llm-tasks/lost').data)
+        busy = json.loads(client.get('/api/llm-tasks/busy').data)
+
+        assert lost['status'] == 'failed'
+        assert 'restarted' in lost['error']
+        assert db.session.get(LLMTask, 'lost').status == 'failed'
+        assert busy['status'] == 'running'
+
+    def test_task_cancelled_at_its_timeout(self, client, monkeypatch):
+        """Test a completion still running at the task timeout is cancelled and the task ends as failed"""
+        monkeypatch.setenv('LLM_TASK_TIMEOUT', '0.2')
+
+        async def create(**kwargs):
+            await asyncio.sleep(10)
+
+        async_client = MagicMock()
+        async_client.chat.completions.create = create
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_async_client', return_value=async_client):
+            response = client.post('/api/generate-tests', json={'contract_code': 'contract A {}'},
+                                   headers={'Prefer': 'respond-async'})
+            status = self._poll(client, json.loads(response.data)['status_url'])
+
+        assert status['status'] == 'failed'
+        assert status['error'] == 'Task did not finish within 0.2 seconds'
+
+    def test_default_path_waits_on_the_event_loop(self, client):
+        """Test a request without `Prefer` is answered from the event loop, backing off without time.sleep"""
+        async_client = MagicMock()
+        async_client.chat.completions.create = AsyncMock(side_effect=[RuntimeError('rate limited'),
+                                                                      _completion('// tests')])
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_cache', return_value=None), \
+                patch('smart_contract_generator.shared_async_client', return_value=async_client), \
+                patch('smart_contract_generator.asyncio.sleep', new_callable=AsyncMock), \
+                patch('smart_contract_generator.time.sleep', side_effect=AssertionError('blocking sleep')):
+            response = client.post('/api/generate-tests', json={'contract_code': 'contract A {}'})
+
+        assert json.loads(response.data) == {'success': True, 'test_code': '// tests'}
+
+    def _start_stream(self, client, stream, monkeypatch):
+        monkeypatch.setattr('llm_tasks.PARTIAL_SAVE_INTERVAL', 0)
+        response = client.post('/api/generate-contract/stream', headers={'Prefer': 'respond-async'},
+                               json={'eip_number': '20', 'contract_type': 'ERC20'})
+        url = json.loads(response.data)['status_url']
+        deadline = time.monotonic() + 5
+        while json.loads(client.get(url).data).get('partial') != stream.first:
+            assert time.monotonic() < deadline, 'partial text not saved'
+            time.sleep(0.02)
+        return response, url
+
+    def test_streamed_task_shows_text_so_far(self, client, monkeypatch):
+        """Test polls of a streamed generation include the code written so far, then the endpoint's body"""
+        stream = GatedStream('contract ', 'Token {}')
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_cache', return_value=None), \
+                patch('smart_contract_generator.shared_async_client') as shared:
+            shared.return_value.chat.completions.create = AsyncMock(return_value=stream)
+            response, url = self._start_stream(client, stream, monkeypatch)
+            stream.release.set()
+            status = self._poll(client, url)
+
+        assert response.status_code == 202
+        assert status['status'] == 'completed'
+        assert status['result']['generated_code'] == 'contract Token {}'
+        assert status['result']['eip_number'] == '20'
+        assert stream.closed
+
+    def test_cancelled_task_stops_generation(self, client, monkeypatch):
+        """Test cancelling a streamed task closes the OpenAI stream and the task stays cancelled"""
+        stream = GatedStream('contract ', 'Token {}')
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_cache', return_value=None), \
+                patch('smart_contract_generator.shared_async_client') as shared:
+            shared.return_value.chat.completions.create = AsyncMock(return_value=stream)
+            response, url = self._start_stream(client, stream, monkeypatch)
+            cancelled = json.loads(client.delete(url).data)
+            deadline = time.monotonic() + 2
+            while not stream.closed:
+                assert time.monotonic() < deadline, 'stream not closed'
+                time.sleep(0.02)
+
+        assert cancelled['status'] == 'cancelled'
+        assert json.loads(client.get(url).data)['status'] == 'cancelled'
+        assert db.session.get(LLMTask, json.loads(response.data)['task_id']).result_json is None
+
+    def test_unknown_task(self, client):
+        """Test polling a task that does not exist returns 404"""
+        response = client.get('/api/llm-tasks/missing')
+
+        assert response.status_code == 404
@@ -0,0 +1,146 @@
+"""
+Tests for LLM call telemetry
+"""
+
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from app import db, LLMCall
+from llm_telemetry import percentiles, record, flush
+from smart_contract_generator import EIPCodeGenerator
+
+
+def _completion(content, prompt_tokens=120, completion_tokens=40):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    return response
+
+
+def _generator(client, cache=None):
+    generator = EIPCodeGenerator.__new__(EIPCodeGenerator)
+    generator.client = client
+    generator.cache = cache
+    return generator
+
+
+class TestRecording:
+    """Test every completion is recorded with its measurements"""
+
+    def test_completion_recorded_with_usage_and_retries(self):
+        """Test a completion that needed a retry is recorded with its endpoint, tokens and retry count"""
+        client = MagicMock()
+        client.chat.completions.create.side_effect = [RuntimeError('server error'), _completion('// tests')]
+        with patch('llm_telemetry.record') as recorded, patch('smart_contract_generator.time.sleep'):
+            result = _generator(client).generate_test_suite('contract A {}', 'A')
+
+        row = recorded.call_args.args[0]
+        assert result['success'] is True
+        assert row['endpoint'] == 'generate_tests'
+        assert row['model'] == 'gpt-4o'
+        assert (row['prompt_tokens'], row['completion_tokens'], row['retries']) == (120, 40, 1)
+        assert row['cache_hit'] is False and row['coalesced'] is False
+        assert row['error_class'] is None
+        assert row['latency_ms'] >= 0
+
+    def test_cache_hit_and_error_recorded(self):
+        """Test a cached answer is recorded as a hit, and a failed completion with its error class"""
+        cache = MagicMock()
+        cache.get.side_effect = ['cached report', None]
+        client = MagicMock()
+        client.chat.completions.create.side_effect = TimeoutError('read timeout')
+        generator = _generator(client, cache)
+        with patch('llm_telemetry.record') as recorded, patch('smart_contract_generator.time.sleep'):
+            generator.analyze_contract_security('contract A {}')
+            result = generator.analyze_contract_security('contract B {}')
+
+        hit, failure = [call.args[0] for call in recorded.call_args_list]
+        assert result['success'] is False
+        assert (hit['endpoint'], hit['cache_hit'], hit['prompt_tokens']) == ('analyze_security', True, None)
+        assert failure['error_class'] == 'TimeoutError'
+        assert failure['retries'] == 2
+
+    def test_stream_records_time_to_first_token(self):
+        """Test a stream closed by its reader is recorded as streamed, with its time to first token"""
+        chunks = [MagicMock(choices=[MagicMock(delta=MagicMock(content=text))]) for text in ('a', 'b')]
+        stream = MagicMock()
+        stream.__iter__.return_value = iter(chunks)
+        client = MagicMock()
+        client.chat.completions.create.return_value = stream
+        with patch('llm_telemetry.record') as recorded:
+            fragments = _generator(client).stream_eip_implementation({'eip': '20'}, 'ERC20')
+            next(fragments)
+            fragments.close()
+
+        row = recorded.call_args.args[0]
+        assert client.chat.completions.create.call_args.kwargs['stream_options'] == {'include_usage': True}
+        assert row['streamed'] is True
+        assert row['first_token_ms'] is not None
+        assert row['error_class'] == 'StreamClosed'
+
+
+class TestSummary:
+    """Test recorded calls are summarized per endpoint"""
+
+    def test_percentiles_nearest_rank(self):
+        """Test percentiles pick the nearest-ranked value and skip missing ones"""
+        assert percentiles([None, *range(1, 101)]) == {'p50': 50, 'p90': 90, 'p99': 99, 'max': 100}
+        assert percentiles([None]) is None
+
+    def test_queued_records_written(self, client, monkeypatch):
+        """Test queued records reach the table when flushed"""
+        monkeypatch.setenv('LLM_TELEMETRY', 'on')
+        record({'endpoint': 'generate_contract', 'latency_ms': 12.0, 'created_at': datetime.utcnow()})
+
+        flush()
+
+        assert LLMCall.query.filter_by(endpoint='generate_contract').count() == 1
+
+    def test_route_summarizes_recent_calls(self, client):
+        """Test the summary reports counts, tokens, hit rate and latency percentiles of upstream calls only"""
+        now = datetime.utcnow()
+        db.session.add_all(
+            [LLMCall(endpoint='generate_contract', latency_ms=float(ms), prompt_tokens=100, completion_tokens=50,
+                     created_at=now) for ms in (1000, 2000, 3000, 4000)] +
+            [LLMCall(endpoint='generate_contract', latency_ms=2.0, cache_hit=True, created_at=now),
+             LLMCall(endpoint='generate_tests', latency_ms=500.0, retries=2, error_class='RateLimitError',
+                     created_at=now),
+             LLMCall(endpoint='generate_tests', latency_ms=9000.0, created_at=now - timedelta(hours=48))]
+        )
+        db.session.commit()
+
+        data = json.loads(client.get('/api/llm-telemetry').data)
+        contract, tests = data['endpoints']
+
+        assert contract['endpoint'] == 'generate_contract'
+        assert contract['calls'] == 5
+        assert contract['cache_hit_rate'] == 0.2
+        assert (contract['prompt_tokens'], contract['completion_tokens']) == (400, 200)
+        assert contract['latency_ms'] == {'p50': 2000.0, 'p90': 4000.0, 'p99': 4000.0, 'max': 4000.0}
+        assert tests['calls'] == 1
+        assert tests['error_classes'] == {'RateLimitError': 1}
+        assert tests['retries'] == 2
+        assert tests['first_token_ms'] is None
+
+    def test_route_filters_endpoint(self, client):
+        """Test one endpoint can be summarized alone, and an endpoint served only from cache has no latencies"""
+        now = datetime.utcnow()
+        db.session.add_all([
+            LLMCall(endpoint='recommend_eips', latency_ms=1.0, cache_hit=True, created_at=now),
+            LLMCall(endpoint='generate_tests', latency_ms=800.0, created_at=now),
+        ])
+        db.session.commit()
+
+        data = json.loads(client.get('/api/llm-telemetry?endpoint=recommend_eips').data)
+
+        [entry] = data['endpoints']
+        assert (entry['endpoint'], entry['calls'], entry['cache_hits']) == ('recommend_eips', 1, 1)
+        assert entry['latency_ms'] is None
+        assert entry['total_latency_ms'] == 0.0
+
+    def test_invalid_window(self, client):
+        """Test a non-numeric window is rejected"""
+        response = client.get('/api/llm-telemetry?hours=day')
+
+        assert response.status_code == 400
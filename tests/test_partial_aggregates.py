@@ -0,0 +1,149 @@
+"""
+Tests for running per-EIP aggregates and progressive Stage 1 publishing
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from app import db, publish_partial, publish_preview, AnalysisJob, EIPSentiment
+from partial_aggregates import PartialAggregates
+from sentiment_analyzer import SentimentAnalyzer
+
+
+def _scores(eips, compounds):
+    compounds = np.asarray(compounds, dtype=float)
+    return pd.DataFrame({
+        'eip': eips, 'compound': compounds,
+        'pos': compounds.clip(0), 'neg': (-compounds).clip(0), 'neu': 1 - abs(compounds),
+    })
+
+
+def _comments(n):
+    return pd.DataFrame({
+        'topic': [f'EIP-{20 + i % 3} thread' for i in range(n)],
+        'paragraphs': ['good' if i % 2 else 'bad' for i in range(n)],
+        'headings': [''] * n,
+        'unordered_lists': [''] * n,
+    })
+
+
+class TestPartialAggregates:
+    """Test exact merging of running sums"""
+
+    def test_chunks_merge_to_full_means(self):
+        """Test aggregating in chunks gives the same means as all rows at once"""
+        full = _scores(['20', '721', '20', '20', '721'], [0.5, -0.2, -0.1, 0.3, 0.6])
+
+        partial = PartialAggregates().add(full.iloc[:2]).add(full.iloc[2:4]).add(full.iloc[4:])
+        unified = partial.unified().set_index('eip')
+
+        expected = full.groupby('eip')['compound'].mean()
+        assert unified.loc['20', 'unified_compound'] == pytest.approx(expected['20'])
+        assert unified.loc['721', 'unified_compound'] == pytest.approx(expected['721'])
+        assert unified.loc['20', 'total_comment_count'] == 3
+        assert partial.comment_count == 5
+
+    def test_csv_round_trip(self, tmp_path):
+        """Test saved aggregates reload and keep merging"""
+        partial = PartialAggregates().add(_scores(['20', '0020x'], [0.5, -0.5]))
+        path = partial.to_csv(str(tmp_path / 'partial.csv'))
+
+        reloaded = PartialAggregates.from_csv(path).merge(PartialAggregates().add(_scores(['20'], [0.1])))
+
+        unified = reloaded.unified().set_index('eip')
+        assert unified.loc['20', 'unified_compound'] == pytest.approx(0.3)
+        assert unified.loc['0020x', 'total_comment_count'] == 1
+
+    def test_empty_aggregates(self):
+        """Test empty chunks leave aggregates untouched"""
+        partial = PartialAggregates().add(_scores([], []))
+
+        assert partial.comment_count == 0
+        assert partial.unified().empty
+
+
+class TestProgressiveScoring:
+    """Test chunked Stage 1 scoring reports running aggregates"""
+
+    @patch('sentiment_analyzer.SentimentIntensityAnalyzer')
+    def test_callback_receives_running_aggregates(self, mock_vader):
+        """Test every chunk but the last is reported when unthrottled"""
+        mock_vader.return_value.polarity_scores.side_effect = lambda text: {
+            'compound': 0.5 if 'good' in text else -0.5, 'pos': 0.5, 'neg': 0.5, 'neu': 0.0
+        }
+        analyzer = SentimentAnalyzer()
+        calls = []
+
+        with patch('sentiment_analyzer.pd.read_csv', return_value=_comments(10)):
+            df = analyzer._load_comments('unused.csv')
+        scored = analyzer._score_comments(
+            df, lambda partial, fraction: calls.append((partial.comment_count, fraction)),
+            chunk_size=4, publish_interval=0
+        )
+
+        assert len(scored) == 10
+        assert list(scored['compound'][:2]) == [-0.5, 0.5]
+        assert calls == [(4, 0.4), (8, 0.8)]
+
+    @patch('sentiment_analyzer.SentimentIntensityAnalyzer')
+    def test_publishing_is_throttled(self, mock_vader):
+        """Test no intermediate publish happens inside the throttle interval"""
+        mock_vader.return_value.polarity_scores.return_value = {'compound': 0.1, 'pos': 0.1, 'neg': 0.0, 'neu': 0.9}
+        analyzer = SentimentAnalyzer()
+        with patch('sentiment_analyzer.pd.read_csv', return_value=_comments(10)):
+            df = analyzer._load_comments('unused.csv')
+        calls = []
+
+        analyzer._score_comments(df, lambda *args: calls.append(args), chunk_size=2, publish_interval=3600)
+
+        assert calls == []
+
+
+class TestPartialPublishing:
+    """Test interim rows and the processed fraction reach the dashboard"""
+
+    def _job(self, job_id):
+        job = AnalysisJob()
+        job.id = job_id
+        job.filename = 'upload.csv'
+        job.original_filename = 'upload.csv'
+        job.status = 'processing'
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def test_partial_results_published(self, client, test_app):
+        """Test partial rows replace earlier ones and report the processed fraction"""
+        with test_app.app_context():
+            job = self._job('partial-job-1')
+            publish_partial(job, PartialAggregates().add(_scores(['20'], [0.4])), 0.25)
+            publish_partial(job, PartialAggregates().add(_scores(['20', '20'], [0.4, 0.0])), 0.5)
+
+            row = EIPSentiment.query.filter_by(job_id='partial-job-1').one()
+            assert row.unified_compound == pytest.approx(0.2)
+
+        status = json.loads(client.get('/api/job/partial-job-1/status').data)
+        page = client.get('/dashboard?job_id=partial-job-1')
+
+        assert status['result_kind'] == 'partial'
+        assert status['processed_fraction'] == 0.5
+        assert b'partialBanner' in page.data
+
+    def test_preview_kept_until_partial_covers_more(self, test_app):
+        """Test early partial results do not replace a better-covered preview"""
+        with test_app.app_context():
+            job = self._job('partial-job-2')
+            publish_preview(job, pd.DataFrame([{
+                'eip': '20', 'unified_compound': 0.3, 'unified_pos': 0.3, 'unified_neg': 0.0,
+                'unified_neu': 0.7, 'total_comment_count': 100, 'sampled_comment_count': 20,
+                'compound_ci_low': 0.1, 'compound_ci_high': 0.5,
+            }]))
+
+            kept = publish_partial(job, PartialAggregates().add(_scores(['20'], [-0.9])), 0.1)
+            replaced = publish_partial(job, PartialAggregates().add(_scores(['20'], [-0.9])), 0.3)
+
+            assert (kept, replaced) == (False, True)
+            assert job.result_kind == 'partial'
+            assert EIPSentiment.query.filter_by(job_id='partial-job-2').one().unified_compound == pytest.approx(-0.9)
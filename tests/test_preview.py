@@ -0,0 +1,120 @@
+"""
+Tests for sampled preview results published before the full run
+"""
+
+import json
+import pandas as pd
+import pytest
+from unittest.mock import patch, MagicMock
+from app import app, db, process_csv_background, publish_preview, AnalysisJob, EIPSentiment
+from sentiment_analyzer import SentimentAnalyzer
+
+
+def _fake_scores(text):
+    compound = 0.5 if 'good' in text else -0.5
+    return {'compound': compound, 'pos': max(compound, 0), 'neg': max(-compound, 0), 'neu': 0.5}
+
+
+def _write_comments(path):
+    # EIP-20 is busy and evenly split, EIP-721 has two positive comments
+    topics = ['EIP-20 thread'] * 400 + ['ERC-721 thread'] * 2
+    paragraphs = ['good idea', 'bad idea'] * 200 + ['good', 'good']
+    pd.DataFrame({
+        'topic': topics,
+        'paragraphs': paragraphs,
+        'headings': [''] * len(topics),
+        'unordered_lists': [''] * len(topics),
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def _create_job(job_id):
+    job = AnalysisJob()
+    job.id = job_id
+    job.filename = 'upload.csv'
+    job.original_filename = 'upload.csv'
+    db.session.add(job)
+    db.session.commit()
+
+
+class TestStratifiedPreview:
+    """Test the sampled Stage 1 preview"""
+
+    @patch('sentiment_analyzer.SentimentIntensityAnalyzer')
+    def test_preview_samples_every_stratum(self, mock_vader, tmp_path):
+        """Test busy EIPs are sampled, small ones scored fully, counts kept exact"""
+        mock_vader.return_value.polarity_scores.side_effect = _fake_scores
+        input_file = _write_comments(tmp_path / 'comments.csv')
+
+        preview = SentimentAnalyzer().run_preview(input_file, per_stratum=40).set_index('eip')
+
+        assert preview.loc['20', 'total_comment_count'] == 400
+        assert preview.loc['20', 'sampled_comment_count'] == 40
+        assert preview.loc['20', 'compound_ci_low'] < 0 < preview.loc['20', 'compound_ci_high']
+        assert preview.loc['721', 'sampled_comment_count'] == 2
+        assert preview.loc['721', 'unified_compound'] == pytest.approx(0.5)
+        assert preview.loc['721', 'compound_ci_low'] == pytest.approx(0.5)
+        assert mock_vader.return_value.polarity_scores.call_count == 42
+
+    @patch('sentiment_analyzer.SentimentIntensityAnalyzer')
+    def test_row_budget_spread_over_strata(self, mock_vader, tmp_path):
+        """Test the overall budget lowers the per-EIP sample but keeps a minimum"""
+        mock_vader.return_value.polarity_scores.side_effect = _fake_scores
+        input_file = _write_comments(tmp_path / 'comments.csv')
+
+        preview = SentimentAnalyzer().run_preview(input_file, per_stratum=40, max_rows=10).set_index('eip')
+
+        assert preview.loc['20', 'sampled_comment_count'] == 5
+
+
+class TestPreviewPublishing:
+    """Test preview rows are shown and later replaced by final results"""
+
+    def test_publish_preview_marks_job(self, client, test_app):
+        """Test published preview rows appear on the dashboard labelled as a preview"""
+        with test_app.app_context():
+            _create_job('preview-job-1')
+            job = AnalysisJob.query.get('preview-job-1')
+            job.status = 'processing'
+            publish_preview(job, pd.DataFrame([{
+                'eip': '20', 'unified_compound': 0.1, 'unified_pos': 0.2, 'unified_neg': 0.1,
+                'unified_neu': 0.7, 'total_comment_count': 400, 'sampled_comment_count': 40,
+                'compound_ci_low': -0.1, 'compound_ci_high': 0.3,
+            }]))
+
+        status = json.loads(client.get('/api/job/preview-job-1/status').data)
+        page = client.get('/dashboard?job_id=preview-job-1')
+
+        assert status['result_kind'] == 'preview'
+        assert b'previewBanner' in page.data
+        with test_app.app_context():
+            assert EIPSentiment.query.filter_by(job_id='preview-job-1').one().total_comment_count == 400
+
+    @patch('sentiment_analyzer.SentimentAnalyzer')
+    def test_final_run_replaces_preview(self, mock_analyzer_cls, test_app, tmp_path):
+        """Test the full run publishes a preview first and then swaps in final rows"""
+        input_file = _write_comments(tmp_path / 'comments.csv')
+        final_file = tmp_path / 'final_merged_analysis.csv'
+        pd.DataFrame({'eip': [20], 'unified_compound': [0.0], 'total_comment_count': [400]}).to_csv(final_file, index=False)
+
+        analyzer = MagicMock()
+        analyzer.run_preview.return_value = pd.DataFrame([{
+            'eip': '20', 'unified_compound': 0.2, 'unified_pos': 0.3, 'unified_neg': 0.1,
+            'unified_neu': 0.6, 'total_comment_count': 400, 'sampled_comment_count': 40,
+            'compound_ci_low': 0.0, 'compound_ci_high': 0.4,
+        }])
+        analyzer.run_stage3.return_value = [str(final_file)]
+        mock_analyzer_cls.return_value = analyzer
+
+        with test_app.app_context():
+            _create_job('preview-job-2')
+            with patch.dict(app.config, {'PREVIEW_MIN_BYTES': 0}):
+                process_csv_background('preview-job-2', input_file, str(tmp_path))
+
+            job = AnalysisJob.query.get('preview-job-2')
+            rows = EIPSentiment.query.filter_by(job_id='preview-job-2').all()
+
+            analyzer.run_preview.assert_called_once_with(input_file)
+            assert job.result_kind == 'final'
+            assert len(rows) == 1
+            assert rows[0].unified_compound == pytest.approx(0.0)
@@ -0,0 +1,109 @@
+"""
+Tests for mergeable compound score sketches
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from app import db, AnalysisJob, EIPSentiment
+from quantile_sketch import CompoundSketch, merge_sketches, sketches_by_group, BIN_WIDTH
+from sentiment_analyzer import SentimentAnalyzer
+
+
+class TestCompoundSketch:
+    """Test sketch accuracy, merging and serialization"""
+
+    def test_quantiles_within_bin_width(self):
+        """Test percentiles match exact values to within one bin"""
+        scores = np.random.default_rng(7).uniform(-1, 1, 5000)
+        sketch = CompoundSketch.from_scores(scores)
+
+        expected = np.quantile(scores, [0.1, 0.5, 0.9])
+
+        assert np.allclose(sketch.quantiles([0.1, 0.5, 0.9]), expected, atol=BIN_WIDTH)
+        assert sketch.quantile(0.0) == pytest.approx(scores.min(), abs=BIN_WIDTH)
+        assert sketch.quantile(1.0) == pytest.approx(scores.max(), abs=BIN_WIDTH)
+
+    def test_merge_equals_sketch_of_union(self):
+        """Test merging chunk sketches loses nothing"""
+        rng = np.random.default_rng(3)
+        first, second = rng.uniform(-1, 1, 300), rng.uniform(-1, 1, 700)
+
+        merged = CompoundSketch.from_scores(first) + CompoundSketch.from_scores(second)
+
+        assert np.array_equal(merged.counts, CompoundSketch.from_scores(np.concatenate([first, second])).counts)
+        assert merged.count == 1000
+
+    def test_polarization(self):
+        """Test split opinions score high and one-sided ones score zero"""
+        split = CompoundSketch.from_scores([-0.9, -0.8, 0.8, 0.9])
+        positive = CompoundSketch.from_scores([0.6, 0.7, 0.0])
+
+        assert split.polarization() == pytest.approx(1.0)
+        assert positive.polarization() == 0.0
+        assert split.quantile(0.5) == pytest.approx(0.0, abs=0.8)
+        assert CompoundSketch().polarization() is None
+
+    def test_string_round_trip_is_compact(self):
+        """Test serialization stores only non-empty bins"""
+        sketch = CompoundSketch.from_scores([0.5] * 1000 + [-1.0, 1.0, np.nan])
+
+        encoded = sketch.to_string()
+
+        assert len(encoded) < 40
+        assert np.array_equal(CompoundSketch.from_string(encoded).counts, sketch.counts)
+        assert merge_sketches([encoded, None, encoded]).count == 2 * sketch.count
+
+    def test_sketches_by_group_matches_per_group(self):
+        """Test the vectorized builder agrees with one sketch per group"""
+        keys = np.array(['20', '721', '20', '1559', '721', '20'], dtype=object)
+        values = np.array([0.1, -0.4, 0.9, 0.0, np.nan, -0.2])
+
+        sketches = sketches_by_group(keys, values)
+
+        assert set(sketches) == {'20', '721', '1559'}
+        assert np.array_equal(sketches['20'].counts, CompoundSketch.from_scores([0.1, 0.9, -0.2]).counts)
+        assert sketches['721'].count == 1
+
+    def test_stage1_sketch_summaries(self):
+        """Test Stage 1 emits percentile columns and a sketch per EIP"""
+        scores = pd.DataFrame({'eip': ['20', '20', '721'], 'compound': [-0.5, 0.5, 0.2]})
+
+        summaries = SentimentAnalyzer._sketch_summaries(scores).set_index('eip')
+
+        assert summaries.loc['20', 'polarization'] == pytest.approx(1.0)
+        assert CompoundSketch.from_string(summaries.loc['721', 'compound_sketch']).count == 1
+
+
+class TestDistributionEndpoint:
+    """Test percentiles merged across jobs"""
+
+    def _job(self, job_id, eip, scores):
+        job = AnalysisJob()
+        job.id = job_id
+        job.filename = 'upload.csv'
+        job.original_filename = 'upload.csv'
+        job.status = 'completed'
+        db.session.add(job)
+        sketch = CompoundSketch.from_scores(scores)
+        db.session.add(EIPSentiment(job_id=job_id, eip=eip, compound_sketch=sketch.to_string(), **sketch.summary()))
+        db.session.commit()
+
+    def test_distribution_merges_jobs(self, client, test_app):
+        """Test the endpoint combines sketches from several jobs"""
+        with test_app.app_context():
+            self._job('dist-job-1', '1559', [-0.9] * 10)
+            self._job('dist-job-2', '1559', [0.9] * 10)
+
+        data = json.loads(client.get('/api/eips/1559/distribution').data)
+        single = json.loads(client.get('/api/eips/1559/distribution?job_id=dist-job-1').data)
+
+        assert data['comment_count'] == 20
+        assert data['polarization'] == pytest.approx(1.0)
+        assert data['jobs'] == ['dist-job-1', 'dist-job-2']
+        assert single['polarization'] == 0.0
+
+    def test_distribution_unknown_eip(self, client):
+        """Test EIPs without stored sketches return 404"""
+        assert client.get('/api/eips/9999/distribution').status_code == 404
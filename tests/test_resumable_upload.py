@@ -0,0 +1,120 @@
+"""
+Tests for resumable chunked uploads
+"""
+
+import os
+import json
+import hashlib
+import pytest
+from unittest.mock import patch
+from app import app, db, AnalysisJob, UploadSession
+import resumable_upload
+
+CSV = (b"topic,paragraphs,headings,unordered_lists\n"
+       + b"".join(b"EIP-20 thread,comment number %d,,\n" % i for i in range(50)))
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    with patch.dict(app.config, {'UPLOAD_FOLDER': str(tmp_path)}):
+        yield tmp_path
+
+
+@pytest.fixture
+def mock_thread():
+    with patch('app.threading.Thread') as thread:
+        yield thread
+
+
+def _start(client, data=CSV, filename='comments.csv', **extra):
+    response = client.post('/api/uploads', json={'filename': filename, 'size': len(data), **extra})
+    assert response.status_code == 201
+    return json.loads(response.data)['upload_id']
+
+
+def _put(client, upload_id, offset, chunk, checksum=None):
+    return client.put(f'/api/uploads/{upload_id}', data=chunk, headers={
+        'X-Upload-Offset': str(offset),
+        'X-Chunk-SHA256': checksum or hashlib.sha256(chunk).hexdigest(),
+    })
+
+
+class TestResumableUpload:
+    """Test chunked uploads are assembled, verified and queued"""
+
+    def test_chunks_assemble_into_job(self, client, test_app, upload_dir, mock_thread):
+        """Test the last chunk queues a job whose content hash was computed incrementally"""
+        upload_id = _start(client)
+
+        for offset in range(0, len(CSV), 400):
+            response = _put(client, upload_id, offset, CSV[offset:offset + 400])
+            assert response.status_code == 200
+
+        status = json.loads(response.data)
+        assert status['status'] == 'completed'
+        with test_app.app_context():
+            job = db.session.get(AnalysisJob, status['job_id'])
+            session = db.session.get(UploadSession, upload_id)
+            assert job.content_hash == hashlib.sha256(CSV).hexdigest()
+            assert open(session.file_path, 'rb').read() == CSV
+        assert mock_thread.call_args.kwargs['args'][1] == session.file_path
+
+    def test_resume_after_offset_mismatch(self, client, upload_dir, mock_thread):
+        """Test a chunk at the wrong offset is refused with the offset to resume from"""
+        upload_id = _start(client)
+        _put(client, upload_id, 0, CSV[:300])
+
+        response = _put(client, upload_id, 600, CSV[600:])
+        resume = json.loads(client.get(f'/api/uploads/{upload_id}').data)
+
+        assert response.status_code == 409
+        assert json.loads(response.data)['offset'] == 300
+        assert resume['offset'] == 300
+        assert _put(client, upload_id, 300, CSV[300:]).status_code == 200
+
+    def test_bad_chunk_checksum_is_rejected(self, client, upload_dir, mock_thread):
+        """Test a corrupted chunk is not written and the offset does not move"""
+        upload_id = _start(client)
+
+        response = _put(client, upload_id, 0, CSV[:300], checksum='0' * 64)
+
+        assert response.status_code == 400
+        assert json.loads(response.data)['offset'] == 0
+        assert not mock_thread.called
+
+    def test_header_validated_on_first_chunk(self, client, test_app, upload_dir, mock_thread):
+        """Test a CSV without the required columns fails as soon as its header arrives"""
+        data = b"topic,body\n" + b"EIP-20,text\n" * 100
+        upload_id = _start(client, data)
+
+        response = _put(client, upload_id, 0, data[:100])
+
+        assert response.status_code == 400
+        assert 'paragraphs' in json.loads(response.data)['error']
+        with test_app.app_context():
+            session = db.session.get(UploadSession, upload_id)
+            assert session.status == 'invalid'
+            assert not os.path.exists(session.file_path)
+
+    def test_hash_rebuilt_after_restart(self, client, test_app, upload_dir, mock_thread):
+        """Test the running hash is recovered from disk when its in-memory state is lost"""
+        upload_id = _start(client, sha256=hashlib.sha256(CSV).hexdigest())
+        _put(client, upload_id, 0, CSV[:500])
+        resumable_upload._hashers.clear()
+
+        response = _put(client, upload_id, 500, CSV[500:])
+
+        assert response.status_code == 200
+        with test_app.app_context():
+            job = db.session.get(AnalysisJob, json.loads(response.data)['job_id'])
+            assert job.content_hash == hashlib.sha256(CSV).hexdigest()
+
+    def test_file_checksum_mismatch_fails_upload(self, client, upload_dir, mock_thread):
+        """Test a declared whole-file checksum that does not match rejects the upload"""
+        upload_id = _start(client, sha256='f' * 64)
+
+        response = _put(client, upload_id, 0, CSV)
+
+        assert response.status_code == 400
+        assert json.loads(response.data)['status'] == 'invalid'
+        assert not mock_thread.called
@@ -0,0 +1,90 @@
+"""
+Tests for upgrading databases created before EIP metadata moved out of EIPSentiment
+"""
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+from app import db, AnalysisJob, EIPSentiment, EIPMetadata, EIPMetadataSnapshot
+from schema_upgrade import upgrade_schema
+
+OLD_SCHEMA = [
+    """CREATE TABLE analysis_job (
+        id VARCHAR(36) PRIMARY KEY, filename VARCHAR(255) NOT NULL, original_filename VARCHAR(255) NOT NULL,
+        status VARCHAR(20), progress INTEGER, stage VARCHAR(255), error_message TEXT,
+        created_at DATETIME, updated_at DATETIME, completed_at DATETIME)""",
+    """CREATE TABLE eip_sentiment (
+        id INTEGER PRIMARY KEY, job_id VARCHAR(36) NOT NULL REFERENCES analysis_job(id), eip VARCHAR(10) NOT NULL,
+        unified_compound FLOAT, unified_pos FLOAT, unified_neg FLOAT, unified_neu FLOAT,
+        total_comment_count INTEGER, category VARCHAR(100), status VARCHAR(50), title TEXT, author TEXT,
+        created_at DATETIME)""",
+    """INSERT INTO analysis_job (id, filename, original_filename, status) VALUES
+        ('job-1', 'a.csv', 'a.csv', 'completed'), ('job-2', 'b.csv', 'b.csv', 'completed'),
+        ('job-3', 'c.csv', 'c.csv', 'completed')""",
+    """INSERT INTO eip_sentiment (id, job_id, eip, unified_compound, category, status, title, author) VALUES
+        (1, 'job-1', '20', 0.4, 'ERC', 'Final', 'Token Standard', 'Fabian'),
+        (2, 'job-1', '1559', -0.2, 'Core', 'Final', 'Fee market', 'Vitalik'),
+        (3, 'job-1', '9999', 0.0, NULL, NULL, NULL, NULL),
+        (4, 'job-2', '20', 0.1, 'ERC', 'Final', 'Token Standard', 'Fabian'),
+        (5, 'job-2', '1559', 0.3, 'Core', 'Final', 'Fee market', 'Vitalik'),
+        (6, 'job-3', '20', 0.2, 'ERC', 'Final', 'Token Standard', 'Fabian'),
+        (7, 'job-3', '1559', 0.5, 'Core', 'Last Call', 'Fee market', 'Vitalik')""",
+]
+
+
+def _old_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+    # As at startup: create_all adds the new tables but leaves the old ones as they were
+    db.metadata.create_all(engine)
+    return engine
+
+
+class TestSchemaUpgrade:
+    """Test an old database is upgraded in place at startup"""
+
+    def test_old_rows_keep_their_metadata(self, tmp_path):
+        """Test missing columns are added and stored metadata is moved to eip_metadata and linked"""
+        engine = _old_database(tmp_path)
+
+        upgrade_schema(engine, db.metadata)
+
+        columns = {column['name'] for column in inspect(engine).get_columns('eip_sentiment')}
+        assert {'metadata_id', 'compound_sketch'} <= columns
+        with Session(engine) as session:
+            rows = {row.eip: row for row in session.query(EIPSentiment).filter_by(job_id='job-1')}
+            job = session.get(AnalysisJob, 'job-1')
+
+            assert (rows['20'].title, rows['20'].status, rows['20'].author) == ('Token Standard', 'Final', 'Fabian')
+            core = session.query(EIPSentiment).filter(EIPSentiment.job_id == 'job-1', EIPSentiment.category == 'Core')
+            assert core.one().eip == '1559'
+            assert rows['9999'].eip_metadata is None
+            assert job.job_type == 'sentiment'
+            assert session.query(EIPSentiment).filter_by(job_id='job-3', eip='1559').one().status == 'Last Call'
+
+    def test_identical_metadata_shared(self, tmp_path):
+        """Test jobs stored with the same metadata share one snapshot, and each job is linked to its own"""
+        engine = _old_database(tmp_path)
+
+        upgrade_schema(engine, db.metadata)
+
+        with Session(engine) as session:
+            jobs = {job.id: job.metadata_snapshot_id for job in session.query(AnalysisJob)}
+            rows = session.query(EIPSentiment).filter(EIPSentiment.metadata_id.isnot(None)).all()
+
+            assert jobs['job-1'] == jobs['job-2'] != jobs['job-3']
+            assert session.query(EIPMetadataSnapshot).count() == 2
+            assert session.query(EIPMetadata).count() == 4
+            assert all(row.eip_metadata.snapshot_id == jobs[row.job_id] for row in rows)
+
+    def test_upgrade_is_idempotent(self, tmp_path):
+        """Test running the upgrade on every start changes nothing after the first time"""
+        engine = _old_database(tmp_path)
+
+        upgrade_schema(engine, db.metadata)
+        upgrade_schema(engine, db.metadata)
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM eip_metadata")).scalar() == 4
+            assert conn.execute(text("SELECT COUNT(*) FROM eip_sentiment WHERE title IS NOT NULL")).scalar() == 0
@@ -0,0 +1,122 @@
+"""
+Tests for the per-comment score store and EIP comment drill-down
+"""
+
+import os
+import json
+import pandas as pd
+import pytest
+from app import db, AnalysisJob, OutputFile
+from score_store import write_score_store, ScoreStoreReader, SCORE_STORE_FILENAME, TEXT_PREVIEW_CHARS
+from sentiment_analyzer import SentimentAnalyzer
+
+
+COMMENTS = pd.DataFrame({
+    'eip': ['20', '20', '20', '721', '1559'],
+    'row': [0, 1, 2, 3, 1],
+    'compound': [0.2, -0.8, 0.9, 0.0, -0.8],
+    'pos': [0.3, 0.0, 0.7, 0.0, 0.0],
+    'neg': [0.1, 0.6, 0.0, 0.0, 0.6],
+    'neu': [0.6, 0.4, 0.3, 1.0, 0.4],
+    'text': ['Looks fine', 'This breaks wallets', 'Great standard 👍', None, 'This breaks wallets'],
+})
+
+
+class TestScoreStore:
+    """Test the columnar per-EIP score file"""
+
+    def test_round_trip_sorted_by_compound(self, tmp_path):
+        """Test an EIP's chunk reads back sorted from most negative to most positive"""
+        path = write_score_store(str(tmp_path / SCORE_STORE_FILENAME), COMMENTS)
+        reader = ScoreStoreReader(path)
+
+        comments = reader.read_eip('20')
+
+        assert list(comments['row']) == [1, 0, 2]
+        assert list(comments['text']) == ['This breaks wallets', 'Looks fine', 'Great standard 👍']
+        assert comments['compound'].iloc[0] == pytest.approx(-0.8)
+        assert reader.header['row_count'] == 5
+
+    def test_extremes_and_missing_text(self, tmp_path):
+        """Test extremes pick both ends and missing text is stored as empty"""
+        reader = ScoreStoreReader(write_score_store(str(tmp_path / 'scores.bin'), COMMENTS))
+
+        extremes = reader.extremes('20', limit=1)
+
+        assert extremes['most_negative'][0]['row'] == 1
+        assert extremes['most_positive'][0]['row'] == 2
+        assert reader.read_eip('721')['text'].tolist() == ['']
+
+    def test_unknown_eip_and_bad_file(self, tmp_path):
+        """Test lookups of absent EIPs and files that are not score stores"""
+        reader = ScoreStoreReader(write_score_store(str(tmp_path / 'scores.bin'), COMMENTS))
+        other = tmp_path / 'other.bin'
+        other.write_bytes(b'not a score store')
+
+        assert '4626' not in reader
+        assert reader.read_eip('4626').empty
+        with pytest.raises(ValueError):
+            ScoreStoreReader(str(other))
+
+    def test_text_is_truncated(self, tmp_path):
+        """Test long comment bodies are stored as previews"""
+        comments = COMMENTS.head(1).copy()
+        comments['text'] = ['x' * (TEXT_PREVIEW_CHARS + 100)]
+        reader = ScoreStoreReader(write_score_store(str(tmp_path / 'scores.bin'), comments))
+
+        assert len(reader.read_eip('20')['text'].iloc[0]) == TEXT_PREVIEW_CHARS
+
+    def test_comments_counted_once_per_referenced_eip(self):
+        """Test a comment mentioning an EIP and an ERC lands in both chunks"""
+        df = pd.DataFrame({
+            'eip': ['20', None],
+            'erc': ['721', '721'],
+            'compound': [0.5, -0.5], 'pos': [0.5, 0.0], 'neg': [0.0, 0.5], 'neu': [0.5, 0.5],
+            'text': ['a', 'b'],
+        })
+
+        scores = SentimentAnalyzer._comment_scores_by_eip(df)
+
+        assert sorted(zip(scores['eip'], scores['row'])) == [('20', 0), ('721', 0), ('721', 1)]
+
+
+class TestCommentDrilldownEndpoint:
+    """Test the EIP comment drill-down API"""
+
+    def _job_with_store(self, job_id, tmp_path):
+        path = write_score_store(str(tmp_path / SCORE_STORE_FILENAME), COMMENTS)
+        job = AnalysisJob()
+        job.id = job_id
+        job.filename = 'upload.csv'
+        job.original_filename = 'upload.csv'
+        job.status = 'completed'
+        db.session.add(job)
+        output = OutputFile()
+        output.job_id = job_id
+        output.filename = SCORE_STORE_FILENAME
+        output.file_path = path
+        output.file_type = 'comment_scores'
+        output.file_size = os.path.getsize(path)
+        db.session.add(output)
+        db.session.commit()
+
+    def test_drilldown_returns_extremes(self, client, test_app, tmp_path):
+        """Test the endpoint returns the most negative and positive comments"""
+        with test_app.app_context():
+            self._job_with_store('drill-job-1', tmp_path)
+
+        response = client.get('/api/job/drill-job-1/eips/20/comments?limit=2')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['comment_count'] == 3
+        assert [c['row'] for c in data['most_negative']] == [1, 0]
+        assert data['most_positive'][0]['text'] == 'Great standard 👍'
+
+    def test_drilldown_missing_eip(self, client, test_app, tmp_path):
+        """Test unknown EIPs and jobs return 404"""
+        with test_app.app_context():
+            self._job_with_store('drill-job-2', tmp_path)
+
+        assert client.get('/api/job/drill-job-2/eips/4626/comments').status_code == 404
+        assert client.get('/api/job/missing-job/eips/20/comments').status_code == 404
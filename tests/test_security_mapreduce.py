@@ -0,0 +1,173 @@
+"""
+Tests for map-reduce security analysis of large contracts
+"""
+
+import json
+import time
+import itertools
+from security_mapreduce import minify_solidity, split_contract, merge_findings, parse_findings
+from smart_contract_generator import EIPCodeGenerator
+
+
+def _vault(functions):
+    body = "\n".join(f"""
+    /// @notice withdraw variant {i}
+    function withdraw{i}(uint256 amount) external onlyOwner {{
+        // send funds
+        (bool ok, ) = msg.sender.call{{value: amount}}("");
+        require(ok, "transfer failed; retry {{later}}");
+    }}""" for i in range(functions))
+    return f"""
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+library Math {{ function max(uint a, uint b) internal pure returns (uint) {{ return a > b ? a : b; }} }}
+
+contract Vault {{
+    mapping(address => uint256) public balances;
+    modifier onlyOwner() {{ require(msg.sender == owner, "not owner"); _; }}
+    {body}
+}}
+"""
+
+
+class TestSplitting:
+    """Test contracts are minified and split at contract and function boundaries"""
+
+    def test_minify_keeps_strings(self):
+        """Test comments and indentation go while string literals, even ones containing comment markers, stay"""
+        code = minify_solidity('contract A {\n    // note\n    string s = "a  // b";   /* x */\n\n}')
+
+        assert code == 'contract A {\nstring s = "a  // b";\n}'
+
+    def test_small_file_is_one_chunk(self):
+        """Test a file that fits is sent whole, with its contracts packed together"""
+        chunks = split_contract(_vault(2))
+
+        assert len(chunks) == 1
+        assert chunks[0].name == 'Math, Vault'
+        assert '@notice' not in chunks[0].code
+
+    def test_large_contract_split_between_functions(self):
+        """Test every chunk holds whole functions plus the contract's declarations"""
+        chunks = split_contract(_vault(30), max_chars=1500)
+        vault_chunks = [chunk for chunk in chunks if chunk.name.startswith('Vault')]
+
+        assert len(vault_chunks) > 2
+        for chunk in vault_chunks:
+            assert chunk.code.startswith('pragma solidity ^0.8.20;\ncontract Vault {')
+            assert 'modifier onlyOwner()' in chunk.code
+            assert chunk.code.count('function withdraw') == chunk.code.count('require(ok')
+            assert len(chunk.code) <= 1500
+        functions = sum(chunk.code.count('function withdraw') for chunk in vault_chunks)
+        assert functions == 30
+
+
+class TestMerging:
+    """Test per-chunk findings become one de-duplicated report"""
+
+    def test_same_issue_merged(self):
+        """Test one issue found in several chunks is reported once with every location and its highest severity"""
+        merged = merge_findings([
+            {'title': 'Reentrancy in withdraw', 'severity': 'high', 'location': 'Vault.withdraw1'},
+            {'title': 'Missing events', 'severity': 'low', 'location': 'Vault.withdraw1'},
+            {'title': 'reentrancy in withdraw.', 'severity': 'critical', 'location': 'Vault.withdraw2',
+             'description': 'External call before state update'},
+        ])
+
+        assert [finding['title'] for finding in merged] == ['Reentrancy in withdraw', 'Missing events']
+        assert merged[0]['severity'] == 'critical'
+        assert merged[0]['locations'] == ['Vault.withdraw1', 'Vault.withdraw2']
+        assert merged[0]['description'] == 'External call before state update'
+
+    def test_prose_answer_kept(self):
+        """Test a chunk answered in prose instead of JSON is kept as notes"""
+        assert parse_findings('Looks fine.') == ([], 'Looks fine.')
+
+    def test_unexpected_json_shapes_have_no_findings(self):
+        """Test JSON answers without a findings list yield no findings instead of failing the analysis"""
+        for content in ('null', '42', '"none"', '{"findings": null}', '{"findings": {"title": "x"}}'):
+            assert parse_findings(content) == ([], None)
+
+
+class TestSplitAnalysis:
+    """Test large contracts are analyzed chunk by chunk in parallel"""
+
+    def _generator(self, chat):
+        generator = EIPCodeGenerator.__new__(EIPCodeGenerator)
+        generator._chat = chat
+        return generator
+
+    def test_chunks_analyzed_in_parallel(self, monkeypatch):
+        """Test each chunk is its own completion, run concurrently, and the findings are merged"""
+        monkeypatch.setattr('security_mapreduce.MAX_CHUNK_CHARS', 1500)
+        prompts = []
+        parts = itertools.count(1)
+
+        def chat(timeout=None, **kwargs):
+            prompts.append(kwargs['messages'][0]['content'])
+            part = next(parts)
+            time.sleep(0.3)
+            return json.dumps({'findings': [
+                {'title': 'Reentrancy in withdraw', 'severity': 'high', 'location': f'Vault.part{part}'}
+            ]})
+
+        started = time.monotonic()
+        result = self._generator(chat).analyze_contract_security(_vault(30))
+        elapsed = time.monotonic() - started
+
+        assert result['success'] is True
+        assert result['parts'] == len(prompts) > 2
+        assert elapsed < 0.3 * len(prompts) / 2
+        assert len(result['findings']) == 1
+        assert len(result['findings'][0]['locations']) == len(prompts)
+        assert 'Reentrancy in withdraw' in result['analysis']
+        assert all('@notice' not in prompt for prompt in prompts)
+
+    def test_failed_chunk_reported(self, monkeypatch):
+        """Test a chunk whose completion fails is named in the report instead of failing the analysis"""
+        monkeypatch.setattr('security_mapreduce.MAX_CHUNK_CHARS', 1500)
+        calls = []
+
+        def chat(timeout=None, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('timeout')
+            return json.dumps({'findings': []})
+
+        result = self._generator(chat).analyze_contract_security(_vault(30))
+
+        assert result['success'] is True
+        assert len(result['failed_parts']) == 1
+        assert 'Not analyzed' in result['analysis']
+
+    def test_cancelled_analysis_sends_no_chunks(self, monkeypatch):
+        """Test chunks not yet started when the analysis is cancelled are never sent"""
+        import threading
+        monkeypatch.setattr('security_mapreduce.MAX_CHUNK_CHARS', 1500)
+        calls = []
+        cancel = threading.Event()
+        cancel.set()
+
+        def chat(**kwargs):
+            calls.append(1)
+            return json.dumps({'findings': []})
+
+        result = self._generator(chat).analyze_contract_security(_vault(30), cancel=cancel)
+
+        assert calls == []
+        assert result == {'success': False, 'error': 'Security analysis failed: Security analysis cancelled'}
+
+    def test_small_contract_single_call(self):
+        """Test a contract that fits one prompt is analyzed with one minified completion"""
+        prompts = []
+
+        def chat(timeout=None, **kwargs):
+            prompts.append(kwargs['messages'][0]['content'])
+            return 'Security Analysis Report'
+
+        result = self._generator(chat).analyze_contract_security(_vault(2))
+
+        assert result == {'success': True, 'analysis': 'Security Analysis Report'}
+        assert len(prompts) == 1
+        assert '// send funds' not in prompts[0]
@@ -0,0 +1,73 @@
+"""
+Tests for vectorized bootstrap confidence intervals
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import sentiment_stats
+from sentiment_stats import bootstrap_mean_ci
+from sentiment_analyzer import SentimentAnalyzer
+
+
+class TestBootstrapMeanCI:
+    """Test the grouped bootstrap engine"""
+
+    def test_interval_matches_per_group_bootstrap(self):
+        """Test intervals agree with a plain bootstrap of one group"""
+        rng = np.random.default_rng(11)
+        values = rng.uniform(-1, 1, 400)
+
+        ci = bootstrap_mean_ci(np.array(['20'] * 400), values, n_resamples=2000)
+        reference = np.quantile([rng.choice(values, 400).mean() for _ in range(2000)], [0.025, 0.975])
+
+        assert ci.loc['20', 'ci_low'] == pytest.approx(reference[0], abs=0.02)
+        assert ci.loc['20', 'ci_high'] == pytest.approx(reference[1], abs=0.02)
+
+    def test_interval_narrows_with_more_comments(self):
+        """Test a heavily discussed EIP gets a tighter interval than a sparse one"""
+        rng = np.random.default_rng(5)
+        keys = np.array(['sparse'] * 5 + ['busy'] * 2000, dtype=object)
+        values = rng.uniform(-1, 1, len(keys))
+
+        ci = bootstrap_mean_ci(keys, values)
+        width = ci['ci_high'] - ci['ci_low']
+
+        assert width['busy'] < width['sparse'] / 5
+
+    def test_interval_contains_group_mean(self):
+        """Test every group's mean lies inside its interval, single comments collapse to a point"""
+        keys = np.array(['20', '721', '20', '20', '1559', '721'], dtype=object)
+        values = np.array([0.1, -0.4, 0.9, -0.2, 0.6, np.nan])
+
+        ci = bootstrap_mean_ci(keys, values)
+
+        assert set(ci.index) == {'20', '721', '1559'}
+        assert ci.loc['20', 'ci_low'] <= np.mean([0.1, 0.9, -0.2]) <= ci.loc['20', 'ci_high']
+        assert ci.loc['1559', 'ci_low'] == pytest.approx(0.6)
+        assert ci.loc['1559', 'ci_high'] == pytest.approx(0.6)
+
+    def test_batched_resampling_is_deterministic(self, monkeypatch):
+        """Test small batches cover all replicates and a seed fixes the result"""
+        keys = np.repeat(np.arange(50).astype(str), 20)
+        values = np.random.default_rng(2).uniform(-1, 1, len(keys))
+        monkeypatch.setattr(sentiment_stats, 'BATCH_CELLS', 3000)
+
+        first = bootstrap_mean_ci(keys, values, n_resamples=250, seed=4)
+        second = bootstrap_mean_ci(keys, values, n_resamples=250, seed=4)
+
+        pd.testing.assert_frame_equal(first, second)
+        assert (first['ci_low'] < first['ci_high']).all()
+
+    def test_empty_input(self):
+        """Test no comments yields no intervals"""
+        assert bootstrap_mean_ci(np.array([]), np.array([])).empty
+
+    def test_stage1_interval_columns(self):
+        """Test Stage 1 names the interval columns per EIP"""
+        scores = pd.DataFrame({'eip': ['20', '20', '721'], 'compound': [-0.5, 0.5, 0.2]})
+
+        ci = SentimentAnalyzer._compound_confidence_intervals(scores)
+
+        assert list(ci.columns) == ['eip', 'compound_ci_low', 'compound_ci_high']
+        assert ci.set_index('eip').loc['721', 'compound_ci_low'] == pytest.approx(0.2)
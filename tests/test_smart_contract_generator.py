@@ -4,7 +4,8 @@ Tests for Smart Contract Generator functionality
 
 import pytest
 import json
-from unittest.mock import patch, MagicMock
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
 from smart_contract_generator import EIPCodeGenerator
 
 
@@ -387,4 +388,217 @@ class TestSmartContractGeneratorIntegration:
             contract_code, 'comprehensive', all_eips, 'all_statuses'
         )
         
-        assert result_all['success'] is True
\ No newline at end of file
+        assert result_all['success'] is True
+
+class TestConcurrentCodeAnalysis:
+    """Test the recommendation and security completions run side by side"""
+    
+    RECOMMENDATIONS = '{"recommendations": [{"eip_number": "20", "reason": "token", "confidence": 0.9}]}'
+    
+    def _generator(self, security):
+        """Generator whose recommendation completion takes 0.3s and whose security analysis is `security`"""
+        generator = EIPCodeGenerator.__new__(EIPCodeGenerator)
+        
+        def chat(**kwargs):
+            time.sleep(0.3)
+            return self.RECOMMENDATIONS
+        
+        generator._chat = chat
+        generator.analyze_contract_security = security
+        return generator
+    
+    def test_calls_overlap(self):
+        """Test total latency is close to the slower call rather than the sum of both"""
+        def security(code, timeout=None, cancel=None):
+            time.sleep(0.3)
+            return {'success': True, 'analysis': 'No issues'}
+        
+        started = time.monotonic()
+        result = self._generator(security).analyze_code_and_recommend_eips('contract A {}', 'comprehensive', [])
+        
+        assert time.monotonic() - started < 0.55
+        assert result['analysis'] == 'No issues'
+        assert result['eip_recommendations'][0]['eip_number'] == '20'
+        assert 'security_error' not in result
+    
+    def test_security_failure_keeps_recommendations(self):
+        """Test recommendations are returned when the security analysis raises"""
+        def security(code, timeout=None, cancel=None):
+            raise RuntimeError('rate limited')
+        
+        result = self._generator(security).analyze_code_and_recommend_eips('contract A {}', 'comprehensive', [])
+        
+        assert result['success'] is True
+        assert len(result['eip_recommendations']) == 1
+        assert 'rate limited' in result['security_error']
+    
+    def test_security_timeout_keeps_recommendations(self):
+        """Test a security analysis running past its limit is abandoned, not waited for"""
+        def security(code, timeout=None, cancel=None):
+            time.sleep(1.0)
+            return {'success': True, 'analysis': 'late'}
+        
+        with patch('smart_contract_generator.SECURITY_ANALYSIS_TIMEOUT', 0.4):
+            started = time.monotonic()
+            result = self._generator(security).analyze_code_and_recommend_eips('contract A {}', 'comprehensive', [])
+        
+        assert time.monotonic() - started < 0.8
+        assert result['success'] is True
+        assert 'timed out' in result['security_error']
+        assert len(result['eip_recommendations']) == 1
+    
+    def test_abandoned_security_analysis_is_cancelled(self):
+        """Test a security analysis that runs over is told to stop sending chunks"""
+        events = []
+        
+        def security(code, timeout=None, cancel=None):
+            events.append(cancel)
+            time.sleep(0.6)
+            return {'success': True, 'analysis': 'late'}
+        
+        with patch('smart_contract_generator.SECURITY_ANALYSIS_TIMEOUT', 0.4):
+            self._generator(security).analyze_code_and_recommend_eips('contract A {}', 'comprehensive', [])
+        
+        assert events[0].is_set()
+
+class TestRequestDeadline:
+    """Test a call's timeout bounds all its attempts together"""
+    
+    def _generator(self, client):
+        generator = EIPCodeGenerator.__new__(EIPCodeGenerator)
+        generator.client = client
+        generator.cache = None
+        return generator
+    
+    def test_retries_stop_at_deadline(self):
+        """Test attempts get only the time left and no retry starts when its backoff would pass the deadline"""
+        client = MagicMock()
+        client.chat.completions.create.side_effect = RuntimeError('server error')
+        
+        with patch('smart_contract_generator.time.sleep') as backoff:
+            with pytest.raises(RuntimeError):
+                self._generator(client)._chat(timeout=1.5, model='gpt-4o', messages=[])
+        
+        timeouts = [call.kwargs['timeout'] for call in client.chat.completions.create.call_args_list]
+        assert len(timeouts) == 2
+        assert all(0 < timeout <= 1.5 for timeout in timeouts)
+        backoff.assert_called_once_with(1)
+    
+    def test_no_attempt_after_deadline(self):
+        """Test a call whose deadline has already passed is never sent"""
+        client = MagicMock()
+        
+        with pytest.raises(TimeoutError):
+            self._generator(client)._chat(deadline=time.monotonic() - 1, model='gpt-4o', messages=[])
+        
+        client.chat.completions.create.assert_not_called()
+
+class FakeStream:
+    """OpenAI stream stand-in that records how far it was read and whether it was closed"""
+    
+    def __init__(self, fragments):
+        self.fragments = fragments
+        self.read = 0
+        self.closed = False
+    
+    def __iter__(self):
+        for text in self.fragments:
+            self.read += 1
+            yield MagicMock(choices=[MagicMock(delta=MagicMock(content=text))])
+    
+    def close(self):
+        self.closed = True
+
+
+class AsyncFakeStream(FakeStream):
+    """FakeStream as returned by the AsyncOpenAI client"""
+    
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
+    
+    async def close(self):
+        self.closed = True
+
+
+class TestStreamingGeneration:
+    """Test contract and test suite generation stream tokens as they arrive"""
+    
+    def _generator(self, stream, cache=None):
+        generator = EIPCodeGenerator.__new__(EIPCodeGenerator)
+        generator.client = MagicMock()
+        generator.client.chat.completions.create.return_value = stream
+        generator.cache = cache
+        return generator
+    
+    def test_fragments_are_yielded_and_cached(self):
+        """Test every fragment is yielded in order and the joined text is cached once the stream ends"""
+        cache = MagicMock()
+        cache.get.return_value = None
+        stream = FakeStream(['pragma ', None, 'solidity ^0.8.0;'])
+        generator = self._generator(stream, cache)
+        
+        fragments = list(generator.stream_test_suite('contract A {}', 'A'))
+        
+        assert fragments == ['pragma ', 'solidity ^0.8.0;']
+        assert generator.client.chat.completions.create.call_args.kwargs['stream'] is True
+        assert cache.set.call_args.args[1] == 'pragma solidity ^0.8.0;'
+        assert stream.closed
+    
+    def test_closing_early_closes_upstream_and_skips_cache(self):
+        """Test a consumer that stops reading closes the OpenAI stream and caches nothing partial"""
+        cache = MagicMock()
+        cache.get.return_value = None
+        stream = FakeStream(['a', 'b', 'c', 'd'])
+        fragments = self._generator(stream, cache).stream_eip_implementation({'eip': '20'}, 'ERC20')
+        
+        assert next(fragments) == 'a'
+        fragments.close()
+        
+        assert stream.closed
+        assert stream.read == 1
+        cache.set.assert_not_called()
+    
+    def test_stream_route_sends_tokens_then_done(self, client):
+        """Test the SSE endpoint emits token events followed by a done event"""
+        stream = AsyncFakeStream(['contract ', 'Token {}'])
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_async_client') as shared:
+            shared.return_value.chat.completions.create = AsyncMock(return_value=stream)
+            response = client.post('/api/generate-contract/stream',
+                                   json={'eip_number': '20', 'contract_type': 'ERC20'})
+        
+        body = response.get_data(as_text=True)
+        events = [block.split('\n') for block in body.strip().split('\n\n')]
+        assert response.mimetype == 'text/event-stream'
+        assert [lines[0] for lines in events] == ['event: token', 'event: token', 'event: done']
+        assert json.loads(events[1][1][len('data: '):]) == {'text': 'Token {}'}
+        assert json.loads(events[2][1][len('data: '):])['eip_number'] == '20'
+    
+    def test_client_disconnect_cancels_generation(self, client):
+        """Test closing the response mid-stream stops reading from OpenAI"""
+        stream = AsyncFakeStream(['describe', '(', '"A"', ')'])
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_async_client') as shared:
+            shared.return_value.chat.completions.create = AsyncMock(return_value=stream)
+            response = client.post('/api/generate-tests/stream', json={'contract_code': 'contract A {}'},
+                                   buffered=False)
+            first = next(iter(response.response))
+            response.close()
+        
+        assert b'event: token' in first
+        assert stream.closed
+        assert stream.read == 1
+    
+    def test_stream_route_reports_errors(self, client):
+        """Test a failing completion ends the stream with an error event"""
+        with patch('smart_contract_generator.shared_client'), \
+                patch('smart_contract_generator.shared_async_client') as shared:
+            shared.return_value.chat.completions.create = AsyncMock(side_effect=RuntimeError('quota exceeded'))
+            with patch('smart_contract_generator.asyncio.sleep', new_callable=AsyncMock), \
+                    patch('smart_contract_generator.time.sleep', side_effect=AssertionError('blocking sleep')):
+                body = client.post('/api/generate-tests/stream',
+                                   json={'contract_code': 'contract A {}'}).get_data(as_text=True)
+        
+        assert body.startswith('event: error')
+        assert 'quota exceeded' in body
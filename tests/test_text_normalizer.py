@@ -0,0 +1,87 @@
+"""
+Tests for pre-scoring text normalization
+"""
+
+import json
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from sentiment_analyzer import SentimentAnalyzer
+from text_normalizer import TextNormalizer, parse_rules, DEFAULT_RULES, NORMALIZATION_STATS_FILENAME
+
+ADDRESS = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+
+
+class TestTextNormalizer:
+    """Test each rule strips only what it targets"""
+
+    def test_code_fences_removed(self):
+        """Test fenced Solidity is dropped, including a fence left open at the end"""
+        normalizer = TextNormalizer()
+
+        assert normalizer.normalize("Looks good ```solidity\nfunction f() {}\n``` to me") == "Looks good to me"
+        assert normalizer.normalize("Try this ```function broken(") == "Try this"
+
+    def test_quoted_posts_removed(self):
+        """Test Discourse quote blocks and markdown quote lines are dropped"""
+        normalizer = TextNormalizer()
+        text = '[quote="alice, post:3"]terrible idea[/quote] Fair point.\n> awful gas costs\nUpdated.'
+
+        assert normalizer.normalize(text) == "Fair point. Updated."
+
+    def test_links_and_hex_removed(self):
+        """Test URLs, addresses and hashes go but short hex literals stay"""
+        normalizer = TextNormalizer()
+        text = f"See https://eips.ethereum.org/EIPS/eip-20 deployed at {ADDRESS} with flag 0x01"
+
+        assert normalizer.normalize(text) == "See deployed at with flag 0x01"
+
+    def test_rules_are_configurable(self):
+        """Test only the selected rules run, and unknown names are rejected"""
+        normalizer = TextNormalizer("urls,whitespace")
+
+        assert normalizer.normalize(f"{ADDRESS} https://x.org") == ADDRESS
+        assert parse_rules(None) == DEFAULT_RULES
+        assert parse_rules("none") == []
+        with pytest.raises(ValueError, match="bogus"):
+            parse_rules("urls,bogus")
+
+    def test_series_reports_bytes_removed(self):
+        """Test per-rule removed byte counts add up to the total shrinkage"""
+        normalizer = TextNormalizer()
+        texts = pd.Series([f"ok {ADDRESS}", "fine ```code```", None])
+
+        normalized = normalizer.normalize_series(texts)
+        stats = normalizer.stats.to_dict()
+
+        assert list(normalized) == ["ok", "fine", ""]
+        assert stats["bytes_in"] - stats["bytes_out"] == stats["bytes_removed"] == sum(stats["removed_by_rule"].values())
+        # Matches are replaced by a space so neighbouring words stay apart
+        assert stats["removed_by_rule"]["hex"] == len(ADDRESS) - 1
+
+
+class TestNormalizedScoring:
+    """Test the analyzer scores normalized text and reports what it removed"""
+
+    def test_stage1_scores_normalized_text(self, tmp_path):
+        """Test quoted negativity no longer drags a comment down, while the stored text is untouched"""
+        input_file = tmp_path / 'comments.csv'
+        pd.DataFrame({
+            'topic': ['EIP-20 thread'],
+            'paragraphs': ['> this is bad\ngood'],
+            'headings': [''],
+            'unordered_lists': [''],
+        }).to_csv(input_file, index=False)
+
+        with patch('sentiment_analyzer.SentimentIntensityAnalyzer') as mock_vader:
+            mock_vader.return_value.polarity_scores.side_effect = lambda text: {
+                'compound': -0.5 if 'bad' in text else 0.5, 'pos': 0.0, 'neg': 0.0, 'neu': 1.0
+            }
+            analyzer = SentimentAnalyzer()
+            df = analyzer._score_comments(analyzer._load_comments(str(input_file)))
+            analyzer._write_normalization_stats(str(tmp_path))
+
+        assert df['compound'].tolist() == [0.5]
+        assert 'bad' in df['text'].iloc[0]
+        stats = json.loads((tmp_path / NORMALIZATION_STATS_FILENAME).read_text())
+        assert stats['removed_by_rule']['quotes'] == len('> this is bad') - 1
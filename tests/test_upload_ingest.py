@@ -0,0 +1,162 @@
+"""
+Tests for multi-file, archive and compressed uploads
+"""
+
+import io
+import os
+import gzip
+import tarfile
+import zipfile
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from app import app, db, ingest_job_background, AnalysisJob, EIPSentiment
+from sentiment_analyzer import SentimentAnalyzer
+from score_store import SCORE_STORE_FILENAME
+from upload_ingest import ingest_uploads, members_sha256
+
+CSV_A = b"topic,paragraphs,headings,unordered_lists\nEIP-20 thread,good,,\nEIP-20 thread,bad,,\n"
+CSV_B = b"topic,paragraphs,headings,unordered_lists\nEIP-20 thread,good,,\nERC-721 thread,good,,\n"
+MAX_BYTES = 1024 * 1024
+
+
+def _fake_scores(text):
+    compound = 0.5 if 'good' in text else -0.5
+    return {'compound': compound, 'pos': max(compound, 0), 'neg': max(-compound, 0), 'neu': 0.5}
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+class TestIngestUploads:
+    """Test uploads are turned into plain CSV members"""
+
+    def test_gzip_csv_is_decompressed(self, tmp_path):
+        """Test a .csv.gz upload becomes one plain CSV with the original content"""
+        upload = _write(tmp_path / 'comments.csv.gz', gzip.compress(CSV_A))
+
+        members = ingest_uploads([upload], str(tmp_path / 'members'), MAX_BYTES)
+
+        assert len(members) == 1
+        assert open(members[0], 'rb').read() == CSV_A
+
+    def test_zip_members_skip_non_csv(self, tmp_path):
+        """Test only CSV members of a zip are extracted, including compressed ones"""
+        upload = _zip(tmp_path / 'export.zip', {
+            'general/a.csv': CSV_A,
+            'core/b.csv.gz': gzip.compress(CSV_B),
+            '__MACOSX/general/._a.csv': b'junk',
+            'README.txt': b'notes',
+        })
+
+        members = ingest_uploads([upload], str(tmp_path / 'members'), MAX_BYTES)
+
+        assert [open(path, 'rb').read() for path in members] == [CSV_A, CSV_B]
+        assert all(os.path.dirname(path) == str(tmp_path / 'members') for path in members)
+
+    def test_tar_gz_is_streamed(self, tmp_path):
+        """Test CSV members of a compressed tar archive are extracted in order"""
+        upload = tmp_path / 'export.tar.gz'
+        with tarfile.open(upload, 'w:gz') as archive:
+            for name, data in [('a.csv', CSV_A), ('b.csv', CSV_B)]:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+        members = ingest_uploads([str(upload)], str(tmp_path / 'members'), MAX_BYTES)
+
+        assert [open(path, 'rb').read() for path in members] == [CSV_A, CSV_B]
+
+    def test_uncompressed_size_is_bounded(self, tmp_path):
+        """Test an upload that inflates past the limit is rejected"""
+        upload = _write(tmp_path / 'big.csv.gz', gzip.compress(CSV_A * 100))
+
+        with pytest.raises(ValueError, match='uncompressed size'):
+            ingest_uploads([upload], str(tmp_path / 'members'), len(CSV_A) * 10)
+
+    def test_zstd_requires_package(self, tmp_path):
+        """Test zstd uploads fail clearly when zstandard is not installed"""
+        upload = _write(tmp_path / 'comments.csv.zst', b'\x28\xb5\x2f\xfd')
+
+        with patch('upload_ingest.zstandard', None), pytest.raises(ValueError, match='zstandard'):
+            ingest_uploads([upload], str(tmp_path / 'members'), MAX_BYTES)
+
+    def test_content_hash_ignores_compression(self, tmp_path):
+        """Test the same CSV hashes the same whether it was uploaded plain or gzipped"""
+        plain = _write(tmp_path / 'a.csv', CSV_A)
+        members = ingest_uploads([_write(tmp_path / 'a.csv.gz', gzip.compress(CSV_A))], str(tmp_path / 'm'), MAX_BYTES)
+
+        assert members_sha256(members) == members_sha256([plain])
+
+
+class TestMultiFileJobs:
+    """Test several files are analysed as one job"""
+
+    def test_members_merge_into_one_result(self, test_app, tmp_path):
+        """Test a zip of two exports produces one job with combined per-EIP counts"""
+        upload = _zip(tmp_path / 'export.zip', {'a.csv': CSV_A, 'b.csv': CSV_B})
+        outputs = tmp_path / 'outputs'
+
+        def stage3(analyzer, output_dir):
+            final_file = os.path.join(output_dir, 'final_merged_analysis.csv')
+            pd.read_csv(os.path.join(output_dir, 'unified_sentiment_summary.csv')).to_csv(final_file, index=False)
+            return [final_file]
+
+        metadata = pd.DataFrame({'eip': ['20', '721'], 'status': ['Final'] * 2, 'category': ['ERC'] * 2})
+        with test_app.app_context():
+            db.session.add(AnalysisJob(id='multi-job', filename='export.zip', original_filename='export.zip'))
+            db.session.commit()
+            with patch.dict(app.config, {'OUTPUT_FOLDER': str(outputs), 'LOCAL_SHARD_PROCESSES': 0}), \
+                    patch('sentiment_analyzer.SentimentIntensityAnalyzer') as mock_vader, \
+                    patch('sentiment_analyzer.fetch_eip_metadata', return_value=metadata), \
+                    patch.object(SentimentAnalyzer, 'run_stage2'), \
+                    patch.object(SentimentAnalyzer, 'run_stage3', stage3):
+                mock_vader.return_value.polarity_scores.side_effect = _fake_scores
+                ingest_job_background('multi-job', [upload], str(outputs / 'multi-job'))
+
+            job = db.session.get(AnalysisJob, 'multi-job')
+            rows = {row.eip: row for row in EIPSentiment.query.filter_by(job_id='multi-job')}
+            assert job.status == 'completed', job.error_message
+            assert rows['20'].total_comment_count == 3
+            assert rows['20'].unified_compound == pytest.approx(0.5 / 3, abs=1e-4)
+            assert rows['721'].total_comment_count == 1
+            # Per-comment scores of both members back the drill-down and the confidence intervals
+            assert os.path.exists(outputs / 'multi-job' / SCORE_STORE_FILENAME)
+            assert rows['20'].compound_ci_low is not None
+
+    def test_invalid_member_fails_job(self, test_app, tmp_path):
+        """Test a member missing required columns fails the job and names the file"""
+        upload = _zip(tmp_path / 'export.zip', {'a.csv': CSV_A, 'broken.csv': b'topic\nEIP-20\n'})
+
+        with test_app.app_context():
+            db.session.add(AnalysisJob(id='multi-job-2', filename='export.zip', original_filename='export.zip'))
+            db.session.commit()
+            ingest_job_background('multi-job-2', [upload], str(tmp_path / 'out'))
+
+            job = db.session.get(AnalysisJob, 'multi-job-2')
+            assert job.status == 'error'
+            assert 'broken.csv' in job.error_message
+
+    def test_upload_route_accepts_several_files(self, client, test_app):
+        """Test posting several files creates one job handled by the ingest task"""
+        data = {'file': [(io.BytesIO(CSV_A), 'general.csv'), (io.BytesIO(gzip.compress(CSV_B)), 'core.csv.gz')]}
+
+        with patch('app.threading.Thread') as mock_thread:
+            response = client.post('/upload', data=data, content_type='multipart/form-data')
+
+        assert response.status_code == 302
+        assert mock_thread.call_args.kwargs['target'] is ingest_job_background
+        job_id, paths = mock_thread.call_args.kwargs['args'][:2]
+        with test_app.app_context():
+            assert db.session.get(AnalysisJob, job_id).original_filename == 'general.csv, core.csv.gz'
+        for path in paths:
+            os.remove(path)
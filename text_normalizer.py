@@ -0,0 +1,94 @@
+import re
+
+NORMALIZATION_STATS_FILENAME = "text_normalization.json"
+
+# Applied in this order; whitespace runs last to collapse the gaps the others leave
+RULES = {
+    # Fenced code (Solidity snippets, diffs), including a fence left open at the end of a post
+    "code_fences": re.compile(r"(```|~~~).*?(?:\1|\Z)", re.DOTALL),
+    # Discourse [quote]...[/quote] blocks and markdown "> " lines quoting earlier posts
+    "quotes": re.compile(r"\[quote[^\]]*\][\s\S]*?\[/quote\]|^[ \t]*>[^\n]*", re.IGNORECASE | re.MULTILINE),
+    "urls": re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE),
+    # Addresses, hashes and selectors; short literals like 0x01 are kept
+    "hex": re.compile(r"\b0x[0-9a-fA-F]{8,}\b"),
+    "whitespace": re.compile(r"\s+"),
+}
+DEFAULT_RULES = list(RULES)
+
+
+def parse_rules(value):
+    """
+    Rule names from a config value: None for the defaults, a list, or a
+    comma-separated string ("" or "none" disables normalization).
+    """
+    if value is None:
+        return list(DEFAULT_RULES)
+    if isinstance(value, str):
+        value = [] if value.strip().lower() in ("", "none") else [name.strip() for name in value.split(",")]
+    unknown = [name for name in value if name not in RULES]
+    if unknown:
+        raise ValueError(f"Unknown text normalization rules: {', '.join(unknown)}")
+    return [name for name in RULES if name in value]
+
+
+def _utf8_bytes(series):
+    return int(series.str.encode("utf-8").str.len().sum()) if len(series) else 0
+
+
+class TextNormalizer:
+    """Strips text that VADER should not score (code, quoted replies, links, hex blobs) before scoring"""
+
+    def __init__(self, rules=None):
+        self.rules = parse_rules(rules)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = NormalizationStats(self.rules)
+
+    @property
+    def enabled(self):
+        return bool(self.rules)
+
+    def normalize(self, text):
+        for name in self.rules:
+            text = RULES[name].sub(" ", text)
+        return text.strip() if "whitespace" in self.rules else text
+
+    def normalize_series(self, texts):
+        """Normalize a Series of comment texts, adding the bytes each rule removed to `stats`"""
+        texts = texts.fillna("").astype(str)
+        if not self.enabled:
+            return texts
+        before = _utf8_bytes(texts)
+        self.stats.bytes_in += before
+        for name in self.rules:
+            texts = texts.str.replace(RULES[name], " ", regex=True)
+            if name == "whitespace":
+                texts = texts.str.strip()
+            after = _utf8_bytes(texts)
+            self.stats.removed[name] += before - after
+            before = after
+        self.stats.bytes_out += before
+        return texts
+
+
+class NormalizationStats:
+    """Running byte counts of text before and after normalization"""
+
+    def __init__(self, rules):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.removed = dict.fromkeys(rules, 0)
+
+    @property
+    def bytes_removed(self):
+        return self.bytes_in - self.bytes_out
+
+    def to_dict(self):
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_removed": self.bytes_removed,
+            "removed_fraction": self.bytes_removed / self.bytes_in if self.bytes_in else 0.0,
+            "removed_by_rule": dict(self.removed),
+        }
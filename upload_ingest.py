@@ -0,0 +1,131 @@
+import os
+import gzip
+import hashlib
+import tarfile
+import zipfile
+import pandas as pd
+from werkzeug.utils import secure_filename
+
+try:
+    import zstandard
+except ImportError:  # zstd uploads are rejected without it
+    zstandard = None
+
+REQUIRED_COLUMNS = ['paragraphs', 'headings', 'unordered_lists', 'topic']
+
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.zst')
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.zst')
+UPLOAD_SUFFIXES = CSV_SUFFIXES + ARCHIVE_SUFFIXES
+
+COPY_BUFFER = 1024 * 1024
+
+
+def allowed_upload(filename):
+    return filename.lower().endswith(UPLOAD_SUFFIXES)
+
+
+def is_plain_csv(filename):
+    return filename.lower().endswith('.csv')
+
+
+def missing_columns(path):
+    """Required columns absent from a CSV, checked from its header only"""
+    columns = pd.read_csv(path, nrows=0).columns.str.strip().str.lower()
+    return [col for col in REQUIRED_COLUMNS if col not in columns]
+
+
+def _decompressing(stream, name):
+    """Wrap a binary stream so reads return the decompressed CSV"""
+    name = name.lower()
+    if name.endswith('.gz') or name.endswith('.tgz'):
+        return gzip.GzipFile(fileobj=stream)
+    if name.endswith('.zst'):
+        if zstandard is None:
+            raise ValueError(f"{os.path.basename(name)}: zstd uploads require the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    return stream
+
+
+def _is_csv_member(name):
+    base = os.path.basename(name)
+    # Skip directories and macOS resource forks that archivers add next to real files
+    return bool(base) and not base.startswith('.') and '__MACOSX' not in name and base.lower().endswith(CSV_SUFFIXES)
+
+
+class _Extractor:
+    """Writes decompressed CSV members into one directory under a shared size budget"""
+
+    def __init__(self, dest_dir, max_bytes):
+        self.dest_dir = dest_dir
+        self.remaining = max_bytes
+        self.members = []
+        os.makedirs(dest_dir, exist_ok=True)
+
+    def add(self, stream, name):
+        base = os.path.basename(name)
+        for suffix in ('.gz', '.zst'):
+            if base.lower().endswith(suffix):
+                base = base[:-len(suffix)]
+        # Members are renamed, so archive paths can never point outside dest_dir
+        path = os.path.join(self.dest_dir, f"{len(self.members):03d}_{secure_filename(base) or 'member.csv'}")
+        with open(path, 'wb') as out:
+            source = _decompressing(stream, name)
+            while True:
+                block = source.read(COPY_BUFFER)
+                if not block:
+                    break
+                self.remaining -= len(block)
+                if self.remaining < 0:
+                    raise ValueError('Upload is larger than the allowed uncompressed size')
+                out.write(block)
+        self.members.append(path)
+        return path
+
+
+def ingest_uploads(paths, dest_dir, max_bytes):
+    """
+    Turn uploaded files into plain CSVs ready for scoring.
+
+    Plain CSVs are used in place. Compressed CSVs (.csv.gz, .csv.zst) and
+    the CSV members of zip/tar archives are decompressed as a stream into
+    dest_dir, so nothing is held in memory whole. `max_bytes` bounds the
+    total decompressed size. Returns the CSV paths in upload order.
+    """
+    extractor = _Extractor(dest_dir, max_bytes)
+    members = []
+    for path in paths:
+        name = os.path.basename(path).lower()
+        if name.endswith('.csv'):
+            members.append(path)
+        elif name.endswith(('.csv.gz', '.csv.zst')):
+            with open(path, 'rb') as raw:
+                members.append(extractor.add(raw, name))
+        elif name.endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and _is_csv_member(info.filename):
+                        with archive.open(info) as raw:
+                            members.append(extractor.add(raw, info.filename))
+        elif name.endswith(('.tar', '.tar.gz', '.tgz', '.tar.zst')):
+            with open(path, 'rb') as raw:
+                # Tar members are read in order from the (decompressed) stream
+                with tarfile.open(fileobj=_decompressing(raw, name), mode='r|') as archive:
+                    for info in archive:
+                        if info.isfile() and _is_csv_member(info.name):
+                            members.append(extractor.add(archive.extractfile(info), info.name))
+        else:
+            raise ValueError(f"Unsupported upload type: {os.path.basename(path)}")
+
+    if not members:
+        raise ValueError('No CSV files found in upload')
+    return members
+
+
+def members_sha256(paths):
+    """Content hash of an upload's CSV members, independent of compression and archive order"""
+    from global_rollup import file_sha256
+
+    if len(paths) == 1:
+        return file_sha256(paths[0])
+    digests = sorted(file_sha256(path) for path in paths)
+    return hashlib.sha256("\n".join(digests).encode("ascii")).hexdigest()